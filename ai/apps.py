@@ -19,6 +19,9 @@ class AiConfig(AppConfig):
         except Exception as e:
             print(f"Warning: Could not set up AI logging: {e}")
 
+        # Feature store invalidation for ML feature matrices
+        import ai.signals
+
         # Import signal handlers for cache invalidation
         # Uncomment when ready to use automatic cache invalidation
         # from ai.cache_utils import invalidate_health_cache_on_record_save, invalidate_org_cache_on_data_change
@@ -162,6 +162,9 @@ class AICacheManager:
         for prefix in prefixes:
             AICacheManager.invalidate(prefix, organization_id)
 
+        from ml_models.feature_store import FeatureStore
+        FeatureStore.invalidate(organization_id)
+
 
 def cache_ai_result(prefix, timeout=None, participant_param='participant'):
     """
@@ -400,9 +400,10 @@ class AIModelHealthCheck:
         Get summary of AI model performance
 
         Returns:
-            dict: Performance summary from AIModelPerformance records
+            dict: Performance summary from AIModelPerformance records and stored model artifacts
         """
         from ai.models import AIModelPerformance
+        from ml_models.registry import ModelArtifact, ModelRegistry
 
         active_models = AIModelPerformance.objects.filter(is_active=True)
 
@@ -419,6 +420,18 @@ class AIModelHealthCheck:
                     'average_confidence': round(model.average_confidence, 3)
                 }
                 for model in active_models
+            ],
+            'artifacts': [
+                {
+                    'name': meta['model_name'],
+                    'organization_id': meta['organization_id'],
+                    'variant': meta['variant'],
+                    'version': meta['version'],
+                    'trained_at': meta['trained_at'],
+                    'age_days': round(ModelArtifact(objects={}, meta=meta).age_days(), 1),
+                    'metrics': meta['metrics'],
+                }
+                for meta in ModelRegistry.list_artifacts()
             ]
         }
 
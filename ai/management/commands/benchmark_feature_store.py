@@ -0,0 +1,52 @@
+"""
+Benchmark ML feature matrix builds (rows, SQL queries, wall time).
+
+Query count stays constant per feature set whatever the population size.
+
+Usage:
+    python manage.py benchmark_feature_store --organization <uid>
+    python manage.py benchmark_feature_store --limit 20
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Participant
+from ml_models.feature_store import FeatureStore
+
+
+class Command(BaseCommand):
+    help = 'Build patient and employee feature matrices uncached and report rows, queries and time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', action='append', dest='organizations', help='Organization uid (repeatable)')
+        parser.add_argument('--limit', type=int, default=10, help='Largest organizations to benchmark when none given')
+
+    def handle(self, *args, **options):
+        if options['organizations']:
+            organizations = Participant.objects.filter(uid__in=options['organizations'])
+        else:
+            organizations = (
+                Participant.objects.filter(role__in=['hospital', 'pharmacy', 'insurance_company'])
+                .annotate(employee_count=Count('employees'))
+                .order_by('-employee_count')[:options['limit']]
+            )
+
+        builders = [
+            ('patients', FeatureStore.build_patient_features),
+            ('employees', FeatureStore.build_employee_features),
+        ]
+        for organization in organizations:
+            for name, builder in builders:
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    matrix = builder(organization)
+                    elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{organization.full_name or organization.email} {name}: {len(matrix)} rows, '
+                    f'{len(queries)} queries, {elapsed * 1000:.1f} ms'
+                )
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
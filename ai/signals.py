@@ -0,0 +1,105 @@
+"""
+Feature store invalidation
+
+Writes to the source tables of ml_models.feature_store bump the owning
+organization's feature version after commit, so the next churn or
+segmentation request rebuilds the matrix instead of serving stale features.
+
+Saves only record the employee, patient or organization id they touch; the
+ids of a transaction are resolved to organizations with at most one query per
+kind when it commits, so a save costs no extra query. Saves whose
+update_fields miss every feature column are ignored.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from appointments.models import Appointment
+from core.models import Participant, Transaction
+from hr.models import Employee, LeaveRequest, PayrollRun, TimeAndAttendance
+from ml_models.feature_store import FeatureStore
+from prescriptions.models import Prescription
+
+# Columns read by ml_models.feature_store, per source model
+FEATURE_FIELDS = {
+    Employee: {'organization', 'status', 'hire_date', 'employment_type', 'user'},
+    TimeAndAttendance: {'employee', 'clock_in', 'is_late', 'is_early_departure'},
+    LeaveRequest: {'employee', 'start_date'},
+    PayrollRun: {'employee', 'payment_status'},
+    Participant: {'role', 'affiliated_provider', 'is_active', 'full_name'},
+    Appointment: {'patient', 'status', 'appointment_date'},
+    Prescription: {'patient'},
+    Transaction: {'sender', 'status', 'amount'},
+}
+
+_pending = threading.local()
+
+
+def _touches_features(sender, kwargs):
+    update_fields = kwargs.get('update_fields')
+    return update_fields is None or bool(FEATURE_FIELDS[sender] & set(update_fields))
+
+
+def _invalidate_later(kind, entity_id):
+    """Record an id to resolve at commit (kind: 'organizations', 'employees' or 'patients')"""
+    if not entity_id:
+        return
+    pending = getattr(_pending, 'ids', None)
+    if pending is None:
+        pending = _pending.ids = {'organizations': set(), 'employees': set(), 'patients': set()}
+    pending[kind].add(entity_id)
+    # Every save registers the flush (a savepoint rollback discards its callbacks); later ones find nothing left
+    transaction.on_commit(_flush)
+
+
+def _flush():
+    pending = getattr(_pending, 'ids', None)
+    _pending.ids = None
+    if not pending:
+        return
+    organization_ids = set(pending['organizations'])
+    if pending['employees']:
+        organization_ids.update(
+            Employee.objects.filter(pk__in=pending['employees']).values_list('organization_id', flat=True)
+        )
+    if pending['patients']:
+        organization_ids.update(
+            Participant.objects.filter(pk__in=pending['patients']).values_list('affiliated_provider_id', flat=True)
+        )
+    for organization_id in organization_ids - {None}:
+        FeatureStore.invalidate(organization_id)
+
+
+@receiver([post_save, post_delete], sender=Employee)
+def invalidate_employee_features(sender, instance, **kwargs):
+    if _touches_features(sender, kwargs):
+        _invalidate_later('organizations', instance.organization_id)
+
+
+@receiver([post_save, post_delete], sender=TimeAndAttendance)
+@receiver([post_save, post_delete], sender=LeaveRequest)
+@receiver([post_save, post_delete], sender=PayrollRun)
+def invalidate_employee_activity_features(sender, instance, **kwargs):
+    if _touches_features(sender, kwargs):
+        _invalidate_later('employees', instance.employee_id)
+
+
+@receiver([post_save, post_delete], sender=Participant)
+def invalidate_patient_population_features(sender, instance, **kwargs):
+    if instance.role == 'patient' and _touches_features(sender, kwargs):
+        _invalidate_later('organizations', instance.affiliated_provider_id)
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+@receiver([post_save, post_delete], sender=Prescription)
+def invalidate_patient_activity_features(sender, instance, **kwargs):
+    if _touches_features(sender, kwargs):
+        _invalidate_later('patients', instance.patient_id)
+
+
+@receiver([post_save, post_delete], sender=Transaction)
+def invalidate_patient_spending_features(sender, instance, **kwargs):
+    if _touches_features(sender, kwargs):
+        _invalidate_later('patients', instance.sender_id)
@@ -0,0 +1,80 @@
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+def _trainer(model_name, variant):  # (train callable, kwargs) for a registry model name and variant
+    from ml_models.churn_prediction import ChurnPredictor
+    from ml_models.patient_segmentation import PatientSegmentation
+    from ml_models.revenue_forecast import AdvancedRevenueForecast
+
+    if model_name == ChurnPredictor.MODEL_NAME:
+        return ChurnPredictor.train, {'variant': variant}
+    if model_name == PatientSegmentation.MODEL_NAME:
+        return PatientSegmentation.train, {'n_clusters': int(variant.lstrip('k'))}
+    if model_name == AdvancedRevenueForecast.MODEL_NAME:
+        return AdvancedRevenueForecast.train, {'historical_days': int(variant.lstrip('h'))}
+    raise ValueError(f"Unknown ML model: {model_name}")
+
+
+def _current_features(model_name, organization):  # Feature matrix the drift check compares against (None for time series)
+    from ml_models.churn_prediction import ChurnPredictor
+    from ml_models.feature_store import FeatureStore
+    from ml_models.patient_segmentation import PatientSegmentation
+
+    if model_name == ChurnPredictor.MODEL_NAME:
+        return FeatureStore.employee_features(organization, lookback_days=ChurnPredictor.LOOKBACK_DAYS)
+    if model_name == PatientSegmentation.MODEL_NAME:
+        return FeatureStore.patient_features(organization, lookback_days=PatientSegmentation.LOOKBACK_DAYS)
+    return None
+
+
+@shared_task
+def train_ml_model(model_name, organization_id, variant='default'):  # Fit one model for one organization and store it in the registry
+    from django.core.cache import cache
+    from core.models import Participant
+
+    organization = Participant.objects.filter(uid=organization_id).first()
+    try:
+        if organization is None:
+            return f"{model_name}: organization {organization_id} not found"
+        train, kwargs = _trainer(model_name, variant)
+        result = train(organization, **kwargs)
+    finally:
+        cache.delete(f"ml:training:{model_name}:{organization_id}:{variant}")
+
+    if 'version' in result:
+        return f"{model_name} v{result['version']} trained for {organization_id} ({variant})"
+    return f"{model_name} not trained for {organization_id}: {result.get('status')}"
+
+
+@shared_task
+def retrain_ml_models():  # Nightly: retrain stored models that are stale or whose features drifted
+    from core.models import Participant
+    from ml_models.registry import ModelRegistry
+
+    retrained = 0
+    for meta in ModelRegistry.list_artifacts():
+        model_name, organization_id, variant = meta['model_name'], meta['organization_id'], meta['variant']
+        organization = Participant.objects.filter(uid=organization_id).first()
+        if organization is None:
+            continue
+
+        artifact = ModelRegistry.load(model_name, organization_id, variant)
+        matrix = _current_features(model_name, organization)
+        reason = ModelRegistry.needs_retraining(
+            artifact,
+            matrix.X if matrix is not None else None,
+            matrix.feature_names if matrix is not None else (),
+        )
+        if not reason:
+            continue
+        try:
+            train, kwargs = _trainer(model_name, variant)
+            train(organization, **kwargs)
+            retrained += 1
+        except Exception:
+            logger.exception(f"Retraining {model_name} for {organization_id} ({variant}) failed")
+    return f"Retrained {retrained} ML models"
@@ -5,7 +5,7 @@ Tests all AI endpoints, ML models, and chatbot functionality
 from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from datetime import timedelta, date
+from datetime import timedelta, date, time
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 import json
@@ -14,6 +14,7 @@ from core.models import Participant
 from ai.models import AIConversation, AIChatMessage, AIInsight, AIFeature
 from health_records.models import HealthRecord
 from hr.models import Employee, TimeAndAttendance
+from appointments.models import Appointment
 
 
 class AIAssistantChatbotTests(APITestCase):
@@ -503,7 +504,7 @@ class MLModelPerformanceTests(TestCase):
             result = PatientSegmentation.segment_patients(hospital)
 
             # Should handle no data gracefully
-            self.assertIn('error', result)
+            self.assertEqual(result['status'], 'insufficient_data')
         except ImportError:
             self.skipTest("scikit-learn not installed")
 
@@ -524,7 +525,7 @@ class MLModelPerformanceTests(TestCase):
             result = ChurnPredictor.train_and_predict(hospital)
 
             # Should handle no data gracefully
-            self.assertIn('error', result)
+            self.assertEqual(result['status'], 'insufficient_data')
         except ImportError:
             self.skipTest("scikit-learn not installed")
 
@@ -541,11 +542,12 @@ class MLModelPerformanceTests(TestCase):
                 is_active=True
             )
 
-            # Test with no data
+            # Test with no data: days without revenue count as zero
             result = AdvancedRevenueForecast.forecast_revenue(hospital)
 
             # Should handle no data gracefully
-            self.assertIn('error', result)
+            self.assertEqual(result['status'], 'forecasted')
+            self.assertEqual(result['forecast_summary']['total_predicted_revenue'], 0)
         except ImportError:
             self.skipTest("scikit-learn not installed")
 
@@ -592,6 +594,198 @@ class MLModelPerformanceTests(TestCase):
             self.skipTest("ML models not available")
 
 
+class FeatureStoreTests(TestCase):
+    """Feature matrices are built with a fixed number of queries and served from cache"""
+
+    def setUp(self):
+        self.hospital = Participant.objects.create_participant(
+            email='features-hospital@test.com', password='testpass123', role='hospital'
+        )
+
+    def _add_population(self, start, count):
+        for i in range(start, start + count):
+            patient = Participant.objects.create_participant(
+                email=f'features-patient{i}@test.com', password='testpass123', role='patient',
+                affiliated_provider_id=self.hospital.uid,
+            )
+            Appointment.objects.create(
+                patient=patient,
+                appointment_date=date.today() - timedelta(days=i),
+                appointment_time=time(9, 0),
+                status='completed' if i % 2 else 'cancelled',
+            )
+            employee_user = Participant.objects.create_participant(
+                email=f'features-staff{i}@test.com', password='testpass123', role='pharmacy'
+            )
+            employee = Employee.objects.create(
+                organization=self.hospital,
+                user=employee_user,
+                employee_id=f'FS-{i}',
+                job_title='Nurse',
+                employment_type='contract' if i % 2 else 'full_time',
+                hire_date=date.today() - timedelta(days=30 * (i + 1)),
+                salary_type='monthly',
+                base_salary=100000,
+            )
+            TimeAndAttendance.objects.create(
+                employee=employee, clock_in=timezone.now() - timedelta(days=1), is_late=bool(i % 2)
+            )
+
+    def _query_counts(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from ml_models.feature_store import FeatureStore
+
+        counts = {}
+        for name, builder in [
+            ('patients', FeatureStore.build_patient_features),
+            ('employees', FeatureStore.build_employee_features),
+        ]:
+            with CaptureQueriesContext(connection) as queries:
+                matrix = builder(self.hospital)
+            counts[name] = (len(queries), len(matrix))
+        return counts
+
+    def test_query_count_independent_of_population(self):
+        self._add_population(0, 3)
+        small = self._query_counts()
+        self._add_population(3, 12)
+        large = self._query_counts()
+
+        self.assertEqual(small['patients'], (4, 3))
+        self.assertEqual(large['patients'], (4, 15))
+        self.assertEqual(small['employees'], (4, 3))
+        self.assertEqual(large['employees'], (4, 15))
+
+    def test_matrix_values_and_cache_invalidation(self):
+        from ml_models.feature_store import FeatureStore
+
+        self._add_population(0, 2)
+        matrix = FeatureStore.patient_features(self.hospital)
+        visits = dict(zip(matrix.entity_ids, matrix.column('visit_count')))
+        self.assertEqual(sorted(visits.values()), [0.0, 1.0])
+
+        with self.assertNumQueries(0):
+            FeatureStore.patient_features(self.hospital)
+
+        FeatureStore.invalidate(self.hospital.uid)
+        with self.assertNumQueries(4):
+            FeatureStore.patient_features(self.hospital)
+
+    def test_saves_resolve_organizations_once_at_commit(self):  # No lookup per save (ai/signals.py)
+        from django.core.cache import cache
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from ml_models.feature_store import FeatureStore
+
+        self._add_population(0, 3)
+        patients = list(Participant.objects.filter(role='patient', affiliated_provider_id=self.hospital.uid))
+        version = cache.get(FeatureStore._version_key(self.hospital.uid)) or 0
+
+        with self.captureOnCommitCallbacks() as callbacks, CaptureQueriesContext(connection) as saves:
+            for patient in patients:
+                Appointment.objects.create(
+                    patient=patient, appointment_date=date.today(), appointment_time=time(10, 0), status='pending'
+                )
+        self.assertFalse([q for q in saves.captured_queries if 'affiliated_provider_id' in q['sql']])
+        with CaptureQueriesContext(connection) as commit:
+            for callback in callbacks:
+                callback()
+        # one patient -> organization lookup for the whole transaction
+        self.assertEqual(len([q for q in commit.captured_queries if 'affiliated_provider_id' in q['sql']]), 1)
+        self.assertEqual(cache.get(FeatureStore._version_key(self.hospital.uid)), version + 1)
+
+
+
+class ModelRegistryTests(TestCase):
+    """Models are trained once into the registry; requests only load and predict"""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+
+        self.artifact_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.artifact_root, True)
+        settings_override = override_settings(ML_ARTIFACT_ROOT=self.artifact_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.organization = Participant.objects.create_participant(
+            email='registry-org@test.com', password='testpass123', role='pharmacy'
+        )
+        for i in range(12):
+            user = Participant.objects.create_participant(
+                email=f'registry-staff{i}@test.com', password='testpass123', role='pharmacy'
+            )
+            recent = i % 2 == 0
+            employee = Employee.objects.create(
+                organization=self.organization,
+                user=user,
+                employee_id=f'REG-{i}',
+                job_title='Cashier',
+                employment_type='full_time',
+                hire_date=date.today() - timedelta(days=30 if recent else 400),
+                salary_type='monthly',
+                base_salary=100000,
+            )
+            TimeAndAttendance.objects.create(
+                employee=employee, clock_in=timezone.now() - timedelta(days=1), is_late=recent
+            )
+
+    def test_predict_queues_training_then_serves_stored_model(self):
+        from unittest import mock
+        from django.test import override_settings
+        from ai.logging_utils import AIModelHealthCheck
+        from ml_models.churn_prediction import ChurnPredictor
+
+        with override_settings(CELERY_BROKER_URL='redis://localhost:6379/0'), \
+                mock.patch('ai.tasks.train_ml_model.delay') as delay:
+            result = ChurnPredictor.predict(self.organization)
+            ChurnPredictor.predict(self.organization)
+        self.assertEqual(result['status'], 'model_training')
+        delay.assert_called_once_with('churn_prediction', str(self.organization.uid), 'default')
+
+        meta = ChurnPredictor.train(self.organization)
+        self.assertEqual(meta['version'], 1)
+
+        with mock.patch('sklearn.linear_model.LogisticRegression.fit') as fit, \
+                mock.patch('ai.tasks.train_ml_model.delay') as delay:
+            result = ChurnPredictor.predict(self.organization)
+        fit.assert_not_called()
+        delay.assert_not_called()
+        self.assertEqual(result['status'], 'predicted')
+        self.assertEqual(result['model_version'], 1)
+        self.assertEqual(result['total_employees_analyzed'], 12)
+
+        self.assertEqual(ChurnPredictor.train(self.organization)['version'], 2)
+        artifacts = AIModelHealthCheck.get_model_performance_summary()['artifacts']
+        self.assertEqual(len(artifacts), 1)
+        self.assertEqual(artifacts[0]['version'], 2)
+        self.assertLess(artifacts[0]['age_days'], 1)
+        self.assertIn('accuracy', artifacts[0]['metrics'])
+
+    def test_predict_trains_in_process_without_a_worker_broker(self):  # memory:// broker: nothing would run the task
+        from ml_models.churn_prediction import ChurnPredictor
+        from ml_models.registry import ModelRegistry
+
+        result = ChurnPredictor.predict(self.organization)
+        self.assertEqual((result['status'], result['model_version']), ('predicted', 1))
+        self.assertEqual(ModelRegistry.latest_version(ChurnPredictor.MODEL_NAME, self.organization.pk), 1)
+
+    def test_loaded_artifacts_are_bounded(self):  # Least recently used artifacts are dropped from the process cache
+        from unittest import mock
+        from ml_models import registry
+
+        with mock.patch.object(registry, 'MAX_LOADED', 2), mock.patch.dict(registry._loaded, clear=True):
+            for organization_id in ('a', 'b', 'c'):
+                registry.ModelRegistry.save('churn_prediction', organization_id, {'model': [1]})
+                registry.ModelRegistry.load('churn_prediction', organization_id)
+            registry.ModelRegistry.save('churn_prediction', 'c', {'model': [2]})
+            self.assertEqual(registry.ModelRegistry.load('churn_prediction', 'c').version, 2)
+            self.assertEqual([key[1] for key in registry._loaded], ['b', 'c'])
+
+
 class AIInsightTests(TestCase):
     """Test AI Insight model and generation"""
 
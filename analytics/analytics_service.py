@@ -1,35 +1,138 @@
-from django.db.models import Count, Sum, Avg, Q, F
+from django.core.cache import cache
+from django.db.models import Count, Sum, Q
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
 from datetime import timedelta
 from appointments.models import Appointment
-from prescriptions.models import Prescription
-from payments.models import Transaction
+from prescriptions.models import Prescription, PrescriptionFulfillment
+from payments.models import ServiceTransaction
 from health_records.models import HealthRecord
-from core.models import Participant
+from core.models import Participant, ParticipantService
 
+DASHBOARD_CACHE_TTL = 60  # seconds; dashboards tolerate a minute of staleness
+DASHBOARD_MONTHS = 6
+DASHBOARD_ROLES = ("patient", "doctor", "hospital", "pharmacy")
 
-class PatientAnalytics:  # Provides analytics and statistics for patient dashboards
+
+class DashboardStatsBuilder:  # Shared grouped-query helpers and per-participant cache for role dashboards
     @staticmethod
-    def get_dashboard_stats(patient):  # Get comprehensive dashboard statistics for a specific patient
-        today = timezone.now().date()
-        thirty_days_ago = today - timedelta(days=30)
+    def cached(role, participant, build):  # Return the participant's dashboard from cache, building it on a miss
+        cache_key = f"analytics:dashboard:{role}:{participant.pk}"
+        stats = cache.get(cache_key)
+        if stats is None:
+            stats = build(participant)
+            cache.set(cache_key, stats, DASHBOARD_CACHE_TTL)
+        return stats
+
+    @staticmethod
+    def invalidate(role, participant):
+        cache.delete(f"analytics:dashboard:{role}:{participant.pk}")
 
-        appointments_stats = Appointment.objects.filter(patient=patient).aggregate(
+    @staticmethod
+    def invalidate_participants(participant_ids):  # Drop every role dashboard of these participants (ids may be None)
+        cache.delete_many([
+            f"analytics:dashboard:{role}:{participant_id}"
+            for participant_id in set(participant_ids) if participant_id is not None
+            for role in DASHBOARD_ROLES
+        ])
+
+    @staticmethod
+    def month_starts(today, months=DASHBOARD_MONTHS):  # First day of the last `months` calendar months, oldest first
+        starts = [today.replace(day=1)]
+        for _ in range(months - 1):
+            starts.insert(0, (starts[0] - timedelta(days=1)).replace(day=1))
+        return starts
+
+    @staticmethod
+    def by_month(queryset, date_field, **aggregates):  # {month_start: {aggregate: value}} over all history in one GROUP BY
+        rows = (
+            queryset.annotate(month=TruncMonth(date_field))
+            .values("month")
+            .annotate(**aggregates)
+            .order_by()
+        )
+        result = {}
+        for row in rows:
+            month = row.pop("month")
+            if month is None:
+                continue
+            if hasattr(month, "hour"):
+                month = timezone.localtime(month).date() if timezone.is_aware(month) else month.date()
+            result[month] = row
+        return result
+
+    @staticmethod
+    def monthly_series(monthly, months, field, label, cast=int):
+        return [
+            {"month": month.strftime("%B"), label: cast((monthly.get(month) or {}).get(field) or 0)}
+            for month in months
+        ]
+
+    @staticmethod
+    def revenue(queryset, months):  # Totals, average and monthly amounts of completed service transactions (one query)
+        monthly = DashboardStatsBuilder.by_month(
+            queryset.filter(status="completed"),
+            "created_at",
+            amount=Sum("amount"),
+            transactions=Count("id"),
+        )
+        total = sum((row["amount"] or 0) for row in monthly.values())
+        count = sum(row["transactions"] for row in monthly.values())
+        return {
+            "total": float(total),
+            "average": float(total / count) if count else 0.0,
+            "transactions": count,
+            "monthly": DashboardStatsBuilder.monthly_series(monthly, months, "amount", "amount", float),
+        }
+
+    @staticmethod
+    def appointment_counts(queryset, today):  # Status, today/upcoming, 30-day and unique-patient counts in one aggregate
+        stats = queryset.aggregate(
             total=Count("id"),
             completed=Count("id", filter=Q(status="completed")),
             cancelled=Count("id", filter=Q(status="cancelled")),
             pending=Count("id", filter=Q(status="pending")),
+            today=Count(
+                "id",
+                filter=Q(appointment_date=today, status__in=["confirmed", "pending"]),
+            ),
             upcoming=Count(
                 "id",
-                filter=Q(
-                    status__in=["confirmed", "pending"], appointment_date__gte=today
-                ),
+                filter=Q(status__in=["confirmed", "pending"], appointment_date__gte=today),
             ),
+            recent_30_days=Count("id", filter=Q(appointment_date__gte=today - timedelta(days=30))),
+            unique_patients=Count("patient", filter=Q(status="completed"), distinct=True),
         )
+        return {name: value or 0 for name, value in stats.items()}
 
-        recent_appointments = Appointment.objects.filter(
-            patient=patient, appointment_date__gte=thirty_days_ago
-        ).count()
+    @staticmethod
+    def completed_by_service(provider, appointment_filter):  # {service name: completed appointments}, zero for unused services
+        services = (
+            ParticipantService.objects.filter(participant=provider)
+            .annotate(
+                completed=Count(
+                    "appointments",
+                    filter=Q(appointments__status="completed", **{f"appointments__{appointment_filter}": provider}),
+                )
+            )
+            .values_list("name", "completed")
+        )
+        return dict(services)
+
+
+class PatientAnalytics:  # Provides analytics and statistics for patient dashboards
+    @staticmethod
+    def get_dashboard_stats(patient):  # Get comprehensive dashboard statistics for a specific patient
+        return DashboardStatsBuilder.cached("patient", patient, PatientAnalytics.build_dashboard_stats)
+
+    @staticmethod
+    def build_dashboard_stats(patient):
+        today = timezone.now().date()
+        months = DashboardStatsBuilder.month_starts(today)
+
+        appointments = DashboardStatsBuilder.appointment_counts(
+            Appointment.objects.filter(patient=patient), today
+        )
 
         prescriptions_stats = Prescription.objects.filter(patient=patient).aggregate(
             total=Count("id"),
@@ -37,43 +140,20 @@ class PatientAnalytics:  # Provides analytics and statistics for patient dashboa
             fulfilled=Count("id", filter=Q(status="fulfilled")),
         )
 
-        health_records_count = HealthRecord.objects.filter(patient=patient).count()
+        health_records_count = HealthRecord.objects.filter(assigned_to=patient).count()
 
-        spending_stats = Transaction.objects.filter(
-            patient=patient, status="completed"
-        ).aggregate(
-            total_spent=Sum("amount"),
-            avg_transaction=Avg("amount"),
-            total_transactions=Count("id"),
+        spending = DashboardStatsBuilder.revenue(
+            ServiceTransaction.objects.filter(patient=patient), months
         )
 
-        monthly_spending = []
-        for i in range(6):
-            month_start = (today.replace(day=1) - timedelta(days=30 * i)).replace(day=1)
-            next_month = (month_start + timedelta(days=32)).replace(day=1)
-
-            amount = (
-                Transaction.objects.filter(
-                    patient=patient,
-                    status="completed",
-                    created_at__gte=month_start,
-                    created_at__lt=next_month,
-                ).aggregate(total=Sum("amount"))["total"]
-                or 0
-            )
-
-            monthly_spending.insert(
-                0, {"month": month_start.strftime("%B"), "amount": float(amount)}
-            )
-
         return {
             "appointments": {
-                "total": appointments_stats["total"] or 0,
-                "completed": appointments_stats["completed"] or 0,
-                "cancelled": appointments_stats["cancelled"] or 0,
-                "pending": appointments_stats["pending"] or 0,
-                "upcoming": appointments_stats["upcoming"] or 0,
-                "recent_30_days": recent_appointments,
+                "total": appointments["total"],
+                "completed": appointments["completed"],
+                "cancelled": appointments["cancelled"],
+                "pending": appointments["pending"],
+                "upcoming": appointments["upcoming"],
+                "recent_30_days": appointments["recent_30_days"],
             },
             "prescriptions": {
                 "total": prescriptions_stats["total"] or 0,
@@ -81,146 +161,77 @@ class PatientAnalytics:  # Provides analytics and statistics for patient dashboa
                 "fulfilled": prescriptions_stats["fulfilled"] or 0,
             },
             "health_records": {"total": health_records_count},
-            "spending": {
-                "total": float(spending_stats["total_spent"] or 0),
-                "average": float(spending_stats["avg_transaction"] or 0),
-                "transactions": spending_stats["total_transactions"] or 0,
-                "monthly": monthly_spending,
-            },
+            "spending": spending,
         }
 
 
 class DoctorAnalytics:  # DoctorAnalytics class implementation
     @staticmethod
     def get_dashboard_stats(doctor):  # Get dashboard stats
+        return DashboardStatsBuilder.cached("doctor", doctor, DoctorAnalytics.build_dashboard_stats)
+
+    @staticmethod
+    def build_dashboard_stats(doctor):
         today = timezone.now().date()
-        thirty_days_ago = today - timedelta(days=30)
+        months = DashboardStatsBuilder.month_starts(today)
 
-        appointments_stats = Appointment.objects.filter(doctor=doctor).aggregate(
-            total=Count("id"),
-            completed=Count("id", filter=Q(status="completed")),
-            cancelled=Count("id", filter=Q(status="cancelled")),
-            pending=Count("id", filter=Q(status="pending")),
-            today=Count(
-                "id",
-                filter=Q(appointment_date=today, status__in=["confirmed", "pending"]),
-            ),
+        appointments = DashboardStatsBuilder.appointment_counts(
+            Appointment.objects.filter(doctor=doctor), today
         )
 
-        recent_appointments = Appointment.objects.filter(
-            doctor=doctor, appointment_date__gte=thirty_days_ago
-        ).count()
-
-        patients_stats = (
-            Appointment.objects.filter(doctor=doctor, status="completed")
-            .values("patient")
-            .distinct()
-            .count()
+        monthly_patients = DashboardStatsBuilder.by_month(
+            Appointment.objects.filter(
+                doctor=doctor, status="completed", appointment_date__gte=months[0]
+            ),
+            "appointment_date",
+            patients=Count("patient", distinct=True),
         )
 
-        revenue_stats = Transaction.objects.filter(
-            doctor=doctor, status="completed"
-        ).aggregate(
-            total_revenue=Sum("amount"),
-            avg_consultation=Avg("amount"),
-            total_transactions=Count("id"),
+        revenue = DashboardStatsBuilder.revenue(
+            ServiceTransaction.objects.filter(service_provider=doctor), months
         )
 
-        monthly_revenue = []
-        monthly_patients = []
-        for i in range(6):
-            month_start = (today.replace(day=1) - timedelta(days=30 * i)).replace(day=1)
-            next_month = (month_start + timedelta(days=32)).replace(day=1)
-
-            revenue = (
-                Transaction.objects.filter(
-                    doctor=doctor,
-                    status="completed",
-                    created_at__gte=month_start,
-                    created_at__lt=next_month,
-                ).aggregate(total=Sum("amount"))["total"]
-                or 0
-            )
-
-            patient_count = (
-                Appointment.objects.filter(
-                    doctor=doctor,
-                    status="completed",
-                    appointment_date__gte=month_start,
-                    appointment_date__lt=next_month,
-                )
-                .values("patient")
-                .distinct()
-                .count()
-            )
-
-            monthly_revenue.insert(
-                0, {"month": month_start.strftime("%B"), "amount": float(revenue)}
-            )
-
-            monthly_patients.insert(
-                0, {"month": month_start.strftime("%B"), "count": patient_count}
-            )
-
-        services_stats = {}
-        from core.models import ProviderService
-
-        services = ProviderService.objects.filter(participant=doctor)
-        for service in services:
-            appointment_count = Appointment.objects.filter(
-                doctor=doctor, service=service, status="completed"
-            ).count()
-            services_stats[service.name] = appointment_count
-
         return {
             "appointments": {
-                "total": appointments_stats["total"] or 0,
-                "completed": appointments_stats["completed"] or 0,
-                "cancelled": appointments_stats["cancelled"] or 0,
-                "pending": appointments_stats["pending"] or 0,
-                "today": appointments_stats["today"] or 0,
-                "recent_30_days": recent_appointments,
-            },
-            "patients": {"total_unique": patients_stats},
-            "revenue": {
-                "total": float(revenue_stats["total_revenue"] or 0),
-                "average": float(revenue_stats["avg_consultation"] or 0),
-                "transactions": revenue_stats["total_transactions"] or 0,
-                "monthly": monthly_revenue,
+                "total": appointments["total"],
+                "completed": appointments["completed"],
+                "cancelled": appointments["cancelled"],
+                "pending": appointments["pending"],
+                "today": appointments["today"],
+                "recent_30_days": appointments["recent_30_days"],
             },
-            "monthly_patients": monthly_patients,
-            "services": services_stats,
+            "patients": {"total_unique": appointments["unique_patients"]},
+            "revenue": revenue,
+            "monthly_patients": DashboardStatsBuilder.monthly_series(
+                monthly_patients, months, "patients", "count"
+            ),
+            "services": DashboardStatsBuilder.completed_by_service(doctor, "doctor"),
         }
 
 
 class HospitalAnalytics:  # HospitalAnalytics class implementation
     @staticmethod
     def get_dashboard_stats(hospital):  # Get dashboard stats
+        return DashboardStatsBuilder.cached("hospital", hospital, HospitalAnalytics.build_dashboard_stats)
+
+    @staticmethod
+    def build_dashboard_stats(hospital):
+        from hospital.models import Admission, Bed
+
         today = timezone.now().date()
-        thirty_days_ago = today - timedelta(days=30)
+        months = DashboardStatsBuilder.month_starts(today)
 
-        appointments_stats = Appointment.objects.filter(hospital=hospital).aggregate(
-            total=Count("id"),
-            completed=Count("id", filter=Q(status="completed")),
-            cancelled=Count("id", filter=Q(status="cancelled")),
-            pending=Count("id", filter=Q(status="pending")),
-            today=Count(
-                "id",
-                filter=Q(appointment_date=today, status__in=["confirmed", "pending"]),
-            ),
+        appointments = DashboardStatsBuilder.appointment_counts(
+            Appointment.objects.filter(hospital=hospital), today
         )
 
-        from core.models import HospitalBed, HospitalAdmission
-
-        beds_stats = HospitalBed.objects.filter(hospital=hospital).aggregate(
+        beds_stats = Bed.objects.filter(hospital=hospital).aggregate(
             total=Count("id"),
             available=Count("id", filter=Q(status="available")),
             occupied=Count("id", filter=Q(status="occupied")),
         )
 
-        admissions_stats = HospitalAdmission.objects.filter(
-            hospital=hospital
-        ).aggregate(
+        admissions_stats = Admission.objects.filter(hospital=hospital).aggregate(
             total=Count("id"),
             active=Count("id", filter=Q(status="admitted")),
             discharged=Count("id", filter=Q(status="discharged")),
@@ -230,50 +241,17 @@ class HospitalAnalytics:  # HospitalAnalytics class implementation
             role="doctor", affiliated_provider_id=hospital.uid
         ).count()
 
-        revenue_stats = Transaction.objects.filter(
-            hospital=hospital, status="completed"
-        ).aggregate(
-            total_revenue=Sum("amount"),
-            avg_transaction=Avg("amount"),
-            total_transactions=Count("id"),
+        revenue = DashboardStatsBuilder.revenue(
+            ServiceTransaction.objects.filter(service_provider=hospital), months
         )
 
-        monthly_revenue = []
-        for i in range(6):
-            month_start = (today.replace(day=1) - timedelta(days=30 * i)).replace(day=1)
-            next_month = (month_start + timedelta(days=32)).replace(day=1)
-
-            revenue = (
-                Transaction.objects.filter(
-                    hospital=hospital,
-                    status="completed",
-                    created_at__gte=month_start,
-                    created_at__lt=next_month,
-                ).aggregate(total=Sum("amount"))["total"]
-                or 0
-            )
-
-            monthly_revenue.insert(
-                0, {"month": month_start.strftime("%B"), "amount": float(revenue)}
-            )
-
-        services_stats = {}
-        from core.models import ProviderService
-
-        services = ProviderService.objects.filter(participant=hospital)
-        for service in services:
-            appointment_count = Appointment.objects.filter(
-                hospital=hospital, service=service, status="completed"
-            ).count()
-            services_stats[service.name] = appointment_count
-
         return {
             "appointments": {
-                "total": appointments_stats["total"] or 0,
-                "completed": appointments_stats["completed"] or 0,
-                "cancelled": appointments_stats["cancelled"] or 0,
-                "pending": appointments_stats["pending"] or 0,
-                "today": appointments_stats["today"] or 0,
+                "total": appointments["total"],
+                "completed": appointments["completed"],
+                "cancelled": appointments["cancelled"],
+                "pending": appointments["pending"],
+                "today": appointments["today"],
             },
             "beds": {
                 "total": beds_stats["total"] or 0,
@@ -292,92 +270,49 @@ class HospitalAnalytics:  # HospitalAnalytics class implementation
                 "discharged": admissions_stats["discharged"] or 0,
             },
             "staff": {"count": staff_count},
-            "revenue": {
-                "total": float(revenue_stats["total_revenue"] or 0),
-                "average": float(revenue_stats["avg_transaction"] or 0),
-                "transactions": revenue_stats["total_transactions"] or 0,
-                "monthly": monthly_revenue,
-            },
-            "services": services_stats,
+            "revenue": revenue,
+            "services": DashboardStatsBuilder.completed_by_service(hospital, "hospital"),
         }
 
 
 class PharmacyAnalytics:  # PharmacyAnalytics class implementation
     @staticmethod
     def get_dashboard_stats(pharmacy):  # Get dashboard stats
+        return DashboardStatsBuilder.cached("pharmacy", pharmacy, PharmacyAnalytics.build_dashboard_stats)
+
+    @staticmethod
+    def build_dashboard_stats(pharmacy):
         today = timezone.now().date()
+        months = DashboardStatsBuilder.month_starts(today)
         thirty_days_ago = today - timedelta(days=30)
 
-        prescriptions_stats = Prescription.objects.filter(pharmacy=pharmacy).aggregate(
+        fulfillments = DashboardStatsBuilder.by_month(
+            PrescriptionFulfillment.objects.filter(pharmacy=pharmacy),
+            "created_at",
             total=Count("id"),
             pending=Count("id", filter=Q(status="pending")),
-            fulfilled=Count("id", filter=Q(status="fulfilled")),
+            fulfilled=Count("id", filter=Q(status="completed")),
             cancelled=Count("id", filter=Q(status="cancelled")),
+            recent_30_days=Count("id", filter=Q(created_at__date__gte=thirty_days_ago)),
         )
+        prescriptions = {
+            name: sum(row[name] for row in fulfillments.values())
+            for name in ("total", "pending", "fulfilled", "cancelled", "recent_30_days")
+        }
 
-        recent_prescriptions = Prescription.objects.filter(
-            pharmacy=pharmacy, created_at__gte=thirty_days_ago
-        ).count()
-
-        revenue_stats = Transaction.objects.filter(
-            pharmacy=pharmacy, status="completed"
-        ).aggregate(
-            total_revenue=Sum("amount"),
-            avg_transaction=Avg("amount"),
-            total_transactions=Count("id"),
+        revenue = DashboardStatsBuilder.revenue(
+            ServiceTransaction.objects.filter(service_provider=pharmacy), months
         )
 
-        monthly_revenue = []
-        monthly_prescriptions = []
-        for i in range(6):
-            month_start = (today.replace(day=1) - timedelta(days=30 * i)).replace(day=1)
-            next_month = (month_start + timedelta(days=32)).replace(day=1)
-
-            revenue = (
-                Transaction.objects.filter(
-                    pharmacy=pharmacy,
-                    status="completed",
-                    created_at__gte=month_start,
-                    created_at__lt=next_month,
-                ).aggregate(total=Sum("amount"))["total"]
-                or 0
-            )
-
-            prescription_count = Prescription.objects.filter(
-                pharmacy=pharmacy,
-                created_at__gte=month_start,
-                created_at__lt=next_month,
-            ).count()
-
-            monthly_revenue.insert(
-                0, {"month": month_start.strftime("%B"), "amount": float(revenue)}
-            )
-
-            monthly_prescriptions.insert(
-                0, {"month": month_start.strftime("%B"), "count": prescription_count}
-            )
-
-        services_stats = {}
-        from core.models import ProviderService
-
-        services = ProviderService.objects.filter(participant=pharmacy)
-        for service in services:
-            services_stats[service.name] = service.price
+        services_stats = dict(
+            ParticipantService.objects.filter(participant=pharmacy).values_list("name", "price")
+        )
 
         return {
-            "prescriptions": {
-                "total": prescriptions_stats["total"] or 0,
-                "pending": prescriptions_stats["pending"] or 0,
-                "fulfilled": prescriptions_stats["fulfilled"] or 0,
-                "cancelled": prescriptions_stats["cancelled"] or 0,
-                "recent_30_days": recent_prescriptions,
-            },
-            "revenue": {
-                "total": float(revenue_stats["total_revenue"] or 0),
-                "average": float(revenue_stats["avg_transaction"] or 0),
-                "transactions": revenue_stats["total_transactions"] or 0,
-                "monthly": monthly_revenue,
-            },
-            "monthly_prescriptions": monthly_prescriptions,
-            "services": services_stats,
+            "prescriptions": prescriptions,
+            "revenue": revenue,
+            "monthly_prescriptions": DashboardStatsBuilder.monthly_series(
+                fulfillments, months, "total", "count"
+            ),
+            "services": {name: float(price or 0) for name, price in services_stats.items()},
         }
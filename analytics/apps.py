@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AnalyticsConfig(AppConfig):  # AnalyticsConfig class implementation
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analytics'
+
+    def ready(self):  # Import signals that keep the daily rollup tables current
+        import analytics.signals
@@ -0,0 +1,48 @@
+"""
+Backfill the daily analytics rollup tables from the source tables.
+
+Usage:
+    python manage.py backfill_analytics_rollups --days 365
+    python manage.py backfill_analytics_rollups --start 2024-01-01 --end 2024-12-31 --chunk-days 31
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from analytics.rollups import RollupService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily registration/transaction/appointment rollups for a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help='Rebuild the last N days (ignored with --start)')
+        parser.add_argument('--start', type=str, help='First day (YYYY-MM-DD)')
+        parser.add_argument('--end', type=str, help='Last day (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Days rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            end_date = date.fromisoformat(options['end']) if options['end'] else timezone.localdate()
+            if options['start']:
+                start_date = date.fromisoformat(options['start'])
+            else:
+                start_date = end_date - timedelta(days=options['days'] - 1)
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+        if start_date > end_date:
+            raise CommandError('--start must not be after --end')
+
+        chunk = timedelta(days=max(options['chunk_days'], 1))
+        totals = {'registrations': 0, 'transactions': 0, 'appointments': 0}
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            chunk_end = min(chunk_start + chunk - timedelta(days=1), end_date)
+            counts = RollupService.rebuild(chunk_start, chunk_end)
+            for name in totals:
+                totals[name] += counts[name]
+            self.stdout.write(f'{chunk_start}..{chunk_end}: {counts}')
+            chunk_start = chunk_end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'Rollups rebuilt for {start_date}..{end_date}: {totals}'))
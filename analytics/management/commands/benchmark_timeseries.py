@@ -0,0 +1,156 @@
+"""
+Benchmark the vectorized time-series helpers against the former per-day Python loops.
+
+Uses two years of synthetic daily revenue (trend + weekly seasonality + noise).
+With --database the series is also written as completed transactions inside a
+rolled-back transaction, and the one-query loader is compared with one SUM
+query per day.
+
+Usage:
+    python manage.py benchmark_timeseries
+    python manage.py benchmark_timeseries --days 730 --repeat 50 --database
+"""
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from analytics.timeseries import TimeSeries
+
+
+def _legacy_regression(values):  # Former generator-sum least squares from PredictiveAnalytics
+    n = len(values)
+    x_values = list(range(n))
+    mean_x = sum(x_values) / n
+    mean_y = sum(values) / n
+    numerator = sum((x - mean_x) * (y - mean_y) for x, y in zip(x_values, values))
+    denominator = sum((x - mean_x) ** 2 for x in x_values)
+    slope = numerator / denominator if denominator != 0 else 0
+    return slope, mean_y - slope * mean_x
+
+
+def _legacy_features(start, days):  # Former per-day feature rows from AdvancedRevenueForecast
+    rows = []
+    for i in range(days):
+        day = start + timedelta(days=i)
+        day_of_week = day.weekday()
+        rows.append([i, day_of_week, day.day, 1 if day_of_week >= 5 else 0, 1 if day.day >= 25 else 0])
+    return np.array(rows, dtype=float)
+
+
+class Command(BaseCommand):
+    help = 'Compare latency of vectorized time-series analysis with the former Python loops'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=730, help='Length of the synthetic series')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per measurement')
+        parser.add_argument('--database', action='store_true', help='Also benchmark loading the series from the database')
+
+    def handle(self, *args, **options):
+        days, repeat = options['days'], options['repeat']
+        end_date = timezone.now().date()
+        start_date = end_date - timedelta(days=days - 1)
+        rng = np.random.default_rng(42)
+        index = np.arange(days)
+        values = np.maximum(
+            5000 + 4 * index + 800 * np.sin(2 * np.pi * ((start_date.weekday() + index) % 7) / 7)
+            + rng.normal(0, 300, days),
+            0,
+        ).round(2)
+        daily = list(values)
+
+        self._compare('regression', repeat, lambda: _legacy_regression(daily), lambda: TimeSeries.linear_trend(values))
+        self._compare(
+            'calendar features', repeat,
+            lambda: _legacy_features(start_date, days), lambda: TimeSeries.calendar_features(start_date, days),
+        )
+        self._compare(
+            'rolling 30-day mean', repeat,
+            lambda: [sum(daily[max(i - 29, 0):i + 1]) / (i + 1 - max(i - 29, 0)) for i in range(days)],
+            lambda: TimeSeries.rolling_mean(values, 30),
+        )
+        rows = [(start_date + timedelta(days=i), daily[i]) for i in range(0, days, 2)]  # every other day has data
+        self._compare(
+            'zero-fill', repeat,
+            lambda: self._legacy_zero_fill(rows, start_date, end_date),
+            lambda: TimeSeries.dense(rows, start_date, end_date),
+        )
+
+        if options['database']:
+            self._benchmark_database(start_date, end_date, daily)
+        self.stdout.write(self.style.SUCCESS('Benchmark complete'))
+
+    def _compare(self, name, repeat, legacy, vectorized):
+        legacy_ms = self._time(legacy, repeat)
+        vectorized_ms = self._time(vectorized, repeat)
+        speedup = legacy_ms / vectorized_ms if vectorized_ms else float('inf')
+        self.stdout.write(f'{name}: loop {legacy_ms:.3f} ms, vectorized {vectorized_ms:.3f} ms ({speedup:.1f}x)')
+
+    @staticmethod
+    def _legacy_zero_fill(rows, start_date, end_date):
+        by_date = dict(rows)
+        filled = {}
+        current = start_date
+        while current <= end_date:
+            filled[current] = float(by_date.get(current, 0))
+            current += timedelta(days=1)
+        return filled
+
+    @staticmethod
+    def _time(func, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - started) * 1000 / repeat
+
+    def _benchmark_database(self, start_date, end_date, daily):
+        from core.models import Participant, Transaction
+
+        with transaction.atomic():
+            recipient = Participant.objects.create_participant(
+                email=f'benchmark-{uuid.uuid4().hex[:8]}@example.com', password=uuid.uuid4().hex, role='pharmacy'
+            )
+            transactions = Transaction.objects.bulk_create([
+                Transaction(
+                    transaction_ref=f'BENCH-{uuid.uuid4().hex[:12]}',
+                    transaction_type='payment',
+                    recipient=recipient,
+                    amount=round(float(amount), 2),
+                    status='completed',
+                    description='time-series benchmark',
+                    balance_before=0,
+                    balance_after=0,
+                )
+                for amount in daily
+            ], batch_size=1000)
+            # created_at is auto_now_add; bulk_update writes the backdated values as given
+            for i, txn in enumerate(transactions):
+                txn.created_at = timezone.make_aware(datetime.combine(start_date + timedelta(days=i), datetime.min.time()))
+            Transaction.objects.bulk_update(transactions, ['created_at'], batch_size=1000)
+
+            queryset = Transaction.objects.filter(recipient=recipient, status='completed')
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                current = start_date
+                while current <= end_date:
+                    queryset.filter(created_at__date=current).aggregate(total=Sum('amount'))
+                    current += timedelta(days=1)
+                legacy_ms = (time.perf_counter() - started) * 1000
+            legacy_queries = len(queries)
+
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                TimeSeries.load(queryset, 'created_at', start_date, end_date, value_field='amount')
+                vectorized_ms = (time.perf_counter() - started) * 1000
+
+            self.stdout.write(
+                f'database load: per-day {legacy_queries} queries {legacy_ms:.1f} ms, '
+                f'grouped {len(queries)} queries {vectorized_ms:.1f} ms'
+            )
+            transaction.set_rollback(True)
@@ -0,0 +1,66 @@
+# Generated by Django 6.0 on 2026-10-18 20:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_alter_platformstatistics_created_by_instance_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRegistrationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('role', models.CharField(max_length=30)),
+                ('city', models.CharField(blank=True, default='', max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'analytics_daily_registrations',
+                'indexes': [models.Index(fields=['date'], name='analytics_d_date_01d491_idx')],
+                'unique_together': {('date', 'role', 'city')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyTransactionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('transaction_type', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('currency', models.CharField(max_length=3)),
+                ('count', models.IntegerField(default=0)),
+                ('amount_total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('amount_xof_total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('commission_xof_total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+            ],
+            options={
+                'db_table': 'analytics_daily_transactions',
+                'indexes': [models.Index(fields=['date', 'status'], name='analytics_d_date_afa182_idx')],
+                'unique_together': {('date', 'transaction_type', 'status', 'currency')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyAppointmentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('revenue_total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('provider', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='appointment_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'analytics_daily_appointments',
+                'indexes': [models.Index(fields=['date', 'status'], name='analytics_d_date_45aff0_idx'), models.Index(fields=['provider', 'date'], name='analytics_d_provide_cb6bd8_idx')],
+                'unique_together': {('date', 'status', 'provider')},
+            },
+        ),
+    ]
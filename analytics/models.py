@@ -103,6 +103,72 @@ class RevenueMetrics(SyncMixin):
         return f"Revenue metrics for {self.date}"
 
 
+class DailyRegistrationRollup(models.Model):
+    """New participants per day, role and city (maintained by analytics.rollups)"""
+    date = models.DateField()
+    role = models.CharField(max_length=30)
+    city = models.CharField(max_length=100, blank=True, default="")
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "analytics_daily_registrations"
+        unique_together = [["date", "role", "city"]]
+        indexes = [
+            models.Index(fields=["date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.role}/{self.city or '-'}: {self.count}"
+
+
+class DailyTransactionRollup(models.Model):
+    """Transaction count and volume per day, type, status and currency"""
+    date = models.DateField()
+    transaction_type = models.CharField(max_length=20)
+    status = models.CharField(max_length=20)
+    currency = models.CharField(max_length=3)
+    count = models.IntegerField(default=0)
+    amount_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    amount_xof_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    commission_xof_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = "analytics_daily_transactions"
+        unique_together = [["date", "transaction_type", "status", "currency"]]
+        indexes = [
+            models.Index(fields=["date", "status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.transaction_type}/{self.status} {self.currency}: {self.count}"
+
+
+class DailyAppointmentRollup(models.Model):
+    """Appointments per appointment date, status and provider (doctor, else hospital)"""
+    date = models.DateField()
+    status = models.CharField(max_length=20)
+    provider = models.ForeignKey(
+        Participant,
+        on_delete=models.CASCADE,
+        related_name="appointment_rollups",
+        null=True,
+        blank=True,
+    )
+    count = models.IntegerField(default=0)
+    revenue_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = "analytics_daily_appointments"
+        unique_together = [["date", "status", "provider"]]
+        indexes = [
+            models.Index(fields=["date", "status"]),
+            models.Index(fields=["provider", "date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.status}: {self.count}"
+
+
 class SurveyResponse(SyncMixin):
     SEX_CHOICES = [
         ('M', 'Male'),
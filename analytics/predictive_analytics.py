@@ -6,11 +6,13 @@ from django.utils import timezone
 from django.db.models import Count, Sum, Avg, Q
 from datetime import timedelta, datetime
 from decimal import Decimal
-import statistics
+import numpy as np
 from core.models import Participant, Transaction
 from appointments.models import Appointment
 from prescriptions.models import Prescription
 from .models import PlatformStatistics, UserGrowthMetrics, RevenueMetrics
+from .rollups import RollupService
+from .timeseries import DAY_NAMES, TimeSeries
 
 
 class PredictiveAnalytics:
@@ -32,15 +34,8 @@ class PredictiveAnalytics:
         start_date = end_date - timedelta(days=historical_days)
 
         # Get historical user registration data
-        daily_registrations = []
-        current_date = start_date
-
-        while current_date <= end_date:
-            daily_count = Participant.objects.filter(
-                created_at__date=current_date
-            ).count()
-            daily_registrations.append(daily_count)
-            current_date += timedelta(days=1)
+        series = TimeSeries.from_rows(RollupService.registrations_by_day(start_date, end_date), start_date, end_date)
+        daily_registrations = series.values
 
         if len(daily_registrations) < 7:
             return {
@@ -50,35 +45,19 @@ class PredictiveAnalytics:
 
         # Calculate simple linear regression
         n = len(daily_registrations)
-        x_values = list(range(n))
-
-        mean_x = sum(x_values) / n
-        mean_y = sum(daily_registrations) / n
+        mean_y = float(daily_registrations.mean())
+        slope, intercept = TimeSeries.linear_trend(daily_registrations)
 
-        # Calculate slope (trend)
-        numerator = sum((x - mean_x) * (y - mean_y) for x, y in zip(x_values, daily_registrations))
-        denominator = sum((x - mean_x) ** 2 for x in x_values)
-
-        slope = numerator / denominator if denominator != 0 else 0
-        intercept = mean_y - (slope * mean_x)
-
-        # Forecast future registrations
-        forecast = []
-        for day in range(1, days_forward + 1):
-            predicted_value = slope * (n + day) + intercept
-            predicted_value = max(0, round(predicted_value, 0))  # Can't have negative registrations
-            forecast.append({
-                'day': day,
-                'predicted_registrations': int(predicted_value)
-            })
+        # Forecast future registrations (can't have negative registrations)
+        predicted = np.maximum(np.round(TimeSeries.extrapolate(slope, intercept, n, days_forward)), 0).astype(int)
+        forecast = [
+            {'day': day, 'predicted_registrations': int(value)}
+            for day, value in enumerate(predicted, start=1)
+        ]
 
         # Calculate trend strength
-        if len(daily_registrations) > 1:
-            variance = statistics.variance(daily_registrations)
-            std_dev = statistics.stdev(daily_registrations)
-        else:
-            variance = 0
-            std_dev = 0
+        variance = float(np.var(daily_registrations, ddof=1)) if n > 1 else 0
+        std_dev = float(np.sqrt(variance))
 
         # Determine trend direction
         if slope > 0.5:
@@ -90,11 +69,12 @@ class PredictiveAnalytics:
 
         # Current totals
         total_users = Participant.objects.filter(is_active=True).count()
-        predicted_total = total_users + sum(f['predicted_registrations'] for f in forecast)
+        total_new_users = int(predicted.sum())
+        predicted_total = total_users + total_new_users
 
         # Calculate growth rate
-        recent_30_days = sum(daily_registrations[-30:]) if len(daily_registrations) >= 30 else sum(daily_registrations)
-        previous_30_days = sum(daily_registrations[-60:-30]) if len(daily_registrations) >= 60 else recent_30_days
+        recent_30_days = float(daily_registrations[-30:].sum())
+        previous_30_days = float(daily_registrations[-60:-30].sum()) if n >= 60 else recent_30_days
 
         growth_rate = ((recent_30_days - previous_30_days) / previous_30_days * 100) if previous_30_days > 0 else 0
 
@@ -109,16 +89,16 @@ class PredictiveAnalytics:
                 'slope': round(slope, 2)
             },
             'predictions': {
-                'total_new_users_forecast': sum(f['predicted_registrations'] for f in forecast),
+                'total_new_users_forecast': total_new_users,
                 'projected_total_users': predicted_total,
                 'daily_forecast': forecast[:7]  # First 7 days for display
             },
             'statistics': {
                 'historical_variance': round(variance, 2),
                 'historical_std_dev': round(std_dev, 2),
-                'min_daily': min(daily_registrations),
-                'max_daily': max(daily_registrations),
-                'median_daily': statistics.median(daily_registrations)
+                'min_daily': int(daily_registrations.min()),
+                'max_daily': int(daily_registrations.max()),
+                'median_daily': float(np.median(daily_registrations))
             },
             'generated_at': timezone.now()
         }
@@ -139,17 +119,10 @@ class PredictiveAnalytics:
         start_date = end_date - timedelta(days=historical_days)
 
         # Get historical revenue data
-        daily_revenue = []
-        current_date = start_date
-
-        while current_date <= end_date:
-            day_revenue = Transaction.objects.filter(
-                created_at__date=current_date,
-                status='completed'
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-
-            daily_revenue.append(float(day_revenue))
-            current_date += timedelta(days=1)
+        series = TimeSeries.from_rows(
+            RollupService.revenue_by_day(start_date, end_date), start_date, end_date, value_key='revenue'
+        )
+        daily_revenue = series.values
 
         if len(daily_revenue) < 7:
             return {
@@ -157,48 +130,31 @@ class PredictiveAnalytics:
                 'message': 'Not enough historical data for forecast (minimum 7 days required)'
             }
 
-        # Calculate moving averages (7-day and 30-day)
-        if len(daily_revenue) >= 7:
-            ma_7 = sum(daily_revenue[-7:]) / 7
-        else:
-            ma_7 = sum(daily_revenue) / len(daily_revenue)
-
-        if len(daily_revenue) >= 30:
-            ma_30 = sum(daily_revenue[-30:]) / 30
-        else:
-            ma_30 = sum(daily_revenue) / len(daily_revenue)
+        # Moving averages (7-day and 30-day)
+        ma_7 = float(daily_revenue[-7:].mean())
+        ma_30 = float(daily_revenue[-30:].mean())
 
         # Calculate trend using linear regression
         n = len(daily_revenue)
-        x_values = list(range(n))
-
-        mean_x = sum(x_values) / n
-        mean_y = sum(daily_revenue) / n
-
-        numerator = sum((x - mean_x) * (y - mean_y) for x, y in zip(x_values, daily_revenue))
-        denominator = sum((x - mean_x) ** 2 for x in x_values)
-
-        slope = numerator / denominator if denominator != 0 else 0
-        intercept = mean_y - (slope * mean_x)
-
-        # Forecast using trend + moving average
-        forecast = []
-        for day in range(1, days_forward + 1):
-            # Use weighted combination of trend and moving average
-            trend_prediction = slope * (n + day) + intercept
-            ma_prediction = ma_7  # Use 7-day MA as baseline
+        mean_y = float(daily_revenue.mean())
+        slope, intercept = TimeSeries.linear_trend(daily_revenue)
 
-            # 70% trend, 30% moving average
-            predicted_value = (0.7 * trend_prediction) + (0.3 * ma_prediction)
-            predicted_value = max(0, predicted_value)
-
-            forecast.append({
-                'day': day,
-                'predicted_revenue': round(predicted_value, 2)
-            })
+        # Forecast using trend + moving average: 70% trend, 30% 7-day moving average
+        trend_prediction = TimeSeries.extrapolate(slope, intercept, n, days_forward)
+        predicted = np.maximum(0.7 * trend_prediction + 0.3 * ma_7, 0)
 
         # Calculate statistics
-        std_dev = statistics.stdev(daily_revenue) if len(daily_revenue) > 1 else 0
+        std_dev = float(np.std(daily_revenue, ddof=1)) if n > 1 else 0
+        lower, upper = TimeSeries.confidence_band(predicted, std_dev)
+        forecast = [
+            {
+                'day': day,
+                'predicted_revenue': round(float(predicted[day - 1]), 2),
+                'lower_bound': round(float(lower[day - 1]), 2),
+                'upper_bound': round(float(upper[day - 1]), 2),
+            }
+            for day in range(1, days_forward + 1)
+        ]
 
         # Determine trend health
         if slope > 0:
@@ -209,12 +165,13 @@ class PredictiveAnalytics:
             revenue_trend = 'stable'
 
         # Calculate growth rate
-        recent_30_days = sum(daily_revenue[-30:]) if len(daily_revenue) >= 30 else sum(daily_revenue)
-        previous_30_days = sum(daily_revenue[-60:-30]) if len(daily_revenue) >= 60 else recent_30_days
+        recent_30_days = float(daily_revenue[-30:].sum())
+        previous_30_days = float(daily_revenue[-60:-30].sum()) if n >= 60 else recent_30_days
 
         growth_rate = ((recent_30_days - previous_30_days) / previous_30_days * 100) if previous_30_days > 0 else 0
 
         total_forecast = sum(f['predicted_revenue'] for f in forecast)
+        weekday_profile = TimeSeries.weekday_profile(series)
 
         return {
             'status': 'forecasted',
@@ -231,6 +188,9 @@ class PredictiveAnalytics:
                 'avg_daily_forecast': round(total_forecast / days_forward, 2),
                 'daily_forecast': forecast[:7]  # First 7 days
             },
+            'seasonality': {
+                name: round(float(index), 3) for name, index in zip(DAY_NAMES, weekday_profile)
+            },
             'confidence_metrics': {
                 'historical_std_dev': round(std_dev, 2),
                 'variance': round(std_dev ** 2, 2),
@@ -254,41 +214,27 @@ class PredictiveAnalytics:
         start_date_90 = end_date - timedelta(days=90)
         start_date_30 = end_date - timedelta(days=30)
 
-        # Get historical appointment data (last 90 days)
-        total_appointments_90 = Appointment.objects.filter(
-            appointment_date__gte=start_date_90,
-            appointment_date__lte=end_date
-        ).count()
+        # Get historical appointment data (last 90 days) in one rollup query
+        by_day = RollupService.appointments_by_day_and_status(start_date_90, end_date)
 
-        completed_appointments_90 = Appointment.objects.filter(
-            appointment_date__gte=start_date_90,
-            appointment_date__lte=end_date,
-            status='completed'
-        ).count()
+        totals = TimeSeries.dense(
+            ((day, sum(statuses.values())) for day, statuses in by_day.items()), start_date_90, end_date
+        )
 
-        cancelled_appointments_90 = Appointment.objects.filter(
-            appointment_date__gte=start_date_90,
-            appointment_date__lte=end_date,
-            status='cancelled'
-        ).count()
+        def status_series(status):
+            return TimeSeries.dense(
+                ((day, statuses.get(status, 0)) for day, statuses in by_day.items()), start_date_90, end_date
+            )
 
-        no_show_appointments_90 = Appointment.objects.filter(
-            appointment_date__gte=start_date_90,
-            appointment_date__lte=end_date,
-            status='no_show'
-        ).count()
+        completed = status_series('completed')
+        total_appointments_90 = int(totals.values.sum())
+        completed_appointments_90 = int(completed.values.sum())
+        cancelled_appointments_90 = int(status_series('cancelled').values.sum())
+        no_show_appointments_90 = int(status_series('no_show').values.sum())
 
         # Last 30 days for comparison
-        total_appointments_30 = Appointment.objects.filter(
-            appointment_date__gte=start_date_30,
-            appointment_date__lte=end_date
-        ).count()
-
-        completed_appointments_30 = Appointment.objects.filter(
-            appointment_date__gte=start_date_30,
-            appointment_date__lte=end_date,
-            status='completed'
-        ).count()
+        total_appointments_30 = int(totals.window(start_date_30).sum())
+        completed_appointments_30 = int(completed.window(start_date_30).sum())
 
         if total_appointments_90 == 0:
             return {
@@ -320,15 +266,9 @@ class PredictiveAnalytics:
         predicted_completed = (predicted_appointments * predicted_completion_rate) / 100
 
         # Analyze by day of week
-        appointments_by_day = {}
-        for i in range(7):
-            day_name = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'][i]
-            day_appointments = Appointment.objects.filter(
-                appointment_date__gte=start_date_90,
-                appointment_date__lte=end_date,
-                appointment_date__week_day=i+2  # Django week_day: 1=Sunday, 2=Monday
-            ).count()
-            appointments_by_day[day_name] = day_appointments
+        appointments_by_day = {
+            day_name: int(total) for day_name, total in zip(DAY_NAMES, TimeSeries.weekday_totals(totals))
+        }
 
         busiest_day = max(appointments_by_day.items(), key=lambda x: x[1])[0] if appointments_by_day else 'Unknown'
 
@@ -0,0 +1,213 @@
+"""
+Daily rollup fact tables for the admin analytics dashboard.
+
+DailyRegistrationRollup, DailyTransactionRollup and DailyAppointmentRollup
+hold one row per day and dimension combination. Signals apply +/- deltas after
+each write commits so "today" stays current; the nightly task rebuilds the
+last days from the source tables (catching QuerySet.update() writes that
+bypass signals), and the backfill_analytics_rollups command rebuilds history.
+Readers fetch a whole date range in a single grouped query.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from appointments.models import Appointment
+from core.models import Participant, Transaction
+from .models import DailyAppointmentRollup, DailyRegistrationRollup, DailyTransactionRollup
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0')
+
+
+def registration_bucket(participant):
+    """(key, values) of the registration rollup row a participant counts towards"""
+    key = {
+        'date': timezone.localdate(participant.created_at),
+        'role': participant.role,
+        'city': (participant.city or '')[:100],
+    }
+    return key, {'count': 1}
+
+
+def transaction_bucket(txn):
+    key = {
+        'date': timezone.localdate(txn.created_at),
+        'transaction_type': txn.transaction_type,
+        'status': txn.status,
+        'currency': txn.currency,
+    }
+    values = {
+        'count': 1,
+        'amount_total': txn.amount or ZERO,
+        'amount_xof_total': txn.amount_xof or ZERO,
+        'commission_xof_total': txn.commission_amount_xof or ZERO,
+    }
+    return key, values
+
+
+def appointment_bucket(appointment):
+    key = {
+        'date': appointment.appointment_date,
+        'status': appointment.status,
+        'provider_id': appointment.doctor_id or appointment.hospital_id,
+    }
+    return key, {'count': 1, 'revenue_total': appointment.final_price or ZERO}
+
+
+class RollupService:
+    """Maintain and read the daily rollup tables"""
+
+    @staticmethod
+    def apply_delta(model, key, values, sign=1):
+        """Add (sign=1) or remove (sign=-1) one source row's contribution to its bucket"""
+        increments = {field: F(field) + value * sign for field, value in values.items()}
+        if model.objects.filter(**key).update(**increments):
+            return
+        try:
+            with transaction.atomic():
+                model.objects.create(**key, **{field: value * sign for field, value in values.items()})
+        except IntegrityError:
+            # Concurrent writer created the bucket first
+            model.objects.filter(**key).update(**increments)
+
+    @staticmethod
+    def registration_rows(start, end):
+        return (
+            Participant.objects.filter(created_at__date__gte=start, created_at__date__lte=end)
+            .annotate(day=TruncDate('created_at'), city_key=Coalesce('city', Value('')))
+            .values('day', 'role', 'city_key')
+            .annotate(count=Count('uid'))
+            .order_by()
+        )
+
+    @staticmethod
+    def transaction_rows(start, end):
+        return (
+            Transaction.objects.filter(created_at__date__gte=start, created_at__date__lte=end)
+            .annotate(day=TruncDate('created_at'))
+            .values('day', 'transaction_type', 'status', 'currency')
+            .annotate(
+                count=Count('id'),
+                amount_total=Sum('amount'),
+                amount_xof_total=Sum('amount_xof'),
+                commission_xof_total=Sum('commission_amount_xof'),
+            )
+            .order_by()
+        )
+
+    @staticmethod
+    def appointment_rows(start, end):
+        return (
+            Appointment.objects.filter(appointment_date__gte=start, appointment_date__lte=end)
+            .annotate(provider_key=Coalesce('doctor_id', 'hospital_id'))
+            .values('appointment_date', 'status', 'provider_key')
+            .annotate(count=Count('id'), revenue_total=Sum('final_price'))
+            .order_by()
+        )
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild(start, end):
+        """Recompute every rollup row dated start..end (inclusive) from the source tables"""
+        DailyRegistrationRollup.objects.filter(date__gte=start, date__lte=end).delete()
+        DailyTransactionRollup.objects.filter(date__gte=start, date__lte=end).delete()
+        DailyAppointmentRollup.objects.filter(date__gte=start, date__lte=end).delete()
+
+        registrations = DailyRegistrationRollup.objects.bulk_create([
+            DailyRegistrationRollup(date=row['day'], role=row['role'], city=row['city_key'][:100], count=row['count'])
+            for row in RollupService.registration_rows(start, end)
+        ], batch_size=1000)
+        transactions = DailyTransactionRollup.objects.bulk_create([
+            DailyTransactionRollup(
+                date=row['day'],
+                transaction_type=row['transaction_type'],
+                status=row['status'],
+                currency=row['currency'],
+                count=row['count'],
+                amount_total=row['amount_total'] or ZERO,
+                amount_xof_total=row['amount_xof_total'] or ZERO,
+                commission_xof_total=row['commission_xof_total'] or ZERO,
+            )
+            for row in RollupService.transaction_rows(start, end)
+        ], batch_size=1000)
+        appointments = DailyAppointmentRollup.objects.bulk_create([
+            DailyAppointmentRollup(
+                date=row['appointment_date'],
+                status=row['status'],
+                provider_id=row['provider_key'],
+                count=row['count'],
+                revenue_total=row['revenue_total'] or ZERO,
+            )
+            for row in RollupService.appointment_rows(start, end)
+        ], batch_size=1000)
+
+        counts = {
+            'registrations': len(registrations),
+            'transactions': len(transactions),
+            'appointments': len(appointments),
+        }
+        logger.info(f"Rebuilt analytics rollups {start}..{end}: {counts}")
+        return counts
+
+    @staticmethod
+    def date_range(days):
+        """Same window as the dashboard functions: today and the `days` days before it"""
+        end_date = timezone.localdate()
+        return end_date - timedelta(days=days), end_date
+
+    @staticmethod
+    def daily_series(rows, start, end, date_field='date', fields=('count',)):
+        """Expand grouped rows into one dict per day (zero-filled), oldest first"""
+        by_date = {row[date_field]: row for row in rows}
+        series = []
+        current = start
+        while current <= end:
+            row = by_date.get(current, {})
+            series.append({'date': current, **{field: row.get(field) or 0 for field in fields}})
+            current += timedelta(days=1)
+        return series
+
+    @staticmethod
+    def registrations_by_day(start, end):
+        rows = (
+            DailyRegistrationRollup.objects.filter(date__gte=start, date__lte=end)
+            .values('date')
+            .annotate(count=Sum('count'))
+            .order_by()
+        )
+        return RollupService.daily_series(rows, start, end)
+
+    @staticmethod
+    def revenue_by_day(start, end):
+        """Completed volume and completed fee-type volume per day"""
+        rows = (
+            DailyTransactionRollup.objects.filter(date__gte=start, date__lte=end, status='completed')
+            .values('date')
+            .annotate(
+                revenue=Sum('amount_total'),
+                fees=Sum('amount_total', filter=Q(transaction_type='fee')),
+            )
+            .order_by()
+        )
+        return RollupService.daily_series(rows, start, end, fields=('revenue', 'fees'))
+
+    @staticmethod
+    def appointments_by_day_and_status(start, end):
+        """{date: {status: count}} for appointments dated start..end"""
+        rows = (
+            DailyAppointmentRollup.objects.filter(date__gte=start, date__lte=end)
+            .values('date', 'status')
+            .annotate(count=Sum('count'))
+            .order_by()
+        )
+        result = {}
+        for row in rows:
+            result.setdefault(row['date'], {})[row['status']] = row['count']
+        return result
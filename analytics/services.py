@@ -7,7 +7,8 @@ from core.models import Participant, Transaction, Wallet, RefundRequest
 from appointments.models import Appointment
 from prescriptions.models import Prescription
 from insurance.models import InsuranceClaim
-from .models import PlatformStatistics, UserGrowthMetrics, RevenueMetrics
+from .models import PlatformStatistics, UserGrowthMetrics, RevenueMetrics, DailyRegistrationRollup
+from .rollups import RollupService
 
 
 class AnalyticsService:  # Provides platform-wide analytics and statistics for admin dashboard
@@ -81,56 +82,37 @@ class AnalyticsService:  # Provides platform-wide analytics and statistics for a
         }
 
     @staticmethod
-    def get_user_growth_data(days=30):  # Get user growth data for specified number of days
-        end_date = timezone.now().date()
-        start_date = end_date - timedelta(days=days)
+    def get_user_growth_data(days=30):  # Get user growth data for specified number of days (from DailyRegistrationRollup)
+        start_date, end_date = RollupService.date_range(days)
+
+        registered_before = DailyRegistrationRollup.objects.filter(
+            date__lt=start_date
+        ).aggregate(total=Sum("count"))["total"] or 0
 
         growth_data = []
-        current_date = start_date
-
-        while current_date <= end_date:
-            daily_data = {
-                "date": current_date.strftime("%Y-%m-%d"),
-                "new_users": Participant.objects.filter(
-                    created_at__date=current_date
-                ).count(),
-                "total_users": Participant.objects.filter(
-                    created_at__date__lte=current_date, is_active=True
-                ).count(),
-            }
-            growth_data.append(daily_data)
-            current_date += timedelta(days=1)
+        running_total = registered_before
+        for day in RollupService.registrations_by_day(start_date, end_date):
+            running_total += day["count"]
+            growth_data.append({
+                "date": day["date"].strftime("%Y-%m-%d"),
+                "new_users": day["count"],
+                "total_users": running_total,
+            })
 
         return growth_data
 
     @staticmethod
-    def get_revenue_data(days=30):  # Get revenue data
-        end_date = timezone.now().date()
-        start_date = end_date - timedelta(days=days)
-
-        revenue_data = []
-        current_date = start_date
-
-        while current_date <= end_date:
-            daily_revenue = Transaction.objects.filter(
-                created_at__date=current_date, status="completed"
-            ).aggregate(total=Sum("amount"))["total"] or Decimal("0")
-
-            daily_fees = Transaction.objects.filter(
-                created_at__date=current_date,
-                transaction_type="fee",
-                status="completed",
-            ).aggregate(total=Sum("amount"))["total"] or Decimal("0")
-
-            daily_data = {
-                "date": current_date.strftime("%Y-%m-%d"),
-                "revenue": float(daily_revenue),
-                "fees": float(daily_fees),
-            }
-            revenue_data.append(daily_data)
-            current_date += timedelta(days=1)
+    def get_revenue_data(days=30):  # Get revenue data (from DailyTransactionRollup)
+        start_date, end_date = RollupService.date_range(days)
 
-        return revenue_data
+        return [
+            {
+                "date": day["date"].strftime("%Y-%m-%d"),
+                "revenue": float(day["revenue"]),
+                "fees": float(day["fees"]),
+            }
+            for day in RollupService.revenue_by_day(start_date, end_date)
+        ]
 
     @staticmethod
     def get_role_distribution():  # Get role distribution
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from appointments.models import Appointment
+from core.models import Participant, Transaction
+from .models import DailyAppointmentRollup, DailyRegistrationRollup, DailyTransactionRollup
+from .rollups import RollupService, appointment_bucket, registration_bucket, transaction_bucket
+
+# model -> (rollup model, bucket function, source fields the bucket depends on)
+ROLLUP_SOURCES = {
+    Participant: (DailyRegistrationRollup, registration_bucket, ('created_at', 'role', 'city')),
+    Transaction: (
+        DailyTransactionRollup,
+        transaction_bucket,
+        ('created_at', 'transaction_type', 'status', 'currency', 'amount', 'amount_xof', 'commission_amount_xof'),
+    ),
+    Appointment: (
+        DailyAppointmentRollup,
+        appointment_bucket,
+        ('appointment_date', 'status', 'doctor_id', 'hospital_id', 'final_price'),
+    ),
+}
+
+
+def _schedule_delta(rollup_model, bucket, sign):
+    key, values = bucket
+    transaction.on_commit(lambda: RollupService.apply_delta(rollup_model, key, values, sign))
+
+
+@receiver(pre_save, sender=Participant)
+@receiver(pre_save, sender=Transaction)
+@receiver(pre_save, sender=Appointment)
+def remember_rollup_bucket(sender, instance, update_fields=None, **kwargs):  # Capture the stored bucket so a role/city/status/amount change can move the row's contribution
+    instance._rollup_previous = None
+    if instance._state.adding:
+        return
+    rollup_model, bucket_for, fields = ROLLUP_SOURCES[sender]
+    if update_fields is not None and not {field.replace('_id', '') for field in fields} & set(update_fields):
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    if previous is not None:
+        instance._rollup_previous = bucket_for(SimpleNamespace(**previous))
+
+
+@receiver(post_save, sender=Participant)
+@receiver(post_save, sender=Transaction)
+@receiver(post_save, sender=Appointment)
+def apply_rollup_delta(sender, instance, created, **kwargs):
+    rollup_model, bucket_for, _ = ROLLUP_SOURCES[sender]
+    if created:
+        _schedule_delta(rollup_model, bucket_for(instance), 1)
+        return
+
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous is None:
+        return
+    current = bucket_for(instance)
+    if current != previous:
+        _schedule_delta(rollup_model, previous, -1)
+        _schedule_delta(rollup_model, current, 1)
+
+
+@receiver(post_delete, sender=Participant)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_delete, sender=Appointment)
+def remove_rollup_contribution(sender, instance, **kwargs):
+    rollup_model, bucket_for, _ = ROLLUP_SOURCES[sender]
+    _schedule_delta(rollup_model, bucket_for(instance), -1)
+
+
+# model -> participant FK attributes whose dashboards read that model
+DASHBOARD_SOURCES = {
+    'appointments.Appointment': ('patient_id', 'doctor_id', 'hospital_id'),
+    'payments.ServiceTransaction': ('patient_id', 'service_provider_id'),
+    'health_records.HealthRecord': ('assigned_to_id',),
+    'prescriptions.Prescription': ('patient_id', 'doctor_id'),
+    'prescriptions.PrescriptionFulfillment': ('pharmacy_id',),
+    'core.ParticipantService': ('participant_id',),
+    'hospital.Bed': ('hospital_id',),
+    'hospital.Admission': ('hospital_id',),
+}
+
+
+@receiver([post_save, post_delete], sender='appointments.Appointment')
+@receiver([post_save, post_delete], sender='payments.ServiceTransaction')
+@receiver([post_save, post_delete], sender='health_records.HealthRecord')
+@receiver([post_save, post_delete], sender='prescriptions.Prescription')
+@receiver([post_save, post_delete], sender='prescriptions.PrescriptionFulfillment')
+@receiver([post_save, post_delete], sender='core.ParticipantService')
+@receiver([post_save, post_delete], sender='hospital.Bed')
+@receiver([post_save, post_delete], sender='hospital.Admission')
+def invalidate_dashboards(sender, instance, **kwargs):  # Drop the cached dashboards the changed row appears in
+    from .analytics_service import DashboardStatsBuilder
+
+    participant_ids = [getattr(instance, field) for field in DASHBOARD_SOURCES[sender._meta.label]]
+    transaction.on_commit(lambda: DashboardStatsBuilder.invalidate_participants(participant_ids))
@@ -0,0 +1,14 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.utils import timezone
+
+
+@shared_task
+def refresh_daily_rollups(days=2):  # Nightly rebuild of the last days of analytics rollups (corrects drift from bulk writes)
+    from .rollups import RollupService
+
+    end_date = timezone.localdate()
+    start_date = end_date - timedelta(days=days - 1)
+    counts = RollupService.rebuild(start_date, end_date)
+    return f"Analytics rollups {start_date}..{end_date} rebuilt: {counts}"
@@ -18,3 +18,223 @@ class AnalyticsAPITest(APITestCase):  # AnalyticsAPITest class implementation
     def test_analytics_requires_auth(self):  # Test analytics requires auth
         response = self.client.get("/api/v1/analytics/")
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class DailyRollupTest(TestCase):  # Signal deltas keep rollups equal to a rebuild from the source tables
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.patient = Participant.objects.create_participant(
+                email="rollup-patient@test.com", password="test123", role="patient"
+            )
+            self.doctor = Participant.objects.create_participant(
+                email="rollup-doctor@test.com", password="test123", role="doctor"
+            )
+
+    def _transaction(self, ref, amount, transaction_type="payment", status="pending"):
+        from core.models import Transaction
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return Transaction.objects.create(
+                transaction_ref=ref,
+                transaction_type=transaction_type,
+                amount=amount,
+                status=status,
+                description="rollup test",
+                balance_before=0,
+                balance_after=0,
+            )
+
+    def _snapshot(self):
+        from analytics.models import DailyRegistrationRollup, DailyTransactionRollup
+
+        return (
+            sorted(DailyRegistrationRollup.objects.values_list("date", "role", "city", "count")),
+            sorted(
+                DailyTransactionRollup.objects.exclude(count=0).values_list(
+                    "date", "transaction_type", "status", "currency", "count", "amount_total"
+                )
+            ),
+        )
+
+    def test_deltas_match_rebuild_and_feed_revenue(self):
+        from decimal import Decimal
+        from django.utils import timezone
+        from analytics.rollups import RollupService
+        from analytics.services import AnalyticsService
+
+        payment = self._transaction("RLP-1", Decimal("1000.00"))
+        self._transaction("RLP-2", Decimal("25.00"), transaction_type="fee", status="completed")
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.status = "completed"
+            payment.save()
+
+        incremental = self._snapshot()
+        today = timezone.localdate()
+        RollupService.rebuild(today, today)
+        self.assertEqual(incremental, self._snapshot())
+
+        with self.assertNumQueries(1):
+            revenue = AnalyticsService.get_revenue_data(days=7)
+        self.assertEqual(len(revenue), 8)
+        self.assertEqual(revenue[-1]["revenue"], 1025.0)
+        self.assertEqual(revenue[-1]["fees"], 25.0)
+
+        growth = AnalyticsService.get_user_growth_data(days=7)
+        self.assertEqual(growth[-1]["new_users"], 2)
+        self.assertEqual(growth[-1]["total_users"], 2)
+
+
+    def test_participant_role_and_city_changes_move_the_registration(self):  # Old bucket captured with one values() query
+        from django.utils import timezone
+        from analytics.rollups import RollupService
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.city = "Cotonou"
+            self.doctor.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.last_login = timezone.now()
+            self.doctor.save(update_fields=["last_login"])
+
+        registrations = self._snapshot()[0]
+        self.assertIn((timezone.localdate(), "doctor", "Cotonou", 1), registrations)
+        self.assertIn((timezone.localdate(), "doctor", "", 0), registrations)
+        today = timezone.localdate()
+        RollupService.rebuild(today, today)
+        self.assertEqual(
+            [row for row in registrations if row[3]], [row for row in self._snapshot()[0] if row[3]]
+        )
+
+
+class DashboardQueryCountTest(TestCase):  # Each role dashboard is a fixed number of grouped queries, then served from cache
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.patient = Participant.objects.create_participant(
+            email="dash-patient@test.com", password="test123", role="patient"
+        )
+        self.doctor = Participant.objects.create_participant(
+            email="dash-doctor@test.com", password="test123", role="doctor"
+        )
+        self.hospital = Participant.objects.create_participant(
+            email="dash-hospital@test.com", password="test123", role="hospital"
+        )
+        self.pharmacy = Participant.objects.create_participant(
+            email="dash-pharmacy@test.com", password="test123", role="pharmacy"
+        )
+
+    def _assert_dashboard_queries(self, analytics_class, participant, expected):
+        with self.assertNumQueries(expected):
+            first = analytics_class.get_dashboard_stats(participant)
+        with self.assertNumQueries(0):
+            self.assertEqual(analytics_class.get_dashboard_stats(participant), first)
+        return first
+
+    def test_dashboard_query_counts(self):
+        from datetime import time
+        from django.utils import timezone
+        from appointments.models import Appointment
+        from analytics.analytics_service import (
+            DoctorAnalytics, HospitalAnalytics, PatientAnalytics, PharmacyAnalytics,
+        )
+
+        Appointment.objects.create(
+            patient=self.patient,
+            doctor=self.doctor,
+            appointment_date=timezone.now().date(),
+            appointment_time=time(9, 0),
+            status="completed",
+        )
+
+        doctor_stats = self._assert_dashboard_queries(DoctorAnalytics, self.doctor, 4)
+        self.assertEqual(doctor_stats["appointments"]["completed"], 1)
+        self.assertEqual(doctor_stats["patients"]["total_unique"], 1)
+        self.assertEqual(doctor_stats["monthly_patients"][-1]["count"], 1)
+        self.assertEqual(len(doctor_stats["revenue"]["monthly"]), 6)
+
+        self._assert_dashboard_queries(PatientAnalytics, self.patient, 4)
+        self._assert_dashboard_queries(HospitalAnalytics, self.hospital, 6)
+        self._assert_dashboard_queries(PharmacyAnalytics, self.pharmacy, 3)
+
+
+    def test_source_changes_invalidate_cached_dashboards(self):  # Appointment and payment writes drop the cached stats
+        from datetime import time
+        from django.utils import timezone
+        from appointments.models import Appointment
+        from analytics.analytics_service import DoctorAnalytics, PatientAnalytics
+
+        self.assertEqual(DoctorAnalytics.get_dashboard_stats(self.doctor)["appointments"]["total"], 0)
+        self.assertEqual(PatientAnalytics.get_dashboard_stats(self.patient)["appointments"]["total"], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Appointment.objects.create(
+                patient=self.patient,
+                doctor=self.doctor,
+                appointment_date=timezone.now().date(),
+                appointment_time=time(10, 0),
+                status="pending",
+            )
+        self.assertEqual(DoctorAnalytics.get_dashboard_stats(self.doctor)["appointments"]["total"], 1)
+        self.assertEqual(PatientAnalytics.get_dashboard_stats(self.patient)["appointments"]["total"], 1)
+
+
+class TimeSeriesTest(TestCase):  # Dense daily series come from one grouped query and match the former loop arithmetic
+    def test_load_zero_fills_from_one_query(self):
+        from datetime import timedelta
+        from decimal import Decimal
+        from django.utils import timezone
+        from core.models import Transaction
+        from analytics.timeseries import TimeSeries
+
+        recipient = Participant.objects.create_participant(
+            email="series-pharmacy@test.com", password="testpass123", role="pharmacy"
+        )
+        end_date = timezone.localdate()
+        start_date = end_date - timedelta(days=9)
+        for i, amount in enumerate(["100.00", "50.00", "25.00"]):
+            txn = Transaction.objects.create(
+                transaction_ref=f"SERIES-{i}",
+                transaction_type="payment",
+                recipient=recipient,
+                amount=Decimal(amount),
+                status="completed",
+                description="series test",
+                balance_before=0,
+                balance_after=0,
+            )
+            Transaction.objects.filter(pk=txn.pk).update(created_at=timezone.now() - timedelta(days=2 * (i // 2)))
+
+        with self.assertNumQueries(1):
+            series = TimeSeries.load(
+                Transaction.objects.filter(recipient=recipient), "created_at", start_date, end_date, value_field="amount"
+            )
+        self.assertEqual(len(series), 10)
+        self.assertEqual(series.values[-1], 150.0)
+        self.assertEqual(series.values[-3], 25.0)
+        self.assertEqual(series.values.sum(), 175.0)
+
+    def test_vectorized_helpers(self):
+        from datetime import date, timedelta
+        import numpy as np
+        from analytics.timeseries import TimeSeries
+
+        values = np.array([3.0, 5.0, 4.0, 8.0, 9.0, 7.0, 12.0, 11.0])
+        slope, intercept = TimeSeries.linear_trend(values)
+        expected_slope, expected_intercept = np.polyfit(np.arange(len(values)), values, 1)
+        self.assertAlmostEqual(slope, expected_slope)
+        self.assertAlmostEqual(intercept, expected_intercept)
+
+        self.assertEqual(list(TimeSeries.rolling_mean([2, 4, 6, 8], 2)), [2.0, 3.0, 5.0, 7.0])
+
+        start = date(2024, 2, 24)  # Saturday
+        features = TimeSeries.calendar_features(start, 8, first_day_number=10)
+        for i, row in enumerate(features):
+            day = start + timedelta(days=i)
+            self.assertEqual(
+                list(row),
+                [10 + i, day.weekday(), day.day, int(day.weekday() >= 5), int(day.day >= 25)],
+            )
+
+        series = TimeSeries.dense([(date(2024, 1, 1), 10), (date(2024, 1, 8), 20)], date(2024, 1, 1), date(2024, 1, 14))
+        profile = TimeSeries.weekday_profile(series)
+        self.assertAlmostEqual(profile[0], 15 / (30 / 14))  # Mondays carry all the volume
+        self.assertEqual(profile[1], 0.0)
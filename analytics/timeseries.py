@@ -0,0 +1,179 @@
+"""
+Shared daily time-series helpers for the forecasters in analytics and ml_models.
+
+A series is loaded with one grouped query (or from rollup rows), zero-filled
+into a dense NumPy array and analysed with vectorized operations: least-squares
+trend, day-of-week seasonality, rolling statistics and confidence bands.
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+Z_95 = 1.96
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+@dataclass
+class DailySeries:
+    """Dense daily values: values[i] belongs to start + i days"""
+    start: date
+    values: np.ndarray
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def end(self):
+        return self.start + timedelta(days=len(self.values) - 1)
+
+    def dates(self):
+        return [self.start + timedelta(days=i) for i in range(len(self.values))]
+
+    def weekdays(self):
+        """Weekday (0 = Monday) of every point"""
+        return (self.start.weekday() + np.arange(len(self.values))) % 7
+
+    def tail(self, days):
+        return self.values[-days:] if days else self.values[:0]
+
+    def window(self, since):
+        """Values dated since..end"""
+        return self.values[max((since - self.start).days, 0):]
+
+
+class TimeSeries:
+    """Load and analyse daily series"""
+
+    @staticmethod
+    def dense(pairs, start, end):
+        """Zero-filled series start..end (inclusive) from (date, value) pairs; duplicate dates are summed"""
+        length = (end - start).days + 1
+        values = np.zeros(max(length, 0))
+        pairs = [(day, value) for day, value in pairs if day is not None and start <= day <= end]
+        if pairs:
+            positions = np.fromiter(((day - start).days for day, _ in pairs), dtype=np.int64, count=len(pairs))
+            amounts = np.fromiter((float(value or 0) for _, value in pairs), dtype=float, count=len(pairs))
+            np.add.at(values, positions, amounts)
+        return DailySeries(start=start, values=values)
+
+    @staticmethod
+    def from_rows(rows, start, end, date_key='date', value_key='count'):
+        """Series from grouped rows such as RollupService.*_by_day output"""
+        return TimeSeries.dense(((row[date_key], row[value_key]) for row in rows), start, end)
+
+    @staticmethod
+    def load(queryset, date_field, start, end, value_field=None):
+        """
+        Daily SUM(value_field) (or COUNT when value_field is None) of a queryset in one grouped query
+
+        Args:
+            queryset: Source rows, already filtered to the entity of interest
+            date_field: DateField or DateTimeField to bucket by
+            start, end: Inclusive date range
+            value_field: Field to sum; rows are counted when omitted
+
+        Returns:
+            DailySeries: zero-filled start..end
+        """
+        field = queryset.model._meta.get_field(date_field)
+        if field.get_internal_type() == 'DateTimeField':
+            queryset = queryset.filter(**{f'{date_field}__date__gte': start, f'{date_field}__date__lte': end})
+            queryset = queryset.annotate(day=TruncDate(date_field))
+            day_key = 'day'
+        else:
+            queryset = queryset.filter(**{f'{date_field}__gte': start, f'{date_field}__lte': end})
+            day_key = date_field
+
+        aggregate = Sum(value_field) if value_field else Count('pk')
+        rows = queryset.values(day_key).annotate(value=aggregate).order_by().values_list(day_key, 'value')
+        return TimeSeries.dense(rows, start, end)
+
+    @staticmethod
+    def linear_trend(values):
+        """Least-squares (slope, intercept) of values against their index 0..n-1"""
+        y = np.asarray(values, dtype=float)
+        n = len(y)
+        if n == 0:
+            return 0.0, 0.0
+        x = np.arange(n, dtype=float)
+        x_centered = x - x.mean()
+        denominator = float(x_centered @ x_centered)
+        slope = float(x_centered @ (y - y.mean())) / denominator if denominator else 0.0
+        return slope, float(y.mean() - slope * x.mean())
+
+    @staticmethod
+    def extrapolate(slope, intercept, n, days_forward):
+        """Trend values for the days_forward days after a series of length n"""
+        return slope * (n + np.arange(1, days_forward + 1)) + intercept
+
+    @staticmethod
+    def weekday_profile(series):
+        """Multiplicative day-of-week index (mean of each weekday / overall mean), Monday first"""
+        weekdays = series.weekdays()
+        totals = np.bincount(weekdays, weights=series.values, minlength=7)
+        counts = np.bincount(weekdays, minlength=7)
+        means = np.divide(totals, counts, out=np.zeros(7), where=counts > 0)
+        overall = series.values.mean() if len(series) else 0.0
+        if not overall:
+            return np.ones(7)
+        return np.where(counts > 0, means / overall, 1.0)
+
+    @staticmethod
+    def weekday_totals(series):
+        """Sum of values per weekday, Monday first"""
+        return np.bincount(series.weekdays(), weights=series.values, minlength=7)
+
+    @staticmethod
+    def rolling_mean(values, window):
+        """Trailing mean over `window` points (shorter windows at the start)"""
+        y = np.asarray(values, dtype=float)
+        if len(y) == 0:
+            return y
+        cumulative = np.concatenate(([0.0], np.cumsum(y)))
+        upper = np.arange(1, len(y) + 1)
+        lower = np.maximum(upper - window, 0)
+        return (cumulative[upper] - cumulative[lower]) / (upper - lower)
+
+    @staticmethod
+    def rolling_std(values, window):
+        """Trailing population standard deviation over `window` points"""
+        y = np.asarray(values, dtype=float)
+        if len(y) == 0:
+            return y
+        squares = TimeSeries.rolling_mean(y * y, window)
+        return np.sqrt(np.maximum(squares - TimeSeries.rolling_mean(y, window) ** 2, 0.0))
+
+    @staticmethod
+    def confidence_band(predictions, spread, z=Z_95, floor=0.0):
+        """(lower, upper) arrays of predictions ± z * spread, lower clipped at floor"""
+        predictions = np.asarray(predictions, dtype=float)
+        return np.maximum(predictions - z * spread, floor), predictions + z * spread
+
+    @staticmethod
+    def percent_change(recent, previous):
+        """Change of the mean of `recent` over the mean of `previous`, in percent (0 when undefined)"""
+        previous_mean = float(np.mean(previous)) if len(previous) else 0.0
+        if previous_mean <= 0:
+            return 0.0
+        return (float(np.mean(recent)) - previous_mean) / previous_mean * 100
+
+    @staticmethod
+    def calendar_features(start, days, first_day_number=0):
+        """
+        Regression features for `days` consecutive dates from `start`:
+        [day_number, day_of_week, day_of_month, is_weekend, is_month_end]
+        """
+        offsets = np.arange(days)
+        dates = np.datetime64(start, 'D') + offsets
+        day_of_week = (start.weekday() + offsets) % 7
+        day_of_month = (dates - dates.astype('datetime64[M]')).astype(int) + 1
+        return np.column_stack([
+            first_day_number + offsets,
+            day_of_week,
+            day_of_month,
+            (day_of_week >= 5).astype(int),
+            (day_of_month >= 25).astype(int),
+        ]).astype(float)
@@ -8,6 +8,13 @@ app = Celery("BintaCura")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
+
+def run_inline():
+    """True when no worker can consume queued tasks (in-process memory:// broker)"""
+    from django.conf import settings
+
+    return settings.CELERY_BROKER_URL.startswith("memory://")
+
 app.conf.beat_schedule = {
     "send-appointment-reminders": {
         "task": "appointments.tasks.send_appointment_reminders",
@@ -33,5 +40,35 @@ app.conf.beat_schedule = {
         "task": "core.backup_tasks.cleanup_old_backups",
         "schedule": crontab(hour=4, minute=0, day_of_week=0),
     },
+    "refresh-analytics-rollups": {
+        "task": "analytics.tasks.refresh_daily_rollups",
+        "schedule": crontab(hour=0, minute=15),
+    },
+    "rebuild-price-index": {
+        "task": "core.tasks.rebuild_price_index",
+        "schedule": crontab(hour=1, minute=30),
+    },
+    "run-settlement-batch": {
+        "task": "payments.tasks.run_settlement_batch",
+        "schedule": crontab(hour=23, minute=30),
+    },
+    "retrain-ml-models": {
+        "task": "ai.tasks.retrain_ml_models",
+        "schedule": crontab(hour=2, minute=30),
+    },
+    "calculate-referral-bonuses": {
+        "task": "pharmacy.tasks.calculate_referral_bonuses",
+        "schedule": crontab(hour=3, minute=30, day_of_month=1),
+    },
+    "process-fedapay-webhook-events": {
+        "task": "payments.tasks.process_fedapay_webhook_events",
+        "schedule": crontab(minute="*"),
+        "options": {"expires": 55},
+    },
+    "escalate-ambulance-dispatches": {
+        "task": "transport.tasks.escalate_ambulance_dispatches",
+        "schedule": crontab(minute="*"),
+        "options": {"expires": 55},
+    },
 }
 
@@ -500,6 +500,18 @@ WHITENOISE_AUTOREFRESH = True
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Fitted ML model artifacts (ml_models.registry); must be shared by web and Celery workers
+ML_ARTIFACT_ROOT = Path(os.getenv("ML_ARTIFACT_ROOT", BASE_DIR / "ml_artifacts"))
+
+# Payroll computation rules (hr.payroll_engine); each deduction is a rate of one earnings field
+HR_PAYROLL_RULES = {
+    "overtime_multiplier": "1.5",
+    "deductions": [
+        {"type": "income_tax", "description": "Income Tax (10%)", "rate": "0.10", "base": "base_pay"},
+        {"type": "social_security", "description": "Social Security (5%)", "rate": "0.05", "base": "base_pay"},
+    ],
+}
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
@@ -564,7 +576,10 @@ SIMPLE_JWT = {
     "USER_ID_CLAIM": "uid",
 }
 
-CELERY_BROKER_URL = "memory://localhost/"
+# The default memory:// transport lives inside each process: worker and beat
+# processes never see what the web process sends to it, so backend.celery.run_inline()
+# makes callers run that work in-process. Set a real broker to move it to workers.
+CELERY_BROKER_URL = config("CELERY_BROKER_URL", default="memory://localhost/")
 CELERY_RESULT_BACKEND = "cache+memory://"
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
@@ -594,6 +609,21 @@ if "pytest" in sys.modules or "test" in sys.argv:
     CACHES["default"]["LOCATION"] = "unique-test-cache"
 
 
+# Channel layer behind the websocket routes of backend/asgi.py. The in-memory layer
+# only reaches clients of the same process; set CHANNEL_REDIS_URL when pings are
+# posted to other workers than the ASGI server.
+CHANNEL_REDIS_URL = config("CHANNEL_REDIS_URL", default="")
+if CHANNEL_REDIS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [CHANNEL_REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
 SESSION_ENGINE = "django.contrib.sessions.backends.db"
 
 #TWILIO_ACCOUNT_SID = config("TWILIO_ACCOUNT_SID", default="")
@@ -0,0 +1,137 @@
+"""
+Benchmark the provider map search on synthetic providers.
+
+Creates --providers doctors and hospitals clustered around a dozen cities
+(with a uniform rural background) and their ProviderLocation rows, then times
+ProviderMapIndex.search for radius searches with and without filters, next to
+the full scan the endpoint used to do (every provider's distance computed in
+Python). Everything runs inside a rolled-back transaction.
+
+Usage:
+    python manage.py benchmark_map_search
+    python manage.py benchmark_map_search --providers 50000 --repeat 50
+"""
+import random
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.price_index import normalize_region
+from core.provider_map_index import ProviderMapIndex, grid_cell, haversine_km
+
+CITIES = [
+    ('Cotonou', 6.3703, 2.3912), ('Porto-Novo', 6.4969, 2.6289), ('Parakou', 9.3372, 2.6303),
+    ('Abomey-Calavi', 6.4485, 2.3557), ('Djougou', 9.7085, 1.6660), ('Bohicon', 7.1783, 2.0667),
+    ('Natitingou', 10.3042, 1.3796), ('Lokossa', 6.6387, 1.7167), ('Lomé', 6.1725, 1.2314),
+    ('Lagos', 6.5244, 3.3792), ('Niamey', 13.5116, 2.1254), ('Ouagadougou', 12.3714, -1.5197),
+]
+SPECIALTIES = ['general', 'pediatrics', 'cardiology', 'gynecology', 'dermatology', 'ophthalmology']
+SEARCHES = [
+    ('Cotonou 10km', dict(latitude=6.3703, longitude=2.3912, radius_km=10)),
+    ('Cotonou 50km', dict(latitude=6.3703, longitude=2.3912, radius_km=50)),
+    ('Parakou 50km cardio', dict(latitude=9.3372, longitude=2.6303, radius_km=50, specialty='cardiology')),
+    ('Lagos 25km rating>=4', dict(latitude=6.5244, longitude=3.3792, radius_km=25, min_rating=4)),
+    ('rural 100km', dict(latitude=11.0, longitude=0.5, radius_km=100)),
+    ('Cotonou 50km page 3', dict(latitude=6.3703, longitude=2.3912, radius_km=50, page=3)),
+]
+
+
+class Command(BaseCommand):
+    help = 'Time provider map searches on synthetic providers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--providers', type=int, default=200000, help='Listed providers to index')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per search')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            started = time.perf_counter()
+            self._populate(options['providers'])
+            self.stdout.write(f"indexed {options['providers']} providers in {time.perf_counter() - started:.1f}s")
+
+            ProviderMapIndex.clear_tree()
+            started = time.perf_counter()
+            ProviderMapIndex.tree()
+            self.stdout.write(f'ball tree built in {(time.perf_counter() - started) * 1000:.1f}ms')
+
+            for label, params in SEARCHES:
+                timings = self._time(lambda: ProviderMapIndex.search(**params), options['repeat'])
+                result = ProviderMapIndex.search(**params)
+                self.stdout.write(
+                    f"{label:24} {result['count']:>7} hits  "
+                    f"median {statistics.median(timings):6.1f}ms  p95 {timings[int(len(timings) * 0.95) - 1]:6.1f}ms"
+                )
+
+            params = SEARCHES[1][1]
+            timings = self._time(lambda: self._full_scan(**params), max(1, options['repeat'] // 10))
+            self.stdout.write(f"{'full scan (previous)':24} median {statistics.median(timings):6.1f}ms")
+            transaction.set_rollback(True)
+        ProviderMapIndex.clear_tree()
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (changes rolled back)'))
+
+    @staticmethod
+    def _time(run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return sorted(timings)
+
+    @staticmethod
+    def _full_scan(latitude, longitude, radius_km):
+        from core.models import ProviderLocation
+        results = []
+        for participant_id, lat, lng in ProviderLocation.objects.values_list('participant_id', 'latitude', 'longitude'):
+            distance = haversine_km(latitude, longitude, lat, lng)
+            if distance <= radius_km:
+                results.append((distance, participant_id))
+        results.sort()
+        return results[:100]
+
+    @staticmethod
+    def _populate(count):
+        from core.models import Participant, ProviderLocation
+
+        rng = random.Random(42)
+        for start in range(0, count, 10000):
+            participants = []
+            entries = []
+            for i in range(start, min(start + 10000, count)):
+                if rng.random() < 0.8:
+                    city, lat, lng = rng.choice(CITIES)
+                    lat, lng = rng.gauss(lat, 0.25), rng.gauss(lng, 0.25)
+                else:
+                    city, lat, lng = '', rng.uniform(6.0, 14.0), rng.uniform(-2.0, 4.0)
+                role = 'doctor' if rng.random() < 0.85 else 'hospital'
+                participant = Participant(
+                    email=f'map-benchmark-{uuid.uuid4().hex[:12]}@example.com',
+                    role=role,
+                    full_name=f'{"Dr" if role == "doctor" else "Hôpital"} {i}',
+                    city=city,
+                    latitude=round(lat, 6),
+                    longitude=round(lng, 6),
+                    is_active=True,
+                    is_verified=True,
+                )
+                participants.append(participant)
+                cell_lat, cell_lng = grid_cell(lat, lng)
+                entries.append(ProviderLocation(
+                    participant=participant,
+                    role=role,
+                    latitude=lat,
+                    longitude=lng,
+                    cell_lat=cell_lat,
+                    cell_lng=cell_lng,
+                    name=participant.full_name,
+                    search_text=normalize_region(f'{participant.full_name} {city}'),
+                    city=city,
+                    specialty=rng.choice(SPECIALTIES) if role == 'doctor' else '',
+                    rating=round(rng.uniform(0, 5), 1),
+                    review_count=rng.randint(0, 200),
+                ))
+            Participant.objects.bulk_create(participants, batch_size=2000)
+            ProviderLocation.objects.bulk_create(entries, batch_size=2000)
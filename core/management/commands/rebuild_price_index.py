@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.price_index import PriceIndexService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the provider price index used by the price comparison API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        total = PriceIndexService.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Price index rebuilt: {total} entries'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.provider_map_index import ProviderMapIndex
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the provider location index used by the map search API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = ProviderMapIndex.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Provider map index rebuilt: {total} providers'))
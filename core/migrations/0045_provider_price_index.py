@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-18 20:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0044_alter_medicalequipment_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderPriceIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('consultation', 'Consultation Fee'), ('service', 'Service Price')], max_length=20)),
+                ('provider_type', models.CharField(max_length=20)),
+                ('specialty', models.CharField(blank=True, max_length=100)),
+                ('service_name', models.CharField(blank=True, max_length=255)),
+                ('region_key', models.CharField(blank=True, max_length=100)),
+                ('location', models.CharField(blank=True, max_length=255)),
+                ('provider_name', models.CharField(blank=True, max_length=255)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('currency', models.CharField(default='XOF', max_length=3)),
+                ('price_pivot', models.DecimalField(decimal_places=2, help_text='Price converted to the pivot currency', max_digits=14)),
+                ('rating', models.FloatField(default=0.0)),
+                ('total_reviews', models.IntegerField(default=0)),
+                ('years_of_experience', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_index_entries', to=settings.AUTH_USER_MODEL)),
+                ('service', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_index_entries', to='core.participantservice')),
+            ],
+            options={
+                'db_table': 'provider_price_index',
+                'indexes': [models.Index(fields=['source', 'specialty', 'region_key', 'price_pivot'], name='provider_pr_source_0483c5_idx'), models.Index(fields=['source', 'region_key', 'price_pivot'], name='provider_pr_source_a15f3b_idx'), models.Index(fields=['source', 'price_pivot'], name='provider_pr_source_418009_idx')],
+            },
+        ),
+    ]
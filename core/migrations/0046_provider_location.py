@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-18 22:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0045_provider_price_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderLocation',
+            fields=[
+                ('participant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='map_location', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('role', models.CharField(max_length=20)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('cell_lat', models.IntegerField()),
+                ('cell_lng', models.IntegerField()),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('search_text', models.TextField(blank=True)),
+                ('address', models.TextField(blank=True)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('country', models.CharField(blank=True, max_length=100)),
+                ('phone', models.CharField(blank=True, max_length=50)),
+                ('specialty', models.CharField(blank=True, max_length=100)),
+                ('consultation_fee', models.IntegerField(blank=True, null=True)),
+                ('rating', models.FloatField(default=0.0)),
+                ('review_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'provider_locations',
+                'indexes': [models.Index(fields=['cell_lat', 'cell_lng'], name='provider_lo_cell_la_832319_idx'), models.Index(fields=['rating'], name='provider_lo_rating_ccba40_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 22:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0046_provider_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='providerpriceindex',
+            name='location_key',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+    ]
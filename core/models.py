@@ -1097,6 +1097,95 @@ class ParticipantService(models.Model):
 ProviderService = ParticipantService
 
 
+class ProviderPriceIndex(models.Model):
+    """
+    Denormalized price index for provider price comparison.
+
+    One row per doctor consultation fee and per active ParticipantService
+    price, with the fee normalized to the pivot currency. Rows are derived
+    data, rebuilt from DoctorData / ParticipantService on change, so the
+    model does not use SyncMixin.
+    """
+    SOURCE_CHOICES = [
+        ("consultation", "Consultation Fee"),
+        ("service", "Service Price"),
+    ]
+
+    participant = models.ForeignKey(
+        Participant, on_delete=models.CASCADE, related_name="price_index_entries"
+    )
+    service = models.ForeignKey(
+        ParticipantService, on_delete=models.CASCADE, null=True, blank=True, related_name="price_index_entries"
+    )
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    provider_type = models.CharField(max_length=20)
+    specialty = models.CharField(max_length=100, blank=True)  # Doctor specialization or service category
+    service_name = models.CharField(max_length=255, blank=True)
+    region_key = models.CharField(max_length=100, blank=True)  # Normalized city (lowercase, no accents)
+    location_key = models.CharField(max_length=500, blank=True)  # Normalized city and address, for substring search
+    location = models.CharField(max_length=255, blank=True)
+    provider_name = models.CharField(max_length=255, blank=True)
+    price = models.DecimalField(max_digits=12, decimal_places=2)
+    currency = models.CharField(max_length=3, default="XOF")
+    price_pivot = models.DecimalField(max_digits=14, decimal_places=2, help_text="Price converted to the pivot currency")
+    rating = models.FloatField(default=0.0)
+    total_reviews = models.IntegerField(default=0)
+    years_of_experience = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "provider_price_index"
+        indexes = [
+            models.Index(fields=["source", "specialty", "region_key", "price_pivot"]),
+            models.Index(fields=["source", "region_key", "price_pivot"]),
+            models.Index(fields=["source", "price_pivot"]),
+        ]
+
+    def __str__(self):
+        return f"{self.provider_name} - {self.specialty} - {self.price_pivot}"
+
+
+class ProviderLocation(models.Model):
+    """
+    Map search row of a listed provider (active, verified doctor or hospital
+    with coordinates), see core/provider_map_index.py.
+
+    cell_lat/cell_lng are the provider's grid cell (MAP_CELL_DEGREES wide) so
+    a bounding box becomes an indexed integer range. Rows are derived data,
+    rebuilt from Participant / DoctorData / HospitalData on change, so the
+    model does not use SyncMixin.
+    """
+    participant = models.OneToOneField(
+        Participant, on_delete=models.CASCADE, primary_key=True, related_name="map_location"
+    )
+    role = models.CharField(max_length=20)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    cell_lat = models.IntegerField()
+    cell_lng = models.IntegerField()
+    name = models.CharField(max_length=255, blank=True)
+    search_text = models.TextField(blank=True)  # Normalized name, city and address
+    address = models.TextField(blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    country = models.CharField(max_length=100, blank=True)
+    phone = models.CharField(max_length=50, blank=True)
+    specialty = models.CharField(max_length=100, blank=True)
+    consultation_fee = models.IntegerField(null=True, blank=True)
+    rating = models.FloatField(default=0.0)
+    review_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "provider_locations"
+        indexes = [
+            models.Index(fields=["cell_lat", "cell_lng"]),
+            models.Index(fields=["rating"]),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.latitude}, {self.longitude})"
+
+
 class FeatureFlagConfig(models.Model):
     """
     Feature flag configuration for multi-region deployment.
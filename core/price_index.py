@@ -0,0 +1,208 @@
+"""
+Provider price index service.
+
+Maintains ProviderPriceIndex rows (fees normalized to the pivot currency)
+from DoctorData and ParticipantService, and answers sorted, paginated price
+comparisons plus cached percentile statistics per specialty/region bucket.
+
+The location filter matches a substring of the provider's city or address,
+case- and accent-insensitively, like the icontains lookups it replaces.
+Statistics are computed in SQL: one aggregate for count/min/avg/max and one
+small ordered slice per percentile, so a cache miss never loads a bucket.
+"""
+import logging
+import unicodedata
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min
+
+from .models import Participant, ProviderPriceIndex
+
+logger = logging.getLogger(__name__)
+
+PRICE_INDEX_PIVOT_CURRENCY = 'XOF'
+PRICE_INDEX_PROVIDER_ROLES = ('doctor', 'hospital')
+PRICE_INDEX_VERSION_KEY = 'price_index:version'
+PRICE_INDEX_STATS_TIMEOUT = 3600
+PRICE_INDEX_PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def normalize_region(value):
+    """Lowercase, accent-free city key ('Cotonou ' and 'cotonou' share a bucket)"""
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', value.strip().lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _percentile(values, count, percent):
+    """Linear interpolation between closest ranks of an ordered queryset of `count` values"""
+    if not count:
+        return 0.0
+    position = (count - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, count - 1)
+    fraction = position - lower
+    rows = [float(value) for value in values[lower:upper + 1]]
+    return rows[0] + (rows[-1] - rows[0]) * fraction
+
+
+class PriceIndexService:
+    """Build and query the provider price index"""
+
+    @staticmethod
+    def _pivot_rate(currency, rates):
+        currency = currency or PRICE_INDEX_PIVOT_CURRENCY
+        if currency not in rates:
+            from currency_converter.services import CurrencyConverterService
+            rates[currency] = CurrencyConverterService.get_rate(currency, PRICE_INDEX_PIVOT_CURRENCY)
+        return rates[currency]
+
+    @staticmethod
+    def build_entries(participant, rates=None):
+        """Unsaved index rows for one provider (expects doctor_data/hospital_data/services loaded or loadable)"""
+        rates = {} if rates is None else rates
+        if participant.role not in PRICE_INDEX_PROVIDER_ROLES or not participant.is_active:
+            return []
+
+        profile = getattr(participant, f'{participant.role}_data', None)
+        common = {
+            'participant': participant,
+            'provider_type': participant.role,
+            'region_key': normalize_region(participant.city),
+            'location_key': ' '.join(normalize_region(value) for value in (participant.city, participant.address) if value),
+            'location': (participant.city or participant.address or 'Non spécifié').strip(),
+            'provider_name': participant.full_name,
+            'rating': float(getattr(profile, 'rating', 0) or 0),
+            'total_reviews': getattr(profile, 'total_reviews', 0) or 0,
+            'years_of_experience': getattr(profile, 'years_of_experience', 0) or 0,
+        }
+
+        entries = []
+        if participant.role == 'doctor' and profile is not None:
+            fee = Decimal(profile.consultation_fee or 0)  # DoctorData fees are stored in XOF
+            entries.append(ProviderPriceIndex(
+                source='consultation',
+                specialty=profile.specialization,
+                price=fee,
+                currency='XOF',
+                price_pivot=(fee * PriceIndexService._pivot_rate('XOF', rates)).quantize(Decimal('0.01')),
+                **common,
+            ))
+
+        for service in participant.services.all():
+            if not service.is_active or not service.is_available or service.is_deleted or service.price is None:
+                continue
+            currency = service.currency or PRICE_INDEX_PIVOT_CURRENCY
+            entries.append(ProviderPriceIndex(
+                source='service',
+                service=service,
+                specialty=service.category or 'other',
+                service_name=service.name,
+                price=service.price,
+                currency=currency,
+                price_pivot=(service.price * PriceIndexService._pivot_rate(currency, rates)).quantize(Decimal('0.01')),
+                **common,
+            ))
+        return entries
+
+    @staticmethod
+    def _providers():
+        return Participant.objects.filter(
+            role__in=PRICE_INDEX_PROVIDER_ROLES
+        ).select_related('doctor_data', 'hospital_data').prefetch_related('services')
+
+    @staticmethod
+    @transaction.atomic
+    def refresh_provider(participant_id):
+        """Replace one provider's rows (called from DoctorData/ParticipantService/Participant signals)"""
+        participant = PriceIndexService._providers().filter(pk=participant_id).first()
+        ProviderPriceIndex.objects.filter(participant_id=participant_id).delete()
+        if participant is not None:
+            ProviderPriceIndex.objects.bulk_create(PriceIndexService.build_entries(participant))
+        PriceIndexService.invalidate_statistics()
+
+    @staticmethod
+    def rebuild(chunk_size=500):
+        """Full rebuild (nightly, after exchange rates are refreshed)"""
+        rates = {}
+        total = 0
+        with transaction.atomic():
+            ProviderPriceIndex.objects.all().delete()
+            batch = []
+            for participant in PriceIndexService._providers().filter(is_active=True).iterator(chunk_size=chunk_size):
+                batch.extend(PriceIndexService.build_entries(participant, rates))
+                if len(batch) >= chunk_size:
+                    ProviderPriceIndex.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                ProviderPriceIndex.objects.bulk_create(batch)
+                total += len(batch)
+        PriceIndexService.invalidate_statistics()
+        logger.info(f"Price index rebuilt: {total} entries")
+        return total
+
+    @staticmethod
+    def invalidate_statistics():
+        """Bump the index version so every cached statistics bucket is recomputed on next read"""
+        try:
+            cache.incr(PRICE_INDEX_VERSION_KEY)
+        except ValueError:
+            cache.set(PRICE_INDEX_VERSION_KEY, 1, None)
+
+    @staticmethod
+    def _bucket(source='consultation', specialty='', region='', provider_type=''):
+        entries = ProviderPriceIndex.objects.filter(source=source)
+        if specialty:
+            entries = entries.filter(specialty=specialty)
+        if region:
+            entries = entries.filter(location_key__contains=normalize_region(region))
+        if provider_type:
+            entries = entries.filter(provider_type=provider_type)
+        return entries
+
+    @staticmethod
+    def get_statistics(source='consultation', specialty='', region='', provider_type=''):
+        """Count, min/avg/max and percentiles for a bucket, cached until the index changes"""
+        version = cache.get(PRICE_INDEX_VERSION_KEY) or 0
+        cache_key = f"price_index:stats:{version}:{source}:{specialty}:{normalize_region(region)}:{provider_type}"
+        stats = cache.get(cache_key)
+        if stats is not None:
+            return stats
+
+        bucket = PriceIndexService._bucket(source, specialty, region, provider_type)
+        summary = bucket.aggregate(
+            count=Count('id'), avg=Avg('price_pivot'), low=Min('price_pivot'), high=Max('price_pivot')
+        )
+        prices = bucket.order_by('price_pivot').values_list('price_pivot', flat=True)
+        stats = {
+            'count': summary['count'],
+            'avg_price': float(summary['avg'] or 0),
+            'min_price': float(summary['low'] or 0),
+            'max_price': float(summary['high'] or 0),
+            'percentiles': {f'p{p}': _percentile(prices, summary['count'], p) for p in PRICE_INDEX_PERCENTILES},
+            'currency': PRICE_INDEX_PIVOT_CURRENCY,
+        }
+        cache.set(cache_key, stats, PRICE_INDEX_STATS_TIMEOUT)
+        return stats
+
+    @staticmethod
+    def compare(source='consultation', specialty='', region='', provider_type='', sort_by='price_asc', page=1, page_size=20):
+        """One page of index rows in the requested order plus bucket statistics"""
+        ordering = {
+            'price_asc': ('price_pivot', 'id'),
+            'price_desc': ('-price_pivot', 'id'),
+            'rating': ('-rating', 'price_pivot', 'id'),
+        }.get(sort_by, ('price_pivot', 'id'))
+
+        statistics = PriceIndexService.get_statistics(source, specialty, region, provider_type)
+        offset = (page - 1) * page_size
+        rows = (
+            PriceIndexService._bucket(source, specialty, region, provider_type)
+            .select_related('participant')
+            .order_by(*ordering)[offset:offset + page_size]
+        )
+        return list(rows), statistics
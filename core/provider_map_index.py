@@ -0,0 +1,288 @@
+"""
+Spatial index behind core.map_views.map_search_api.
+
+Listed providers (active, verified doctors and hospitals with coordinates) are
+denormalized into ProviderLocation rows, refreshed on commit by the
+Participant / DoctorData / HospitalData signals in core/signals.py and rebuilt
+by `python manage.py rebuild_provider_map_index`.
+
+Nearby searches are answered in two steps:
+
+1. Candidates: an in-process ball tree (scikit-learn, haversine metric) over
+   every listed provider returns the ids within the radius, nearest first.
+   The tree is rebuilt when the index version (row count and latest
+   updated_at of ProviderLocation, read from the database so every worker
+   sees every refresh) changes, at most once every TREE_REFRESH_SECONDS per
+   process; until then its matches are checked against the current rows, so
+   providers delisted in between are neither returned nor counted. Without
+   scikit-learn, or when text/specialty/rating filters apply, a SQL bounding
+   box on the grid-cell columns (cell_lat, cell_lng) narrows the rows first.
+2. Exact great-circle distances are computed for candidates only, and a
+   single page of rows is loaded (top-K with pagination).
+"""
+import logging
+import math
+import threading
+import time
+
+from django.db import transaction
+from django.db.models import Count, Max, Q
+
+from .models import Participant, ProviderLocation
+from .price_index import normalize_region
+
+logger = logging.getLogger(__name__)
+
+MAP_CELL_DEGREES = 0.1  # ~11 km of latitude per grid cell
+MAP_PROVIDER_ROLES = ('doctor', 'hospital')
+TREE_REFRESH_SECONDS = 30
+EARTH_RADIUS_KM = 6371.0
+MAX_PAGE_SIZE = 500
+
+_tree_lock = threading.Lock()
+_tree_state = {'version': None, 'built_at': 0.0, 'tree': None, 'ids': None}
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometers"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def grid_cell(latitude, longitude):
+    return math.floor(latitude / MAP_CELL_DEGREES), math.floor(longitude / MAP_CELL_DEGREES)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng) enclosing the search circle"""
+    dlat = radius_km / 111.32
+    dlng = radius_km / (111.32 * max(math.cos(math.radians(latitude)), 0.01))
+    return latitude - dlat, latitude + dlat, longitude - dlng, longitude + dlng
+
+
+class ProviderMapIndex:
+    """Build and query the provider map index"""
+
+    @staticmethod
+    def build_entry(participant):
+        """Unsaved ProviderLocation of a listed provider, else None (doctor_data/hospital_data loadable)"""
+        if (participant.role not in MAP_PROVIDER_ROLES or not participant.is_active or not participant.is_verified
+                or participant.latitude is None or participant.longitude is None):
+            return None
+        latitude, longitude = float(participant.latitude), float(participant.longitude)
+        cell_lat, cell_lng = grid_cell(latitude, longitude)
+        entry = ProviderLocation(
+            participant=participant,
+            role=participant.role,
+            latitude=latitude,
+            longitude=longitude,
+            cell_lat=cell_lat,
+            cell_lng=cell_lng,
+            name=participant.full_name or '',
+            search_text=' '.join(normalize_region(value) for value in (
+                participant.full_name, participant.city, participant.address
+            ) if value),
+            address=participant.address or '',
+            city=participant.city or '',
+            country=participant.country or '',
+            phone=participant.phone_number or '',
+        )
+        profile = getattr(participant, 'doctor_data' if participant.role == 'doctor' else 'hospital_data', None)
+        if profile is not None:
+            entry.rating = profile.rating or 0.0
+            entry.review_count = profile.total_reviews or 0
+            if participant.role == 'doctor':
+                entry.specialty = profile.specialization or ''
+                entry.consultation_fee = profile.consultation_fee or None
+        return entry
+
+    @staticmethod
+    def _providers():
+        return Participant.objects.filter(role__in=MAP_PROVIDER_ROLES).select_related('doctor_data', 'hospital_data')
+
+    @staticmethod
+    @transaction.atomic
+    def refresh_provider(participant_id):
+        """Replace one provider's row (called on commit from the profile/Participant signals)"""
+        participant = ProviderMapIndex._providers().filter(pk=participant_id).first()
+        ProviderLocation.objects.filter(participant_id=participant_id).delete()
+        entry = ProviderMapIndex.build_entry(participant) if participant is not None else None
+        if entry is not None:
+            entry.save(force_insert=True)
+
+    @staticmethod
+    def rebuild(chunk_size=1000):
+        """Full rebuild; returns the number of listed providers"""
+        total = 0
+        with transaction.atomic():
+            ProviderLocation.objects.all().delete()
+            batch = []
+            providers = ProviderMapIndex._providers().filter(
+                is_active=True, is_verified=True, latitude__isnull=False, longitude__isnull=False
+            )
+            for participant in providers.iterator(chunk_size=chunk_size):
+                entry = ProviderMapIndex.build_entry(participant)
+                if entry is not None:
+                    batch.append(entry)
+                if len(batch) >= chunk_size:
+                    ProviderLocation.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                ProviderLocation.objects.bulk_create(batch)
+                total += len(batch)
+        ProviderMapIndex.clear_tree()
+        logger.info(f"Provider map index rebuilt: {total} providers")
+        return total
+
+    @staticmethod
+    def clear_tree():
+        """Drop this process's tree so the next search rebuilds it regardless of TREE_REFRESH_SECONDS"""
+        with _tree_lock:
+            _tree_state.update(version=None, built_at=0.0, tree=None, ids=None)
+
+    @staticmethod
+    def version():
+        """(row count, latest updated_at) of the index: refreshes re-insert rows, delistings remove them"""
+        state = ProviderLocation.objects.aggregate(rows=Count('pk'), latest=Max('updated_at'))
+        return state['rows'], state['latest']
+
+    @staticmethod
+    def tree():
+        """
+        (BallTree, participant ids, current) over all listed providers, or
+        (None, None, False) without scikit-learn; current is False while a tree
+        older than the index is reused within TREE_REFRESH_SECONDS
+        """
+        try:
+            import numpy as np
+            from sklearn.neighbors import BallTree
+        except ImportError:
+            return None, None, False
+
+        version = ProviderMapIndex.version()
+        state = _tree_state
+        recent = time.monotonic() - state['built_at'] < TREE_REFRESH_SECONDS
+        if state['tree'] is not None and (state['version'] == version or recent):
+            return state['tree'], state['ids'], state['version'] == version
+
+        with _tree_lock:
+            if state['version'] == version and state['tree'] is not None:
+                return state['tree'], state['ids'], True
+            rows = list(ProviderLocation.objects.values_list('participant_id', 'latitude', 'longitude'))
+            ids = [row[0] for row in rows]
+            points = np.radians(np.array([(row[1], row[2]) for row in rows], dtype=float).reshape(-1, 2))
+            tree = BallTree(points, metric='haversine') if rows else None
+            state.update(version=version, built_at=time.monotonic(), tree=tree, ids=ids)
+            logger.debug(f"Provider map tree built over {len(ids)} providers")
+            return tree, ids, True
+
+    @staticmethod
+    def _filtered(search='', specialty='', min_rating=0, role=''):
+        entries = ProviderLocation.objects.all()
+        if search:
+            entries = entries.filter(search_text__contains=normalize_region(search))
+        if specialty:
+            entries = entries.filter(Q(specialty__icontains=specialty) | Q(role='hospital'))
+        if min_rating:
+            entries = entries.filter(rating__gte=min_rating)
+        if role:
+            entries = entries.filter(role=role)
+        return entries
+
+    @staticmethod
+    def _in_box(entries, latitude, longitude, radius_km):
+        min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+        (min_cell_lat, min_cell_lng), (max_cell_lat, max_cell_lng) = grid_cell(min_lat, min_lng), grid_cell(max_lat, max_lng)
+        return entries.filter(
+            cell_lat__range=(min_cell_lat, max_cell_lat),
+            cell_lng__range=(min_cell_lng, max_cell_lng),
+            latitude__range=(min_lat, max_lat),
+            longitude__range=(min_lng, max_lng),
+        )
+
+    @staticmethod
+    def nearby(latitude, longitude, radius_km, search='', specialty='', min_rating=0, role=''):
+        """[(participant_id, distance km)] within radius_km, nearest first"""
+        filtered = bool(search or specialty or min_rating or role)
+        tree, ids, current = ProviderMapIndex.tree()
+        if tree is not None:
+            import numpy as np
+            found, distances = tree.query_radius(
+                np.radians([[latitude, longitude]]), r=radius_km / EARTH_RADIUS_KM,
+                return_distance=True, sort_results=True,
+            )
+            matches = [(ids[i], distance * EARTH_RADIUS_KM) for i, distance in zip(found[0], distances[0])]
+            if not filtered and current:
+                return matches
+            # Filters apply, or the tree predates the latest refresh: keep rows that (still) match
+            allowed = set(ProviderMapIndex._in_box(
+                ProviderMapIndex._filtered(search, specialty, min_rating, role), latitude, longitude, radius_km
+            ).values_list('participant_id', flat=True))
+            return [match for match in matches if match[0] in allowed]
+
+        candidates = ProviderMapIndex._in_box(
+            ProviderMapIndex._filtered(search, specialty, min_rating, role), latitude, longitude, radius_km
+        ).values_list('participant_id', 'latitude', 'longitude')
+        matches = []
+        for participant_id, lat, lng in candidates:
+            distance = haversine_km(latitude, longitude, lat, lng)
+            if distance <= radius_km:
+                matches.append((participant_id, distance))
+        matches.sort(key=lambda match: match[1])
+        return matches
+
+    @staticmethod
+    def serialize(entry, distance=None):
+        return {
+            'id': str(entry.participant_id),
+            'name': entry.name,
+            'role': entry.role,
+            'latitude': entry.latitude,
+            'longitude': entry.longitude,
+            'address': entry.address,
+            'city': entry.city,
+            'country': entry.country,
+            'phone': entry.phone,
+            'distance': round(distance, 2) if distance is not None else None,
+            'rating': entry.rating,
+            'review_count': entry.review_count,
+            'specialty': entry.specialty or None,
+            'consultation_fee': entry.consultation_fee,
+            'available_today': False,
+        }
+
+    @staticmethod
+    def search(latitude=None, longitude=None, radius_km=50, search='', specialty='', min_rating=0, role='',
+               page=1, page_size=100):
+        """
+        Paginated provider search: nearest first with a location, else best rated first
+
+        Returns:
+            dict: {'count', 'page', 'page_size', 'providers'}
+        """
+        page = max(int(page), 1)
+        page_size = min(max(int(page_size), 1), MAX_PAGE_SIZE)
+        offset = (page - 1) * page_size
+
+        if latitude is None or longitude is None:
+            entries = ProviderMapIndex._filtered(search, specialty, min_rating, role)
+            rows = list(entries.order_by('-rating', 'name')[offset:offset + page_size])
+            count = entries.count() if len(rows) == page_size or page > 1 else offset + len(rows)
+            return {
+                'count': count, 'page': page, 'page_size': page_size,
+                'providers': [ProviderMapIndex.serialize(entry) for entry in rows],
+            }
+
+        matches = ProviderMapIndex.nearby(latitude, longitude, radius_km, search, specialty, min_rating, role)
+        page_ids = [participant_id for participant_id, _ in matches[offset:offset + page_size]]
+        entries = ProviderLocation.objects.in_bulk(page_ids)
+        providers = []
+        for participant_id in page_ids:
+            entry = entries.get(participant_id)
+            if entry is None:  # delisted since the tree was built
+                continue
+            distance = haversine_km(latitude, longitude, entry.latitude, entry.longitude)
+            providers.append(ProviderMapIndex.serialize(entry, distance))
+        return {'count': len(matches), 'page': page, 'page_size': page_size, 'providers': providers}
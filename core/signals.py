@@ -1,4 +1,4 @@
-from django.db.models.signals import pre_save, post_save, post_delete
+from django.db.models.signals import pre_save, post_init, post_save, post_delete
 from django.dispatch import receiver
 from django.db import transaction
 from django.db.models import Avg
@@ -155,3 +155,78 @@ def assign_identifier_on_verification(sender, instance, **kwargs):
     except Exception:
         pass
 
+
+
+PRICE_INDEX_PARTICIPANT_FIELDS = {'full_name', 'city', 'address', 'is_active', 'role'}
+INDEXED_PROVIDER_ROLES = {'doctor', 'hospital'}
+
+
+@receiver(post_init, sender=Participant)
+def remember_participant_role(sender, instance, **kwargs):
+    """Role as loaded, so a provider who changes role is still dropped from the indexes (no extra query)"""
+    instance._loaded_role = instance.__dict__.get('role')
+
+
+def _was_or_is_provider(instance):
+    return instance.role in INDEXED_PROVIDER_ROLES or getattr(instance, '_loaded_role', None) in INDEXED_PROVIDER_ROLES
+
+
+def _schedule_price_index_refresh(participant_id):
+    if participant_id is None:
+        return
+    from core.price_index import PriceIndexService
+    transaction.on_commit(lambda: PriceIndexService.refresh_provider(participant_id))
+
+
+@receiver([post_save, post_delete], sender='doctor.DoctorData')
+@receiver([post_save, post_delete], sender='hospital.HospitalData')
+@receiver([post_save, post_delete], sender='core.ParticipantService')
+def refresh_price_index_for_profile(sender, instance, **kwargs):
+    """Keep ProviderPriceIndex in sync with fees, service prices and ratings"""
+    _schedule_price_index_refresh(instance.participant_id)
+
+
+@receiver(post_save, sender=Participant)
+def refresh_price_index_for_participant(sender, instance, created, update_fields=None, **kwargs):
+    if created or not _was_or_is_provider(instance):
+        return
+    if update_fields is not None and not PRICE_INDEX_PARTICIPANT_FIELDS.intersection(update_fields):
+        return  # e.g. last_login updates
+    _schedule_price_index_refresh(instance.pk)
+
+
+PROVIDER_MAP_PARTICIPANT_FIELDS = {
+    'full_name', 'city', 'address', 'country', 'phone_number', 'latitude', 'longitude', 'is_active', 'is_verified',
+    'role',
+}
+
+
+def _schedule_provider_map_refresh(participant_id):
+    if participant_id is None:
+        return
+    from core.provider_map_index import ProviderMapIndex
+    transaction.on_commit(lambda: ProviderMapIndex.refresh_provider(participant_id))
+
+
+@receiver([post_save, post_delete], sender='doctor.DoctorData')
+@receiver([post_save, post_delete], sender='hospital.HospitalData')
+def refresh_provider_map_for_profile(sender, instance, **kwargs):
+    """Keep ProviderLocation in sync with ratings, specialties and fees"""
+    _schedule_provider_map_refresh(instance.participant_id)
+
+
+@receiver(post_save, sender=Participant)
+def refresh_provider_map_for_participant(sender, instance, created, update_fields=None, **kwargs):
+    """List or delist a provider; a former doctor/hospital is refreshed too so its row is removed"""
+    if not _was_or_is_provider(instance):
+        return
+    if update_fields is not None and not PROVIDER_MAP_PARTICIPANT_FIELDS.intersection(update_fields):
+        return
+    _schedule_provider_map_refresh(instance.pk)
+
+
+@receiver(post_delete, sender=Participant)
+def drop_provider_from_map(sender, instance, **kwargs):
+    if instance.role in ('doctor', 'hospital'):
+        from core.provider_map_index import ProviderMapIndex
+        transaction.on_commit(ProviderMapIndex.clear_tree)  # the row itself goes with the cascade
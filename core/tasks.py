@@ -69,3 +69,11 @@ def cleanup_old_logs():  # Periodic task to clean up log entries older than 90 d
     cutoff_date = timezone.now() - timedelta(days=90)
     # Implementation would delete old log entries
     return f"Cleaned logs older than {cutoff_date}"
+
+
+@shared_task
+def rebuild_price_index():  # Nightly rebuild of the provider price index after exchange rates refresh
+    from .price_index import PriceIndexService
+
+    total = PriceIndexService.rebuild()
+    return f"Price index rebuilt with {total} entries"
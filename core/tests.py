@@ -0,0 +1,156 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Participant, ProviderLocation, ProviderPriceIndex
+
+
+class PriceIndexTest(TestCase):  # Index rows follow profile changes and answer filtered statistics in SQL
+    def setUp(self):  # Setup
+        cache.clear()
+        self.doctors = [
+            self._doctor(f"price{i}@test.com", fee, city, address)
+            for i, (fee, city, address) in enumerate([
+                (5000, "Cotonou", "Akpakpa, rue 12"),
+                (8000, "Cotonou", "Cadjèhoun"),
+                (12000, "Porto-Novo", "Ouando"),
+                (20000, "Abomey-Calavi", "Godomey"),
+            ])
+        ]
+
+    def _doctor(self, email, fee, city, address):
+        from doctor.models import DoctorData
+
+        with self.captureOnCommitCallbacks(execute=True):
+            doctor = Participant.objects.create(
+                email=email, role="doctor", full_name=email, city=city, address=address, is_active=True
+            )
+            DoctorData.objects.create(
+                participant=doctor, specialization="general_practice", license_number=email, consultation_fee=fee
+            )
+        return doctor
+
+    def test_index_follows_profile_and_role_changes(self):  # Rebuilt on commit, dropped when no longer a provider
+        from core.price_index import PriceIndexService
+
+        doctor = self.doctors[0]
+        self.assertEqual(ProviderPriceIndex.objects.get(participant=doctor).price_pivot, 5000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            doctor.doctor_data.consultation_fee = 6500
+            doctor.doctor_data.save()
+        self.assertEqual(ProviderPriceIndex.objects.get(participant=doctor).price_pivot, 6500)
+        self.assertEqual(PriceIndexService.get_statistics()["max_price"], 20000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reloaded = Participant.objects.get(pk=doctor.pk)
+            reloaded.role = "patient"
+            reloaded.save()
+        self.assertFalse(ProviderPriceIndex.objects.filter(participant=doctor).exists())
+        self.assertEqual(PriceIndexService.rebuild(), 3)
+
+    def test_location_matches_city_or_address_substrings(self):  # Case and accent insensitive, like icontains
+        from core.price_index import PriceIndexService
+
+        def providers(location):
+            rows, _ = PriceIndexService.compare(region=location)
+            return sorted(row.participant.email for row in rows)
+
+        self.assertEqual(providers("cotonou"), ["price0@test.com", "price1@test.com"])
+        self.assertEqual(providers("COTON"), ["price0@test.com", "price1@test.com"])
+        self.assertEqual(providers("akpakpa"), ["price0@test.com"])
+        self.assertEqual(providers("cadjehoun"), ["price1@test.com"])
+        self.assertEqual(providers("Novo"), ["price2@test.com"])
+        self.assertEqual(providers("Parakou"), [])
+
+    def test_statistics_without_loading_the_bucket(self):  # Aggregates and percentile slices, then cached
+        from core.price_index import PriceIndexService
+
+        with CaptureQueriesContext(connection) as queries:
+            stats = PriceIndexService.get_statistics()
+        self.assertEqual(stats["count"], 4)
+        self.assertEqual((stats["min_price"], stats["max_price"], stats["avg_price"]), (5000, 20000, 11250))
+        self.assertEqual(stats["percentiles"]["p50"], 10000)
+        self.assertAlmostEqual(stats["percentiles"]["p90"], 17600)
+        self.assertTrue(all("LIMIT" in query["sql"] or "AVG" in query["sql"] for query in queries.captured_queries))
+        self.assertEqual(PriceIndexService.get_statistics(region="cotonou")["count"], 2)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(PriceIndexService.get_statistics(), stats)
+
+
+class ProviderMapIndexTest(TestCase):  # Nearby search over the denormalized provider locations
+    ORIGIN = (6.3703, 2.3912)
+
+    def setUp(self):  # Setup
+        from core.provider_map_index import ProviderMapIndex
+
+        cache.clear()
+        ProviderMapIndex.clear_tree()
+        self.hospitals = {km: self._hospital(km) for km in (30, 1, 5)}
+
+    def _hospital(self, km):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Participant.objects.create(
+                email=f"map{km}@test.com", role="hospital", full_name=f"Hôpital {km} km", is_active=True,
+                is_verified=True, latitude=self.ORIGIN[0] + km / 111.2, longitude=self.ORIGIN[1],
+            )
+
+    def _nearby(self, radius_km):
+        from core.provider_map_index import ProviderMapIndex
+
+        return ProviderMapIndex.nearby(*self.ORIGIN, radius_km)
+
+    def test_nearest_first_within_the_radius(self):  # Ordering and radius cut-off
+        matches = self._nearby(10)
+        self.assertEqual([participant_id for participant_id, _ in matches], [self.hospitals[1].pk, self.hospitals[5].pk])
+        self.assertAlmostEqual(matches[0][1], 1, delta=0.05)
+        self.assertEqual(len(self._nearby(50)), 3)
+        self.assertEqual(self._nearby(0.5), [])
+
+    def test_profile_changes_refresh_the_row(self):  # Saves re-list the provider on commit
+        hospital = self.hospitals[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            hospital.latitude = self.ORIGIN[0] + 200 / 111.2
+            hospital.full_name = "Hôpital déplacé"
+            hospital.save()
+        self.assertEqual(ProviderLocation.objects.get(participant=hospital).name, "Hôpital déplacé")
+        self.assertEqual([participant_id for participant_id, _ in self._nearby(10)], [self.hospitals[5].pk])
+
+    def test_delisted_providers_are_not_returned_or_counted(self):  # Role change and unverification, tree already built
+        from core.provider_map_index import ProviderMapIndex
+
+        self.assertEqual(ProviderMapIndex.search(*self.ORIGIN, radius_km=50)["count"], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            former = Participant.objects.get(pk=self.hospitals[5].pk)
+            former.role = "patient"
+            former.save()
+            unverified = self.hospitals[30]
+            unverified.is_verified = False
+            unverified.save(update_fields=["is_verified"])
+        self.assertEqual(list(ProviderLocation.objects.values_list("participant_id", flat=True)), [self.hospitals[1].pk])
+
+        result = ProviderMapIndex.search(*self.ORIGIN, radius_km=50)
+        self.assertEqual(result["count"], 1)
+        self.assertEqual([provider["id"] for provider in result["providers"]], [str(self.hospitals[1].pk)])
+
+    def test_other_workers_refreshes_reach_this_process(self):  # Version comes from the rows, not a per-process cache
+        from unittest import mock
+        from core.provider_map_index import ProviderMapIndex
+
+        self.assertEqual(len(self._nearby(50)), 3)
+        cache.clear()  # the refreshing worker's cache is not this one
+        newcomer = Participant.objects.create(
+            email="map-new@test.com", role="hospital", full_name="Nouvel hôpital", is_active=True, is_verified=True,
+            latitude=self.ORIGIN[0] + 2 / 111.2, longitude=self.ORIGIN[1],
+        )
+        ProviderLocation.objects.filter(participant=newcomer).delete()
+        ProviderMapIndex.build_entry(newcomer).save(force_insert=True)
+        ProviderLocation.objects.filter(participant=self.hospitals[30]).delete()
+
+        with mock.patch("core.provider_map_index.TREE_REFRESH_SECONDS", 0):
+            matches = self._nearby(50)
+        self.assertEqual(
+            [participant_id for participant_id, _ in matches], [self.hospitals[1].pk, newcomer.pk, self.hospitals[5].pk]
+        )
@@ -4276,75 +4276,56 @@ class PharmacyCatalogAPIView(APIView):  # Class for pharmacycatalogapi
 
     @extend_schema(
         summary="Get pharmacy catalog",
+        parameters=[
+            OpenApiParameter(name='search', description='Medication name, generic/brand name or city (prefix and typo tolerant)', required=False, type=str),
+            OpenApiParameter(name='city', description='Pharmacy city', required=False, type=str),
+            OpenApiParameter(name='pharmacy_id', description='Pharmacy uid', required=False, type=str),
+            OpenApiParameter(name='category', description='Medication category', required=False, type=str),
+            OpenApiParameter(name='page', description='Page number', required=False, type=int),
+            OpenApiParameter(name='page_size', description='Results per page (max 100)', required=False, type=int),
+        ],
         responses={200: ParticipantSerializer}
     )
     def get(self, request):  # Handle get operation
-        from pharmacy.models import PharmacyInventory
-        from prescriptions.models import Medication
-        from django.db.models import Q
+        from pharmacy.catalog_search import CatalogSearchService
 
         search = request.query_params.get('search', '').strip()
         pharmacy_id = request.query_params.get('pharmacy_id', '').strip()
         category = request.query_params.get('category', '').strip()
-
-        inventory_items = PharmacyInventory.objects.filter(
-            is_publicly_available=True,
-            quantity_in_stock__gt=0
-        ).select_related('medication', 'pharmacy')
-
-        if search:
-            inventory_items = inventory_items.filter(
-                Q(medication__name__icontains=search) |
-                Q(medication__generic_name__icontains=search) |
-                Q(medication__brand_name__icontains=search) |
-                Q(medication__category__icontains=search)
-            )
-
-        if pharmacy_id:
-            inventory_items = inventory_items.filter(pharmacy_id=pharmacy_id)
-
-        if category:
-            inventory_items = inventory_items.filter(medication__category=category)
-
-        inventory_items = inventory_items.order_by('medication__name')
-
-        catalog_data = []
-        pharmacies_set = set()
-        categories_set = set()
-
-        for item in inventory_items:
-            catalog_data.append({
-                'id': str(item.id),
-                'medication_id': str(item.medication.id),
-                'medication_name': item.medication.name,
-                'generic_name': item.medication.generic_name,
-                'brand_name': item.medication.brand_name,
-                'category': item.medication.category,
-                'description': item.medication.description,
-                'dosage_forms': item.medication.dosage_forms,
-                'strengths': item.medication.strengths,
-                'requires_prescription': item.medication.requires_prescription,
-                'pharmacy_id': str(item.pharmacy.uid),
-                'pharmacy_name': item.pharmacy.full_name,
-                'pharmacy_address': item.pharmacy.address,
-                'pharmacy_phone': item.pharmacy.phone_number,
-                'quantity_in_stock': item.quantity_in_stock,
-                'unit_price': item.unit_price,
-                'selling_price': item.selling_price,
-                'expiry_date': item.expiry_date.strftime('%Y-%m-%d'),
-                'requires_refrigeration': item.requires_refrigeration,
-            })
-
-            pharmacies_set.add((str(item.pharmacy.uid), item.pharmacy.full_name))
-            if item.medication.category:
-                categories_set.add(item.medication.category)
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get('page_size', 50)), 1), 100)
+        except ValueError:
+            return Response({
+                'success': False,
+                'error': 'page and page_size must be integers'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Ranked page from the medication catalog index (see pharmacy/catalog_search.py)
+        results = CatalogSearchService.search(
+            query=search,
+            city=request.query_params.get('city', '').strip(),
+            pharmacy_id=pharmacy_id or None,
+            category=category,
+            page=page,
+            page_size=page_size,
+        )
+        facets = results['facets']
 
         return Response({
             'success': True,
-            'catalog': catalog_data,
-            'count': len(catalog_data),
-            'pharmacies': [{'id': p[0], 'name': p[1]} for p in sorted(pharmacies_set, key=lambda x: x[1])],
-            'categories': sorted(list(categories_set))
+            'catalog': [CatalogSearchService.serialize(entry) for entry in results['results']],
+            'count': results['total'],
+            'pagination': {
+                'page': page,
+                'page_size': page_size,
+                'total': results['total'],
+            },
+            'pharmacies': [
+                {'id': str(row['pharmacy_id']), 'name': row['pharmacy_name'], 'count': row['count']}
+                for row in facets['pharmacies']
+            ],
+            'categories': [row['category'] for row in facets['categories']]
         }, status=status.HTTP_200_OK)
 
 
@@ -4895,86 +4876,77 @@ class PriceComparisonAPIView(APIView):
     @extend_schema(
         summary="Compare prices across doctors and hospitals",
         parameters=[
-            OpenApiParameter(name='specialty', description='Medical specialty', required=False, type=str),
-            OpenApiParameter(name='location', description='City or region', required=False, type=str),
+            OpenApiParameter(name='specialty', description='Medical specialty (or service category with source=service)', required=False, type=str),
+            OpenApiParameter(name='location', description='City', required=False, type=str),
             OpenApiParameter(name='provider_type', description='doctor or hospital', required=False, type=str),
+            OpenApiParameter(name='source', description='consultation (default) or service', required=False, type=str),
             OpenApiParameter(name='sort_by', description='price_asc, price_desc, rating', required=False, type=str),
+            OpenApiParameter(name='page', description='Page number', required=False, type=int),
+            OpenApiParameter(name='page_size', description='Results per page (max 100)', required=False, type=int),
         ],
         responses={200: OpenApiResponse(description="Price comparison data")}
     )
     def get(self, request):
-        from doctor.models import DoctorData
-        from django.db.models import Q, Avg, Count
+        from .price_index import PriceIndexService
         
         try:
             specialty = request.query_params.get('specialty', '').strip()
             location = request.query_params.get('location', '').strip()
             provider_type = request.query_params.get('provider_type', '').strip()
+            source = request.query_params.get('source', 'consultation').strip()
             sort_by = request.query_params.get('sort_by', 'price_asc')
+            try:
+                page = max(int(request.query_params.get('page', 1)), 1)
+                page_size = min(max(int(request.query_params.get('page_size', 20)), 1), 100)
+            except ValueError:
+                return Response({
+                    'success': False,
+                    'error': 'page and page_size must be integers'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
-            doctors = Participant.objects.filter(
-                role='doctor',
-                is_active=True
-            ).select_related('doctor_data')
-            
-            if specialty:
-                doctors = doctors.filter(doctor_data__specialization=specialty)
-            
-            if location:
-                doctors = doctors.filter(
-                    Q(city__icontains=location) |
-                    Q(address__icontains=location) |
-                    Q(region__icontains=location)
-                )
-            
-            comparison_data = []
-            prices = []
-            
-            for doctor in doctors:
-                if not hasattr(doctor, 'doctor_data') or not doctor.doctor_data:
-                    continue
-                    
-                fee = doctor.doctor_data.consultation_fee or Decimal('0')
-                prices.append(float(fee))
-                
-                comparison_data.append({
-                    'uid': str(doctor.uid),
-                    'name': doctor.full_name,
-                    'specialty': doctor.doctor_data.specialization,
-                    'consultation_fee': float(fee),
-                    'currency': doctor.doctor_data.currency or 'XOF',
-                    'location': doctor.city or doctor.address or 'Non spécifié',
-                    'rating': float(doctor.doctor_data.rating or 0),
-                    'total_reviews': doctor.doctor_data.total_reviews or 0,
-                    'years_of_experience': doctor.doctor_data.years_of_experience or 0,
-                    'provider_type': 'doctor',
-                    'phone': doctor.phone_number,
-                    'email': doctor.email,
-                })
-            
-            if sort_by == 'price_asc':
-                comparison_data.sort(key=lambda x: x['consultation_fee'])
-            elif sort_by == 'price_desc':
-                comparison_data.sort(key=lambda x: x['consultation_fee'], reverse=True)
-            elif sort_by == 'rating':
-                comparison_data.sort(key=lambda x: x['rating'], reverse=True)
+            # Served from the precomputed price index (fees normalized to the pivot currency)
+            entries, statistics = PriceIndexService.compare(
+                source=source,
+                specialty=specialty,
+                region=location,
+                provider_type=provider_type,
+                sort_by=sort_by,
+                page=page,
+                page_size=page_size,
+            )
             
-            statistics = {
-                'count': len(comparison_data),
-                'avg_price': sum(prices) / len(prices) if prices else 0,
-                'min_price': min(prices) if prices else 0,
-                'max_price': max(prices) if prices else 0,
-                'currency': 'XOF'
-            }
+            comparison_data = [{
+                'uid': str(entry.participant.uid),
+                'name': entry.provider_name,
+                'specialty': entry.specialty,
+                'service_name': entry.service_name,
+                'consultation_fee': float(entry.price_pivot),
+                'currency': statistics['currency'],
+                'original_price': float(entry.price),
+                'original_currency': entry.currency,
+                'location': entry.location,
+                'rating': entry.rating,
+                'total_reviews': entry.total_reviews,
+                'years_of_experience': entry.years_of_experience,
+                'provider_type': entry.provider_type,
+                'phone': entry.participant.phone_number,
+                'email': entry.participant.email,
+            } for entry in entries]
             
             return Response({
                 'success': True,
                 'results': comparison_data,
                 'statistics': statistics,
+                'pagination': {
+                    'page': page,
+                    'page_size': page_size,
+                    'total': statistics['count'],
+                },
                 'filters': {
                     'specialty': specialty,
                     'location': location,
                     'provider_type': provider_type,
+                    'source': source,
                     'sort_by': sort_by
                 }
             }, status=status.HTTP_200_OK)
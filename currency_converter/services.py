@@ -242,12 +242,7 @@ class CurrencyConverterService:  # Service class for CurrencyConverter operation
             amount = Decimal(str(amount))
         
         rate = cls.get_rate(from_currency, to_currency)
-        converted = amount * rate
-        
-        if to_currency in ['XOF', 'XAF', 'NGN', 'KES']:
-            converted = converted.quantize(Decimal('1'))
-        else:
-            converted = converted.quantize(Decimal('0.01'))
+        converted = cls.apply_rate(amount, rate, to_currency)
         
         return {
             'original_amount': amount,
@@ -257,6 +252,19 @@ class CurrencyConverterService:  # Service class for CurrencyConverter operation
             'rate': rate,
         }
     
+    @classmethod
+    def apply_rate(cls, amount, rate: Decimal, to_currency: str) -> Decimal:
+        """
+        Convert amount with an already looked-up rate, rounded like convert().
+        Lets callers pricing many amounts resolve the rate once per request.
+        """
+        if not isinstance(amount, Decimal):
+            amount = Decimal(str(amount))
+        converted = amount * rate
+        if to_currency in ['XOF', 'XAF', 'NGN', 'KES']:
+            return converted.quantize(Decimal('1'))
+        return converted.quantize(Decimal('0.01'))
+    
     @classmethod
     def convert_amount(cls, amount, from_currency: str, to_currency: str) -> Decimal:
         """
@@ -3,14 +3,20 @@ Financial AI Analytics Module
 No LLM required - Uses statistical methods, trend analysis, and pattern recognition
 """
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Sum, Avg, Count, Q, F
 from datetime import timedelta
 from decimal import Decimal
+import numpy as np
 from .models import (
     Budget, BudgetLine, JournalEntry, JournalEntryLine,
-    ChartOfAccounts, BankAccount, FiscalPeriod
+    ChartOfAccounts, BankAccount, FiscalPeriod, JournalAmountStatistics
 )
 
+ANOMALY_ENTRY_TYPES = ('sales', 'purchase', 'payment', 'receipt', 'payroll')
+ANOMALY_MIN_SAMPLES = 10  # posted entries of a type before incremental scoring starts
+ANOMALY_ROLLING_WINDOW = 500  # effective number of recent entries in the rolling statistics
+
 
 class FinancialAI:
     """AI-powered financial analytics using statistical methods"""
@@ -249,98 +255,216 @@ class FinancialAI:
         }
 
     @staticmethod
-    def detect_transaction_anomalies(organization, days=30, std_dev_threshold=2.5):
+    def _entry_totals(organization, start_date, entry_types=None):
+        """(entry_id, entry_number, posting_date, description, reference, entry_type, debit total) of posted entries, one grouped query"""
+        entries = JournalEntry.objects.filter(
+            organization=organization,
+            status='posted',
+            posting_date__gte=start_date
+        )
+        if entry_types:
+            entries = entries.filter(entry_type__in=entry_types)
+        return list(
+            entries.annotate(total=Sum('line_items__debit_amount'))
+            .order_by('posting_date', 'created_at', 'id')  # stable output order for the anomaly lists
+            .values_list('id', 'entry_number', 'posting_date', 'description', 'reference_number', 'entry_type', 'total')
+        )
+
+    @staticmethod
+    def detect_transaction_anomalies(organization, days=30, std_dev_threshold=2.5, iqr_multiplier=3.0):
         """
         Detect anomalous transactions using statistical outlier detection
 
+        Entry totals come from one grouped query; z-scores and IQR fences are
+        computed per entry type with NumPy.
+
         Args:
             organization: Organization participant
             days: Number of days to analyze (default 30)
             std_dev_threshold: Standard deviations from mean to flag (default 2.5)
+            iqr_multiplier: Interquartile ranges beyond Q1/Q3 to flag (default 3.0)
 
         Returns:
             dict: Detected anomalies with statistical analysis
         """
         start_date = timezone.now().date() - timedelta(days=days)
+        rows = FinancialAI._entry_totals(organization, start_date)
 
-        # Get all posted journal entries
-        entries = JournalEntry.objects.filter(
-            organization=organization,
-            status='posted',
-            posting_date__gte=start_date
-        ).prefetch_related('line_items')
-
-        if not entries.exists():
+        if not rows:
             return {
                 'status': 'no_data',
                 'message': f'No transactions found in last {days} days'
             }
 
         # Analyze transaction amounts by type
+        analyzed = [row for row in rows if row[5] in ANOMALY_ENTRY_TYPES]
         anomalies = []
 
-        for entry_type in ['sales', 'purchase', 'payment', 'receipt', 'payroll']:
-            type_entries = entries.filter(entry_type=entry_type)
-
-            if not type_entries.exists():
-                continue
-
-            # Calculate transaction amounts
-            amounts = []
-            entry_data = []
-
-            for entry in type_entries:
-                total = entry.line_items.aggregate(
-                    total=Sum('debit_amount')
-                )['total'] or Decimal('0')
-                amounts.append(float(total))
-                entry_data.append({
-                    'entry_number': entry.entry_number,
-                    'posting_date': entry.posting_date,
-                    'amount': float(total),
-                    'description': entry.description,
-                    'reference': entry.reference_number
+        if analyzed:
+            codes = np.array([ANOMALY_ENTRY_TYPES.index(row[5]) for row in analyzed])
+            amounts = np.array([float(row[6] or 0) for row in analyzed])
+            group_count = len(ANOMALY_ENTRY_TYPES)
+
+            # Per-type mean and sample standard deviation (two passes: squared deviations
+            # from the type mean, so large equal amounts do not cancel into a negative variance)
+            counts = np.bincount(codes, minlength=group_count)
+            sums = np.bincount(codes, weights=amounts, minlength=group_count)
+            means = np.divide(sums, counts, out=np.zeros(group_count), where=counts > 0)
+            deviations = amounts - means[codes]
+            squares = np.bincount(codes, weights=deviations * deviations, minlength=group_count)
+            variances = np.divide(squares, counts - 1, out=np.zeros(group_count), where=counts > 1)
+            std_devs = np.sqrt(variances)
+
+            # Per-type interquartile fences
+            lower_fences = np.full(group_count, -np.inf)
+            upper_fences = np.full(group_count, np.inf)
+            for code in np.flatnonzero(counts >= 3):
+                q1, q3 = np.percentile(amounts[codes == code], [25, 75])
+                lower_fences[code] = q1 - iqr_multiplier * (q3 - q1)
+                upper_fences[code] = q3 + iqr_multiplier * (q3 - q1)
+
+            entry_std = std_devs[codes]
+            z_scores = np.divide(
+                np.abs(amounts - means[codes]), entry_std, out=np.zeros(len(amounts)), where=entry_std > 0
+            )
+            z_outliers = z_scores > std_dev_threshold
+            iqr_outliers = (amounts < lower_fences[codes]) | (amounts > upper_fences[codes])
+            # Need at least 3 transactions of a type for statistical analysis
+            flagged = np.flatnonzero((counts[codes] >= 3) & (z_outliers | iqr_outliers))
+
+            for i in flagged:
+                _, entry_number, posting_date, description, reference, entry_type, _ = analyzed[i]
+                code, z_score = codes[i], float(z_scores[i])
+                methods = [name for name, hit in (('z_score', z_outliers[i]), ('iqr', iqr_outliers[i])) if hit]
+                reasons = []
+                if z_outliers[i]:
+                    reasons.append(f"Amount is {z_score:.1f} standard deviations from mean")
+                if iqr_outliers[i]:
+                    reasons.append(f"Amount is outside the {iqr_multiplier:g}x IQR range")
+                anomalies.append({
+                    'entry_number': entry_number,
+                    'posting_date': posting_date,
+                    'amount': float(amounts[i]),
+                    'description': description,
+                    'reference': reference,
+                    'entry_type': entry_type,
+                    'z_score': round(z_score, 2),
+                    'mean_amount': round(float(means[code]), 2),
+                    'std_dev': round(float(std_devs[code]), 2),
+                    'iqr_bounds': [round(float(lower_fences[code]), 2), round(float(upper_fences[code]), 2)],
+                    'detection_methods': methods,
+                    'severity': 'high' if z_score > 3.5 else 'medium',
+                    'reason': '; '.join(reasons)
                 })
 
-            if len(amounts) < 3:
-                continue  # Need at least 3 transactions for statistical analysis
-
-            # Calculate mean and standard deviation
-            import statistics
-            mean_amount = statistics.mean(amounts)
-            std_dev = statistics.stdev(amounts) if len(amounts) > 1 else 0
-
-            # Find outliers
-            for data in entry_data:
-                if std_dev > 0:
-                    z_score = abs((data['amount'] - mean_amount) / std_dev)
-
-                    if z_score > std_dev_threshold:
-                        anomaly_data = data.copy()
-                        anomaly_data.update({
-                            'entry_type': entry_type,
-                            'z_score': round(z_score, 2),
-                            'mean_amount': round(mean_amount, 2),
-                            'std_dev': round(std_dev, 2),
-                            'severity': 'high' if z_score > 3.5 else 'medium',
-                            'reason': f"Amount is {z_score:.1f} standard deviations from mean"
-                        })
-                        anomalies.append(anomaly_data)
-
         # Sort by severity and z-score
         anomalies.sort(key=lambda x: (x['severity'] == 'high', x['z_score']), reverse=True)
 
         return {
             'status': 'analyzed',
             'analysis_period_days': days,
-            'total_transactions': entries.count(),
+            'total_transactions': len(rows),
             'anomalies_detected': len(anomalies),
             'high_severity_count': len([a for a in anomalies if a['severity'] == 'high']),
             'medium_severity_count': len([a for a in anomalies if a['severity'] == 'medium']),
             'anomalies': anomalies[:20],  # Top 20
-            'threshold_used': std_dev_threshold
+            'threshold_used': std_dev_threshold,
+            'iqr_multiplier': iqr_multiplier
         }
 
+    @staticmethod
+    def rebuild_amount_statistics(organization, days=365):
+        """
+        Seed the rolling per-type amount statistics from posted history
+
+        Args:
+            organization: Organization participant
+            days: History to include (default 365)
+
+        Returns:
+            int: Number of entry types with statistics
+        """
+        start_date = timezone.now().date() - timedelta(days=days)
+        amounts_by_type = {}
+        for row in FinancialAI._entry_totals(organization, start_date, ANOMALY_ENTRY_TYPES):
+            amounts_by_type.setdefault(row[5], []).append(float(row[6] or 0))
+
+        for entry_type, amounts in amounts_by_type.items():
+            window = np.array(amounts[-ANOMALY_ROLLING_WINDOW:])
+            JournalAmountStatistics.objects.update_or_create(
+                organization=organization,
+                entry_type=entry_type,
+                defaults={
+                    'sample_count': len(window),
+                    'mean': float(window.mean()),
+                    'variance': float(window.var()),
+                }
+            )
+        return len(amounts_by_type)
+
+    @staticmethod
+    def score_posted_entry(entry_id, std_dev_threshold=2.5):
+        """
+        Score a newly posted entry against its type's rolling statistics, record an
+        AIInsight when it is anomalous, then fold the amount into the statistics
+
+        Called after commit when an entry is posted (see financial/signals.py).
+
+        Returns:
+            dict or None: Anomaly details when the entry was flagged
+        """
+        from ai.models import AIInsight
+
+        entry = JournalEntry.objects.filter(pk=entry_id, status='posted').first()
+        if entry is None or entry.entry_type not in ANOMALY_ENTRY_TYPES:
+            return None
+        amount = float(entry.line_items.aggregate(total=Sum('debit_amount'))['total'] or 0)
+        if not amount:
+            return None  # lines not written yet; rebuild_amount_statistics picks it up later
+
+        anomaly = None
+        with transaction.atomic():
+            stats, _ = JournalAmountStatistics.objects.select_for_update().get_or_create(
+                organization_id=entry.organization_id, entry_type=entry.entry_type
+            )
+            std_dev = stats.std_dev
+            if stats.sample_count >= ANOMALY_MIN_SAMPLES and std_dev > 0:
+                z_score = abs(amount - stats.mean) / std_dev
+                if z_score > std_dev_threshold:
+                    anomaly = {
+                        'entry_number': entry.entry_number,
+                        'entry_type': entry.entry_type,
+                        'amount': amount,
+                        'z_score': round(z_score, 2),
+                        'mean_amount': round(stats.mean, 2),
+                        'std_dev': round(std_dev, 2),
+                        'severity': 'high' if z_score > 3.5 else 'medium',
+                    }
+
+            # Exponentially weighted update: exact running statistics until the window fills
+            weight = 1.0 / min(stats.sample_count + 1, ANOMALY_ROLLING_WINDOW)
+            delta = amount - stats.mean
+            stats.mean += weight * delta
+            stats.variance = (1 - weight) * (stats.variance + weight * delta * delta)
+            stats.sample_count += 1
+            stats.save(update_fields=['sample_count', 'mean', 'variance', 'updated_at'])
+
+            if anomaly:
+                AIInsight.objects.create(
+                    organization_id=entry.organization_id,
+                    category='financial_analytics',
+                    priority='high' if anomaly['severity'] == 'high' else 'medium',
+                    insight_text=(
+                        f"Journal entry {entry.entry_number} ({entry.entry_type}) amount {amount:,.2f} is "
+                        f"{anomaly['z_score']} standard deviations from the usual {stats.entry_type} amount"
+                    ),
+                    recommendation='Review the entry and its supporting documents.',
+                    metric_name='journal_entry_anomaly',
+                    metric_value=entry.entry_number,
+                    confidence_score=min(anomaly['z_score'] / 5, 1.0),
+                )
+        return anomaly
+
     @staticmethod
     def calculate_financial_health_score(organization):
         """
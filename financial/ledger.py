@@ -0,0 +1,312 @@
+"""
+General ledger aggregation for financial reports.
+
+Account totals come from one grouped query over JournalEntryLine. Closing a
+period or fiscal year writes AccountBalanceSnapshot rows (cumulative posted
+debits/credits per account), so a report as of any date reads the latest
+snapshot on or before that date and only sums the activity after it.
+Postings, voids or date changes on or before a snapshot drop the affected
+snapshots (see financial/signals.py); the next close rewrites them. Line saves
+check for such snapshots with one indexed EXISTS query, read from the database
+rather than a per-process cache so every worker sees the latest close.
+
+Bank account balances are maintained incrementally: posting, voiding or
+editing a posted line applies its debit/credit delta with an F() update
+(reconcile_bank_balances verifies them against a full recompute). Inside
+collect_bank_deltas() the deltas are summed per account and written as one
+update per account when the block exits (used when a posted entry is created
+together with its lines). queryset.update() sends no post_save, so the updated
+bank accounts' sync events are logged with log_bulk_sync_events.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from sync.signals import log_bulk_sync_events
+
+from .models import AccountBalanceSnapshot, BankAccount, ChartOfAccounts, JournalEntryLine
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0')
+DEBIT_NORMAL_TYPES = ('asset', 'expense')
+
+_pending_bank_deltas = threading.local()
+
+
+class LedgerService:
+    """Grouped account totals, balance snapshots and the standard reports"""
+
+    @staticmethod
+    def signed_balance(account_type, debits, credits):
+        # Assets and Expenses increase with debits; Liabilities, Equity, Revenue with credits
+        if account_type in DEBIT_NORMAL_TYPES:
+            return debits - credits
+        return credits - debits
+
+    @staticmethod
+    def _activity(organization_id, start_date=None, end_date=None, after_date=None, account_ids=None):
+        """{account_id: (debits, credits)} of posted lines in the date window, one grouped query"""
+        lines = JournalEntryLine.objects.filter(
+            journal_entry__organization_id=organization_id,
+            journal_entry__status='posted',
+        )
+        if start_date:
+            lines = lines.filter(journal_entry__posting_date__gte=start_date)
+        if after_date:
+            lines = lines.filter(journal_entry__posting_date__gt=after_date)
+        if end_date:
+            lines = lines.filter(journal_entry__posting_date__lte=end_date)
+        if account_ids is not None:
+            lines = lines.filter(account_id__in=account_ids)
+        rows = lines.values('account_id').annotate(
+            debits=Sum('debit_amount'), credits=Sum('credit_amount')
+        ).order_by()
+        return {row['account_id']: (row['debits'] or ZERO, row['credits'] or ZERO) for row in rows}
+
+    @staticmethod
+    def latest_snapshot_date(organization_id, on_or_before=None):
+        snapshots = AccountBalanceSnapshot.objects.filter(organization_id=organization_id)
+        if on_or_before:
+            snapshots = snapshots.filter(as_of_date__lte=on_or_before)
+        return snapshots.order_by('-as_of_date').values_list('as_of_date', flat=True).first()
+
+    @staticmethod
+    def has_snapshots_from(organization_id, from_date):
+        """Whether any snapshot is dated on or after from_date (one query on the (organization, as_of_date) index)"""
+        return AccountBalanceSnapshot.objects.filter(organization_id=organization_id, as_of_date__gte=from_date).exists()
+
+    @staticmethod
+    def account_totals(organization_id, end_date=None, account_ids=None):
+        """
+        Cumulative posted (debits, credits) per account up to end_date (inclusive; all dates when None)
+
+        Returns:
+            dict: {account_id: (debits, credits)} for accounts with any activity
+        """
+        snapshot_date = LedgerService.latest_snapshot_date(organization_id, end_date)
+        totals = {}
+        if snapshot_date:
+            snapshots = AccountBalanceSnapshot.objects.filter(organization_id=organization_id, as_of_date=snapshot_date)
+            if account_ids is not None:
+                snapshots = snapshots.filter(account_id__in=account_ids)
+            totals = {
+                account_id: (debits, credits)
+                for account_id, debits, credits in snapshots.values_list('account_id', 'debit_total', 'credit_total')
+            }
+
+        activity = LedgerService._activity(
+            organization_id, end_date=end_date, after_date=snapshot_date, account_ids=account_ids
+        )
+        for account_id, (debits, credits) in activity.items():
+            base_debits, base_credits = totals.get(account_id, (ZERO, ZERO))
+            totals[account_id] = (base_debits + debits, base_credits + credits)
+        return totals
+
+    @staticmethod
+    def account_balances(organization_id, end_date=None):
+        """{account_id: signed balance} for every account of the organization"""
+        totals = LedgerService.account_totals(organization_id, end_date)
+        return {
+            account_id: LedgerService.signed_balance(account_type, *totals.get(account_id, (ZERO, ZERO)))
+            for account_id, account_type in ChartOfAccounts.objects.filter(
+                organization_id=organization_id
+            ).values_list('id', 'account_type')
+        }
+
+    @staticmethod
+    @transaction.atomic
+    def write_snapshots(organization_id, as_of_date, fiscal_period=None):
+        """Store cumulative totals of every account with activity as of a closed period/year end"""
+        totals = LedgerService.account_totals(organization_id, as_of_date)
+        AccountBalanceSnapshot.objects.filter(organization_id=organization_id, as_of_date=as_of_date).delete()
+        snapshots = AccountBalanceSnapshot.objects.bulk_create([
+            AccountBalanceSnapshot(
+                organization_id=organization_id,
+                account_id=account_id,
+                as_of_date=as_of_date,
+                fiscal_period=fiscal_period,
+                debit_total=debits,
+                credit_total=credits,
+            )
+            for account_id, (debits, credits) in totals.items()
+        ], batch_size=1000)
+        logger.info(f"Wrote {len(snapshots)} balance snapshots for {organization_id} as of {as_of_date}")
+        return len(snapshots)
+
+    @staticmethod
+    def invalidate_snapshots(organization_id, from_date):
+        """Drop snapshots a back-dated posting or void has made stale"""
+        deleted = AccountBalanceSnapshot.objects.filter(
+            organization_id=organization_id, as_of_date__gte=from_date
+        ).delete()[0]
+        return deleted
+
+    @staticmethod
+    def entry_bank_deltas(entry):
+        """{gl_account_id: debits - credits} of an entry's lines on bank-linked accounts, one grouped query"""
+        rows = (
+            JournalEntryLine.objects.filter(
+                journal_entry=entry,
+                account_id__in=BankAccount.objects.values('gl_account_id'),
+            )
+            .values('account_id')
+            .annotate(debits=Sum('debit_amount'), credits=Sum('credit_amount'))
+            .order_by()
+        )
+        return {row['account_id']: (row['debits'] or ZERO) - (row['credits'] or ZERO) for row in rows}
+
+    @staticmethod
+    @contextmanager
+    def collect_bank_deltas():
+        """Sum the bank deltas applied inside the block and write one F update per account on exit"""
+        collected = getattr(_pending_bank_deltas, 'deltas', None)
+        if collected is not None:  # nested: the outer block writes them
+            yield collected
+            return
+        collected = _pending_bank_deltas.deltas = {}
+        try:
+            yield collected
+        finally:
+            _pending_bank_deltas.deltas = None
+        LedgerService.apply_bank_deltas(collected)
+
+    @staticmethod
+    def apply_bank_deltas(deltas, sign=1):
+        """Move current_balance of the bank accounts linked to each GL account by its delta (atomic F update)"""
+        collected = getattr(_pending_bank_deltas, 'deltas', None)
+        if collected is not None:
+            for gl_account_id, delta in deltas.items():
+                collected[gl_account_id] = collected.get(gl_account_id, ZERO) + delta * sign
+            return
+        moved = [gl_account_id for gl_account_id, delta in deltas.items() if delta]
+        for gl_account_id in moved:
+            BankAccount.objects.filter(gl_account_id=gl_account_id).update(
+                current_balance=F('current_balance') + deltas[gl_account_id] * sign,
+                version=F('version') + 1,
+                updated_at=timezone.now(),
+            )
+        if moved:
+            log_bulk_sync_events(BankAccount.objects.filter(gl_account_id__in=moved))
+
+    @staticmethod
+    def expected_bank_balances(bank_accounts):
+        """{bank_account_id: (stored, recomputed)} for a batch of bank accounts, one grouped ledger query"""
+        gl_account_ids = {account.gl_account_id for account in bank_accounts}
+        rows = (
+            JournalEntryLine.objects.filter(account_id__in=gl_account_ids, journal_entry__status='posted')
+            .values('account_id')
+            .annotate(debits=Sum('debit_amount'), credits=Sum('credit_amount'))
+            .order_by()
+        )
+        net = {row['account_id']: (row['debits'] or ZERO) - (row['credits'] or ZERO) for row in rows}
+        return {
+            account.pk: (account.current_balance, account.opening_balance + net.get(account.gl_account_id, ZERO))
+            for account in bank_accounts
+        }
+
+    @staticmethod
+    def _accounts(organization, account_types):
+        return list(
+            ChartOfAccounts.objects.filter(
+                organization=organization, account_type__in=account_types, is_active=True
+            ).order_by('account_code').values('id', 'account_code', 'account_name', 'account_type')
+        )
+
+    @staticmethod
+    def trial_balance(organization, as_of_date):
+        accounts = LedgerService._accounts(organization, [choice for choice, _ in ChartOfAccounts.ACCOUNT_TYPE_CHOICES])
+        totals = LedgerService.account_totals(organization.pk, as_of_date)
+
+        trial_balance_data = []
+        total_debits = ZERO
+        total_credits = ZERO
+        for account in accounts:
+            debits, credits = totals.get(account['id'], (ZERO, ZERO))
+            if debits > 0 or credits > 0:
+                total_debits += debits
+                total_credits += credits
+                trial_balance_data.append({
+                    'account_code': account['account_code'],
+                    'account_name': account['account_name'],
+                    'account_type': account['account_type'],
+                    'debit': float(debits),
+                    'credit': float(credits)
+                })
+
+        return {
+            'as_of_date': as_of_date,
+            'accounts': trial_balance_data,
+            'total_debits': float(total_debits),
+            'total_credits': float(total_credits),
+            'is_balanced': total_debits == total_credits
+        }
+
+    @staticmethod
+    def _section(accounts, account_type, totals, value_key):
+        rows = []
+        total = ZERO
+        for account in accounts:
+            if account['account_type'] != account_type:
+                continue
+            amount = LedgerService.signed_balance(account_type, *totals.get(account['id'], (ZERO, ZERO)))
+            total += amount
+            rows.append({
+                'account_code': account['account_code'],
+                'account_name': account['account_name'],
+                value_key: float(amount)
+            })
+        return rows, total
+
+    @staticmethod
+    def profit_and_loss(organization, start_date, end_date):
+        accounts = LedgerService._accounts(organization, ['revenue', 'expense'])
+        totals = LedgerService._activity(organization.pk, start_date=start_date, end_date=end_date)
+        revenue_data, total_revenue = LedgerService._section(accounts, 'revenue', totals, 'amount')
+        expense_data, total_expense = LedgerService._section(accounts, 'expense', totals, 'amount')
+
+        return {
+            'period': {
+                'start_date': start_date,
+                'end_date': end_date
+            },
+            'revenue': {
+                'accounts': revenue_data,
+                'total': float(total_revenue)
+            },
+            'expenses': {
+                'accounts': expense_data,
+                'total': float(total_expense)
+            },
+            'net_income': float(total_revenue - total_expense)
+        }
+
+    @staticmethod
+    def balance_sheet(organization, as_of_date):
+        accounts = LedgerService._accounts(organization, ['asset', 'liability', 'equity'])
+        totals = LedgerService.account_totals(organization.pk, as_of_date)
+        assets_data, total_assets = LedgerService._section(accounts, 'asset', totals, 'balance')
+        liabilities_data, total_liabilities = LedgerService._section(accounts, 'liability', totals, 'balance')
+        equity_data, total_equity = LedgerService._section(accounts, 'equity', totals, 'balance')
+
+        return {
+            'as_of_date': as_of_date,
+            'assets': {
+                'accounts': assets_data,
+                'total': float(total_assets)
+            },
+            'liabilities': {
+                'accounts': liabilities_data,
+                'total': float(total_liabilities)
+            },
+            'equity': {
+                'accounts': equity_data,
+                'total': float(total_equity)
+            },
+            'total_liabilities_and_equity': float(total_liabilities + total_equity)
+        }
@@ -0,0 +1,29 @@
+"""
+Seed the rolling journal amount statistics used for real-time anomaly scoring.
+
+Usage:
+    python manage.py rebuild_journal_statistics
+    python manage.py rebuild_journal_statistics --organization <uid> --days 180
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import Participant
+from financial.ai_insights import FinancialAI
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-type journal amount statistics from posted entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', action='append', dest='organizations', help='Organization uid (repeatable)')
+        parser.add_argument('--days', type=int, default=365, help='Posted history to include')
+
+    def handle(self, *args, **options):
+        organizations = Participant.objects.filter(journal_entries__status='posted').distinct()
+        if options['organizations']:
+            organizations = organizations.filter(uid__in=options['organizations'])
+
+        for organization in organizations:
+            types = FinancialAI.rebuild_amount_statistics(organization, days=options['days'])
+            self.stdout.write(f'{organization.full_name or organization.email}: {types} entry types')
+        self.stdout.write(self.style.SUCCESS('Journal statistics rebuilt'))
@@ -0,0 +1,59 @@
+"""
+Verify stored bank account balances against a full recompute from posted journal lines.
+
+Balances are maintained incrementally by financial.signals; this command checks
+them in chunks (one grouped ledger query per chunk) and, with --repair,
+rewrites the ones that drifted.
+
+Usage:
+    python manage.py reconcile_bank_balances
+    python manage.py reconcile_bank_balances --repair --chunk-size 500
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from financial.ledger import LedgerService
+from financial.models import BankAccount
+
+
+class Command(BaseCommand):
+    help = 'Compare bank account current_balance with opening balance plus posted ledger activity'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help='Rewrite balances that do not match')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Bank accounts checked per query')
+
+    def handle(self, *args, **options):
+        checked = mismatched = 0
+        last_pk = None
+        while True:
+            chunk = BankAccount.objects.order_by('pk').only(
+                'pk', 'gl_account_id', 'opening_balance', 'current_balance', 'account_name'
+            )
+            if last_pk is not None:
+                chunk = chunk.filter(pk__gt=last_pk)
+            chunk = list(chunk[:options['chunk_size']])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+
+            names = {account.pk: account.account_name for account in chunk}
+            for pk, (stored, expected) in LedgerService.expected_bank_balances(chunk).items():
+                checked += 1
+                if stored == expected:
+                    continue
+                mismatched += 1
+                self.stdout.write(self.style.WARNING(f'{names[pk]} ({pk}): stored {stored}, expected {expected}'))
+                if options['repair']:
+                    with transaction.atomic():
+                        # Re-check under lock so a concurrent posting is not overwritten
+                        account = BankAccount.objects.select_for_update().get(pk=pk)
+                        _, expected = LedgerService.expected_bank_balances([account])[pk]
+                        BankAccount.objects.filter(pk=pk).update(
+                            current_balance=expected, version=F('version') + 1, updated_at=timezone.now()
+                        )
+
+        action = 'repaired' if options['repair'] else 'found'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} bank accounts, {action} {mismatched} mismatches'))
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 20:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financial', '0005_alter_bankaccount_created_by_instance_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalAmountStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('manual', 'Manual Entry'), ('sales', 'Sales'), ('purchase', 'Purchase'), ('payment', 'Payment'), ('receipt', 'Receipt'), ('payroll', 'Payroll'), ('depreciation', 'Depreciation'), ('adjustment', 'Adjustment'), ('opening_balance', 'Opening Balance'), ('closing', 'Closing Entry')], max_length=30)),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(default=0.0)),
+                ('variance', models.FloatField(default=0.0, help_text='Population variance of entry amounts')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='journal_amount_statistics', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'journal_amount_statistics',
+                'unique_together': {('organization', 'entry_type')},
+            },
+        ),
+    ]
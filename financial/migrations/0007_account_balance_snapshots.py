@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-18 20:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financial', '0006_journal_amount_statistics'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of_date', models.DateField()),
+                ('debit_total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('credit_total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='financial.chartofaccounts')),
+                ('fiscal_period', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='balance_snapshots', to='financial.fiscalperiod')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='account_balance_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'account_balance_snapshots',
+                'indexes': [models.Index(fields=['organization', 'as_of_date'], name='account_bal_organiz_44580c_idx')],
+                'unique_together': {('account', 'as_of_date')},
+            },
+        ),
+    ]
@@ -111,20 +111,13 @@ class ChartOfAccounts(SyncMixin):
         return f"{self.account_code} - {self.account_name}"
 
     def get_balance(self, as_of_date=None):
-        """Calculate current balance for this account"""
-        query = self.ledger_entries.all()
-        if as_of_date:
-            query = query.filter(journal_entry__posting_date__lte=as_of_date)
+        """Calculate the posted balance of this account (from the latest snapshot plus later activity)"""
+        from .ledger import LedgerService
 
-        debits = query.aggregate(total=Sum('debit_amount'))['total'] or Decimal('0')
-        credits = query.aggregate(total=Sum('credit_amount'))['total'] or Decimal('0')
-
-        # Assets and Expenses increase with debits
-        if self.account_type in ['asset', 'expense']:
-            return debits - credits
-        # Liabilities, Equity, Revenue increase with credits
-        else:
-            return credits - debits
+        debits, credits = LedgerService.account_totals(
+            self.organization_id, end_date=as_of_date, account_ids=[self.pk]
+        ).get(self.pk, (Decimal('0'), Decimal('0')))
+        return LedgerService.signed_balance(self.account_type, debits, credits)
 
 
 class JournalEntry(SyncMixin):
@@ -221,6 +214,27 @@ class JournalEntryLine(SyncMixin):
         return f"CR {self.account.account_code} {self.credit_amount}"
 
 
+class AccountBalanceSnapshot(models.Model):
+    """Cumulative posted debits/credits of an account up to a closed period or year end"""
+    organization = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name='account_balance_snapshots')
+    account = models.ForeignKey(ChartOfAccounts, on_delete=models.CASCADE, related_name='balance_snapshots')
+    as_of_date = models.DateField()
+    fiscal_period = models.ForeignKey(FiscalPeriod, on_delete=models.SET_NULL, null=True, blank=True, related_name='balance_snapshots')
+    debit_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    credit_total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'account_balance_snapshots'
+        unique_together = ['account', 'as_of_date']
+        indexes = [
+            models.Index(fields=['organization', 'as_of_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.account_id} @ {self.as_of_date}: DR {self.debit_total} CR {self.credit_total}"
+
+
 class BankAccount(SyncMixin):
     """Organization bank accounts"""
     ACCOUNT_TYPE_CHOICES = [
@@ -253,6 +267,12 @@ class BankAccount(SyncMixin):
     def __str__(self):
         return f"{self.bank_name} - {self.account_name} ({self.account_number[-4:]})"
 
+    def save(self, *args, **kwargs):
+        # Posted activity is applied to current_balance incrementally, so it starts at the opening balance
+        if self._state.adding and not self.current_balance:
+            self.current_balance = self.opening_balance
+        super().save(*args, **kwargs)
+
 
 class Budget(SyncMixin):
     """Budget planning and control"""
@@ -369,3 +389,24 @@ class ProjectManagement(SyncMixin):
 
     def __str__(self):
         return f"{self.project_code} - {self.project_name}"
+
+
+class JournalAmountStatistics(models.Model):
+    """Rolling mean/variance of posted journal entry amounts per organization and entry type"""
+    organization = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name='journal_amount_statistics')
+    entry_type = models.CharField(max_length=30, choices=JournalEntry.ENTRY_TYPE_CHOICES)
+    sample_count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0.0)
+    variance = models.FloatField(default=0.0, help_text="Population variance of entry amounts")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'journal_amount_statistics'
+        unique_together = ['organization', 'entry_type']
+
+    def __str__(self):
+        return f"{self.organization_id} {self.entry_type}: n={self.sample_count} mean={self.mean:.2f}"
+
+    @property
+    def std_dev(self):
+        return max(self.variance, 0.0) ** 0.5
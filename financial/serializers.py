@@ -40,6 +40,9 @@ class ChartOfAccountsSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def get_current_balance(self, obj) -> float:
+        balances = self.context.get('balances')
+        if balances is not None and obj.pk in balances:
+            return float(balances[obj.pk])
         return float(obj.get_balance())
 
 
@@ -1,21 +1,104 @@
-from django.db.models.signals import post_save, pre_delete
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import JournalEntry, JournalEntryLine, BankAccount
-from django.db.models import Sum
+from .models import JournalEntry, JournalEntryLine
+
+
+@receiver(pre_save, sender=JournalEntryLine)
+def remember_line_amounts(sender, instance, **kwargs):
+    """Capture the stored account and amounts so an edit can move only the difference"""
+    instance._previous_amounts = None
+    if not instance._state.adding:
+        instance._previous_amounts = (
+            JournalEntryLine.objects.filter(pk=instance.pk)
+            .values_list('account_id', 'debit_amount', 'credit_amount')
+            .first()
+        )
 
 
 @receiver(post_save, sender=JournalEntryLine)
 def update_bank_balance(sender, instance, created, **kwargs):
-    """Update bank account balance when journal entries are posted"""
-    if instance.journal_entry.status == 'posted' and instance.account.bank_accounts.exists():
-        bank_account = instance.account.bank_accounts.first()
-        # Recalculate balance from all posted entries
-        posted_entries = JournalEntryLine.objects.filter(
-            account=instance.account,
-            journal_entry__status='posted'
+    """Apply a posted line's debit/credit change to the linked bank account balance"""
+    if instance.journal_entry.status != 'posted':
+        return
+    from .ledger import LedgerService
+
+    deltas = {instance.account_id: instance.debit_amount - instance.credit_amount}
+    previous = getattr(instance, '_previous_amounts', None)
+    if previous:
+        account_id, debit_amount, credit_amount = previous
+        deltas[account_id] = deltas.get(account_id, 0) - (debit_amount - credit_amount)
+    LedgerService.apply_bank_deltas(deltas)
+
+
+@receiver(post_delete, sender=JournalEntryLine)
+def remove_line_from_bank_balance(sender, instance, **kwargs):
+    entry = JournalEntry.objects.filter(pk=instance.journal_entry_id).values_list('status', flat=True).first()
+    if entry != 'posted':
+        return
+    from .ledger import LedgerService
+
+    LedgerService.apply_bank_deltas({instance.account_id: instance.credit_amount - instance.debit_amount})
+
+
+@receiver(pre_save, sender=JournalEntry)
+def remember_journal_entry_status(sender, instance, **kwargs):
+    """Capture the stored status and posting date so posting and re-dating can be detected after save"""
+    instance._previous_status = instance._previous_posting_date = None
+    if not instance._state.adding:
+        instance._previous_status, instance._previous_posting_date = (
+            JournalEntry.objects.filter(pk=instance.pk).values_list('status', 'posting_date').first()
+            or (None, None)
         )
-        total_debits = posted_entries.aggregate(Sum('debit_amount'))['debit_amount__sum'] or 0
-        total_credits = posted_entries.aggregate(Sum('credit_amount'))['credit_amount__sum'] or 0
 
-        bank_account.current_balance = bank_account.opening_balance + total_debits - total_credits
-        bank_account.save()
+
+@receiver(post_save, sender=JournalEntry)
+def update_bank_balances_on_status_change(sender, instance, created, **kwargs):
+    """Posting adds the entry's bank-account lines to the balances (one update per account); voiding removes them"""
+    previous = getattr(instance, '_previous_status', None)
+    if (previous == 'posted') == (instance.status == 'posted'):
+        return
+    from .ledger import LedgerService
+
+    LedgerService.apply_bank_deltas(
+        LedgerService.entry_bank_deltas(instance), sign=1 if instance.status == 'posted' else -1
+    )
+
+
+@receiver(post_save, sender=JournalEntry)
+def score_posted_journal_entry(sender, instance, created, **kwargs):
+    """Score newly posted entries against rolling amount statistics once the posting commits"""
+    if instance.status != 'posted' or getattr(instance, '_previous_status', None) == 'posted':
+        return
+    from .ai_insights import FinancialAI
+
+    entry_id = instance.pk
+    transaction.on_commit(lambda: FinancialAI.score_posted_entry(entry_id))
+
+
+def _invalidate_stale_snapshots(organization_id, posting_date):
+    from .ledger import LedgerService
+
+    if LedgerService.has_snapshots_from(organization_id, posting_date):
+        LedgerService.invalidate_snapshots(organization_id, posting_date)
+
+
+@receiver(post_save, sender=JournalEntry)
+def invalidate_snapshots_on_status_change(sender, instance, created, **kwargs):
+    """Posting, voiding or re-dating a posted entry inside a closed period makes later balance snapshots stale"""
+    previous_status = getattr(instance, '_previous_status', None)
+    previous_date = getattr(instance, '_previous_posting_date', None)
+    was_posted, is_posted = previous_status == 'posted', instance.status == 'posted'
+    if not (was_posted or is_posted):
+        return
+    if was_posted != is_posted or previous_date != instance.posting_date:
+        dates = [instance.posting_date] + ([previous_date] if was_posted and previous_date else [])
+        _invalidate_stale_snapshots(instance.organization_id, min(dates))
+
+
+@receiver(post_save, sender=JournalEntryLine)
+@receiver(post_delete, sender=JournalEntryLine)
+def invalidate_snapshots_on_line_change(sender, instance, **kwargs):
+    entry = instance.journal_entry
+    if entry.status == 'posted':
+        _invalidate_stale_snapshots(entry.organization_id, entry.posting_date)
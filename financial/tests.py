@@ -0,0 +1,245 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Participant
+from .models import ChartOfAccounts, JournalEntry, JournalEntryLine
+
+
+class LedgerTestMixin:  # Organization, a small chart of accounts and journal entry helpers
+    def setUp(self):  # Setup
+        self.organization = Participant.objects.create(email="ledger-org@test.com", role="hospital")
+        self.cash = self._account("1100", "Caisse", "asset", "current_asset")
+        self.revenue = self._account("4100", "Consultations", "revenue", "operating_revenue")
+        self.expense = self._account("6100", "Fournitures", "expense", "operating_expense")
+
+    def _account(self, code, name, account_type, subtype):
+        return ChartOfAccounts.objects.create(
+            organization=self.organization, account_code=code, account_name=name,
+            account_type=account_type, account_subtype=subtype,
+        )
+
+    def _entry(self, number, lines, posting_date=None, entry_type="sales", post=True):
+        entry = JournalEntry.objects.create(
+            organization=self.organization,
+            entry_number=number,
+            entry_type=entry_type,
+            posting_date=posting_date or timezone.now().date(),
+            description=number,
+        )
+        for account, debit, credit in lines:
+            JournalEntryLine.objects.create(
+                journal_entry=entry, account=account, debit_amount=debit, credit_amount=credit
+            )
+        if post:
+            entry.post(self.organization)
+        return entry
+
+    def _sale(self, number, amount, **kwargs):
+        return self._entry(number, [(self.cash, amount, 0), (self.revenue, 0, amount)], **kwargs)
+
+
+class AnomalyDetectionTest(LedgerTestMixin, TestCase):  # Batch outlier detection and its variance arithmetic
+    def test_known_outlier_is_flagged(self):  # One sale far above the others
+        from .ai_insights import FinancialAI
+
+        for i, amount in enumerate([1000, 1020, 980, 1010, 990, 1005, 995, 1015, 985, 1000, 50000]):
+            self._sale(f"JE-OUT-{i}", amount)
+
+        result = FinancialAI.detect_transaction_anomalies(self.organization, std_dev_threshold=2.5)
+        self.assertEqual(result["anomalies_detected"], 1)
+        anomaly = result["anomalies"][0]
+        self.assertEqual(anomaly["entry_number"], "JE-OUT-10")
+        self.assertEqual(set(anomaly["detection_methods"]), {"z_score", "iqr"})
+
+    def test_entry_totals_follow_posting_order(self):  # The rolling window keeps the latest entries
+        from .ai_insights import FinancialAI
+
+        today = timezone.now().date()
+        for number, days_ago in (("JE-ORD-A", 0), ("JE-ORD-B", 2), ("JE-ORD-C", 1)):
+            self._sale(number, 100, posting_date=today - timedelta(days=days_ago))
+
+        rows = FinancialAI._entry_totals(self.organization, today - timedelta(days=30))
+        self.assertEqual([row[1] for row in rows], ["JE-ORD-B", "JE-ORD-C", "JE-ORD-A"])
+
+    def test_constant_amounts_have_zero_spread(self):  # Large equal amounts: no negative variance, nothing flagged
+        from .ai_insights import FinancialAI
+
+        for i in range(6):
+            self._sale(f"JE-CONST-{i}", Decimal("987654321.09"))
+
+        result = FinancialAI.detect_transaction_anomalies(self.organization)
+        self.assertEqual(result["anomalies_detected"], 0)
+        self.assertEqual(result["total_transactions"], 6)
+
+        from .models import JournalAmountStatistics
+        self.assertEqual(JournalAmountStatistics(variance=-1e-9).std_dev, 0.0)  # rounding residue of the rolling update
+
+
+class LedgerSnapshotTest(LedgerTestMixin, TestCase):  # Snapshot-based reports must equal a recompute from the lines
+    def setUp(self):  # Setup
+        from django.core.cache import cache
+
+        super().setUp()
+        cache.clear()
+        self.today = timezone.now().date()
+        self.closed = self.today - timedelta(days=30)
+        self._sale("JE-SNAP-1", 1000, posting_date=self.closed - timedelta(days=10))
+        self._entry("JE-SNAP-2", [(self.expense, 300, 0), (self.cash, 0, 300)], posting_date=self.closed - timedelta(days=5))
+
+    def _recomputed(self, end_date, start_date=None):
+        from .ledger import LedgerService
+
+        return LedgerService._activity(self.organization.pk, start_date=start_date, end_date=end_date)
+
+    def _assert_reports_match_recompute(self):
+        from .ledger import LedgerService
+
+        for as_of in (self.closed, self.today):
+            report = LedgerService.trial_balance(self.organization, as_of)
+            expected = self._recomputed(as_of)
+            self.assertEqual(
+                {row["account_code"]: (row["debit"], row["credit"]) for row in report["accounts"]},
+                {
+                    code: (float(expected[pk][0]), float(expected[pk][1]))
+                    for code, pk in (("1100", self.cash.pk), ("4100", self.revenue.pk), ("6100", self.expense.pk))
+                    if pk in expected
+                },
+            )
+            self.assertTrue(report["is_balanced"])
+
+        start = self.closed - timedelta(days=60)
+        pnl = LedgerService.profit_and_loss(self.organization, start, self.today)
+        expected = self._recomputed(self.today, start)
+        revenue = expected.get(self.revenue.pk, (0, 0))
+        expense = expected.get(self.expense.pk, (0, 0))
+        self.assertEqual(pnl["net_income"], float((revenue[1] - revenue[0]) - (expense[0] - expense[1])))
+
+    def test_snapshot_reports_match_full_recompute(self):  # Close, then back-dated, voided and re-dated postings
+        from .ledger import LedgerService
+        from .models import AccountBalanceSnapshot
+
+        LedgerService.write_snapshots(self.organization.pk, self.closed)
+        self._sale("JE-SNAP-3", 200)
+        self._assert_reports_match_recompute()
+
+        backdated = self._sale("JE-SNAP-4", 50, posting_date=self.closed - timedelta(days=1))
+        self.assertFalse(AccountBalanceSnapshot.objects.exists())
+        self._assert_reports_match_recompute()
+
+        LedgerService.write_snapshots(self.organization.pk, self.closed)
+        backdated.status = "void"
+        backdated.save()
+        self.assertFalse(AccountBalanceSnapshot.objects.exists())
+        self._assert_reports_match_recompute()
+
+        LedgerService.write_snapshots(self.organization.pk, self.closed)
+        later = JournalEntry.objects.get(entry_number="JE-SNAP-3")
+        later.posting_date = self.closed - timedelta(days=2)  # moved into the closed period
+        later.save()
+        self.assertFalse(AccountBalanceSnapshot.objects.exists())
+        self._assert_reports_match_recompute()
+
+    def test_line_saves_check_snapshots_in_the_database(self):  # One EXISTS query, no per-process cached date
+        from django.core.cache import cache
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .ledger import LedgerService
+        from .models import AccountBalanceSnapshot
+
+        entry = self._sale("JE-SNAP-5", 75)
+        LedgerService.write_snapshots(self.organization.pk, self.closed)
+        with CaptureQueriesContext(connection) as queries:
+            JournalEntryLine.objects.create(journal_entry=entry, account=self.cash, debit_amount=5, credit_amount=0)
+        self.assertEqual(len([q for q in queries.captured_queries if "account_balance_snapshots" in q["sql"]]), 1)
+        JournalEntryLine.objects.create(journal_entry=entry, account=self.revenue, debit_amount=0, credit_amount=5)
+
+        cache.clear()  # another worker's cache knows nothing about the close
+        backdated = self._sale("JE-SNAP-6", 40, post=False, posting_date=self.closed - timedelta(days=3))
+        backdated.post(self.organization)
+        self.assertFalse(AccountBalanceSnapshot.objects.exists())
+        self._assert_reports_match_recompute()
+
+
+class BankBalanceTest(LedgerTestMixin, TestCase):  # Incremental bank balances and their reconciliation
+    def setUp(self):  # Setup
+        from .models import BankAccount
+
+        super().setUp()
+        self.bank = BankAccount.objects.create(
+            organization=self.organization, account_name="Compte courant", bank_name="BOA",
+            account_number="0001", account_type="checking", gl_account=self.cash, opening_balance=100,
+            current_balance=100,
+        )
+
+    def _balance(self):
+        self.bank.refresh_from_db()
+        return self.bank.current_balance
+
+    def test_post_void_and_line_edits(self):  # Posting adds, voiding removes, edits move only the difference
+        entry = self._sale("JE-BANK-1", 500, post=False)
+        self.assertEqual(self._balance(), 100)
+        entry.post(self.organization)
+        self.assertEqual(self._balance(), 600)
+
+        line = entry.line_items.get(account=self.cash)
+        line.debit_amount = 450
+        line.save()
+        self.assertEqual(self._balance(), 550)
+        line.account = self.expense
+        line.save()
+        self.assertEqual(self._balance(), 100)
+        line.account = self.cash
+        line.save()
+        line.delete()
+        self.assertEqual(self._balance(), 100)
+
+        entry = self._sale("JE-BANK-2", 80)
+        self.assertEqual(self._balance(), 180)
+        entry.status = "void"
+        entry.save()
+        self.assertEqual(self._balance(), 100)
+
+    def test_balance_updates_log_sync_events(self):  # F() updates send no post_save
+        from sync.models import SyncEvent
+
+        self._sale("JE-BANK-5", 40)
+        event = SyncEvent.objects.get(model_name="financial.bankaccount", object_id=self.bank.pk, event_type="update")
+        self.assertEqual(Decimal(event.data_snapshot["fields"]["current_balance"]), self._balance())
+
+    def test_collected_deltas_are_one_update_per_account(self):  # Posted entry created with its lines
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .ledger import LedgerService
+
+        with CaptureQueriesContext(connection) as queries, LedgerService.collect_bank_deltas():
+            entry = JournalEntry.objects.create(
+                organization=self.organization, entry_number="JE-BANK-3", entry_type="receipt",
+                posting_date=timezone.now().date(), description="batch", status="posted",
+            )
+            for amount in (10, 20, 30):
+                JournalEntryLine.objects.create(journal_entry=entry, account=self.cash, debit_amount=amount)
+            JournalEntryLine.objects.create(journal_entry=entry, account=self.revenue, credit_amount=60)
+        updates = [q for q in queries.captured_queries if q["sql"].startswith('UPDATE "bank_accounts"')]
+        self.assertEqual(len(updates), 2)  # cash and revenue, instead of one per line
+        self.assertEqual(self._balance(), 160)
+
+    def test_reconcile_command_repairs_drift(self):  # Balance changed behind the signals is detected and fixed
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import BankAccount
+
+        self._sale("JE-BANK-4", 250)
+        BankAccount.objects.filter(pk=self.bank.pk).update(current_balance=999)
+
+        output = StringIO()
+        call_command("reconcile_bank_balances", stdout=output)
+        self.assertIn("found 1 mismatches", output.getvalue())
+        self.assertEqual(self._balance(), 999)
+
+        call_command("reconcile_bank_balances", "--repair", stdout=output)
+        self.assertEqual(self._balance(), 350)
+        call_command("reconcile_bank_balances", stdout=output)
+        self.assertIn("found 0 mismatches", output.getvalue())
@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from drf_spectacular.utils import extend_schema, OpenApiResponse
+from django.db import transaction
 from django.db.models import Sum, Q, F
 from django.utils import timezone
 from datetime import datetime, date
@@ -12,6 +13,7 @@ from .models import (
     FiscalYear, FiscalPeriod, ChartOfAccounts, JournalEntry, JournalEntryLine,
     BankAccount, Budget, BudgetLine, Tax, ProjectManagement
 )
+from .ledger import LedgerService
 from core.serializers import ParticipantSerializer
 from .serializers import (
     FiscalYearSerializer, FiscalPeriodSerializer, ChartOfAccountsSerializer,
@@ -42,10 +44,12 @@ class FiscalYearViewSet(FinancialBaseViewSet):
         if fiscal_year.is_closed:
             return Response({'error': 'Fiscal year already closed'}, status=status.HTTP_400_BAD_REQUEST)
 
-        fiscal_year.is_closed = True
-        fiscal_year.closed_by = request.user
-        fiscal_year.closed_at = timezone.now()
-        fiscal_year.save()
+        with transaction.atomic():
+            fiscal_year.is_closed = True
+            fiscal_year.closed_by = request.user
+            fiscal_year.closed_at = timezone.now()
+            fiscal_year.save()
+            LedgerService.write_snapshots(fiscal_year.organization_id, fiscal_year.end_date)
 
         return Response({'message': 'Fiscal year closed successfully'})
 
@@ -83,10 +87,12 @@ class FiscalPeriodViewSet(FinancialBaseViewSet):
         if period.is_closed:
             return Response({'error': 'Period already closed'}, status=status.HTTP_400_BAD_REQUEST)
 
-        period.is_closed = True
-        period.closed_by = request.user
-        period.closed_at = timezone.now()
-        period.save()
+        with transaction.atomic():
+            period.is_closed = True
+            period.closed_by = request.user
+            period.closed_at = timezone.now()
+            period.save()
+            LedgerService.write_snapshots(period.fiscal_year.organization_id, period.end_date, fiscal_period=period)
 
         return Response({'message': 'Period closed successfully'})
 
@@ -95,6 +101,13 @@ class ChartOfAccountsViewSet(FinancialBaseViewSet):
     queryset = ChartOfAccounts.objects.all()
     serializer_class = ChartOfAccountsSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ('list', 'by_type') and self.request.user.is_authenticated:
+            # One grouped ledger query for every listed account's current_balance
+            context['balances'] = LedgerService.account_balances(self.request.user.pk)
+        return context
+
     @action(detail=False, methods=['get'])
     def by_type(self, request):
         """Get accounts grouped by type"""
@@ -166,14 +179,17 @@ class JournalEntryViewSet(FinancialBaseViewSet):
         entry_data['created_by'] = request.user.id
         entry_serializer = self.get_serializer(data=entry_data)
         entry_serializer.is_valid(raise_exception=True)
-        entry = entry_serializer.save()
 
-        # Create line items
-        for line_data in lines_data:
-            line_data['journal_entry'] = entry.id
-            line_serializer = JournalEntryLineSerializer(data=line_data)
-            line_serializer.is_valid(raise_exception=True)
-            line_serializer.save()
+        # Lines of an entry created as posted move bank balances: one update per account, not per line
+        with transaction.atomic(), LedgerService.collect_bank_deltas():
+            entry = entry_serializer.save()
+
+            # Create line items
+            for line_data in lines_data:
+                line_data['journal_entry'] = entry.id
+                line_serializer = JournalEntryLineSerializer(data=line_data)
+                line_serializer.is_valid(raise_exception=True)
+                line_serializer.save()
 
         # Return full entry with lines
         entry.refresh_from_db()
@@ -324,81 +340,7 @@ class FinancialReportsViewSet(viewsets.ViewSet):
         start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
         end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
 
-        # Get revenue accounts
-        revenue_accounts = ChartOfAccounts.objects.filter(
-            organization=request.user,
-            account_type='revenue',
-            is_active=True
-        )
-
-        revenue_data = []
-        total_revenue = Decimal('0')
-
-        for account in revenue_accounts:
-            # Calculate revenue (credits - debits)
-            entries = JournalEntryLine.objects.filter(
-                account=account,
-                journal_entry__status='posted',
-                journal_entry__posting_date__gte=start_date,
-                journal_entry__posting_date__lte=end_date
-            )
-            credits = entries.aggregate(Sum('credit_amount'))['credit_amount__sum'] or Decimal('0')
-            debits = entries.aggregate(Sum('debit_amount'))['debit_amount__sum'] or Decimal('0')
-            amount = credits - debits
-            total_revenue += amount
-
-            revenue_data.append({
-                'account_code': account.account_code,
-                'account_name': account.account_name,
-                'amount': float(amount)
-            })
-
-        # Get expense accounts
-        expense_accounts = ChartOfAccounts.objects.filter(
-            organization=request.user,
-            account_type='expense',
-            is_active=True
-        )
-
-        expense_data = []
-        total_expense = Decimal('0')
-
-        for account in expense_accounts:
-            # Calculate expense (debits - credits)
-            entries = JournalEntryLine.objects.filter(
-                account=account,
-                journal_entry__status='posted',
-                journal_entry__posting_date__gte=start_date,
-                journal_entry__posting_date__lte=end_date
-            )
-            debits = entries.aggregate(Sum('debit_amount'))['debit_amount__sum'] or Decimal('0')
-            credits = entries.aggregate(Sum('credit_amount'))['credit_amount__sum'] or Decimal('0')
-            amount = debits - credits
-            total_expense += amount
-
-            expense_data.append({
-                'account_code': account.account_code,
-                'account_name': account.account_name,
-                'amount': float(amount)
-            })
-
-        net_income = total_revenue - total_expense
-
-        return Response({
-            'period': {
-                'start_date': start_date,
-                'end_date': end_date
-            },
-            'revenue': {
-                'accounts': revenue_data,
-                'total': float(total_revenue)
-            },
-            'expenses': {
-                'accounts': expense_data,
-                'total': float(total_expense)
-            },
-            'net_income': float(net_income)
-        })
+        return Response(LedgerService.profit_and_loss(request.user, start_date, end_date))
 
     @action(detail=False, methods=['get'])
     def balance_sheet(self, request):
@@ -410,79 +352,7 @@ class FinancialReportsViewSet(viewsets.ViewSet):
         else:
             as_of_date = datetime.strptime(as_of_date, '%Y-%m-%d').date()
 
-        # Assets
-        asset_accounts = ChartOfAccounts.objects.filter(
-            organization=request.user,
-            account_type='asset',
-            is_active=True
-        )
-
-        assets_data = []
-        total_assets = Decimal('0')
-
-        for account in asset_accounts:
-            balance = account.get_balance(as_of_date)
-            total_assets += balance
-            assets_data.append({
-                'account_code': account.account_code,
-                'account_name': account.account_name,
-                'balance': float(balance)
-            })
-
-        # Liabilities
-        liability_accounts = ChartOfAccounts.objects.filter(
-            organization=request.user,
-            account_type='liability',
-            is_active=True
-        )
-
-        liabilities_data = []
-        total_liabilities = Decimal('0')
-
-        for account in liability_accounts:
-            balance = account.get_balance(as_of_date)
-            total_liabilities += balance
-            liabilities_data.append({
-                'account_code': account.account_code,
-                'account_name': account.account_name,
-                'balance': float(balance)
-            })
-
-        # Equity
-        equity_accounts = ChartOfAccounts.objects.filter(
-            organization=request.user,
-            account_type='equity',
-            is_active=True
-        )
-
-        equity_data = []
-        total_equity = Decimal('0')
-
-        for account in equity_accounts:
-            balance = account.get_balance(as_of_date)
-            total_equity += balance
-            equity_data.append({
-                'account_code': account.account_code,
-                'account_name': account.account_name,
-                'balance': float(balance)
-            })
-
-        return Response({
-            'as_of_date': as_of_date,
-            'assets': {
-                'accounts': assets_data,
-                'total': float(total_assets)
-            },
-            'liabilities': {
-                'accounts': liabilities_data,
-                'total': float(total_liabilities)
-            },
-            'equity': {
-                'accounts': equity_data,
-                'total': float(total_equity)
-            },
-            'total_liabilities_and_equity': float(total_liabilities + total_equity)
-        })
+        return Response(LedgerService.balance_sheet(request.user, as_of_date))
 
     @action(detail=False, methods=['get'])
     def trial_balance(self, request):
@@ -494,44 +364,7 @@ class FinancialReportsViewSet(viewsets.ViewSet):
         else:
             as_of_date = datetime.strptime(as_of_date, '%Y-%m-%d').date()
 
-        accounts = ChartOfAccounts.objects.filter(
-            organization=request.user,
-            is_active=True
-        ).order_by('account_code')
-
-        trial_balance_data = []
-        total_debits = Decimal('0')
-        total_credits = Decimal('0')
-
-        for account in accounts:
-            entries = JournalEntryLine.objects.filter(
-                account=account,
-                journal_entry__status='posted',
-                journal_entry__posting_date__lte=as_of_date
-            )
-
-            debits = entries.aggregate(Sum('debit_amount'))['debit_amount__sum'] or Decimal('0')
-            credits = entries.aggregate(Sum('credit_amount'))['credit_amount__sum'] or Decimal('0')
-
-            if debits > 0 or credits > 0:
-                total_debits += debits
-                total_credits += credits
-
-                trial_balance_data.append({
-                    'account_code': account.account_code,
-                    'account_name': account.account_name,
-                    'account_type': account.account_type,
-                    'debit': float(debits),
-                    'credit': float(credits)
-                })
-
-        return Response({
-            'as_of_date': as_of_date,
-            'accounts': trial_balance_data,
-            'total_debits': float(total_debits),
-            'total_credits': float(total_credits),
-            'is_balanced': total_debits == total_credits
-        })
+        return Response(LedgerService.trial_balance(request.user, as_of_date))
 
     @action(detail=False, methods=['get'])
     def ai_budget_variance(self, request):
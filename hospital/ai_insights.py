@@ -3,32 +3,33 @@ Hospital Operations AI Analytics Module
 No LLM required - Uses statistical methods, pattern recognition, and trend analysis
 """
 from django.utils import timezone
-from django.db.models import Count, Avg, Q, F, Sum
-from datetime import timedelta, datetime
-from decimal import Decimal
-from .models import Bed, Admission, HospitalStaff, DepartmentTask
+from .models import Bed, HospitalStaff
+from .snapshot import HospitalSnapshotBuilder
 
 
 class HospitalAI:
     """AI-powered hospital operations analytics using statistical methods"""
 
     @staticmethod
-    def predict_bed_occupancy(hospital, days_forward=7):
+    def predict_bed_occupancy(hospital, days_forward=7, snapshot=None):
         """
         Predict bed occupancy using discharge patterns and admission rates
 
         Args:
             hospital: Hospital participant
             days_forward: Number of days to forecast (default 7)
+            snapshot: Precomputed HospitalSnapshot (loaded from cache when omitted)
 
         Returns:
             dict: Bed occupancy forecast with recommendations
         """
+        snapshot = snapshot or HospitalSnapshotBuilder.get(hospital)
+
         # Get current bed status
-        total_beds = Bed.objects.filter(hospital=hospital).count()
-        occupied_beds = Bed.objects.filter(hospital=hospital, status='occupied').count()
-        available_beds = Bed.objects.filter(hospital=hospital, status='available').count()
-        maintenance_beds = Bed.objects.filter(hospital=hospital, status='maintenance').count()
+        total_beds = snapshot.bed_counts()
+        occupied_beds = snapshot.bed_counts(status='occupied')
+        available_beds = snapshot.bed_counts(status='available')
+        maintenance_beds = snapshot.bed_counts(status='maintenance')
 
         if total_beds == 0:
             return {
@@ -38,27 +39,12 @@ class HospitalAI:
 
         current_occupancy_rate = (occupied_beds / total_beds * 100) if total_beds > 0 else 0
 
-        # Analyze historical discharge patterns (last 30 days)
-        lookback_days = 30
-        start_date = timezone.now() - timedelta(days=lookback_days)
-
-        # Count discharges by day of week
-        discharges = Admission.objects.filter(
-            hospital=hospital,
-            status='discharged',
-            actual_discharge_date__gte=start_date
-        )
-
-        total_discharges = discharges.count()
+        # Historical discharge and admission patterns (last 30 days)
+        lookback_days = snapshot.admissions['lookback_days']
+        total_discharges = snapshot.admissions['discharges']
         avg_discharges_per_day = total_discharges / lookback_days if lookback_days > 0 else 0
 
-        # Analyze admission patterns
-        admissions = Admission.objects.filter(
-            hospital=hospital,
-            admission_date__gte=start_date
-        )
-
-        total_admissions = admissions.count()
+        total_admissions = sum(count for _, _, count in snapshot.recent_admissions())
         avg_admissions_per_day = total_admissions / lookback_days if lookback_days > 0 else 0
 
         # Calculate net bed usage trend
@@ -71,14 +57,12 @@ class HospitalAI:
 
         # Analyze by bed type
         bed_type_analysis = []
-        bed_types = ['standard', 'icu', 'private', 'semi_private', 'pediatric', 'maternity']
-
-        for bed_type in bed_types:
-            type_total = Bed.objects.filter(hospital=hospital, bed_type=bed_type).count()
+        for bed_type, _ in Bed.TYPE_CHOICES:
+            type_total = snapshot.bed_counts(bed_type=bed_type)
             if type_total == 0:
                 continue
 
-            type_occupied = Bed.objects.filter(hospital=hospital, bed_type=bed_type, status='occupied').count()
+            type_occupied = snapshot.bed_counts(bed_type=bed_type, status='occupied')
             type_occupancy_rate = (type_occupied / type_total * 100) if type_total > 0 else 0
 
             bed_type_analysis.append({
@@ -103,24 +87,8 @@ class HospitalAI:
             alert_level = 'normal'
             recommendation = "Occupancy within normal range."
 
-        # Analyze average length of stay
-        recent_stays = Admission.objects.filter(
-            hospital=hospital,
-            status='discharged',
-            actual_discharge_date__gte=start_date
-        )
-
-        avg_stay_days = 0
-        if recent_stays.exists():
-            total_stay_days = 0
-            count = 0
-            for admission in recent_stays:
-                if admission.actual_discharge_date and admission.admission_date:
-                    stay_duration = (admission.actual_discharge_date.date() - admission.admission_date.date()).days
-                    total_stay_days += stay_duration
-                    count += 1
-
-            avg_stay_days = round(total_stay_days / count, 1) if count > 0 else 0
+        # Average length of stay of recent discharges
+        avg_stay_days = snapshot.admissions['avg_stay_days']
 
         return {
             'status': 'forecasted',
@@ -147,7 +115,7 @@ class HospitalAI:
         }
 
     @staticmethod
-    def optimize_staff_scheduling(hospital, department=None, days_forward=7):
+    def optimize_staff_scheduling(hospital, department=None, days_forward=7, snapshot=None):
         """
         Optimize staff scheduling based on patient volume analysis
 
@@ -155,25 +123,22 @@ class HospitalAI:
             hospital: Hospital participant
             department: Optional - specific department to analyze
             days_forward: Number of days to forecast (default 7)
+            snapshot: Precomputed HospitalSnapshot (loaded from cache when omitted)
 
         Returns:
             dict: Staff scheduling recommendations
         """
-        # Analyze current staffing levels
-        staff_query = HospitalStaff.objects.filter(
-            hospital=hospital,
-            is_active=True
-        )
-
-        if department:
-            staff_query = staff_query.filter(department=department)
+        snapshot = snapshot or HospitalSnapshotBuilder.get(hospital)
+        department_id = department.pk if department else None
 
-        total_staff = staff_query.count()
+        # Analyze current staffing levels
+        role_counts = snapshot.staff_by_role(department_id)
+        total_staff = sum(role_counts.values())
 
         # Count staff by role
         staff_by_role = {}
         for role_code, role_name in HospitalStaff.ROLE_CHOICES:
-            role_count = staff_query.filter(role=role_code).count()
+            role_count = role_counts.get(role_code, 0)
             if role_count > 0:
                 staff_by_role[role_code] = {
                     'role_name': role_name,
@@ -181,39 +146,18 @@ class HospitalAI:
                 }
 
         # Analyze patient volume (last 30 days)
-        lookback_days = 30
-        start_date = timezone.now() - timedelta(days=lookback_days)
-
-        # Current admissions
-        current_admissions_query = Admission.objects.filter(
-            hospital=hospital,
-            status='admitted'
-        )
-
-        if department:
-            current_admissions_query = current_admissions_query.filter(department=department)
-
-        current_patients = current_admissions_query.count()
+        lookback_days = snapshot.admissions['lookback_days']
+        current_patients = snapshot.current_patients(department_id)
 
         # Historical admission patterns
-        historical_admissions = Admission.objects.filter(
-            hospital=hospital,
-            admission_date__gte=start_date
-        )
-
-        if department:
-            historical_admissions = historical_admissions.filter(department=department)
-
-        total_historical_admissions = historical_admissions.count()
+        historical_admissions = snapshot.recent_admissions(department_id)
+        total_historical_admissions = sum(count for _, _, count in historical_admissions)
         avg_daily_admissions = total_historical_admissions / lookback_days if lookback_days > 0 else 0
 
         # Analyze admission patterns by day of week
         day_patterns = {}
-        for admission in historical_admissions:
-            day_of_week = admission.admission_date.strftime('%A')
-            if day_of_week not in day_patterns:
-                day_patterns[day_of_week] = 0
-            day_patterns[day_of_week] += 1
+        for _, day_of_week, count in historical_admissions:
+            day_patterns[day_of_week] = day_patterns.get(day_of_week, 0) + count
 
         # Identify peak days
         peak_day = max(day_patterns.items(), key=lambda x: x[1])[0] if day_patterns else 'Unknown'
@@ -225,8 +169,8 @@ class HospitalAI:
         # Determine staffing adequacy
         # Ideal ratios (simplified):
         # Doctors: 1:10, Nurses: 1:5, Other staff: varies
-        doctors_count = staff_query.filter(role__in=['doctor', 'surgeon']).count()
-        nurses_count = staff_query.filter(role='nurse').count()
+        doctors_count = role_counts.get('doctor', 0) + role_counts.get('surgeon', 0)
+        nurses_count = role_counts.get('nurse', 0)
 
         ideal_doctors = current_patients / 10
         ideal_nurses = current_patients / 5
@@ -257,7 +201,9 @@ class HospitalAI:
             })
 
         # Analyze emergency admissions
-        emergency_admissions = historical_admissions.filter(admission_type='emergency').count()
+        emergency_admissions = sum(
+            count for admission_type, _, count in historical_admissions if admission_type == 'emergency'
+        )
         emergency_rate = (emergency_admissions / total_historical_admissions * 100) if total_historical_admissions > 0 else 0
 
         if emergency_rate > 30:
@@ -283,7 +229,8 @@ class HospitalAI:
                 'current_patients': current_patients,
                 'staff_to_patient_ratio': round(staff_to_patient_ratio, 2),
                 'staffing_status': staffing_status,
-                'staff_by_role': staff_by_role
+                'staff_by_role': staff_by_role,
+                'scheduled_shifts': snapshot.upcoming_shifts(days_forward, department_id)
             },
             'patient_volume_analysis': {
                 'avg_daily_admissions': round(avg_daily_admissions, 1),
@@ -296,7 +243,7 @@ class HospitalAI:
         }
 
     @staticmethod
-    def predict_equipment_maintenance(hospital):
+    def predict_equipment_maintenance(hospital, snapshot=None):
         """
         Predict equipment maintenance needs based on task patterns
 
@@ -304,46 +251,27 @@ class HospitalAI:
 
         Args:
             hospital: Hospital participant
+            snapshot: Precomputed HospitalSnapshot (loaded from cache when omitted)
 
         Returns:
             dict: Maintenance predictions and recommendations
         """
-        # Get all departments for this hospital
-        from core.models import Department
-        departments = Department.objects.filter(
-            organization=hospital
-        )
-
-        # Analyze maintenance-related tasks
-        lookback_days = 90
-        start_date = timezone.now() - timedelta(days=lookback_days)
+        snapshot = snapshot or HospitalSnapshotBuilder.get(hospital)
 
+        # Department task counts of the last 90 days (departments without tasks are skipped)
         maintenance_analysis = []
 
-        for dept in departments:
-            # Get tasks for this department (using DepartmentTask as proxy)
-            dept_tasks = DepartmentTask.objects.filter(
-                department=dept,
-                created_at__gte=start_date
-            )
-
-            total_tasks = dept_tasks.count()
-            if total_tasks == 0:
-                continue
-
-            # Analyze task completion rate
-            completed_tasks = dept_tasks.filter(status='completed').count()
-            pending_tasks = dept_tasks.filter(status='pending').count()
-            in_progress_tasks = dept_tasks.filter(status='in_progress').count()
-            overdue_tasks = dept_tasks.filter(
-                status__in=['pending', 'in_progress'],
-                due_date__lt=timezone.now()
-            ).count()
+        for dept in snapshot.tasks['departments']:
+            total_tasks = dept['total']
+            completed_tasks = dept['completed']
+            pending_tasks = dept['pending']
+            in_progress_tasks = dept['in_progress']
+            overdue_tasks = dept['overdue']
 
             completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
 
             # Analyze high priority tasks
-            high_priority_tasks = dept_tasks.filter(priority__in=['high', 'urgent']).count()
+            high_priority_tasks = dept['high_priority']
             high_priority_rate = (high_priority_tasks / total_tasks * 100) if total_tasks > 0 else 0
 
             # Determine department status
@@ -358,7 +286,7 @@ class HospitalAI:
                 dept_recommendation = "Department task management is healthy"
 
             maintenance_analysis.append({
-                'department': dept.name,
+                'department': dept['department__name'],
                 'total_tasks': total_tasks,
                 'completed': completed_tasks,
                 'pending': pending_tasks,
@@ -414,9 +342,10 @@ class HospitalAI:
             list: All hospital insights with priority levels
         """
         insights = []
+        snapshot = HospitalSnapshotBuilder.get(hospital)
 
         # Bed occupancy insights
-        bed_forecast = HospitalAI.predict_bed_occupancy(hospital, days_forward=7)
+        bed_forecast = HospitalAI.predict_bed_occupancy(hospital, days_forward=7, snapshot=snapshot)
         if bed_forecast['status'] == 'forecasted':
             priority = 'high' if bed_forecast['alert_level'] == 'critical' else 'medium' if bed_forecast['alert_level'] == 'warning' else 'low'
 
@@ -430,7 +359,7 @@ class HospitalAI:
             })
 
         # Staffing insights
-        staff_analysis = HospitalAI.optimize_staff_scheduling(hospital)
+        staff_analysis = HospitalAI.optimize_staff_scheduling(hospital, snapshot=snapshot)
         if staff_analysis['status'] == 'analyzed' and staff_analysis['recommendations']:
             high_priority_recs = [r for r in staff_analysis['recommendations'] if r.get('priority') == 'high']
 
@@ -446,7 +375,7 @@ class HospitalAI:
             })
 
         # Maintenance insights
-        maintenance = HospitalAI.predict_equipment_maintenance(hospital)
+        maintenance = HospitalAI.predict_equipment_maintenance(hospital, snapshot=snapshot)
         if maintenance['status'] == 'analyzed':
             critical_depts = [d for d in maintenance['department_details'] if d['status'] == 'critical']
 
@@ -1,8 +1,9 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
 from django.conf import settings
-from core.models import Participant
-from hospital.models import HospitalData
+from core.models import Department, Participant
+from hospital.models import Admission, Bed, DepartmentTask, HospitalData, HospitalStaff, StaffShift
 from hospital.service_models import HospitalService
 import logging
 
@@ -68,3 +69,70 @@ def add_default_hospital_services(sender, instance, created, **kwargs):
         
     except Exception as e:
         logger.error(f"Error adding default services to {hospital.full_name}: {str(e)}")
+
+
+# Fields whose changes move the hospital snapshot aggregates (hospital/snapshot.py); the first
+# one locates the hospital (through the department for tasks)
+SNAPSHOT_FIELDS = {
+    Bed: ('hospital_id', 'bed_type', 'status'),
+    Admission: ('hospital_id', 'department_id', 'admission_type', 'status', 'admission_date', 'actual_discharge_date'),
+    HospitalStaff: ('hospital_id', 'department_id', 'role', 'is_active'),
+    StaffShift: ('hospital_id', 'department_id', 'staff_id', 'status', 'shift_date'),
+    DepartmentTask: ('department_id', 'status', 'priority', 'due_date'),
+}
+SNAPSHOT_SECTIONS = {Bed: 'beds', Admission: 'admissions', HospitalStaff: 'staff', StaffShift: 'staff', DepartmentTask: 'tasks'}
+
+
+def _snapshot_fields(sender, instance):
+    # Loaded values only (no query): a deferred field reads as None and counts as changed
+    return tuple(instance.__dict__.get(field) for field in SNAPSHOT_FIELDS[sender])
+
+
+def _invalidate_snapshot(sender, owner_ids):
+    from hospital.snapshot import HospitalSnapshotBuilder
+
+    def invalidate():
+        hospital_ids = {owner_id for owner_id in owner_ids if owner_id is not None}
+        if sender is DepartmentTask:
+            hospital_ids = set(Department.objects.filter(pk__in=hospital_ids).values_list('hospital_id', flat=True))
+        for hospital_id in hospital_ids:
+            HospitalSnapshotBuilder.invalidate(hospital_id, SNAPSHOT_SECTIONS[sender])
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_init, sender=Bed)
+@receiver(post_init, sender=Admission)
+@receiver(post_init, sender=HospitalStaff)
+@receiver(post_init, sender=StaffShift)
+@receiver(post_init, sender=DepartmentTask)
+def remember_snapshot_fields(sender, instance, **kwargs):
+    """Keep the aggregate fields as loaded so saves that change none of them leave the snapshot alone"""
+    instance._loaded_snapshot_fields = _snapshot_fields(sender, instance)
+
+
+@receiver(post_save, sender=Bed)
+@receiver(post_save, sender=Admission)
+@receiver(post_save, sender=HospitalStaff)
+@receiver(post_save, sender=StaffShift)
+@receiver(post_save, sender=DepartmentTask)
+def refresh_hospital_snapshot(sender, instance, created, **kwargs):
+    """Drop the matching section of the hospital snapshot when a status (or grouping field) changes"""
+    if kwargs.get('raw', False):
+        return
+    current = _snapshot_fields(sender, instance)
+    previous = None if created else getattr(instance, '_loaded_snapshot_fields', None)
+    instance._loaded_snapshot_fields = current
+    if previous == current:
+        return
+    _invalidate_snapshot(sender, {current[0], previous[0] if previous else None})
+
+
+@receiver(post_delete, sender=Bed)
+@receiver(post_delete, sender=Admission)
+@receiver(post_delete, sender=HospitalStaff)
+@receiver(post_delete, sender=StaffShift)
+@receiver(post_delete, sender=DepartmentTask)
+def drop_hospital_snapshot_on_delete(sender, instance, **kwargs):
+    _invalidate_snapshot(sender, {getattr(instance, SNAPSHOT_FIELDS[sender][0])})
+
@@ -0,0 +1,198 @@
+"""
+Hospital operations snapshot shared by the HospitalAI insights.
+
+The aggregates behind the bed, staffing and maintenance insights are collected
+with one grouped query per section and cached per hospital:
+
+    beds        bed counts per (bed_type, status)
+    admissions  current inpatients per department, admissions of the last
+                30 days per (department, admission_type, weekday), discharges
+                and average length of stay over the same window
+    staff       active staff per (department, role), upcoming shifts per
+                (department, role, date)
+    tasks       department task counts of the last 90 days
+
+Bed, Admission, HospitalStaff, StaffShift and DepartmentTask changes drop only
+their own section (see hospital/signals.py), so the next read rebuilds one
+grouped query instead of the whole snapshot. Windowed sections also expire
+after SNAPSHOT_TIMEOUT as the window moves.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q
+from django.db.models.functions import ExtractWeekDay
+from django.utils import timezone
+
+from .models import Admission, Bed, DepartmentTask, HospitalStaff, StaffShift
+
+ADMISSION_LOOKBACK_DAYS = 30
+TASK_LOOKBACK_DAYS = 90
+SHIFT_HORIZON_DAYS = 30
+
+SNAPSHOT_TIMEOUT = 300  # windowed sections; writes through the signals invalidate earlier
+BED_SNAPSHOT_TIMEOUT = 3600  # no time window, only changes through signals
+
+SECTIONS = ('beds', 'admissions', 'staff', 'tasks')
+WEEKDAY_NAMES = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']  # ExtractWeekDay order
+
+
+@dataclass
+class HospitalSnapshot:
+    """Precomputed operational aggregates of one hospital"""
+    hospital_id: object
+    beds: dict
+    admissions: dict
+    staff: dict
+    tasks: dict
+
+    def bed_counts(self, bed_type=None, status=None):
+        return sum(
+            count
+            for (row_type, row_status), count in self.beds['counts'].items()
+            if (bed_type is None or row_type == bed_type) and (status is None or row_status == status)
+        )
+
+    def current_patients(self, department_id=None):
+        current = self.admissions['current_by_department']
+        if department_id is None:
+            return sum(current.values())
+        return current.get(department_id, 0)
+
+    def recent_admissions(self, department_id=None):
+        """[(admission_type, weekday_name, count)] of the lookback window"""
+        return [
+            (admission_type, weekday, count)
+            for row_department, admission_type, weekday, count in self.admissions['recent']
+            if department_id is None or row_department == department_id
+        ]
+
+    def staff_by_role(self, department_id=None):
+        counts = {}
+        for (row_department, role), count in self.staff['active'].items():
+            if department_id is None or row_department == department_id:
+                counts[role] = counts.get(role, 0) + count
+        return counts
+
+    def upcoming_shifts(self, days_forward, department_id=None):
+        """{role: shift count} of scheduled/confirmed shifts in the next days_forward days"""
+        last_day = timezone.now().date() + timedelta(days=days_forward)
+        counts = {}
+        for row_department, role, shift_date, count in self.staff['shifts']:
+            if shift_date <= last_day and (department_id is None or row_department == department_id):
+                counts[role] = counts.get(role, 0) + count
+        return counts
+
+
+class HospitalSnapshotBuilder:
+    """Build, cache and invalidate hospital snapshot sections"""
+
+    @staticmethod
+    def _key(hospital_id, section):
+        return f"hospital:snapshot:{hospital_id}:{section}"
+
+    @staticmethod
+    def get(hospital):
+        """Snapshot of a hospital; missing or expired sections are rebuilt, the rest come from one cache read"""
+        keys = {section: HospitalSnapshotBuilder._key(hospital.pk, section) for section in SECTIONS}
+        cached = cache.get_many(list(keys.values()))
+        sections = {}
+        for section, key in keys.items():
+            data = cached.get(key)
+            if data is None:
+                data = getattr(HospitalSnapshotBuilder, f'build_{section}')(hospital.pk)
+                timeout = BED_SNAPSHOT_TIMEOUT if section == 'beds' else SNAPSHOT_TIMEOUT
+                cache.set(key, data, timeout)
+            sections[section] = data
+        return HospitalSnapshot(hospital_id=hospital.pk, **sections)
+
+    @staticmethod
+    def invalidate(hospital_id, *sections):
+        """Drop sections (all when none given) so the next read rebuilds only those"""
+        cache.delete_many([HospitalSnapshotBuilder._key(hospital_id, section) for section in sections or SECTIONS])
+
+    @staticmethod
+    def build_beds(hospital_id):
+        rows = Bed.objects.filter(hospital_id=hospital_id).values('bed_type', 'status').annotate(count=Count('id')).order_by()
+        return {'counts': {(row['bed_type'], row['status']): row['count'] for row in rows}}
+
+    @staticmethod
+    def build_admissions(hospital_id):
+        start_date = timezone.now() - timedelta(days=ADMISSION_LOOKBACK_DAYS)
+        admissions = Admission.objects.filter(hospital_id=hospital_id)
+
+        current = admissions.filter(status='admitted').values('department_id').annotate(count=Count('id')).order_by()
+        recent = (
+            admissions.filter(admission_date__gte=start_date)
+            .annotate(weekday=ExtractWeekDay('admission_date'))
+            .values('department_id', 'admission_type', 'weekday')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        discharges = admissions.filter(status='discharged', actual_discharge_date__gte=start_date).aggregate(
+            count=Count('id'),
+            avg_stay=Avg(
+                ExpressionWrapper(F('actual_discharge_date') - F('admission_date'), output_field=DurationField()),
+                filter=Q(admission_date__isnull=False),
+            ),
+        )
+
+        avg_stay = discharges['avg_stay']
+        return {
+            'lookback_days': ADMISSION_LOOKBACK_DAYS,
+            'current_by_department': {row['department_id']: row['count'] for row in current},
+            'recent': [
+                (row['department_id'], row['admission_type'], WEEKDAY_NAMES[row['weekday'] - 1], row['count'])
+                for row in recent
+            ],
+            'discharges': discharges['count'],
+            'avg_stay_days': round(avg_stay.total_seconds() / 86400, 1) if avg_stay else 0,
+        }
+
+    @staticmethod
+    def build_staff(hospital_id):
+        today = timezone.now().date()
+        active = (
+            HospitalStaff.objects.filter(hospital_id=hospital_id, is_active=True)
+            .values('department_id', 'role')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        shifts = (
+            StaffShift.objects.filter(
+                hospital_id=hospital_id,
+                status__in=['scheduled', 'confirmed'],
+                shift_date__gte=today,
+                shift_date__lte=today + timedelta(days=SHIFT_HORIZON_DAYS),
+            )
+            .values('department_id', 'staff__role', 'shift_date')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        return {
+            'active': {(row['department_id'], row['role']): row['count'] for row in active},
+            'shifts': [(row['department_id'], row['staff__role'], row['shift_date'], row['count']) for row in shifts],
+        }
+
+    @staticmethod
+    def build_tasks(hospital_id):
+        now = timezone.now()
+        open_statuses = ['pending', 'in_progress']
+        rows = (
+            DepartmentTask.objects.filter(
+                department__hospital_id=hospital_id,
+                created_at__gte=now - timedelta(days=TASK_LOOKBACK_DAYS),
+            )
+            .values('department_id', 'department__name')
+            .annotate(
+                total=Count('id'),
+                completed=Count('id', filter=Q(status='completed')),
+                pending=Count('id', filter=Q(status='pending')),
+                in_progress=Count('id', filter=Q(status='in_progress')),
+                overdue=Count('id', filter=Q(status__in=open_statuses, due_date__lt=now)),
+                high_priority=Count('id', filter=Q(priority__in=['high', 'urgent'])),
+            )
+            .order_by('department__name')
+        )
+        return {'departments': [dict(row) for row in rows]}
@@ -0,0 +1,100 @@
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import Department, Participant
+
+from .models import Admission, Bed, DepartmentTask, HospitalStaff, StaffShift
+from .snapshot import HospitalSnapshotBuilder
+
+
+class HospitalSnapshotTest(TestCase):  # Cached operational aggregates and their invalidation
+    def setUp(self):  # Setup
+        cache.clear()
+        self.hospital = Participant.objects.create(email="snapshot-hospital@test.com", role="hospital")
+        self.patient = Participant.objects.create(email="snapshot-patient@test.com", role="patient")
+        self.department = Department.objects.create(hospital=self.hospital, name="Médecine interne")
+        self.beds = [
+            Bed.objects.create(
+                hospital=self.hospital, department=self.department, bed_number=f"B{i}", room_number="101",
+                floor_number="1", status="occupied" if i < 2 else "available",
+            )
+            for i in range(5)
+        ]
+        self.nurse = HospitalStaff.objects.create(
+            hospital=self.hospital, department=self.department, full_name="Infirmière", email="nurse@test.com",
+            phone_number="0100000000", role="nurse",
+        )
+        now = timezone.now()
+        self.admission = Admission.objects.create(
+            admission_number="ADM-SNAP-1", hospital=self.hospital, patient=self.patient, department=self.department,
+            status="discharged", chief_complaint="Fièvre", admission_date=now - timedelta(days=3, hours=12),
+            actual_discharge_date=now - timedelta(days=1),
+        )
+        self.task = DepartmentTask.objects.create(department=self.department, title="Inventaire", description="-")
+
+    def _snapshot(self):
+        return HospitalSnapshotBuilder.get(self.hospital)
+
+    def test_cached_snapshot_reads_without_queries(self):  # Cold build is one query per section, warm is none
+        with CaptureQueriesContext(connection) as queries:
+            snapshot = self._snapshot()
+        self.assertLessEqual(len(queries.captured_queries), 7)
+        self.assertEqual(snapshot.bed_counts(status="occupied"), 2)
+        self.assertEqual(snapshot.admissions["avg_stay_days"], 2.5)  # exact duration, not whole dates
+
+        started = time.perf_counter()
+        with self.assertNumQueries(0):
+            self.assertEqual(self._snapshot(), snapshot)
+        self.assertLess(time.perf_counter() - started, 0.1)
+
+    def test_bed_and_admission_changes_invalidate_their_section(self):  # Status changes are seen on the next read
+        self._snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            bed = Bed.objects.get(pk=self.beds[4].pk)
+            bed.status = "occupied"
+            bed.save()
+        self.assertEqual(self._snapshot().bed_counts(status="occupied"), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Admission.objects.create(
+                admission_number="ADM-SNAP-2", hospital=self.hospital, patient=self.patient,
+                department=self.department, status="admitted", chief_complaint="Toux",
+            )
+        self.assertEqual(self._snapshot().current_patients(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bed.room_number = "102"  # not an aggregate field
+            bed.save()
+        self.assertIsNotNone(cache.get(HospitalSnapshotBuilder._key(self.hospital.pk, "beds")))
+
+    def test_staff_shift_and_task_changes_invalidate_their_section(self):  # Receivers beyond beds and admissions
+        self._snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.nurse.role = "surgeon"
+            self.nurse.save()
+            StaffShift.objects.create(
+                hospital=self.hospital, staff=self.nurse, department=self.department,
+                shift_date=timezone.now().date() + timedelta(days=1), shift_type="day",
+                start_time="07:00", end_time="15:00",
+            )
+        snapshot = self._snapshot()
+        self.assertEqual(snapshot.staff_by_role(), {"surgeon": 1})
+        self.assertEqual(snapshot.upcoming_shifts(7), {"surgeon": 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.status = "completed"
+            self.task.save()
+        self.assertEqual(self._snapshot().tasks["departments"][0]["completed"], 1)
+
+    def test_saves_do_not_reload_the_row(self):  # Loaded values come from post_init, not a SELECT before the save
+        bed = Bed.objects.get(pk=self.beds[0].pk)
+        bed.status = "maintenance"
+        with CaptureQueriesContext(connection) as queries:
+            bed.save()
+        self.assertFalse([q for q in queries.captured_queries if q["sql"].startswith("SELECT")])
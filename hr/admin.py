@@ -1,6 +1,6 @@
 from django.contrib import admin
 from .models import (
-    Employee, PayrollPeriod, PayrollRun, PayrollDeduction,
+    Employee, PayrollPeriod, PayrollRun, PayrollDeduction, PayrollJob,
     LeaveType, LeaveRequest, LeaveBalance, TimeAndAttendance,
     EmployeeBenefit
 )
@@ -73,6 +73,14 @@ class PayrollPeriodAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(PayrollJob)
+class PayrollJobAdmin(admin.ModelAdmin):
+    list_display = ['payroll_period', 'status', 'processed_employees', 'total_employees', 'runs_created', 'skipped_employees', 'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['payroll_period__period_name']
+    readonly_fields = [field.name for field in PayrollJob._meta.fields]
+
+
 @admin.register(PayrollRun)
 class PayrollRunAdmin(admin.ModelAdmin):
     list_display = ['employee', 'payroll_period', 'gross_pay', 'total_deductions', 'net_pay', 'payment_status', 'paid_at']
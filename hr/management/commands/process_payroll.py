@@ -0,0 +1,52 @@
+"""
+Run (or resume) background payroll processing.
+
+Usage:
+    python manage.py process_payroll --job <job_id>
+    python manage.py process_payroll --period <period_id> --chunk-size 1000
+    python manage.py process_payroll --job <job_id> --max-chunks 5   # job stays resumable
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from hr.models import PayrollJob, PayrollPeriod
+from hr.payroll_engine import PayrollEngine
+
+
+class Command(BaseCommand):
+    help = 'Process the payroll runs of a period in resumable chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', help='PayrollJob id to run or resume')
+        parser.add_argument('--period', help='PayrollPeriod id; starts a job or resumes its unfinished one')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Employees per chunk/transaction')
+        parser.add_argument('--max-chunks', type=int, default=None, help='Stop after N chunks (job stays resumable)')
+
+    def handle(self, *args, **options):
+        if options['job']:
+            job = PayrollJob.objects.filter(pk=options['job']).first()
+            if job is None:
+                raise CommandError(f"Payroll job {options['job']} not found")
+        elif options['period']:
+            period = PayrollPeriod.objects.filter(pk=options['period']).first()
+            if period is None:
+                raise CommandError(f"Payroll period {options['period']} not found")
+            try:
+                job = PayrollEngine.start(period, chunk_size=options['chunk_size'])
+            except ValueError as e:
+                raise CommandError(str(e))
+        else:
+            raise CommandError('Pass --job or --period')
+
+        job = PayrollEngine.run(job.pk, max_chunks=options['max_chunks'])
+
+        for stats in job.chunk_stats[-20:]:
+            self.stdout.write(
+                f"  chunk {stats['chunk']:>5} {stats['employees']} employees / {stats['runs']} runs "
+                f"in {stats['seconds']}s ({stats['employees_per_second']}/s)"
+            )
+
+        style = self.style.SUCCESS if job.status == 'completed' else self.style.WARNING
+        self.stdout.write(style(
+            f"Job {job.id} {job.status}: {job.processed_employees}/{job.total_employees} employees, "
+            f"{job.runs_created} runs created, {job.skipped_employees} skipped"
+        ))
@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-18 21:01
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0005_alter_employee_created_by_instance_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='queued', max_length=20)),
+                ('chunk_size', models.PositiveIntegerField(default=500)),
+                ('cursor', models.CharField(blank=True, max_length=64)),
+                ('total_employees', models.PositiveIntegerField(default=0)),
+                ('processed_employees', models.PositiveIntegerField(default=0)),
+                ('runs_created', models.PositiveIntegerField(default=0)),
+                ('skipped_employees', models.PositiveIntegerField(default=0)),
+                ('chunks_completed', models.PositiveIntegerField(default=0)),
+                ('chunk_stats', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('payroll_period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='processing_jobs', to='hr.payrollperiod')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payroll_jobs_requested', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'hr_payroll_job',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['payroll_period', 'status'], name='hr_payroll__payroll_367a26_idx')],
+            },
+        ),
+    ]
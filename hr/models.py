@@ -329,6 +329,66 @@ class PayrollDeduction(SyncMixin):
         return f"{self.description} - {self.amount}"
 
 
+class PayrollJob(models.Model):
+    """
+    Background processing of a payroll period (see hr/payroll_engine.py).
+
+    Not a SyncMixin model: it is rewritten after every chunk and only matters
+    to the instance executing the job. A job left in 'running' state after a
+    crash resumes after its employee cursor; heartbeat_at (touched at start
+    and after every chunk) tells a stalled job from a busy one.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    payroll_period = models.ForeignKey(
+        PayrollPeriod,
+        on_delete=models.CASCADE,
+        related_name='processing_jobs'
+    )
+    requested_by = models.ForeignKey(
+        Participant,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='payroll_jobs_requested'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', db_index=True)
+    chunk_size = models.PositiveIntegerField(default=500)
+    cursor = models.CharField(max_length=64, blank=True)  # last processed employee id
+    total_employees = models.PositiveIntegerField(default=0)
+    processed_employees = models.PositiveIntegerField(default=0)
+    runs_created = models.PositiveIntegerField(default=0)
+    skipped_employees = models.PositiveIntegerField(default=0)  # already had a run for the period
+    chunks_completed = models.PositiveIntegerField(default=0)
+    chunk_stats = models.JSONField(default=list, blank=True)  # most recent per-chunk throughput
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'hr_payroll_job'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['payroll_period', 'status']),
+        ]
+
+    def __str__(self):
+        return f"Payroll job {self.payroll_period_id} - {self.status}"
+
+    @property
+    def progress_percent(self):
+        if not self.total_employees:
+            return 100.0 if self.status == 'completed' else 0.0
+        return round(self.processed_employees * 100 / self.total_employees, 1)
+
+
 class LeaveType(SyncMixin):
     """Types of leave (annual, sick, maternity, etc.)"""
     region_code = models.CharField(max_length=50, default="global", db_index=True)
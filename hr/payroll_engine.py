@@ -0,0 +1,321 @@
+"""
+Bulk payroll engine behind PayrollPeriodViewSet.process.
+
+A PayrollJob walks the organization's active employees in id order, one chunk
+per transaction: existing runs of the chunk are found with one query, approved
+attendance hours with one grouped query, pay and deductions are computed in
+memory from settings.HR_PAYROLL_RULES, and runs and deductions are
+bulk-created. The job checkpoint (employee cursor and counters) is written in
+the same transaction, so an interrupted job resumes after its last committed
+chunk and never creates a run twice. Bulk inserts send no post_save, so the
+SyncEvents of the new runs and deductions are written with the chunk
+(sync.signals.log_bulk_sync_events).
+
+When no worker consumes the broker (backend.celery.run_inline) the job runs
+in the request, once the period is committed. A queued or running job whose
+heartbeat is older than STALE_AFTER (worker lost, task dropped) is re-queued
+by start(), like a failed one.
+"""
+import logging
+import time
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from sync.signals import log_bulk_sync_events
+
+from .models import Employee, PayrollDeduction, PayrollJob, PayrollPeriod, PayrollRun, TimeAndAttendance
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+MAX_CHUNK_STATS = 200
+STALE_AFTER = timedelta(minutes=10)  # no chunk committed for this long: the job is resumed
+
+
+def _money(value):
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class PayrollEngine:
+    """Chunked, resumable creation of the payroll runs of a period"""
+
+    @staticmethod
+    def rules():
+        """HR_PAYROLL_RULES with rates parsed to Decimal"""
+        rules = settings.HR_PAYROLL_RULES
+        return {
+            'overtime_multiplier': Decimal(str(rules.get('overtime_multiplier', '1.5'))),
+            'deductions': [
+                {
+                    'type': rule['type'],
+                    'description': rule.get('description', rule['type']),
+                    'rate': Decimal(str(rule['rate'])),
+                    'base': rule.get('base', 'base_pay'),
+                }
+                for rule in rules.get('deductions', [])
+            ],
+        }
+
+    @staticmethod
+    def employees(period):
+        return Employee.objects.filter(organization_id=period.organization_id, status='active')
+
+    @staticmethod
+    def attendance_hours(period, employee_ids):
+        """{employee_id: (regular_hours, overtime_hours)} of approved attendance in the period, one grouped query"""
+        if not employee_ids:
+            return {}
+        rows = (
+            TimeAndAttendance.objects.filter(
+                employee_id__in=employee_ids,
+                clock_in__date__gte=period.start_date,
+                clock_in__date__lte=period.end_date,
+                is_approved=True,
+            )
+            .values('employee_id')
+            .annotate(regular=Sum('regular_hours'), overtime=Sum('overtime_hours'))
+            .order_by()
+        )
+        return {row['employee_id']: (row['regular'] or ZERO, row['overtime'] or ZERO) for row in rows}
+
+    @staticmethod
+    def compute_pay(salary_type, base_salary, hours, rules):
+        """
+        Earnings, deductions and totals of one employee (no queries)
+
+        Hourly employees are paid base_salary per approved regular hour plus
+        overtime at the overtime multiplier; every other salary type is paid
+        base_salary for the period.
+
+        Returns:
+            dict: PayrollRun field values plus 'deductions' as (type, description, amount) tuples
+        """
+        if salary_type == 'hourly':
+            regular_hours, overtime_hours = hours
+            base_pay = _money(regular_hours * base_salary)
+            overtime_pay = _money(overtime_hours * base_salary * rules['overtime_multiplier'])
+        else:
+            regular_hours = overtime_hours = ZERO
+            base_pay = _money(base_salary)
+            overtime_pay = ZERO
+
+        gross_pay = base_pay + overtime_pay
+        earnings = {'base_pay': base_pay, 'overtime_pay': overtime_pay, 'gross_pay': gross_pay}
+        deductions = [
+            (rule['type'], rule['description'], _money(earnings[rule['base']] * rule['rate']))
+            for rule in rules['deductions']
+        ]
+        total_deductions = sum((amount for _, _, amount in deductions), ZERO)
+        return {
+            'regular_hours': regular_hours,
+            'overtime_hours': overtime_hours,
+            'base_pay': base_pay,
+            'overtime_pay': overtime_pay,
+            'gross_pay': gross_pay,
+            'total_deductions': total_deductions,
+            'net_pay': gross_pay - total_deductions,
+            'deductions': deductions,
+        }
+
+    @staticmethod
+    def is_stale(job, now=None):
+        """Whether a queued or running job stopped making progress"""
+        if job.status not in ('queued', 'running'):
+            return False
+        last_seen = job.heartbeat_at or job.started_at or job.created_at
+        return last_seen < (now or timezone.now()) - STALE_AFTER
+
+    @staticmethod
+    def start(period, requested_by=None, chunk_size=500):
+        """
+        Queue processing of an open period (or hand back its unfinished job)
+
+        Marks the period 'processing' and enqueues the Celery task once the
+        transaction commits. An unfinished job that failed or went stale is
+        queued again and resumes from its cursor.
+
+        Raises:
+            ValueError: when the period is neither open nor already processing
+        """
+        with transaction.atomic():
+            period = PayrollPeriod.objects.select_for_update().get(pk=period.pk)
+            job = period.processing_jobs.exclude(status='completed').order_by('-created_at').first()
+            if period.status == 'processing' and job:
+                if job.status == 'failed' or PayrollEngine.is_stale(job):
+                    logger.info(f"Resuming {job.status} payroll job {job.id} after employee {job.cursor or '-'}")
+                    job.status = 'queued'
+                    job.error = ''
+                    job.heartbeat_at = timezone.now()
+                    job.save(update_fields=['status', 'error', 'heartbeat_at'])
+                    transaction.on_commit(lambda: PayrollEngine.enqueue(job.pk))
+                return job
+            if period.status != 'open':
+                raise ValueError(f'Cannot process payroll. Period status is {period.status}')
+
+            job = PayrollJob.objects.create(
+                payroll_period=period,
+                requested_by=requested_by,
+                chunk_size=chunk_size,
+                total_employees=PayrollEngine.employees(period).count(),
+            )
+            period.status = 'processing'
+            period.save()
+            transaction.on_commit(lambda: PayrollEngine.enqueue(job.pk))
+        logger.info(f"Queued payroll job {job.id} for {period} ({job.total_employees} employees)")
+        return job
+
+    @staticmethod
+    def enqueue(job_id):
+        """Process a job on a worker, or in-process when no worker consumes the broker"""
+        from backend.celery import run_inline
+
+        if not run_inline():
+            from .tasks import process_payroll_job
+            process_payroll_job.delay(str(job_id))
+            return
+        try:
+            PayrollEngine.run(job_id)
+        except Exception as e:
+            # run() logged the error and stored the job as 'failed'; the next start() resumes it
+            logger.warning(f"Payroll job {job_id} processed in-process failed: {e}")
+
+    @staticmethod
+    def run(job_id, max_chunks=None):
+        """
+        Process a job until every employee is handled (or max_chunks is reached)
+
+        Returns the PayrollJob; it stays 'running' when stopped by max_chunks
+        and becomes 'failed' on error, and both resume from the cursor.
+        """
+        job = PayrollJob.objects.select_related('payroll_period').get(pk=job_id)
+        if job.status == 'completed':
+            return job
+        job.status = 'running'
+        job.error = ''
+        job.started_at = job.started_at or timezone.now()
+        job.heartbeat_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'started_at', 'heartbeat_at'])
+
+        rules = PayrollEngine.rules()
+        chunks = 0
+        try:
+            while True:
+                if max_chunks is not None and chunks >= max_chunks:
+                    return job
+                chunk = PayrollEngine.process_chunk(job, rules)
+                if chunk is None:
+                    break
+                job = chunk
+                chunks += 1
+            PayrollEngine.finish(job)
+        except Exception as e:
+            logger.error(f"Payroll job {job.id} stopped: {e}", exc_info=True)
+            PayrollJob.objects.filter(pk=job.pk).update(status='failed', error=str(e))
+            job.status, job.error = 'failed', str(e)
+            raise
+
+        logger.info(
+            f"Payroll job {job.id} completed: {job.runs_created} runs created, "
+            f"{job.skipped_employees} skipped, {job.chunks_completed} chunks"
+        )
+        return job
+
+    @staticmethod
+    @transaction.atomic
+    def process_chunk(job, rules):
+        """Create the runs of one chunk of employees and checkpoint; returns the updated job or None when done"""
+        started = time.perf_counter()
+        job = PayrollJob.objects.select_for_update().select_related('payroll_period').get(pk=job.pk)
+        period = job.payroll_period
+
+        employees = PayrollEngine.employees(period)
+        if job.cursor:
+            employees = employees.filter(id__gt=job.cursor)
+        chunk = list(employees.order_by('id').values_list('id', 'salary_type', 'base_salary')[:job.chunk_size])
+        if not chunk:
+            return None
+
+        employee_ids = [employee_id for employee_id, _, _ in chunk]
+        existing = set(
+            PayrollRun.objects.filter(payroll_period=period, employee_id__in=employee_ids)
+            .order_by()
+            .values_list('employee_id', flat=True)
+        )
+        hours = PayrollEngine.attendance_hours(
+            period,
+            [employee_id for employee_id, salary_type, _ in chunk
+             if salary_type == 'hourly' and employee_id not in existing],
+        )
+
+        runs = []
+        deductions = []
+        for employee_id, salary_type, base_salary in chunk:
+            if employee_id in existing:
+                continue
+            pay = PayrollEngine.compute_pay(salary_type, base_salary, hours.get(employee_id, (ZERO, ZERO)), rules)
+            run = PayrollRun(
+                payroll_period=period,
+                employee_id=employee_id,
+                region_code=period.region_code,
+                **{key: value for key, value in pay.items() if key != 'deductions'},
+            )
+            runs.append(run)
+            deductions.extend(
+                PayrollDeduction(
+                    payroll_run=run,
+                    region_code=period.region_code,
+                    deduction_type=deduction_type,
+                    description=description,
+                    amount=amount,
+                    is_mandatory=True,
+                )
+                for deduction_type, description, amount in pay['deductions']
+            )
+        PayrollRun.objects.bulk_create(runs, batch_size=500)
+        PayrollDeduction.objects.bulk_create(deductions, batch_size=1000)
+        log_bulk_sync_events(runs, 'create')
+        log_bulk_sync_events(deductions, 'create')
+
+        elapsed = time.perf_counter() - started
+        stats = {
+            'chunk': job.chunks_completed + 1,
+            'employees': len(chunk),
+            'runs': len(runs),
+            'skipped': len(existing),
+            'seconds': round(elapsed, 4),
+            'employees_per_second': round(len(chunk) / elapsed, 1) if elapsed else None,
+        }
+        logger.info(f"Payroll job {job.id} chunk {stats['chunk']}: {stats}")
+
+        job.cursor = str(employee_ids[-1])
+        job.chunks_completed += 1
+        job.processed_employees += len(chunk)
+        job.runs_created += len(runs)
+        job.skipped_employees += len(existing)
+        job.chunk_stats = (job.chunk_stats + [stats])[-MAX_CHUNK_STATS:]
+        job.heartbeat_at = timezone.now()
+        job.save()
+        return job
+
+    @staticmethod
+    @transaction.atomic
+    def finish(job):
+        """Mark the job completed and the period processed"""
+        now = timezone.now()
+        period = PayrollPeriod.objects.select_for_update().get(pk=job.payroll_period_id)
+        period.status = 'processed'
+        period.processed_by_id = job.requested_by_id
+        period.processed_at = now
+        period.save()
+
+        job.status = 'completed'
+        job.finished_at = now
+        job.total_employees = max(job.total_employees, job.processed_employees)
+        job.save(update_fields=['status', 'finished_at', 'total_employees'])
+        return job
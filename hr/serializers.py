@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import (
-    Employee, PayrollPeriod, PayrollRun, PayrollDeduction,
+    Employee, PayrollPeriod, PayrollRun, PayrollDeduction, PayrollJob,
     LeaveType, LeaveRequest, LeaveBalance, TimeAndAttendance,
     EmployeeBenefit
 )
@@ -79,6 +79,20 @@ class PayrollPeriodSerializer(serializers.ModelSerializer):
         return float(total) if total else 0.0
 
 
+class PayrollJobSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    progress_percent = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = PayrollJob
+        fields = [
+            'id', 'payroll_period', 'status', 'status_display', 'progress_percent',
+            'total_employees', 'processed_employees', 'runs_created', 'skipped_employees',
+            'chunks_completed', 'error', 'created_at', 'started_at', 'heartbeat_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
 class PayrollRunSerializer(serializers.ModelSerializer):
     payroll_period_name = serializers.CharField(source='payroll_period.period_name', read_only=True)
     employee_name = serializers.CharField(source='employee.user.full_name', read_only=True)
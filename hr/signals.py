@@ -1,13 +1,27 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import PayrollRun, LeaveRequest, LeaveBalance, TimeAndAttendance
+from .models import PayrollRun, PayrollDeduction, LeaveRequest, LeaveBalance, TimeAndAttendance
 
 
-@receiver(post_save, sender=PayrollRun)
+@receiver(pre_save, sender=PayrollRun)
 def update_payroll_totals(sender, instance, **kwargs):
-    """Update payroll run totals when deductions change"""
+    """Keep gross and net pay in line with the earnings fields (no query, no extra save)"""
     if not kwargs.get('raw', False):
-        instance.calculate_totals()
+        instance.gross_pay = (
+            instance.base_pay + instance.overtime_pay + instance.bonus +
+            instance.commission + instance.allowances
+        )
+        instance.net_pay = instance.gross_pay - instance.total_deductions
+
+
+@receiver(post_save, sender=PayrollDeduction)
+@receiver(post_delete, sender=PayrollDeduction)
+def update_payroll_deduction_totals(sender, instance, **kwargs):
+    """Recalculate the run totals when one of its deductions changes (bulk-created deductions skip this)"""
+    if not kwargs.get('raw', False):
+        run = PayrollRun.objects.filter(pk=instance.payroll_run_id).first()
+        if run:
+            run.calculate_totals()
 
 
 @receiver(post_save, sender=LeaveRequest)
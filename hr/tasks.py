@@ -0,0 +1,19 @@
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def process_payroll_job(job_id):
+    """Create the payroll runs of a period in resumable chunks (queued by PayrollPeriodViewSet.process)"""
+    from .payroll_engine import PayrollEngine
+
+    job = PayrollEngine.run(job_id)
+    return {
+        'job': str(job.id),
+        'status': job.status,
+        'processed_employees': job.processed_employees,
+        'runs_created': job.runs_created,
+        'skipped_employees': job.skipped_employees,
+    }
@@ -0,0 +1,129 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Participant
+from sync.models import SyncEvent
+
+from .models import Employee, PayrollDeduction, PayrollJob, PayrollPeriod, PayrollRun, TimeAndAttendance
+from .payroll_engine import STALE_AFTER, PayrollEngine
+
+WORKER_BROKER = "redis://localhost:6379/0"
+PAYROLL_RULES = {
+    'overtime_multiplier': '2',
+    'deductions': [
+        {'type': 'income_tax', 'description': 'IRPP (20%)', 'rate': '0.20', 'base': 'gross_pay'},
+        {'type': 'social_security', 'description': 'CNSS (3.6%)', 'rate': '0.036', 'base': 'base_pay'},
+    ],
+}
+
+
+@override_settings(HR_PAYROLL_RULES=PAYROLL_RULES)
+class PayrollEngineTest(TestCase):  # Chunked payroll processing of a period
+    def setUp(self):  # Setup
+        self.organization = Participant.objects.create(email="payroll-org@test.com", role="hospital")
+        self.period = PayrollPeriod.objects.create(
+            organization=self.organization, period_name="Mars 2026", frequency="monthly",
+            start_date=date(2026, 3, 1), end_date=date(2026, 3, 31), pay_date=date(2026, 4, 2), status="open",
+        )
+        self.employees = [self._employee(i, "monthly", Decimal("250000")) for i in range(4)]
+        self.hourly = self._employee(4, "hourly", Decimal("2000"))
+        for day, regular, overtime in ((2, "8", "2"), (3, "8", "0"), (4, "4", "1.5")):
+            TimeAndAttendance.objects.create(
+                employee=self.hourly, clock_in=timezone.make_aware(datetime(2026, 3, day, 8)),
+                regular_hours=Decimal(regular), overtime_hours=Decimal(overtime), is_approved=True,
+            )
+        TimeAndAttendance.objects.create(  # not approved: not paid
+            employee=self.hourly, clock_in=timezone.make_aware(datetime(2026, 3, 5, 8)),
+            regular_hours=Decimal("8"),
+        )
+
+    def _employee(self, number, salary_type, base_salary):
+        user = Participant.objects.create(email=f"employee{number}@test.com", role="patient", full_name=f"E{number}")
+        return Employee.objects.create(
+            organization=self.organization, user=user, employee_id=f"EMP-{number:03d}", job_title="Infirmier",
+            employment_type="full_time", hire_date=date(2024, 1, 1), salary_type=salary_type, base_salary=base_salary,
+        )
+
+    def _start(self, chunk_size=2):
+        with override_settings(CELERY_BROKER_URL=WORKER_BROKER), mock.patch("hr.tasks.process_payroll_job.delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            job = PayrollEngine.start(self.period, chunk_size=chunk_size)
+        delay.assert_called_once_with(str(job.pk))
+        return job
+
+    def test_pay_follows_the_configured_rules(self):  # Gross, deductions and net from HR_PAYROLL_RULES
+        PayrollEngine.run(self._start().pk)
+
+        monthly = PayrollRun.objects.get(employee=self.employees[0])
+        self.assertEqual((monthly.gross_pay, monthly.total_deductions), (Decimal("250000"), Decimal("59000")))
+        self.assertEqual(monthly.net_pay, Decimal("191000"))
+
+        hourly = PayrollRun.objects.get(employee=self.hourly)
+        self.assertEqual((hourly.regular_hours, hourly.overtime_hours), (Decimal("20"), Decimal("3.5")))
+        self.assertEqual((hourly.base_pay, hourly.overtime_pay), (Decimal("40000"), Decimal("14000")))
+        self.assertEqual(
+            dict(hourly.deductions.values_list("deduction_type", "amount")),
+            {"income_tax": Decimal("10800"), "social_security": Decimal("1440")},
+        )
+        self.assertEqual(hourly.net_pay, Decimal("41760"))
+
+    def test_interrupted_job_resumes_after_its_last_chunk(self):  # max_chunks stop, then resume from the cursor
+        job = PayrollEngine.run(self._start().pk, max_chunks=1)
+        self.assertEqual((job.status, job.processed_employees, job.runs_created), ("running", 2, 2))
+        self.assertEqual(job.cursor, sorted(str(e.pk) for e in self.employees + [self.hourly])[1])
+
+        job = PayrollEngine.run(job.pk)
+        self.assertEqual((job.status, job.processed_employees, job.runs_created, job.chunks_completed),
+                         ("completed", 5, 5, 3))
+        self.assertEqual(PayrollRun.objects.filter(payroll_period=self.period).count(), 5)
+        self.assertEqual(PayrollDeduction.objects.count(), 10)
+        self.period.refresh_from_db()
+        self.assertEqual(self.period.status, "processed")
+
+    def test_rerun_creates_nothing_twice(self):  # Completed job is a no-op; a new job skips existing runs
+        job = PayrollEngine.run(self._start().pk)
+        self.assertEqual(PayrollEngine.run(job.pk).runs_created, 5)
+
+        rerun = PayrollEngine.run(PayrollJob.objects.create(payroll_period=self.period, chunk_size=3).pk)
+        self.assertEqual((rerun.runs_created, rerun.skipped_employees), (0, 5))
+        self.assertEqual(PayrollRun.objects.count(), 5)
+        self.assertEqual(PayrollDeduction.objects.count(), 10)
+
+    def test_bulk_created_rows_log_sync_events(self):  # One create event per run and deduction
+        PayrollEngine.run(self._start().pk)
+        self.assertEqual(SyncEvent.objects.filter(model_name="hr.payrollrun", event_type="create").count(), 5)
+        self.assertEqual(SyncEvent.objects.filter(model_name="hr.payrolldeduction", event_type="create").count(), 10)
+        event = SyncEvent.objects.filter(model_name="hr.payrollrun").first()
+        self.assertTrue(event.verify_integrity())
+
+    def test_stale_job_is_queued_again(self):  # No heartbeat for STALE_AFTER: start() re-enqueues it
+        job = self._start()
+        with override_settings(CELERY_BROKER_URL=WORKER_BROKER), mock.patch("hr.tasks.process_payroll_job.delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(PayrollEngine.start(self.period), job)
+        delay.assert_not_called()
+
+        PayrollJob.objects.filter(pk=job.pk).update(
+            status="running", heartbeat_at=timezone.now() - STALE_AFTER - timedelta(minutes=1)
+        )
+        with override_settings(CELERY_BROKER_URL=WORKER_BROKER), mock.patch("hr.tasks.process_payroll_job.delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            PayrollEngine.start(self.period)
+        delay.assert_called_once_with(str(job.pk))
+        job.refresh_from_db()
+        self.assertEqual(job.status, "queued")
+
+    def test_runs_in_the_request_without_a_worker_broker(self):  # memory:// broker: no worker would run the task
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        client.force_authenticate(self.organization)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(f"/api/v1/hr/payroll-periods/{self.period.pk}/process/")
+        self.assertEqual(response.data["job"]["total_employees"], 5)
+        self.assertEqual(PayrollJob.objects.get(pk=response.data["job"]["id"]).status, "completed")
+        self.assertEqual(PayrollRun.objects.filter(payroll_period=self.period).count(), 5)
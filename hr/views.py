@@ -15,8 +15,10 @@ from .models import (
 from .serializers import (
     EmployeeSerializer, PayrollPeriodSerializer, PayrollRunSerializer,
     PayrollDeductionSerializer, LeaveTypeSerializer, LeaveRequestSerializer,
-    LeaveBalanceSerializer, TimeAndAttendanceSerializer, EmployeeBenefitSerializer
+    LeaveBalanceSerializer, TimeAndAttendanceSerializer, EmployeeBenefitSerializer,
+    PayrollJobSerializer
 )
+from .payroll_engine import PayrollEngine
 
 
 class HRBaseViewSet(viewsets.ModelViewSet):
@@ -289,8 +291,8 @@ class EmployeeViewSet(HRBaseViewSet):
         try:
             from ml_models.churn_prediction import ChurnPredictor
 
-            # Train and predict for all employees in organization
-            predictions = ChurnPredictor.train_and_predict(user)
+            # Predict for all employees with the stored model (trained in the background)
+            predictions = ChurnPredictor.predict(user)
 
             return Response({
                 'organization': user.full_name,
@@ -316,103 +318,39 @@ class PayrollPeriodViewSet(HRBaseViewSet):
 
     @action(detail=True, methods=['post'])
     def process(self, request, pk=None):
-        """Process payroll for the period"""
+        """Queue background payroll processing for the period; poll process_status for progress"""
         period = self.get_object()
 
-        if period.status != 'open':
-            return Response(
-                {'error': f'Cannot process payroll. Period status is {period.status}'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Update status
-        period.status = 'processing'
-        period.save()
-
-        # Get all active employees for this organization
-        employees = Employee.objects.filter(
-            organization=period.organization,
-            status='active'
-        )
+        try:
+            job = PayrollEngine.start(period, requested_by=request.user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        created_count = 0
-        for employee in employees:
-            # Check if payroll run already exists
-            if PayrollRun.objects.filter(payroll_period=period, employee=employee).exists():
-                continue
-
-            # Calculate hours and pay based on employment type
-            if employee.salary_type == 'monthly':
-                base_pay = employee.base_salary
-                regular_hours = Decimal('0.00')
-                overtime_hours = Decimal('0.00')
-            elif employee.salary_type == 'hourly':
-                # Get attendance records for the period
-                attendance = TimeAndAttendance.objects.filter(
-                    employee=employee,
-                    clock_in__date__gte=period.start_date,
-                    clock_in__date__lte=period.end_date,
-                    is_approved=True
-                )
-                regular_hours = attendance.aggregate(total=Sum('regular_hours'))['total'] or Decimal('0.00')
-                overtime_hours = attendance.aggregate(total=Sum('overtime_hours'))['total'] or Decimal('0.00')
-                base_pay = regular_hours * employee.base_salary
-                overtime_pay = overtime_hours * employee.base_salary * Decimal('1.5')
-            else:
-                base_pay = employee.base_salary
-                regular_hours = Decimal('0.00')
-                overtime_hours = Decimal('0.00')
-
-            # Create payroll run
-            payroll_run = PayrollRun.objects.create(
-                payroll_period=period,
-                employee=employee,
-                regular_hours=regular_hours,
-                overtime_hours=overtime_hours,
-                base_pay=base_pay,
-                overtime_pay=overtime_pay if employee.salary_type == 'hourly' else Decimal('0.00'),
-                bonus=Decimal('0.00'),
-                commission=Decimal('0.00'),
-                allowances=Decimal('0.00'),
-                gross_pay=base_pay,
-                total_deductions=Decimal('0.00'),
-                net_pay=base_pay
-            )
+        job.refresh_from_db()  # already processed when no worker consumes the broker
+        if job.status == 'completed':
+            return Response({
+                'message': f'Payroll processed successfully for {job.runs_created} employees',
+                'payroll_runs_created': job.runs_created,
+                'job': PayrollJobSerializer(job).data
+            })
+        return Response({
+            'message': f'Payroll processing queued for {job.total_employees} employees',
+            'job': PayrollJobSerializer(job).data
+        }, status=status.HTTP_202_ACCEPTED)
 
-            # Add standard deductions (income tax, social security, etc.)
-            # Income tax (example: 10% for simplicity)
-            income_tax = base_pay * Decimal('0.10')
-            PayrollDeduction.objects.create(
-                payroll_run=payroll_run,
-                deduction_type='income_tax',
-                description='Income Tax (10%)',
-                amount=income_tax,
-                is_mandatory=True
-            )
+    @action(detail=True, methods=['get'])
+    def process_status(self, request, pk=None):
+        """Progress of the latest payroll processing job of the period"""
+        period = self.get_object()
+        job = period.processing_jobs.order_by('-created_at').first()
 
-            # Social security (example: 5%)
-            social_security = base_pay * Decimal('0.05')
-            PayrollDeduction.objects.create(
-                payroll_run=payroll_run,
-                deduction_type='social_security',
-                description='Social Security (5%)',
-                amount=social_security,
-                is_mandatory=True
+        if job is None:
+            return Response(
+                {'error': 'Payroll has not been processed for this period'},
+                status=status.HTTP_404_NOT_FOUND
             )
 
-            # Recalculate totals
-            payroll_run.calculate_totals()
-            created_count += 1
-
-        period.status = 'processed'
-        period.processed_by = request.user
-        period.processed_at = timezone.now()
-        period.save()
-
-        return Response({
-            'message': f'Payroll processed successfully for {created_count} employees',
-            'payroll_runs_created': created_count
-        })
+        return Response(PayrollJobSerializer(job).data)
 
     @action(detail=True, methods=['post'])
     def approve_all(self, request, pk=None):
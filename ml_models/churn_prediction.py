@@ -1,11 +1,11 @@
 """
 Enhanced Employee Churn Prediction using Logistic Regression
-Lightweight model - calculated on-the-fly, no model persistence
+Features come from the set-based FeatureStore (all active employees);
+the fitted model is trained in the background and loaded from the ModelRegistry
 """
 from sklearn.linear_model import LogisticRegression
 from sklearn.preprocessing import StandardScaler
 from django.utils import timezone
-from datetime import timedelta
 import numpy as np
 
 
@@ -15,119 +15,48 @@ class ChurnPredictor:
     More sophisticated than rule-based approach in hr/ai_insights.py
     """
 
+    MODEL_NAME = 'churn_prediction'
+    LOOKBACK_DAYS = 90
+
     @staticmethod
-    def train_and_predict(organization):
+    def _proxy_labels(matrix):
+        """
+        Proxy churn labels: tenure < 180 days AND (punctuality < 85% OR leave_count > 5),
+        or repeated payroll issues
+        """
+        tenure_days = matrix.column('tenure_days')
+        attendance_rate = matrix.column('attendance_rate')
+        leave_count = matrix.column('leave_count')
+        payroll_issues = matrix.column('payroll_issues')
+        return (
+            ((tenure_days < 180) & ((attendance_rate < 85) | (leave_count > 5))) |
+            (payroll_issues > 2)
+        ).astype(int)
+
+    @staticmethod
+    def train(organization, variant='default'):
         """
-        Train churn prediction model and predict for all employees
+        Fit the scaler and Logistic Regression model and store them in the model registry
+        (runs in the train_ml_model Celery task, or in-process without a worker broker)
 
         Args:
-            organization: Organization to analyze
+            organization: Organization to train for
 
         Returns:
-            dict: Churn predictions with probabilities
+            dict: Stored artifact metadata, or a status dict when training is not possible
         """
-        from hr.models import Employee, Attendance, PerformanceReview, LeaveRequest
-        from core.models import Payroll
-
-        employees = Employee.objects.filter(
-            organization=organization,
-            status='active'
-        )
+        from .feature_store import FeatureStore
+        from .registry import ModelRegistry
 
-        if employees.count() < 10:
+        matrix = FeatureStore.employee_features(organization, lookback_days=ChurnPredictor.LOOKBACK_DAYS)
+        if len(matrix) < 10:
             return {
                 'status': 'insufficient_data',
                 'message': 'Need at least 10 employees for ML churn prediction'
             }
 
-        # Prepare training data
-        X = []  # Features
-        y = []  # Labels (1 = churned, 0 = stayed) - we'll use proxy indicators
-        employee_data = []
-        lookback_days = 90
-
-        start_date = timezone.now() - timedelta(days=lookback_days)
-
-        for employee in employees[:100]:  # Limit to 100 to avoid memory issues
-            user = employee.user
-
-            # Feature 1: Tenure (days since joining)
-            tenure_days = (timezone.now().date() - employee.joining_date).days if employee.joining_date else 0
-
-            # Feature 2: Attendance rate
-            total_attendance = Attendance.objects.filter(
-                employee=user,
-                date__gte=start_date
-            ).count()
-            present_attendance = Attendance.objects.filter(
-                employee=user,
-                date__gte=start_date,
-                status='present'
-            ).count()
-            attendance_rate = (present_attendance / total_attendance * 100) if total_attendance > 0 else 100
-
-            # Feature 3: Performance score (average of recent reviews)
-            recent_reviews = PerformanceReview.objects.filter(
-                employee=user,
-                review_date__gte=start_date - timedelta(days=180)
-            ).order_by('-review_date')[:3]
-            avg_performance = np.mean([r.overall_rating for r in recent_reviews]) if recent_reviews.exists() else 3.0
-
-            # Feature 4: Leave request frequency
-            leave_count = LeaveRequest.objects.filter(
-                employee=user,
-                start_date__gte=start_date
-            ).count()
-
-            # Feature 5: Payroll issues (late/failed payments)
-            payroll_issues = Payroll.objects.filter(
-                employee=user,
-                status__in=['failed', 'pending'],
-                created_at__gte=start_date
-            ).count()
-
-            # Feature 6: Employment type (0 = permanent, 1 = temporary)
-            is_temporary = 1 if employee.employment_type in ['temporary', 'contract'] else 0
-
-            # Create feature vector
-            features = [
-                tenure_days,
-                attendance_rate,
-                avg_performance,
-                leave_count,
-                payroll_issues,
-                is_temporary
-            ]
-
-            X.append(features)
-
-            # Label (proxy): High risk indicators
-            # If tenure < 180 days AND (attendance < 85% OR performance < 2.5 OR leave_count > 5)
-            is_high_risk = (
-                (tenure_days < 180 and (attendance_rate < 85 or avg_performance < 2.5 or leave_count > 5)) or
-                (payroll_issues > 2)
-            )
-            y.append(1 if is_high_risk else 0)
-
-            employee_data.append({
-                'employee_id': str(employee.user.uid),
-                'employee_name': employee.user.full_name,
-                'features': features
-            })
-
-        if len(X) < 10:
-            return {
-                'status': 'insufficient_data',
-                'message': 'Insufficient employee data for ML prediction'
-            }
-
-        # Convert to numpy arrays
-        X = np.array(X)
-        y = np.array(y)
-
-        # Check if we have both classes
+        y = ChurnPredictor._proxy_labels(matrix)
         if len(np.unique(y)) < 2:
-            # All employees in same class, use rule-based fallback
             return {
                 'status': 'homogeneous_data',
                 'message': 'All employees have similar risk profile. Using statistical analysis instead.',
@@ -135,18 +64,77 @@ class ChurnPredictor:
                 'low_risk_count': int(len(y) - y.sum())
             }
 
-        # Standardize features
+        # Standardize features and train Logistic Regression model
         scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
-
-        # Train Logistic Regression model
+        X_scaled = scaler.fit_transform(matrix.X)
         model = LogisticRegression(random_state=42, max_iter=1000)
         model.fit(X_scaled, y)
 
+        return ModelRegistry.save(
+            ChurnPredictor.MODEL_NAME,
+            organization.pk,
+            {'scaler': scaler, 'model': model},
+            feature_names=matrix.feature_names,
+            metrics={
+                'accuracy': round(float(model.score(X_scaled, y)), 4),
+                'positive_rate': round(float(y.mean()), 4),
+                'samples': int(len(y)),
+            },
+            training_stats=ModelRegistry.training_stats(matrix.X),
+            variant=variant,
+        )
+
+    @staticmethod
+    def train_and_predict(organization):
+        """Backwards-compatible name for predict (training now happens in the background)"""
+        return ChurnPredictor.predict(organization)
+
+    @staticmethod
+    def predict(organization):
+        """
+        Predict churn for all employees with the organization's stored model
+
+        Args:
+            organization: Organization to analyze
+
+        Returns:
+            dict: Churn predictions with probabilities
+        """
+        from .feature_store import FeatureStore
+        from .registry import ModelRegistry
+
+        matrix = FeatureStore.employee_features(organization, lookback_days=ChurnPredictor.LOOKBACK_DAYS)
+
+        if len(matrix) < 10:
+            return {
+                'status': 'insufficient_data',
+                'message': 'Need at least 10 employees for ML churn prediction'
+            }
+
+        artifact = ModelRegistry.load(ChurnPredictor.MODEL_NAME, organization.pk)
+        retrain_reason = ModelRegistry.needs_retraining(artifact, matrix.X, matrix.feature_names)
+        if retrain_reason and ModelRegistry.request_training(
+            ChurnPredictor.MODEL_NAME, organization.pk, reason=retrain_reason
+        ) == 'trained':
+            artifact, retrain_reason = ModelRegistry.load(ChurnPredictor.MODEL_NAME, organization.pk), None
+        if artifact is None or retrain_reason == 'schema_changed':
+            return {
+                'status': 'model_training',
+                'message': 'Churn model is being trained. Try again in a few minutes.'
+            }
+
+        X_scaled = artifact.objects['scaler'].transform(matrix.X)
+        model = artifact.objects['model']
+
         # Predict churn probabilities
         churn_probabilities = model.predict_proba(X_scaled)[:, 1]  # Probability of class 1 (churn)
         predictions = model.predict(X_scaled)
 
+        employee_data = [
+            {'employee_id': employee_id, 'employee_name': matrix.labels[employee_id]}
+            for employee_id in matrix.entity_ids
+        ]
+
         # Compile results
         prediction_results = []
         for i, emp_data in enumerate(employee_data):
@@ -187,7 +175,9 @@ class ChurnPredictor:
             'total_employees_analyzed': len(employee_data),
             'high_risk_count': high_risk_count,
             'critical_risk_count': critical_count,
-            'model_accuracy': 'N/A (unsupervised proxy labels)',
+            'model_accuracy': artifact.meta['metrics'].get('accuracy'),
+            'model_version': artifact.version,
+            'model_trained_at': artifact.meta['trained_at'],
             'top_at_risk_employees': top_at_risk,
             'all_predictions': prediction_results,
             'recommendations': _generate_churn_recommendations(critical_count, high_risk_count, len(employee_data)),
@@ -206,7 +196,7 @@ class ChurnPredictor:
             dict: Churn prediction for the employee
         """
         # Run full prediction and filter for this employee
-        org_predictions = ChurnPredictor.train_and_predict(employee.organization)
+        org_predictions = ChurnPredictor.predict(employee.organization)
 
         if org_predictions['status'] != 'predicted':
             return org_predictions
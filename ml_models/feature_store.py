@@ -0,0 +1,222 @@
+"""
+Feature Store for ML models
+Builds per-organization feature matrices with one grouped SQL query per
+feature family (keyed by entity id) and caches them as NumPy arrays.
+Query count is independent of the number of patients/employees.
+"""
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+FEATURE_CACHE_TIMEOUT = 1800  # 30 minutes; writes invalidate earlier (see ai/signals.py)
+
+
+@dataclass
+class FeatureMatrix:
+    """Feature matrix for one organization: row i of X describes entity_ids[i]"""
+    entity_ids: list
+    feature_names: tuple
+    X: np.ndarray
+    labels: dict = field(default_factory=dict)  # entity id -> display name
+    built_at: object = None
+
+    def __len__(self):
+        return len(self.entity_ids)
+
+    def column(self, name):
+        return self.X[:, self.feature_names.index(name)]
+
+
+def _fill(target, index, rows, key, value):
+    """Write grouped query rows into a 1-D array (or matrix column view) by entity position"""
+    for row in rows:
+        position = index.get(row[key])
+        if position is not None:
+            target[position] = float(row[value] or 0)
+
+
+class FeatureStore:
+    """
+    Cached, set-based feature matrices
+
+    Cache keys carry a per-organization version; FeatureStore.invalidate bumps
+    it so every feature set of the organization is rebuilt on next access.
+    """
+
+    PATIENT_FEATURES = ('visit_count', 'avg_spending', 'completion_rate', 'prescription_count')
+    EMPLOYEE_FEATURES = (
+        'tenure_days', 'attendance_rate', 'late_count', 'leave_count', 'payroll_issues', 'is_temporary',
+    )
+
+    @staticmethod
+    def _version_key(organization_id):
+        return f"ml:features:version:{organization_id}"
+
+    @staticmethod
+    def invalidate(organization_id):
+        """Drop every cached feature matrix of an organization"""
+        key = FeatureStore._version_key(organization_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+    @staticmethod
+    def _cached(name, organization, builder, **params):
+        version = cache.get(FeatureStore._version_key(organization.pk)) or 0
+        suffix = ':'.join(f"{key}={value}" for key, value in sorted(params.items()))
+        cache_key = f"ml:features:{name}:{organization.pk}:{version}:{suffix}"
+        matrix = cache.get(cache_key)
+        if matrix is None:
+            matrix = builder(organization, **params)
+            cache.set(cache_key, matrix, FEATURE_CACHE_TIMEOUT)
+        return matrix
+
+    @staticmethod
+    def patient_features(organization, lookback_days=180):
+        """
+        Patient feature matrix (visits, spending per visit, completion rate, prescriptions)
+
+        Args:
+            organization: Participant whose affiliated patients are analyzed
+            lookback_days: Activity window in days
+
+        Returns:
+            FeatureMatrix: one row per active affiliated patient
+        """
+        return FeatureStore._cached(
+            'patients', organization, FeatureStore.build_patient_features, lookback_days=lookback_days
+        )
+
+    @staticmethod
+    def build_patient_features(organization, lookback_days=180):
+        from appointments.models import Appointment
+        from core.models import Participant, Transaction
+        from prescriptions.models import Prescription
+
+        start_date = timezone.now() - timedelta(days=lookback_days)
+        population = Participant.objects.filter(
+            role='patient',
+            affiliated_provider_id=organization.pk,
+            is_active=True,
+        )
+        patients = list(population.order_by('uid').values_list('uid', 'full_name'))
+        index = {uid: i for i, (uid, _) in enumerate(patients)}
+        names = FeatureStore.PATIENT_FEATURES
+        X = np.zeros((len(patients), len(names)))
+
+        if patients:
+            patient_ids = population.values('uid')
+            appointments = (
+                Appointment.objects.filter(patient__in=patient_ids, appointment_date__gte=start_date.date())
+                .values('patient')
+                .annotate(total=Count('id'), completed=Count('id', filter=Q(status='completed')))
+                .order_by()
+            )
+            totals = np.zeros(len(patients))
+            for row in appointments:
+                position = index.get(row['patient'])
+                if position is not None:
+                    X[position, 0] = row['completed']
+                    totals[position] = row['total']
+
+            spending = np.zeros(len(patients))
+            _fill(
+                spending, index,
+                Transaction.objects.filter(sender__in=patient_ids, status='completed', created_at__gte=start_date)
+                .values('sender').annotate(total=Sum('amount')).order_by(),
+                'sender', 'total',
+            )
+            _fill(
+                X[:, 3], index,
+                Prescription.objects.filter(patient__in=patient_ids, created_at__gte=start_date)
+                .values('patient').annotate(total=Count('id')).order_by(),
+                'patient', 'total',
+            )
+
+            X[:, 1] = spending / np.maximum(X[:, 0], 1)
+            X[:, 2] = np.divide(X[:, 0] * 100, totals, out=np.zeros(len(patients)), where=totals > 0)
+
+        return FeatureMatrix(
+            entity_ids=[str(uid) for uid, _ in patients],
+            feature_names=names,
+            X=X,
+            labels={str(uid): name for uid, name in patients},
+            built_at=timezone.now(),
+        )
+
+    @staticmethod
+    def employee_features(organization, lookback_days=90):
+        """
+        Employee feature matrix (tenure, punctuality, leave, payroll issues, contract type)
+
+        Args:
+            organization: Employer participant
+            lookback_days: Activity window in days
+
+        Returns:
+            FeatureMatrix: one row per active employee, keyed by the employee's participant uid
+        """
+        return FeatureStore._cached(
+            'employees', organization, FeatureStore.build_employee_features, lookback_days=lookback_days
+        )
+
+    @staticmethod
+    def build_employee_features(organization, lookback_days=90):
+        from hr.models import Employee, LeaveRequest, PayrollRun, TimeAndAttendance
+
+        now = timezone.now()
+        start_date = now - timedelta(days=lookback_days)
+        employees = list(
+            Employee.objects.filter(organization=organization, status='active')
+            .order_by('id')
+            .values_list('id', 'user_id', 'user__full_name', 'hire_date', 'employment_type')
+        )
+        index = {employee_id: i for i, (employee_id, *_) in enumerate(employees)}
+        names = FeatureStore.EMPLOYEE_FEATURES
+        X = np.zeros((len(employees), len(names)))
+
+        if employees:
+            today = now.date()
+            X[:, 0] = [(today - hire_date).days if hire_date else 0 for _, _, _, hire_date, _ in employees]
+            X[:, 5] = [1.0 if employment_type in ('temporary', 'contract') else 0.0 for *_, employment_type in employees]
+
+            scope = {'employee__organization': organization, 'employee__status': 'active'}
+            attendance = (
+                TimeAndAttendance.objects.filter(clock_in__gte=start_date, **scope)
+                .values('employee')
+                .annotate(total=Count('id'), late=Count('id', filter=Q(is_late=True) | Q(is_early_departure=True)))
+                .order_by()
+            )
+            X[:, 1] = 100.0  # no attendance records -> no evidence of absenteeism
+            for row in attendance:
+                position = index.get(row['employee'])
+                if position is not None and row['total']:
+                    X[position, 1] = (row['total'] - row['late']) / row['total'] * 100
+                    X[position, 2] = row['late']
+
+            _fill(
+                X[:, 3], index,
+                LeaveRequest.objects.filter(start_date__gte=start_date.date(), **scope)
+                .values('employee').annotate(total=Count('id')).order_by(),
+                'employee', 'total',
+            )
+            _fill(
+                X[:, 4], index,
+                PayrollRun.objects.filter(
+                    payment_status__in=['failed', 'pending'], created_at__gte=start_date, **scope
+                ).values('employee').annotate(total=Count('id')).order_by(),
+                'employee', 'total',
+            )
+
+        return FeatureMatrix(
+            entity_ids=[str(user_id) for _, user_id, *_ in employees],
+            feature_names=names,
+            X=X,
+            labels={str(user_id): name for _, user_id, name, *_ in employees},
+            built_at=now,
+        )
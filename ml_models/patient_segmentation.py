@@ -1,11 +1,12 @@
 """
 Patient Segmentation using K-Means Clustering
-Lightweight model - calculated on-the-fly, no model persistence
+Features come from the set-based FeatureStore (all affiliated patients);
+the fitted clustering is trained in the background and loaded from the ModelRegistry
 """
 from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
 from sklearn.preprocessing import StandardScaler
 from django.utils import timezone
-from datetime import timedelta
 import numpy as np
 
 
@@ -18,10 +19,62 @@ class PatientSegmentation:
     - Prescription adherence
     """
 
+    MODEL_NAME = 'patient_segmentation'
+    LOOKBACK_DAYS = 180  # Last 6 months
+
+    @staticmethod
+    def variant(n_clusters):
+        return f"k{n_clusters}"
+
+    @staticmethod
+    def train(organization, n_clusters=4):
+        """
+        Fit the scaler and K-Means model and store them in the model registry
+        (runs in the train_ml_model Celery task, or in-process without a worker broker)
+
+        Args:
+            organization: Organization to train for
+            n_clusters: Number of segments
+
+        Returns:
+            dict: Stored artifact metadata, or a status dict when training is not possible
+        """
+        from .feature_store import FeatureStore
+        from .registry import ModelRegistry
+
+        matrix = FeatureStore.patient_features(organization, lookback_days=PatientSegmentation.LOOKBACK_DAYS)
+        if len(matrix) < n_clusters:
+            return {
+                'status': 'insufficient_data',
+                'message': f'Need at least {n_clusters} patients for segmentation. Found: {len(matrix)}'
+            }
+
+        # Standardize features and apply K-Means clustering
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(matrix.X)
+        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+        cluster_labels = kmeans.fit_predict(X_scaled)
+
+        metrics = {'samples': len(matrix), 'inertia': round(float(kmeans.inertia_), 4)}
+        if 1 < len(np.unique(cluster_labels)) < len(matrix):
+            metrics['silhouette'] = round(float(silhouette_score(
+                X_scaled, cluster_labels, sample_size=min(len(matrix), 2000), random_state=42
+            )), 4)
+
+        return ModelRegistry.save(
+            PatientSegmentation.MODEL_NAME,
+            organization.pk,
+            {'scaler': scaler, 'model': kmeans},
+            feature_names=matrix.feature_names,
+            metrics=metrics,
+            training_stats=ModelRegistry.training_stats(matrix.X),
+            variant=PatientSegmentation.variant(n_clusters),
+        )
+
     @staticmethod
     def segment_patients(organization, n_clusters=4):
         """
-        Segment patients using K-Means clustering
+        Segment patients with the organization's stored K-Means model
 
         Args:
             organization: Organization to analyze patients for
@@ -30,84 +83,36 @@ class PatientSegmentation:
         Returns:
             dict: Patient segments with characteristics
         """
-        from core.models import Participant, Transaction
-        from appointments.models import Appointment
-        from prescriptions.models import Prescription
-
-        # Get patients affiliated with organization
-        patients = Participant.objects.filter(
-            role='patient',
-            affiliated_provider=organization,
-            is_active=True
-        )
+        from .feature_store import FeatureStore
+        from .registry import ModelRegistry
 
-        if patients.count() < n_clusters:
+        lookback_days = PatientSegmentation.LOOKBACK_DAYS
+        matrix = FeatureStore.patient_features(organization, lookback_days=lookback_days)
+
+        if len(matrix) < n_clusters:
             return {
                 'status': 'insufficient_data',
-                'message': f'Need at least {n_clusters} patients for segmentation. Found: {patients.count()}'
+                'message': f'Need at least {n_clusters} patients for segmentation. Found: {len(matrix)}'
             }
 
-        # Prepare features for each patient
-        patient_features = []
-        patient_ids = []
-        lookback_days = 180  # Last 6 months
-
-        start_date = timezone.now() - timedelta(days=lookback_days)
-
-        for patient in patients[:200]:  # Limit to 200 patients to avoid memory issues
-            # Feature 1: Visit frequency (appointments in last 6 months)
-            visit_count = Appointment.objects.filter(
-                patient=patient,
-                appointment_date__gte=start_date,
-                status='completed'
-            ).count()
-
-            # Feature 2: Average spending
-            transactions = Transaction.objects.filter(
-                sender=patient,
-                status='completed',
-                created_at__gte=start_date
-            )
-            total_spending = sum(float(t.amount) for t in transactions)
-            avg_spending = total_spending / max(visit_count, 1)
-
-            # Feature 3: Appointment completion rate
-            total_appointments = Appointment.objects.filter(
-                patient=patient,
-                appointment_date__gte=start_date
-            ).count()
-            completion_rate = (visit_count / total_appointments * 100) if total_appointments > 0 else 0
-
-            # Feature 4: Prescription count (engagement indicator)
-            prescription_count = Prescription.objects.filter(
-                patient=patient,
-                created_at__gte=start_date
-            ).count()
-
-            patient_features.append([
-                visit_count,
-                avg_spending,
-                completion_rate,
-                prescription_count
-            ])
-            patient_ids.append(str(patient.uid))
-
-        if len(patient_features) < n_clusters:
+        variant = PatientSegmentation.variant(n_clusters)
+        artifact = ModelRegistry.load(PatientSegmentation.MODEL_NAME, organization.pk, variant)
+        retrain_reason = ModelRegistry.needs_retraining(artifact, matrix.X, matrix.feature_names)
+        if retrain_reason and ModelRegistry.request_training(
+            PatientSegmentation.MODEL_NAME, organization.pk, variant, reason=retrain_reason
+        ) == 'trained':
+            artifact = ModelRegistry.load(PatientSegmentation.MODEL_NAME, organization.pk, variant)
+            retrain_reason = None
+        if artifact is None or retrain_reason == 'schema_changed':
             return {
-                'status': 'insufficient_data',
-                'message': f'Insufficient patient data for segmentation'
+                'status': 'model_training',
+                'message': 'Segmentation model is being trained. Try again in a few minutes.'
             }
 
-        # Convert to numpy array
-        X = np.array(patient_features)
-
-        # Standardize features
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
-
-        # Apply K-Means clustering
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        cluster_labels = kmeans.fit_predict(X_scaled)
+        # Feature columns: visits, spending per visit, completion rate, prescriptions
+        X = matrix.X
+        patient_ids = matrix.entity_ids
+        cluster_labels = artifact.objects['model'].predict(artifact.objects['scaler'].transform(X))
 
         # Analyze each cluster
         segments = []
@@ -167,6 +172,8 @@ class PatientSegmentation:
             'n_clusters': n_clusters,
             'lookback_period_days': lookback_days,
             'segments': segments,
+            'model_version': artifact.version,
+            'model_trained_at': artifact.meta['trained_at'],
             'generated_at': timezone.now()
         }
 
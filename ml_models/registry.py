@@ -0,0 +1,251 @@
+"""
+ML Model Registry
+Versioned, on-disk artifacts for fitted models (scalers, estimators)
+Training runs in Celery (ai.tasks), or in the requesting process when no worker
+consumes the broker (backend.celery.run_inline); request handlers otherwise only
+load and predict.
+
+Layout: <ML_ARTIFACT_ROOT>/<model>/<organization>/<variant>/v<N>/{model.joblib,meta.json}
+plus a LATEST file per variant holding the current version number.
+"""
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FILE = 'model.joblib'
+META_FILE = 'meta.json'
+LATEST_FILE = 'LATEST'
+KEEP_VERSIONS = 3
+MAX_LOADED = 64  # artifacts kept open per process (least recently used are dropped)
+
+MAX_ARTIFACT_AGE_DAYS = 7  # retrain at least weekly
+DRIFT_THRESHOLD = 0.5  # mean shift, in training standard deviations, that triggers retraining
+POPULATION_DRIFT = 0.2  # relative change in row count that triggers retraining
+
+
+@dataclass
+class ModelArtifact:
+    """A loaded artifact: fitted objects plus metadata (version, feature schema, metrics)"""
+    objects: dict
+    meta: dict
+
+    @property
+    def version(self):
+        return self.meta['version']
+
+    @property
+    def feature_names(self):
+        return tuple(self.meta.get('feature_names', ()))
+
+    def age_days(self):
+        trained_at = datetime.fromisoformat(self.meta['trained_at'])
+        return (timezone.now() - trained_at).total_seconds() / 86400
+
+
+_loaded = OrderedDict()  # (model, organization, variant) -> latest loaded ModelArtifact
+_loaded_lock = threading.Lock()
+
+
+class ModelRegistry:
+    """Save, load (memory-mapped, cached per process) and inspect model artifacts"""
+
+    @staticmethod
+    def root():
+        return Path(getattr(settings, 'ML_ARTIFACT_ROOT', Path(settings.BASE_DIR) / 'ml_artifacts'))
+
+    @staticmethod
+    def variant_dir(model_name, organization_id, variant='default'):
+        return ModelRegistry.root() / model_name / str(organization_id) / variant
+
+    @staticmethod
+    def latest_version(model_name, organization_id, variant='default'):
+        try:
+            return int((ModelRegistry.variant_dir(model_name, organization_id, variant) / LATEST_FILE).read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def save(model_name, organization_id, objects, feature_names=(), metrics=None, training_stats=None,
+             variant='default', extra=None):
+        """
+        Persist fitted objects as the next version and point LATEST at it
+
+        Args:
+            model_name: Registry name (e.g. 'churn_prediction')
+            organization_id: Owning organization uid
+            objects: dict of fitted estimators / arrays (joblib-serialized)
+            feature_names: Ordered feature schema the estimators expect
+            metrics: Training metrics (accuracy, rmse, ...)
+            training_stats: Feature means/stds and row count used for drift checks
+            variant: Parameter variant (e.g. 'h180' for a 180-day forecast window)
+            extra: Additional metadata needed at predict time
+
+        Returns:
+            dict: Metadata of the stored version
+        """
+        base = ModelRegistry.variant_dir(model_name, organization_id, variant)
+        base.mkdir(parents=True, exist_ok=True)
+        version = (ModelRegistry.latest_version(model_name, organization_id, variant) or 0) + 1
+        target = base / f'v{version}'
+        target.mkdir(parents=True, exist_ok=True)
+
+        joblib.dump(objects, target / ARTIFACT_FILE)
+        meta = {
+            'model_name': model_name,
+            'organization_id': str(organization_id),
+            'variant': variant,
+            'version': version,
+            'trained_at': timezone.now().isoformat(),
+            'feature_names': list(feature_names),
+            'metrics': metrics or {},
+            'training_stats': training_stats or {},
+            'extra': extra or {},
+        }
+        (target / META_FILE).write_text(json.dumps(meta, default=str))
+
+        # Atomic pointer swap: readers see either the old or the new version
+        pointer = base / f'{LATEST_FILE}.tmp'
+        pointer.write_text(str(version))
+        os.replace(pointer, base / LATEST_FILE)
+
+        ModelRegistry._prune(base, version)
+        logger.info(f"Stored {model_name} v{version} for {organization_id} ({variant}): {meta['metrics']}")
+        return meta
+
+    @staticmethod
+    def _prune(base, current_version):
+        import shutil
+
+        for path in base.glob('v*'):
+            try:
+                version = int(path.name[1:])
+            except ValueError:
+                continue
+            if version <= current_version - KEEP_VERSIONS:
+                shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def load(model_name, organization_id, variant='default'):
+        """
+        Load the latest artifact (memory-mapped arrays), cached per process until LATEST moves
+
+        Returns:
+            ModelArtifact or None when the model has never been trained
+        """
+        version = ModelRegistry.latest_version(model_name, organization_id, variant)
+        if version is None:
+            return None
+
+        key = (model_name, str(organization_id), variant)
+        path = ModelRegistry.variant_dir(model_name, organization_id, variant) / f'v{version}'
+        with _loaded_lock:
+            cached = _loaded.get(key)
+            if cached is not None and cached.version == version:
+                _loaded.move_to_end(key)
+                return cached
+            artifact = ModelArtifact(
+                objects=joblib.load(path / ARTIFACT_FILE, mmap_mode='r'),
+                meta=json.loads((path / META_FILE).read_text()),
+            )
+            _loaded[key] = artifact  # replaces the version LATEST pointed at before
+            _loaded.move_to_end(key)
+            while len(_loaded) > MAX_LOADED:
+                _loaded.popitem(last=False)
+        return artifact
+
+    @staticmethod
+    def training_stats(X):
+        """Column means/stds and row count of a training matrix (stored for drift detection)"""
+        if len(X) == 0:
+            return {'rows': 0, 'mean': [], 'std': []}
+        return {
+            'rows': int(len(X)),
+            'mean': [float(v) for v in np.mean(X, axis=0)],
+            'std': [float(v) for v in np.std(X, axis=0)],
+        }
+
+    @staticmethod
+    def needs_retraining(artifact, X=None, feature_names=()):
+        """
+        Decide whether an artifact should be retrained
+
+        Returns:
+            str or None: Reason ('missing', 'stale', 'schema_changed', 'population_drift', 'feature_drift')
+        """
+        if artifact is None:
+            return 'missing'
+        if artifact.age_days() > MAX_ARTIFACT_AGE_DAYS:
+            return 'stale'
+        if feature_names and tuple(feature_names) != artifact.feature_names:
+            return 'schema_changed'
+        if X is None:
+            return None
+
+        stats = artifact.meta.get('training_stats') or {}
+        trained_rows = stats.get('rows') or 0
+        if trained_rows and abs(len(X) - trained_rows) / trained_rows > POPULATION_DRIFT:
+            return 'population_drift'
+        if len(X) and stats.get('mean'):
+            mean = np.asarray(stats['mean'])
+            std = np.maximum(np.asarray(stats['std']), 1e-9)
+            if np.any(np.abs(np.mean(X, axis=0) - mean) / std > DRIFT_THRESHOLD):
+                return 'feature_drift'
+        return None
+
+    @staticmethod
+    def request_training(model_name, organization_id, variant='default', reason=''):
+        """
+        Queue a background training run (deduplicated for a few minutes)
+
+        Returns:
+            'queued', 'trained' (run in-process when no worker consumes the
+            broker) or None when a run is already pending or could not start
+        """
+        from django.core.cache import cache
+        from backend.celery import run_inline
+
+        lock_key = f"ml:training:{model_name}:{organization_id}:{variant}"
+        if not cache.add(lock_key, True, 300):
+            return None
+        from ai.tasks import train_ml_model
+        if run_inline():
+            try:
+                logger.info(train_ml_model(model_name, str(organization_id), variant))
+                return 'trained'
+            except Exception as e:
+                logger.error(f"{model_name} training for {organization_id} ({variant}) failed: {e}", exc_info=True)
+                return None
+        try:
+            train_ml_model.delay(model_name, str(organization_id), variant)
+            logger.info(f"Queued {model_name} training for {organization_id} ({variant}): {reason}")
+            return 'queued'
+        except Exception as e:
+            cache.delete(lock_key)
+            logger.warning(f"Could not queue {model_name} training for {organization_id}: {e}")
+            return None
+
+    @staticmethod
+    def list_artifacts():
+        """Metadata of the latest version of every stored model"""
+        root = ModelRegistry.root()
+        artifacts = []
+        for latest in root.glob(f'*/*/*/{LATEST_FILE}'):
+            try:
+                version = int(latest.read_text())
+                meta = json.loads((latest.parent / f'v{version}' / META_FILE).read_text())
+            except (OSError, ValueError):
+                continue
+            artifacts.append(meta)
+        return artifacts
@@ -1,13 +1,14 @@
 """
 Advanced Revenue Forecasting using Linear Regression with Seasonality
-Lightweight model - calculated on-the-fly, no model persistence
+The regression is fitted in the background and loaded from the ModelRegistry
 """
 from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
 from django.utils import timezone
-from datetime import timedelta, date
+from datetime import date, timedelta
 import numpy as np
 
+from analytics.timeseries import TimeSeries
+
 
 class AdvancedRevenueForecast:
     """
@@ -15,37 +16,38 @@ class AdvancedRevenueForecast:
     More sophisticated than simple moving averages
     """
 
+    MODEL_NAME = 'revenue_forecast'
+    FEATURE_NAMES = ('day_number', 'day_of_week', 'day_of_month', 'is_weekend', 'is_month_end')
+
     @staticmethod
-    def forecast_revenue(organization, days_forward=30, historical_days=180):
-        """
-        Forecast revenue using ML with seasonal adjustment
+    def variant(historical_days):
+        return f"h{historical_days}"
 
-        Args:
-            organization: Organization to forecast for
-            days_forward: Days to forecast (default 30)
-            historical_days: Historical period to analyze (default 180)
+    @staticmethod
+    def daily_revenue(organization, start_date, end_date):
+        """Completed revenue received per day (DailySeries), from one grouped query"""
+        from core.models import Transaction
+
+        return TimeSeries.load(
+            Transaction.objects.filter(recipient=organization, status='completed'),
+            'created_at', start_date, end_date, value_field='amount',
+        )
+
+    @staticmethod
+    def train(organization, historical_days=180):
+        """
+        Fit the seasonal regression on the last `historical_days` days and store it in the
+        model registry (runs in the train_ml_model Celery task, or in-process without a
+        worker broker)
 
         Returns:
-            dict: Revenue forecast with confidence intervals
+            dict: Stored artifact metadata, or a status dict when training is not possible
         """
-        from core.models import Transaction
+        from .registry import ModelRegistry
 
         end_date = timezone.now().date()
         start_date = end_date - timedelta(days=historical_days)
-
-        # Collect daily revenue data
-        daily_revenue = {}
-        current_date = start_date
-
-        while current_date <= end_date:
-            day_revenue = Transaction.objects.filter(
-                receiver=organization,
-                status='completed',
-                created_at__date=current_date
-            ).aggregate(total=models.Sum('amount'))['total'] or 0
-
-            daily_revenue[current_date] = float(day_revenue)
-            current_date += timedelta(days=1)
+        daily_revenue = AdvancedRevenueForecast.daily_revenue(organization, start_date, end_date)
 
         if len(daily_revenue) < 30:
             return {
@@ -53,74 +55,91 @@ class AdvancedRevenueForecast:
                 'message': 'Need at least 30 days of revenue data for ML forecasting'
             }
 
-        # Prepare features for ML model
-        X = []  # Features: [day_number, day_of_week, day_of_month, is_weekend]
-        y = []  # Target: revenue
-
-        dates = sorted(daily_revenue.keys())
-        for i, date_key in enumerate(dates):
-            day_of_week = date_key.weekday()  # 0 = Monday, 6 = Sunday
-            day_of_month = date_key.day
-            is_weekend = 1 if day_of_week >= 5 else 0
-            is_month_end = 1 if day_of_month >= 25 else 0
-
-            X.append([
-                i,  # Sequential day number (trend)
-                day_of_week,  # Seasonal: day of week
-                day_of_month,  # Seasonal: day of month
-                is_weekend,  # Binary: weekend effect
-                is_month_end  # Binary: month-end effect
-            ])
-            y.append(daily_revenue[date_key])
-
-        # Convert to numpy arrays
-        X = np.array(X)
-        y = np.array(y)
-
-        # Train Linear Regression model
+        # Features: [day_number, day_of_week, day_of_month, is_weekend, is_month_end]; target: revenue
+        X = TimeSeries.calendar_features(start_date, len(daily_revenue))
+        y = daily_revenue.values
+
         model = LinearRegression()
         model.fit(X, y)
 
         # Calculate model performance
-        y_pred_train = model.predict(X)
-        residuals = y - y_pred_train
-        rmse = np.sqrt(np.mean(residuals ** 2))
-        mae = np.mean(np.abs(residuals))
-
-        # Generate forecast for next N days
-        forecast_dates = []
-        forecast_values = []
-        last_day_number = len(dates)
-
-        for day in range(1, days_forward + 1):
-            forecast_date = end_date + timedelta(days=day)
-            day_of_week = forecast_date.weekday()
-            day_of_month = forecast_date.day
-            is_weekend = 1 if day_of_week >= 5 else 0
-            is_month_end = 1 if day_of_month >= 25 else 0
-
-            X_forecast = np.array([[
-                last_day_number + day,
-                day_of_week,
-                day_of_month,
-                is_weekend,
-                is_month_end
-            ]])
-
-            predicted_revenue = model.predict(X_forecast)[0]
-            predicted_revenue = max(0, predicted_revenue)  # Can't have negative revenue
-
-            forecast_dates.append(forecast_date)
-            forecast_values.append(predicted_revenue)
-
-        # Calculate confidence intervals (±1.96 * RMSE for 95% CI)
-        confidence_interval = 1.96 * rmse
+        residuals = y - model.predict(X)
+        rmse = float(np.sqrt(np.mean(residuals ** 2)))
+        mae = float(np.mean(np.abs(residuals)))
 
         # Detect trend
         recent_30_days = y[-30:]
         previous_30_days = y[-60:-30] if len(y) >= 60 else y[:30]
-        trend_change = (np.mean(recent_30_days) - np.mean(previous_30_days)) / np.mean(previous_30_days) * 100 if np.mean(previous_30_days) > 0 else 0
+        trend_change = TimeSeries.percent_change(recent_30_days, previous_30_days)
+
+        return ModelRegistry.save(
+            AdvancedRevenueForecast.MODEL_NAME,
+            organization.pk,
+            {'model': model},
+            feature_names=AdvancedRevenueForecast.FEATURE_NAMES,
+            metrics={
+                'rmse': round(rmse, 2),
+                'mae': round(mae, 2),
+                'r_squared': round(float(model.score(X, y)), 3),
+                'samples': len(y),
+            },
+            variant=AdvancedRevenueForecast.variant(historical_days),
+            extra={
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat(),
+                'avg_daily_revenue': round(float(np.mean(y)), 2),
+                'last_30_days_avg': round(float(np.mean(recent_30_days)), 2),
+                'trend_change_percent': round(float(trend_change), 1),
+            },
+        )
+
+    @staticmethod
+    def forecast_revenue(organization, days_forward=30, historical_days=180):
+        """
+        Forecast revenue using ML with seasonal adjustment
 
+        Args:
+            organization: Organization to forecast for
+            days_forward: Days to forecast (default 30)
+            historical_days: Historical period to analyze (default 180)
+
+        Returns:
+            dict: Revenue forecast with confidence intervals
+        """
+        from .registry import ModelRegistry
+
+        variant = AdvancedRevenueForecast.variant(historical_days)
+        artifact = ModelRegistry.load(AdvancedRevenueForecast.MODEL_NAME, organization.pk, variant)
+        retrain_reason = ModelRegistry.needs_retraining(artifact, feature_names=AdvancedRevenueForecast.FEATURE_NAMES)
+        if retrain_reason and ModelRegistry.request_training(
+            AdvancedRevenueForecast.MODEL_NAME, organization.pk, variant, reason=retrain_reason
+        ) == 'trained':
+            artifact = ModelRegistry.load(AdvancedRevenueForecast.MODEL_NAME, organization.pk, variant)
+            retrain_reason = None
+        if artifact is None or retrain_reason == 'schema_changed':
+            return {
+                'status': 'model_training',
+                'message': 'Revenue forecast model is being trained. Try again in a few minutes.'
+            }
+
+        model = artifact.objects['model']
+        metrics = artifact.meta['metrics']
+        extra = artifact.meta['extra']
+
+        # Day numbers continue from the training window so the trend term lines up
+        training_start = date.fromisoformat(extra['start_date'])
+        first_date = timezone.now().date() + timedelta(days=1)
+        forecast_dates = [first_date + timedelta(days=day) for day in range(days_forward)]
+        X_forecast = TimeSeries.calendar_features(
+            first_date, days_forward, first_day_number=(first_date - training_start).days
+        )
+        forecast_values = np.maximum(model.predict(X_forecast), 0.0)  # Can't have negative revenue
+
+        # Calculate confidence intervals (±1.96 * RMSE for 95% CI)
+        confidence_interval = 1.96 * metrics['rmse']
+        lower, upper = TimeSeries.confidence_band(forecast_values, metrics['rmse'])
+
+        trend_change = extra['trend_change_percent']
         if trend_change > 5:
             trend = 'increasing'
         elif trend_change < -5:
@@ -129,16 +148,16 @@ class AdvancedRevenueForecast:
             trend = 'stable'
 
         # Calculate total forecast
-        total_forecast = sum(forecast_values)
+        total_forecast = float(forecast_values.sum())
 
         # Daily forecast breakdown (first 7 days)
         daily_forecast = []
         for i in range(min(7, len(forecast_dates))):
             daily_forecast.append({
                 'date': forecast_dates[i].strftime('%Y-%m-%d'),
-                'predicted_revenue': round(forecast_values[i], 2),
-                'lower_bound': round(max(0, forecast_values[i] - confidence_interval), 2),
-                'upper_bound': round(forecast_values[i] + confidence_interval, 2)
+                'predicted_revenue': round(float(forecast_values[i]), 2),
+                'lower_bound': round(float(lower[i]), 2),
+                'upper_bound': round(float(upper[i]), 2)
             })
 
         return {
@@ -147,10 +166,10 @@ class AdvancedRevenueForecast:
             'forecast_period_days': days_forward,
             'historical_period_days': historical_days,
             'current_metrics': {
-                'avg_daily_revenue': round(np.mean(y), 2),
+                'avg_daily_revenue': extra['avg_daily_revenue'],
                 'trend': trend,
-                'trend_change_percent': round(trend_change, 1),
-                'last_30_days_avg': round(np.mean(recent_30_days), 2)
+                'trend_change_percent': trend_change,
+                'last_30_days_avg': extra['last_30_days_avg']
             },
             'forecast_summary': {
                 'total_predicted_revenue': round(total_forecast, 2),
@@ -159,16 +178,18 @@ class AdvancedRevenueForecast:
             },
             'daily_forecast': daily_forecast,
             'model_performance': {
-                'rmse': round(rmse, 2),
-                'mae': round(mae, 2),
-                'r_squared': round(model.score(X, y), 3)
+                'rmse': metrics['rmse'],
+                'mae': metrics['mae'],
+                'r_squared': metrics['r_squared']
             },
             'feature_importance': {
-                'trend_coefficient': round(model.coef_[0], 4),
-                'day_of_week_coefficient': round(model.coef_[1], 4),
-                'weekend_effect': round(model.coef_[3], 2),
-                'month_end_effect': round(model.coef_[4], 2)
+                'trend_coefficient': round(float(model.coef_[0]), 4),
+                'day_of_week_coefficient': round(float(model.coef_[1]), 4),
+                'weekend_effect': round(float(model.coef_[3]), 2),
+                'month_end_effect': round(float(model.coef_[4]), 2)
             },
+            'model_version': artifact.version,
+            'model_trained_at': artifact.meta['trained_at'],
             'generated_at': timezone.now()
         }
 
@@ -193,7 +214,7 @@ class AdvancedRevenueForecast:
             return ml_forecast
 
         # Get baseline forecast (from predictive_analytics.py)
-        baseline_forecast = PredictiveAnalytics.forecast_revenue(organization, days_forward)
+        baseline_forecast = PredictiveAnalytics.forecast_revenue(days_forward=days_forward)
 
         if baseline_forecast['status'] != 'forecasted':
             return {
@@ -242,6 +263,3 @@ def _get_forecast_recommendation(ml_forecast, baseline_forecast):
 
     return recommendation
 
-
-# Import django models for the forecast_revenue function
-from django.db import models
@@ -18,6 +18,7 @@ from .models import (
     Vendor,
     ExpenseCategory,
     VendorInvoice,
+    SettlementRun,
 )
 from .participant_payment_models import ParticipantPaymentMethod, PaymentMethodVerification
 
@@ -79,6 +80,23 @@ class DoctorPayoutAdmin(admin.ModelAdmin):  # Admin configuration for DoctorPayo
     date_hierarchy = "created_at"
 
 
+@admin.register(SettlementRun)
+class SettlementRunAdmin(admin.ModelAdmin):  # Admin configuration for SettlementRun model
+    list_display = (
+        "id",
+        "status",
+        "chunks_completed",
+        "payouts_released",
+        "schedules_created",
+        "total_amount",
+        "started_at",
+        "finished_at",
+    )
+    list_filter = ("status",)
+    readonly_fields = ("cursors", "completed_phases", "chunk_stats", "error", "started_at", "finished_at")
+    date_hierarchy = "started_at"
+
+
 @admin.register(PaymentReceipt)
 class PaymentReceiptAdmin(admin.ModelAdmin):  # Admin configuration for PaymentReceipt model
     list_display = ("id", "receipt_number", "issued_to", "issued_by", "issued_at")
@@ -307,12 +325,14 @@ class FedaPayWebhookEventAdmin(admin.ModelAdmin):  # Admin configuration for Fed
         "id",
         "event_type",
         "event_id",
+        "status",
+        "attempts",
         "processed",
         "created_at",
         "processed_at",
     )
-    list_filter = ("event_type", "processed", "created_at")
-    search_fields = ("event_type", "event_id")
+    list_filter = ("event_type", "status", "processed", "created_at")
+    search_fields = ("event_type", "event_id", "ordering_key")
     readonly_fields = ("created_at", "processed_at")
     date_hierarchy = "created_at"
     
@@ -327,6 +347,10 @@ class FedaPayWebhookEventAdmin(admin.ModelAdmin):  # Admin configuration for Fed
         }),
         ("Processing Status", {
             "fields": (
+                "status",
+                "ordering_key",
+                "attempts",
+                "next_attempt_at",
                 "processed",
                 "processing_error",
             )
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PaymentsConfig(AppConfig):  # PaymentsConfig class implementation
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'payments'
+
+    def ready(self):  # Import signals to pre-render receipts on payment completion
+        import payments.signals
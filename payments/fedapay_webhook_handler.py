@@ -1,6 +1,8 @@
 import logging
+from datetime import timedelta
 from decimal import Decimal
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import Min
 from django.utils import timezone
 from .models import (
     FedaPayCustomer,
@@ -14,81 +16,238 @@ from .fedapay_service import fedapay_service
 logger = logging.getLogger(__name__)
 
 
+# Retry schedule (seconds) for failed webhook events; once exhausted the event is dead-lettered
+WEBHOOK_RETRY_DELAYS = [30, 120, 600, 1800, 3600]
+WEBHOOK_MAX_ATTEMPTS = len(WEBHOOK_RETRY_DELAYS) + 1
+WEBHOOK_PENDING_STATUSES = ("received", "retrying")
+
+
 class FedaPayWebhookHandler:
     """Handle FedaPay webhook events"""
-    
+
     @staticmethod
-    @transaction.atomic
-    def handle_webhook(event_data: dict) -> bool:
+    def get_ordering_key(event_type: str, entity: dict) -> str:
+        """Events for the same FedaPay object are processed strictly in arrival order"""
+        object_type = (event_type or "").split(".")[0] or "unknown"
+        return f"{object_type}:{entity.get('id', '')}"
+
+    @staticmethod
+    def ingest_webhook(event_data: dict):
         """
-        Process incoming webhook event with idempotency guarantee.
+        Ack-fast path: store the verified event idempotently and enqueue processing.
 
-        ACID Compliance:
-        - Wrapped in @transaction.atomic for full ACID guarantees
-        - Uses select_for_update() with get_or_create to prevent race conditions
-        - Returns immediately if event already processed
-        - Ensures each webhook is processed exactly once
+        Returns (webhook_event, created). Duplicate deliveries return the stored
+        event without re-queuing it, so provider retry storms cost one indexed
+        lookup each instead of a full processing run.
         """
         event_type = event_data.get('type')
         entity = event_data.get('entity', {})
         event_id = event_data.get('id')
+        ordering_key = FedaPayWebhookHandler.get_ordering_key(event_type, entity)
+
+        with transaction.atomic():
+            if event_id is None:
+                webhook_event = FedaPayWebhookEvent.objects.create(
+                    event_type=event_type,
+                    payload=event_data,
+                    ordering_key=ordering_key,
+                )
+                created = True
+            else:
+                try:
+                    with transaction.atomic():
+                        webhook_event, created = FedaPayWebhookEvent.objects.get_or_create(
+                            event_id=event_id,
+                            defaults={
+                                'event_type': event_type,
+                                'payload': event_data,
+                                'ordering_key': ordering_key,
+                            }
+                        )
+                except IntegrityError:
+                    # Concurrent delivery of the same event won the insert race
+                    webhook_event = FedaPayWebhookEvent.objects.get(event_id=event_id)
+                    created = False
+
+            if created:
+                transaction.on_commit(
+                    lambda: FedaPayWebhookHandler._enqueue_processing(ordering_key)
+                )
+            else:
+                logger.info(f"Webhook event {event_id} already received (status={webhook_event.status}). Acknowledging.")
 
-        # IDEMPOTENCY: Use get_or_create with select_for_update to prevent duplicate processing
-        webhook_event, created = FedaPayWebhookEvent.objects.select_for_update().get_or_create(
-            event_id=event_id,
-            defaults={
-                'event_type': event_type,
-                'payload': event_data
-            }
-        )
+        return webhook_event, created
+
+    @staticmethod
+    def _enqueue_processing(ordering_key: str):
+        """
+        Hand the ordering key to the worker pool, or process it right away when
+        no worker consumes the broker (backend.celery.run_inline); events left
+        pending are retried by the periodic sweep or the key's next delivery
+        """
+        from backend.celery import run_inline
 
-        # If event already exists and was processed, return success (idempotent)
-        if not created:
-            if webhook_event.processed:
-                logger.info(f"Webhook event {event_id} already processed. Returning success (idempotent).")
-                return True
-            else:
-                logger.warning(f"Webhook event {event_id} exists but failed previous processing. Retrying...")
-        
         try:
-            if event_type == 'transaction.approved':
-                FedaPayWebhookHandler._handle_transaction_approved(entity, webhook_event)
-                FedaPayWebhookHandler._handle_gateway_transaction_approved(entity, webhook_event)
-            elif event_type == 'transaction.canceled':
-                FedaPayWebhookHandler._handle_transaction_canceled(entity, webhook_event)
-                FedaPayWebhookHandler._handle_gateway_transaction_canceled(entity, webhook_event)
-            elif event_type == 'transaction.declined':
-                FedaPayWebhookHandler._handle_transaction_declined(entity, webhook_event)
-                FedaPayWebhookHandler._handle_gateway_transaction_declined(entity, webhook_event)
-            elif event_type == 'transaction.failed':
-                FedaPayWebhookHandler._handle_transaction_failed(entity, webhook_event)
-                FedaPayWebhookHandler._handle_gateway_transaction_failed(entity, webhook_event)
-            elif event_type == 'transaction.refunded':
-                FedaPayWebhookHandler._handle_transaction_refunded(entity, webhook_event)
-            elif event_type == 'transaction.started':
-                FedaPayWebhookHandler._handle_transaction_started(entity, webhook_event)
-            elif event_type == 'transaction.pending':
-                FedaPayWebhookHandler._handle_transaction_pending(entity, webhook_event)
-            elif event_type == 'transaction.processing':
-                FedaPayWebhookHandler._handle_transaction_processing(entity, webhook_event)
-            elif event_type == 'payout.sent':
-                FedaPayWebhookHandler._handle_payout_sent(entity, webhook_event)
-            elif event_type == 'payout.failed':
-                FedaPayWebhookHandler._handle_payout_failed(entity, webhook_event)
+            if run_inline():
+                FedaPayWebhookHandler.process_pending_events(ordering_key=ordering_key)
             else:
-                logger.warning(f"Unknown webhook event type: {event_type}")
-            
-            webhook_event.processed = True
-            webhook_event.processed_at = timezone.now()
-            webhook_event.save()
+                from .tasks import process_fedapay_webhook_events
+                process_fedapay_webhook_events.delay(ordering_key=ordering_key)
+        except Exception as e:
+            logger.warning(f"Could not process webhook events for {ordering_key}: {e}")
+
+    @staticmethod
+    def handle_webhook(event_data: dict) -> bool:
+        """
+        Store and process a webhook event synchronously.
+
+        Kept for callers that need the result inline (tests, manual replays);
+        the HTTP endpoint uses ingest_webhook(), which processes after commit.
+        """
+        webhook_event, created = FedaPayWebhookHandler.ingest_webhook(event_data)
+        if webhook_event.processed:
+            logger.info(f"Webhook event {webhook_event.event_id} already processed. Returning success (idempotent).")
             return True
-            
+        FedaPayWebhookHandler.process_pending_events(ordering_key=webhook_event.ordering_key)
+        webhook_event.refresh_from_db()
+        return webhook_event.processed
+
+    @staticmethod
+    def process_pending_events(ordering_key: str = None, limit: int = 500) -> dict:
+        """
+        Processing path: drain pending events, in order per ordering key.
+
+        Each key is owned by at most one worker at a time (the head event row is
+        locked with SKIP LOCKED), and a failing head event blocks later events for
+        the same key until it succeeds or is dead-lettered.
+        """
+        pending = FedaPayWebhookEvent.objects.filter(
+            status__in=WEBHOOK_PENDING_STATUSES,
+            processed=False,
+        )
+        if ordering_key is not None:
+            keys = [ordering_key]
+        else:
+            # Oldest waiting key first; order_by() replaces Meta ordering so DISTINCT stays per key
+            keys = list(
+                pending.values('ordering_key')
+                .annotate(oldest=Min('created_at'))
+                .order_by('oldest', 'ordering_key')
+                .values_list('ordering_key', flat=True)[:limit]
+            )
+
+        stats = {'processed': 0, 'failed': 0, 'dead_letter': 0, 'keys': len(keys)}
+        for key in keys:
+            key_stats = FedaPayWebhookHandler._process_ordering_key(key, limit)
+            for name, count in key_stats.items():
+                stats[name] += count
+        return stats
+
+    @staticmethod
+    def _process_ordering_key(ordering_key: str, limit: int) -> dict:
+        stats = {'processed': 0, 'failed': 0, 'dead_letter': 0}
+        for _ in range(limit):
+            head = FedaPayWebhookEvent.objects.filter(
+                ordering_key=ordering_key,
+                status__in=WEBHOOK_PENDING_STATUSES,
+                processed=False,
+            ).order_by('created_at', 'id').values_list('id', flat=True).first()
+            if head is None:
+                break
+
+            with transaction.atomic():
+                webhook_event = FedaPayWebhookEvent.objects.select_for_update(
+                    skip_locked=True
+                ).filter(
+                    id=head,
+                    status__in=WEBHOOK_PENDING_STATUSES,
+                ).first()
+                if webhook_event is None:
+                    # Another worker owns this key right now
+                    break
+                if webhook_event.next_attempt_at and webhook_event.next_attempt_at > timezone.now():
+                    # Head is waiting for its retry slot; keep later events queued behind it
+                    break
+
+                outcome = FedaPayWebhookHandler.process_event(webhook_event)
+                stats[outcome] += 1
+                if outcome == 'failed':
+                    break
+        return stats
+
+    @staticmethod
+    def process_event(webhook_event) -> str:
+        """
+        Run the handlers for one stored event and record the outcome.
+
+        Must be called inside a transaction holding the event row lock. Returns
+        'processed', 'failed' (scheduled for retry) or 'dead_letter'.
+        """
+        event_data = webhook_event.payload
+        event_type = event_data.get('type')
+        entity = event_data.get('entity', {})
+        webhook_event.attempts += 1
+
+        try:
+            with transaction.atomic():
+                FedaPayWebhookHandler._dispatch(event_type, entity, webhook_event)
         except Exception as e:
-            logger.error(f"Error processing webhook: {str(e)}")
+            logger.error(f"Error processing webhook {webhook_event.event_id} (attempt {webhook_event.attempts}): {str(e)}")
             webhook_event.processing_error = str(e)
-            webhook_event.save()
-            return False
-    
+            if webhook_event.attempts >= WEBHOOK_MAX_ATTEMPTS:
+                webhook_event.status = 'dead_letter'
+                webhook_event.next_attempt_at = None
+                outcome = 'dead_letter'
+                logger.error(f"Webhook event {webhook_event.event_id} moved to dead letter after {webhook_event.attempts} attempts")
+            else:
+                delay = WEBHOOK_RETRY_DELAYS[webhook_event.attempts - 1]
+                webhook_event.status = 'retrying'
+                webhook_event.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+                outcome = 'failed'
+            webhook_event.save(update_fields=[
+                'attempts', 'status', 'next_attempt_at', 'processing_error', 'updated_at'
+            ])
+            return outcome
+
+        webhook_event.status = 'processed'
+        webhook_event.processed = True
+        webhook_event.processed_at = timezone.now()
+        webhook_event.next_attempt_at = None
+        webhook_event.processing_error = ''
+        webhook_event.save(update_fields=[
+            'attempts', 'status', 'processed', 'processed_at', 'next_attempt_at', 'processing_error', 'updated_at'
+        ])
+        return 'processed'
+
+    @staticmethod
+    def _dispatch(event_type: str, entity: dict, webhook_event):
+        if event_type == 'transaction.approved':
+            FedaPayWebhookHandler._handle_transaction_approved(entity, webhook_event)
+            FedaPayWebhookHandler._handle_gateway_transaction_approved(entity, webhook_event)
+        elif event_type == 'transaction.canceled':
+            FedaPayWebhookHandler._handle_transaction_canceled(entity, webhook_event)
+            FedaPayWebhookHandler._handle_gateway_transaction_canceled(entity, webhook_event)
+        elif event_type == 'transaction.declined':
+            FedaPayWebhookHandler._handle_transaction_declined(entity, webhook_event)
+            FedaPayWebhookHandler._handle_gateway_transaction_declined(entity, webhook_event)
+        elif event_type == 'transaction.failed':
+            FedaPayWebhookHandler._handle_transaction_failed(entity, webhook_event)
+            FedaPayWebhookHandler._handle_gateway_transaction_failed(entity, webhook_event)
+        elif event_type == 'transaction.refunded':
+            FedaPayWebhookHandler._handle_transaction_refunded(entity, webhook_event)
+        elif event_type == 'transaction.started':
+            FedaPayWebhookHandler._handle_transaction_started(entity, webhook_event)
+        elif event_type == 'transaction.pending':
+            FedaPayWebhookHandler._handle_transaction_pending(entity, webhook_event)
+        elif event_type == 'transaction.processing':
+            FedaPayWebhookHandler._handle_transaction_processing(entity, webhook_event)
+        elif event_type == 'payout.sent':
+            FedaPayWebhookHandler._handle_payout_sent(entity, webhook_event)
+        elif event_type == 'payout.failed':
+            FedaPayWebhookHandler._handle_payout_failed(entity, webhook_event)
+        else:
+            logger.warning(f"Unknown webhook event type: {event_type}")
+
     @staticmethod
     @transaction.atomic
     def _handle_transaction_approved(entity: dict, webhook_event):
@@ -4,15 +4,29 @@ from django.conf import settings
 class FeeCalculationService:
     """Service for calculating fees and taxes for BINTACURA transactions"""
     
-    # Fee Configuration
-    PLATFORM_FEE_PERCENTAGE = Decimal('0.01')  # 1% platform fee
-    TAX_RATE = Decimal('0.18')  # 18% VAT (adjust based on your country)
+    # Fee and tax rates come from SystemConfiguration (see get_fee_config)
     
     # Transaction types that incur fees
     FEE_EXEMPT_TYPES = ['deposit']
     
     @staticmethod
-    def calculate_fees(amount: Decimal, transaction_type: str, include_tax: bool = True) -> dict:
+    def get_fee_config() -> dict:
+        """
+        Snapshot the fee and tax rates from the active SystemConfiguration.
+
+        SystemConfiguration stores percentages (1.00 = 1%); the snapshot holds
+        rates so it can be passed straight to calculate_fees / calculate_fees_batch.
+        """
+        from core.system_config import SystemConfiguration
+
+        config = SystemConfiguration.get_active_config()
+        return {
+            'platform_fee_rate': Decimal(str(config.platform_fee_percentage)) / 100,
+            'tax_rate': Decimal(str(config.tax_percentage)) / 100,
+        }
+
+    @staticmethod
+    def calculate_fees(amount: Decimal, transaction_type: str, include_tax: bool = True, fee_config: dict = None) -> dict:
         """
         Calculate platform fees and taxes for a transaction
         
@@ -20,6 +34,7 @@ class FeeCalculationService:
             amount: Transaction amount
             transaction_type: Type of transaction
             include_tax: Whether to include tax calculation
+            fee_config: Optional rate snapshot from get_fee_config() (read when omitted)
             
         Returns:
             dict with fee breakdown:
@@ -34,6 +49,10 @@ class FeeCalculationService:
             }
         """
         amount = Decimal(str(amount))
+        if fee_config is None:
+            fee_config = FeeCalculationService.get_fee_config()
+        platform_fee_rate = fee_config['platform_fee_rate']
+        tax_rate = fee_config['tax_rate']
         
         # No fees for wallet top-ups
         if transaction_type in FeeCalculationService.FEE_EXEMPT_TYPES:
@@ -54,12 +73,12 @@ class FeeCalculationService:
             }
         
         # Calculate platform fee (1% of transaction amount)
-        platform_fee = (amount * FeeCalculationService.PLATFORM_FEE_PERCENTAGE).quantize(Decimal('0.01'))
+        platform_fee = (amount * platform_fee_rate).quantize(Decimal('0.01'))
         
         # Calculate tax on platform fee if applicable
         tax_on_fee = Decimal('0')
         if include_tax:
-            tax_on_fee = (platform_fee * FeeCalculationService.TAX_RATE).quantize(Decimal('0.01'))
+            tax_on_fee = (platform_fee * tax_rate).quantize(Decimal('0.01'))
         
         total_fee = platform_fee + tax_on_fee
         net_amount = amount - total_fee
@@ -72,14 +91,111 @@ class FeeCalculationService:
             'net_amount': net_amount,
             'gross_amount': amount,
             'fee_breakdown': {
-                'platform_fee_percentage': f'{FeeCalculationService.PLATFORM_FEE_PERCENTAGE * 100}%',
+                'platform_fee_percentage': f'{platform_fee_rate * 100}%',
                 'platform_fee': platform_fee,
-                'tax_rate': f'{FeeCalculationService.TAX_RATE * 100}%' if include_tax else '0%',
+                'tax_rate': f'{tax_rate * 100}%' if include_tax else '0%',
                 'tax_on_fee': tax_on_fee,
                 'total_deducted': total_fee
             }
         }
     
+    @staticmethod
+    def calculate_fees_batch(amounts, transaction_types, include_tax: bool = True, fee_config: dict = None) -> dict:
+        """
+        Calculate fees for many transactions at once (payout summaries, settlement jobs)
+        
+        Rates are snapshotted once (from SystemConfiguration unless fee_config is
+        given) and every row is computed with the same Decimal quantization as
+        calculate_fees, so each row matches the scalar result exactly.
+        
+        Args:
+            amounts: Sequence of transaction amounts
+            transaction_types: Sequence of transaction types (same length), or one type for all rows
+            include_tax: Whether to include tax calculation
+            fee_config: Optional rate snapshot from get_fee_config()
+            
+        Returns:
+            dict with columnar per-row values and aggregates:
+            {
+                'amount': [...], 'platform_fee': [...], 'tax': [...],
+                'total_fee': [...], 'net_amount': [...],
+                'totals': {'count', 'amount', 'platform_fee', 'tax', 'total_fee', 'net_amount'},
+                'by_type': {transaction_type: totals},
+                'config': rates used
+            }
+        """
+        if fee_config is None:
+            fee_config = FeeCalculationService.get_fee_config()
+        if isinstance(transaction_types, str):
+            transaction_types = [transaction_types] * len(amounts)
+        if len(transaction_types) != len(amounts):
+            raise ValueError("amounts and transaction_types must have the same length")
+
+        platform_fee_rate = fee_config['platform_fee_rate']
+        tax_rate = fee_config['tax_rate'] if include_tax else None
+        exempt_types = set(FeeCalculationService.FEE_EXEMPT_TYPES)
+        cent = Decimal('0.01')
+        zero = Decimal('0')
+
+        amount_col, fee_col, tax_col, total_col, net_col = [], [], [], [], []
+        by_type = {}
+        for raw_amount, transaction_type in zip(amounts, transaction_types):
+            amount = raw_amount if type(raw_amount) is Decimal else Decimal(str(raw_amount))
+            if transaction_type in exempt_types:
+                platform_fee = tax_on_fee = zero
+            else:
+                platform_fee = (amount * platform_fee_rate).quantize(cent)
+                tax_on_fee = (platform_fee * tax_rate).quantize(cent) if tax_rate is not None else zero
+            total_fee = platform_fee + tax_on_fee
+            net_amount = amount - total_fee
+
+            amount_col.append(amount)
+            fee_col.append(platform_fee)
+            tax_col.append(tax_on_fee)
+            total_col.append(total_fee)
+            net_col.append(net_amount)
+
+            type_totals = by_type.get(transaction_type)
+            if type_totals is None:
+                type_totals = by_type[transaction_type] = FeeCalculationService._empty_fee_totals()
+            type_totals['count'] += 1
+            type_totals['amount'] += amount
+            type_totals['platform_fee'] += platform_fee
+            type_totals['tax'] += tax_on_fee
+            type_totals['total_fee'] += total_fee
+            type_totals['net_amount'] += net_amount
+
+        totals = FeeCalculationService._empty_fee_totals()
+        for type_totals in by_type.values():
+            for key in totals:
+                totals[key] += type_totals[key]
+
+        return {
+            'amount': amount_col,
+            'platform_fee': fee_col,
+            'tax': tax_col,
+            'total_fee': total_col,
+            'net_amount': net_col,
+            'totals': totals,
+            'by_type': by_type,
+            'config': {
+                'platform_fee_percentage': f'{platform_fee_rate * 100}%',
+                'tax_rate': f'{fee_config["tax_rate"] * 100}%' if include_tax else '0%',
+            },
+        }
+
+    @staticmethod
+    def _empty_fee_totals() -> dict:
+        zero = Decimal('0')
+        return {
+            'count': 0,
+            'amount': zero,
+            'platform_fee': zero,
+            'tax': zero,
+            'total_fee': zero,
+            'net_amount': zero,
+        }
+
     @staticmethod
     def calculate_service_payment_fees(service_amount: Decimal, payment_method: str = 'wallet') -> dict:
         """
@@ -125,19 +241,14 @@ class FeeCalculationService:
         Returns:
             dict with payout breakdown
         """
-        # Calculate fees on wallet transactions (1% + tax)
-        wallet_fees = FeeCalculationService.calculate_fees(
-            wallet_transactions_total,
-            'service_payment',
-            include_tax=True
-        )
-        
-        # Calculate fees on on-site transactions (1% + tax)
-        onsite_fees = FeeCalculationService.calculate_fees(
-            onsite_transactions_total,
+        # Fees on wallet and on-site totals (platform fee + tax), one rate snapshot
+        fees = FeeCalculationService.calculate_fees_batch(
+            [wallet_transactions_total, onsite_transactions_total],
             'service_payment',
             include_tax=True
         )
+        wallet_fees = {column: fees[column][0] for column in ('platform_fee', 'tax', 'total_fee')}
+        onsite_fees = {column: fees[column][1] for column in ('platform_fee', 'tax', 'total_fee')}
         
         total_platform_fees = wallet_fees['platform_fee'] + onsite_fees['platform_fee']
         total_tax = wallet_fees['tax'] + onsite_fees['tax']
@@ -166,8 +277,8 @@ class FeeCalculationService:
             'total_deductions': total_deductions,
             'net_payout_amount': net_payout,
             'fee_summary': {
-                'platform_fee_rate': '1%',
-                'tax_rate': f'{FeeCalculationService.TAX_RATE * 100}%',
+                'platform_fee_rate': fees['config']['platform_fee_percentage'],
+                'tax_rate': fees['config']['tax_rate'],
                 'total_transactions': wallet_transactions_count + onsite_transactions_count
             }
         }
@@ -0,0 +1,83 @@
+"""
+Pre-render receipt PDFs for settled transactions and benchmark downloads.
+
+Usage:
+    python manage.py render_receipts --days 30 --workers 4
+    python manage.py render_receipts --kind service --limit 500 --benchmark 50
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils import timezone
+
+from payments.receipt_render_service import RECEIPT_KINDS, ReceiptRenderService
+
+
+class Command(BaseCommand):
+    help = 'Render receipt PDFs in a process pool and report render/download throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=list(RECEIPT_KINDS) + ['all'], default='all')
+        parser.add_argument('--days', type=int, default=30, help='Only transactions created in the last N days')
+        parser.add_argument('--limit', type=int, default=1000, help='Maximum transactions per kind')
+        parser.add_argument('--workers', type=int, default=None, help='Pool size (defaults to CPU count)')
+        parser.add_argument(
+            '--benchmark',
+            type=int,
+            default=0,
+            help='Compare N live renders with N downloads of the stored files',
+        )
+
+    def handle(self, *args, **options):
+        kinds = list(RECEIPT_KINDS) if options['kind'] == 'all' else [options['kind']]
+        since = timezone.now() - timedelta(days=options['days'])
+
+        jobs = []
+        for kind in kinds:
+            model = ReceiptRenderService.get_model(kind)
+            settled = model.objects.filter(created_at__gte=since).exclude(
+                status__in=RECEIPT_KINDS[kind][2]
+            ).values_list('id', flat=True)[:options['limit']]
+            jobs.extend((kind, str(object_id), None) for object_id in settled)
+
+        if not jobs:
+            self.stdout.write(self.style.WARNING('No settled transactions to render'))
+            return
+
+        started = time.perf_counter()
+        results = ReceiptRenderService.render_in_pool(jobs, workers=options['workers'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {results['rendered']} receipts in {elapsed:.2f}s "
+            f"({results['rendered'] / elapsed if elapsed else 0:.1f}/s), "
+            f"skipped {results['skipped']}, failed {results['failed']}"
+        ))
+
+        if options['benchmark']:
+            self._benchmark(jobs[:options['benchmark']])
+
+    def _benchmark(self, jobs):
+        factory = RequestFactory()
+        live, stored = [], []
+        for kind, object_id, _ in jobs:
+            obj = ReceiptRenderService.get_model(kind).objects.get(pk=object_id)
+            receipt_number = ReceiptRenderService.default_receipt_number(kind, obj)
+
+            started = time.perf_counter()
+            RECEIPT_KINDS[kind][1](obj, receipt_number)
+            live.append(time.perf_counter() - started)
+
+            request = factory.get('/receipt/')
+            started = time.perf_counter()
+            response = ReceiptRenderService.receipt_response(request, kind, obj, receipt_number)
+            b''.join(response.streaming_content)
+            stored.append(time.perf_counter() - started)
+
+        def summary(samples):
+            samples = sorted(samples)
+            return f"avg {sum(samples) / len(samples) * 1000:.1f} ms, max {samples[-1] * 1000:.1f} ms"
+
+        self.stdout.write(f"Live render:     {summary(live)}")
+        self.stdout.write(f"Stored download: {summary(stored)}")
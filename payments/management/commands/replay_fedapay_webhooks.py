@@ -0,0 +1,107 @@
+"""
+Replay stored FedaPay webhook events.
+
+Modes:
+- ingest: re-deliver stored payloads through the ack-fast path (duplicate
+  delivery storm). Idempotent, safe on any database.
+- process: reset the selected events to "received" and run them through the
+  worker path inline, reporting throughput. Re-applies wallet/appointment side
+  effects, so it refuses to run outside DEBUG unless --force is given.
+
+Usage:
+    python manage.py replay_fedapay_webhooks --mode ingest --repeat 20
+    python manage.py replay_fedapay_webhooks --mode process --status dead_letter
+    python manage.py replay_fedapay_webhooks --mode process --event-id 1234 --event-id 1235
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.fedapay_webhook_handler import FedaPayWebhookHandler
+from payments.models import FedaPayWebhookEvent
+
+
+class Command(BaseCommand):
+    help = 'Replay stored FedaPay webhook events (load testing / dead-letter recovery)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode',
+            choices=['ingest', 'process'],
+            default='ingest',
+            help='ingest: re-deliver payloads to the ack path; process: re-run handlers',
+        )
+        parser.add_argument('--event-id', type=int, action='append', dest='event_ids', help='FedaPay event id (repeatable)')
+        parser.add_argument('--event-type', type=str, help='Only replay this event type')
+        parser.add_argument(
+            '--status',
+            choices=[choice for choice, _ in FedaPayWebhookEvent.STATUS_CHOICES],
+            help='Only replay events in this status',
+        )
+        parser.add_argument('--limit', type=int, default=1000, help='Maximum number of stored events to replay')
+        parser.add_argument('--repeat', type=int, default=1, help='Ingest mode: deliveries per event')
+        parser.add_argument('--force', action='store_true', help='Allow process mode outside DEBUG')
+
+    def handle(self, *args, **options):
+        events = FedaPayWebhookEvent.objects.exclude(event_type__startswith='transaction.redirect')
+        if options['event_ids']:
+            events = events.filter(event_id__in=options['event_ids'])
+        if options['event_type']:
+            events = events.filter(event_type=options['event_type'])
+        if options['status']:
+            events = events.filter(status=options['status'])
+        events = list(events.order_by('created_at', 'id')[:options['limit']])
+
+        if not events:
+            self.stdout.write(self.style.WARNING('No matching webhook events'))
+            return
+
+        if options['mode'] == 'ingest':
+            self._replay_ingest(events, max(options['repeat'], 1))
+        else:
+            if not settings.DEBUG and not options['force']:
+                raise CommandError('Process mode re-applies payment side effects; use --force outside DEBUG')
+            self._replay_process(events)
+
+    def _replay_ingest(self, events, repeat):
+        latencies = []
+        for _ in range(repeat):
+            for event in events:
+                started = time.perf_counter()
+                FedaPayWebhookHandler.ingest_webhook(event.payload)
+                latencies.append(time.perf_counter() - started)
+
+        latencies.sort()
+        total = sum(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+        self.stdout.write(self.style.SUCCESS(
+            f'Ingested {len(latencies)} deliveries in {total:.2f}s '
+            f'({len(latencies) / total if total else 0:.0f}/s), '
+            f'avg {total / len(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms'
+        ))
+
+    def _replay_process(self, events):
+        FedaPayWebhookEvent.objects.filter(id__in=[event.id for event in events]).update(
+            status='received',
+            processed=False,
+            processed_at=None,
+            attempts=0,
+            next_attempt_at=None,
+            processing_error='',
+        )
+        keys = sorted({event.ordering_key for event in events})
+
+        started = time.perf_counter()
+        totals = {'processed': 0, 'failed': 0, 'dead_letter': 0}
+        for key in keys:
+            stats = FedaPayWebhookHandler.process_pending_events(ordering_key=key)
+            for name in totals:
+                totals[name] += stats[name]
+        elapsed = time.perf_counter() - started
+
+        handled = sum(totals.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {handled} events across {len(keys)} keys in {elapsed:.2f}s '
+            f'({handled / elapsed if elapsed else 0:.0f}/s): {totals}'
+        ))
@@ -0,0 +1,41 @@
+"""
+Release held provider payouts in resumable chunks.
+
+Usage:
+    python manage.py run_settlement
+    python manage.py run_settlement --chunk-size 1000 --max-chunks 10
+    python manage.py run_settlement --fresh   # ignore an interrupted run
+"""
+from django.core.management.base import BaseCommand
+
+from payments.settlement_service import SettlementBatchService
+
+
+class Command(BaseCommand):
+    help = 'Run (or resume) the settlement batch for held provider payouts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Payouts per chunk/transaction')
+        parser.add_argument('--max-chunks', type=int, default=None, help='Stop after N chunks (run stays resumable)')
+        parser.add_argument('--fresh', action='store_true', help='Start a new run instead of resuming')
+
+    def handle(self, *args, **options):
+        run = SettlementBatchService.run(
+            chunk_size=options['chunk_size'],
+            resume=not options['fresh'],
+            max_chunks=options['max_chunks'],
+        )
+
+        for stats in run.chunk_stats[-20:]:
+            self.stdout.write(
+                f"  chunk {stats['chunk']:>5} [{stats['phase']}] "
+                f"{stats['payouts']} payouts / {stats['providers']} providers "
+                f"in {stats['seconds']}s ({stats['payouts_per_second']}/s)"
+            )
+
+        style = self.style.SUCCESS if run.status == 'completed' else self.style.WARNING
+        self.stdout.write(style(
+            f"Run {run.id} {run.status}: {run.chunks_completed} chunks, "
+            f"{run.payouts_released} payouts released, {run.schedules_created} payout schedules, "
+            f"total {run.total_amount}"
+        ))
@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-18 20:30
+
+from django.db import migrations, models
+
+
+def backfill_webhook_status(apps, schema_editor):
+    """
+    Existing events predate the worker queue: mark processed ones as such and
+    park old failures in the dead letter state instead of replaying them.
+    """
+    FedaPayWebhookEvent = apps.get_model('payments', 'FedaPayWebhookEvent')
+    FedaPayWebhookEvent.objects.filter(processed=True).update(status='processed')
+    FedaPayWebhookEvent.objects.filter(processed=False).update(status='dead_letter')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0028_add_payment_method_and_receipt_to_payment_request'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fedapaywebhookevent',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fedapaywebhookevent',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='fedapaywebhookevent',
+            name='ordering_key',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='fedapaywebhookevent',
+            name='status',
+            field=models.CharField(choices=[('received', 'Received'), ('retrying', 'Retrying'), ('processed', 'Processed'), ('dead_letter', 'Dead Letter')], db_index=True, default='received', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='fedapaywebhookevent',
+            index=models.Index(fields=['status', 'ordering_key', 'created_at'], name='fedapay_web_status_aca7cc_idx'),
+        ),
+        migrations.RunPython(backfill_webhook_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 20:35
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0029_fedapay_webhook_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SettlementRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='running', max_length=20)),
+                ('chunk_size', models.PositiveIntegerField(default=500)),
+                ('cursors', models.JSONField(blank=True, default=dict)),
+                ('completed_phases', models.JSONField(blank=True, default=list)),
+                ('chunks_completed', models.PositiveIntegerField(default=0)),
+                ('payouts_released', models.PositiveIntegerField(default=0)),
+                ('schedules_created', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.BigIntegerField(default=0)),
+                ('chunk_stats', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'settlement_runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
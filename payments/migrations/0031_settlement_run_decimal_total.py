@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 22:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0030_settlement_run'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='settlementrun',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+    ]
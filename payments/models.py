@@ -656,12 +656,25 @@ class FedaPayWebhookEvent(SyncMixin):  # Records webhook events received from Fe
     processing_error = models.TextField(blank=True)
     processed_at = models.DateTimeField(null=True, blank=True)
 
+    # Asynchronous processing queue (events are acknowledged first, processed by workers)
+    STATUS_CHOICES = [
+        ("received", "Received"),
+        ("retrying", "Retrying"),
+        ("processed", "Processed"),
+        ("dead_letter", "Dead Letter"),
+    ]
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="received", db_index=True)
+    ordering_key = models.CharField(max_length=100, blank=True, default="", db_index=True)  # e.g. "transaction:12345"
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+
     class Meta:  # Meta class implementation
         db_table = "fedapay_webhook_events"
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["event_type", "processed"]),
             models.Index(fields=["created_at"]),
+            models.Index(fields=["status", "ordering_key", "created_at"]),
         ]
 
     def __str__(self):  # Return string representation
@@ -1148,6 +1161,41 @@ class PayoutSchedule(SyncMixin):  # Schedules and manages periodic payouts to pr
         super().save(*args, **kwargs)
 
 
+class SettlementRun(models.Model):  # Checkpoint for end-of-day release of held provider payouts
+    """
+    Progress of a settlement batch run.
+
+    Not a SyncMixin model: it is rewritten after every chunk and only matters
+    to the instance executing the run. A run left in 'running' state after a
+    crash is resumed from its per-phase cursors.
+    """
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running', db_index=True)
+    chunk_size = models.PositiveIntegerField(default=500)
+    cursors = models.JSONField(default=dict, blank=True)  # phase -> last processed payout id
+    completed_phases = models.JSONField(default=list, blank=True)
+    chunks_completed = models.PositiveIntegerField(default=0)
+    payouts_released = models.PositiveIntegerField(default=0)
+    schedules_created = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    chunk_stats = models.JSONField(default=list, blank=True)  # most recent per-chunk throughput
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:  # Meta class implementation
+        db_table = "settlement_runs"
+        ordering = ["-started_at"]
+
+    def __str__(self):  # Return string representation
+        return f"Settlement {self.started_at:%Y-%m-%d %H:%M} - {self.status}"
+
+
 # ========================================
 # INVOICE CUSTOMIZATION MODELS
 # ISSUE-DOC-030: Invoice branding and customization
@@ -0,0 +1,226 @@
+"""
+Pre-rendered, content-addressed receipt PDFs.
+
+Receipts for settled transactions never change, so they are rendered once
+(by a Celery worker on payment completion, or by the render_receipts command
+in a process pool) and stored under a key derived from the transaction, its
+status, the receipt number and RECEIPT_TEMPLATE_VERSION. Downloads stream the
+stored file with ETag and Range support instead of rebuilding the ReportLab
+document on every request.
+"""
+import hashlib
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .receipt_service import ReceiptPDFService
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever a receipt layout in ReceiptPDFService changes; old files are simply no longer addressed
+RECEIPT_TEMPLATE_VERSION = 1
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# kind -> (model label, renderer, statuses whose receipt can still change)
+RECEIPT_KINDS = {
+    'transaction': ('core.Transaction', ReceiptPDFService.generate_transaction_receipt, ('pending', 'processing')),
+    'fedapay': ('payments.FedaPayTransaction', ReceiptPDFService.generate_transaction_receipt, ('pending',)),
+    'service': ('payments.ServiceTransaction', ReceiptPDFService.generate_service_transaction_receipt, ('pending', 'processing')),
+}
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def fedapay_receipt_number(fedapay_txn):
+    return f"RCP-{fedapay_txn.id}"
+
+
+def service_receipt_number(service_txn):
+    """Stable receipt number for a service transaction (its PaymentReceipt if one was issued)"""
+    receipt = getattr(service_txn, 'receipt', None)
+    if receipt is not None:
+        return receipt.receipt_number
+    issued_on = service_txn.completed_at or service_txn.created_at
+    return f"RCP-{issued_on.strftime('%Y%m%d')}-{service_txn.id}"
+
+
+class ReceiptRenderService:
+    """Render-once storage and streaming for receipt PDFs"""
+
+    @staticmethod
+    def get_model(kind):
+        from django.apps import apps
+        return apps.get_model(RECEIPT_KINDS[kind][0])
+
+    @staticmethod
+    def is_cacheable(kind, obj):
+        return obj.status not in RECEIPT_KINDS[kind][2]
+
+    @staticmethod
+    def receipt_key(kind, obj, receipt_number):
+        """Content address: changes whenever anything printed on the receipt may change"""
+        raw = f"{kind}:{obj.pk}:{obj.status}:{receipt_number}:v{RECEIPT_TEMPLATE_VERSION}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def storage_name(kind, digest):
+        return f"receipts/rendered/v{RECEIPT_TEMPLATE_VERSION}/{kind}/{digest[:2]}/{digest}.pdf"
+
+    @staticmethod
+    def render_and_store(kind, obj, receipt_number):
+        """Return the storage name of the rendered receipt, rendering it only if missing"""
+        digest = ReceiptRenderService.receipt_key(kind, obj, receipt_number)
+        name = ReceiptRenderService.storage_name(kind, digest)
+        if default_storage.exists(name):
+            return name
+
+        renderer = RECEIPT_KINDS[kind][1]
+        pdf_buffer = renderer(obj, receipt_number)
+        saved_name = default_storage.save(name, ContentFile(pdf_buffer.getvalue()))
+        if saved_name != name:
+            # Another worker stored the same receipt concurrently; keep the canonical copy
+            default_storage.delete(saved_name)
+        logger.info(f"Rendered {kind} receipt {receipt_number} -> {name}")
+        return name
+
+    @staticmethod
+    def render_by_id(kind, object_id, receipt_number=None):
+        """Entry point for Celery tasks and pool workers (arguments must be picklable)"""
+        model = ReceiptRenderService.get_model(kind)
+        obj = model.objects.get(pk=object_id)
+        if not ReceiptRenderService.is_cacheable(kind, obj):
+            return None
+        if receipt_number is None:
+            receipt_number = ReceiptRenderService.default_receipt_number(kind, obj)
+        return ReceiptRenderService.render_and_store(kind, obj, receipt_number)
+
+    @staticmethod
+    def default_receipt_number(kind, obj):
+        if kind == 'fedapay':
+            return fedapay_receipt_number(obj)
+        if kind == 'service':
+            return service_receipt_number(obj)
+        receipt = getattr(obj, 'receipt', None)
+        return receipt.receipt_number if receipt is not None else f"RCP-{obj.id}"
+
+    @staticmethod
+    def enqueue(kind, object_id, receipt_number=None):
+        try:
+            from .tasks import render_receipt_pdf
+            render_receipt_pdf.delay(kind, str(object_id), receipt_number)
+        except Exception as e:
+            logger.warning(f"Could not enqueue {kind} receipt render for {object_id}: {e}")
+
+    @staticmethod
+    def render_in_pool(jobs, workers=None):
+        """
+        Render (kind, object_id, receipt_number) jobs in a process pool.
+
+        Used for backfills; each worker process sets up Django once and keeps
+        its ReportLab font/style caches warm across jobs.
+        """
+        from django.db import connections
+
+        connections.close_all()  # never share DB sockets with forked workers
+        results = {'rendered': 0, 'skipped': 0, 'failed': 0}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_pool_worker) as pool:
+            futures = [pool.submit(_render_job, *job) for job in jobs]
+            for future in as_completed(futures):
+                try:
+                    name = future.result()
+                    results['rendered' if name else 'skipped'] += 1
+                except Exception as e:
+                    logger.error(f"Receipt render failed: {e}")
+                    results['failed'] += 1
+        return results
+
+    @staticmethod
+    def receipt_response(request, kind, obj, receipt_number, filename=None):
+        """
+        Serve a receipt download.
+
+        Settled transactions are served from the stored render (rendered on the
+        spot if the background job has not run yet); receipts that can still
+        change are rendered live and never stored.
+        """
+        filename = filename or f"receipt_{receipt_number}.pdf"
+        if not ReceiptRenderService.is_cacheable(kind, obj):
+            pdf_buffer = RECEIPT_KINDS[kind][1](obj, receipt_number)
+            response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            response['Cache-Control'] = 'private, no-store'
+            return response
+
+        name = ReceiptRenderService.render_and_store(kind, obj, receipt_number)
+        digest = os.path.splitext(os.path.basename(name))[0]
+        return ReceiptRenderService.stored_file_response(request, name, digest, filename)
+
+    @staticmethod
+    def stored_file_response(request, name, digest, filename):
+        """Stream a stored PDF honouring If-None-Match and single byte ranges"""
+        etag = f'"{digest}"'
+        if etag in [tag.strip() for tag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+            response = HttpResponse(status=304)
+            response['ETag'] = etag
+            return response
+
+        size = default_storage.size(name)
+        start, end = 0, size - 1
+        status_code = 200
+
+        range_header = request.META.get('HTTP_RANGE', '')
+        if_range = request.META.get('HTTP_IF_RANGE')
+        match = _RANGE_RE.match(range_header.strip()) if range_header else None
+        if match and (not if_range or if_range == etag):
+            first, last = match.groups()
+            if first:
+                start = int(first)
+                end = min(int(last), size - 1) if last else size - 1
+            elif last:
+                start = max(size - int(last), 0)
+            if start > end or start >= size:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f"bytes */{size}"
+                return response
+            status_code = 206
+
+        response = StreamingHttpResponse(
+            _iter_file_range(name, start, end - start + 1),
+            status=status_code,
+            content_type='application/pdf',
+        )
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        if status_code == 206:
+            response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        return response
+
+
+def _iter_file_range(name, offset, length):
+    with default_storage.open(name, 'rb') as f:
+        f.seek(offset)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _init_pool_worker():
+    import django
+    django.setup()
+
+
+def _render_job(kind, object_id, receipt_number=None):
+    return ReceiptRenderService.render_by_id(kind, object_id, receipt_number)
@@ -0,0 +1,223 @@
+"""
+Settlement batch engine for held provider payouts.
+
+Releases on-hold ProviderPayout / DoctorPayout rows of verified (blue
+checkmark) providers in chunks. Each chunk is one transaction: the payout rows
+are locked with SKIP LOCKED, aggregated per provider and currency in SQL,
+moved to 'processing' with a single UPDATE, and one PayoutSchedule posting per
+provider is bulk-created. The schedule carries the amount from then on: released
+rows are not left 'pending', so pending totals never count a payout twice.
+The SettlementRun checkpoint is written in the same transaction, so a crashed
+run resumes exactly after its last committed chunk. Rows another worker held
+locked while the cursor passed them are re-scanned before a phase is marked
+complete.
+
+SettlementBatchService.release is the one hold-release transition: the admin
+release of a single provider (payment_hold_service.release_held_payments) goes
+through it as well. The bulk writes send no post_save, so it bumps the row
+versions and logs the sync events itself.
+"""
+import logging
+import time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.utils import timezone
+
+from sync.signals import log_bulk_sync_events
+
+from .models import DoctorPayout, PayoutSchedule, ProviderPayout, SettlementRun
+
+logger = logging.getLogger(__name__)
+
+# phase name, payout model, provider FK field, per-payout transaction count field
+SETTLEMENT_PHASES = [
+    ('provider_payouts', ProviderPayout, 'provider', 'transaction_count'),
+    ('doctor_payouts', DoctorPayout, 'doctor', 'consultation_count'),
+]
+
+MAX_CHUNK_STATS = 200
+CENT = Decimal('0.01')
+
+
+class SettlementBatchService:
+    """Chunked, resumable release of held payouts"""
+
+    @staticmethod
+    def releasable_payouts(model, provider_field):
+        return model.objects.filter(
+            status='on_hold',
+            **{f'{provider_field}__has_blue_checkmark': True},
+        )
+
+    @staticmethod
+    def start_run(chunk_size=500, resume=True):
+        """Resume the latest unfinished run, or start a new one"""
+        if resume:
+            run = SettlementRun.objects.filter(status='running').order_by('-started_at').first()
+            if run:
+                logger.info(f"Resuming settlement run {run.id} after {run.chunks_completed} chunks")
+                return run
+        return SettlementRun.objects.create(chunk_size=chunk_size)
+
+    @staticmethod
+    def run(chunk_size=500, resume=True, max_chunks=None):
+        """
+        Process releasable holds until none are left (or max_chunks is reached).
+
+        Returns the SettlementRun; its status stays 'running' when stopped by
+        max_chunks so the next call continues from the checkpoint.
+        """
+        run = SettlementBatchService.start_run(chunk_size=chunk_size, resume=resume)
+        chunks = 0
+        try:
+            for phase, model, provider_field, count_field in SETTLEMENT_PHASES:
+                if phase in run.completed_phases:
+                    continue
+                while True:
+                    if max_chunks is not None and chunks >= max_chunks:
+                        return run
+                    chunk = SettlementBatchService.process_chunk(run, phase, model, provider_field, count_field)
+                    if chunk is None:
+                        break
+                    run = chunk
+                    chunks += 1
+                run.completed_phases = run.completed_phases + [phase]
+                run.save(update_fields=['completed_phases'])
+        except Exception as e:
+            logger.error(f"Settlement run {run.id} stopped: {e}", exc_info=True)
+            SettlementRun.objects.filter(pk=run.pk).update(error=str(e))
+            raise
+
+        run.status = 'completed'
+        run.finished_at = timezone.now()
+        run.save(update_fields=['status', 'finished_at'])
+        logger.info(
+            f"Settlement run {run.id} completed: {run.payouts_released} payouts released, "
+            f"{run.schedules_created} schedules, {run.total_amount} total"
+        )
+        return run
+
+    @staticmethod
+    def _lock_chunk(candidates, run):
+        return list(
+            candidates.select_for_update(skip_locked=True, of=('self',))
+            .order_by('id')
+            .values_list('id', flat=True)[:run.chunk_size]
+        )
+
+    @staticmethod
+    def release(model, provider_field, count_field, ids, metadata):
+        """
+        Move locked on-hold payout rows to 'processing' and post one PayoutSchedule
+        per provider and currency (call inside the transaction holding the locks)
+
+        Returns:
+            tuple: (rows released, created schedules)
+        """
+        now = timezone.now()
+        chunk_rows = model.objects.filter(id__in=ids)
+        groups = chunk_rows.values(provider_field, f'{provider_field}__role', 'currency').annotate(
+            net_amount=Sum('amount'),
+            fees=Sum('total_fees_deducted'),
+            transactions=Sum(count_field),
+            payouts=Count('id'),
+            first_period=Min('period_start'),
+            last_period=Max('period_end'),
+        )
+
+        schedules = [
+            PayoutSchedule(
+                participant_id=group[provider_field],
+                participant_role=group[f'{provider_field}__role'] or '',
+                period_start=group['first_period'],
+                period_end=group['last_period'],
+                total_transactions_count=group['transactions'] or 0,
+                total_gross_amount=(group['net_amount'] or 0) + (group['fees'] or 0),
+                total_fees_deducted=group['fees'] or 0,
+                total_net_amount=group['net_amount'] or 0,
+                scheduled_for=now,
+                metadata={
+                    **metadata,
+                    'currency': group['currency'],
+                    'payout_count': group['payouts'],
+                },
+            )
+            for group in groups
+        ]
+        PayoutSchedule.objects.bulk_create(schedules, batch_size=500)
+
+        released = chunk_rows.update(
+            status='processing',
+            on_hold_reason='',
+            released_from_hold_at=now,
+            version=F('version') + 1,
+            updated_at=now,
+        )
+        log_bulk_sync_events(chunk_rows)
+        log_bulk_sync_events(schedules, 'create')
+        return released, schedules
+
+    @staticmethod
+    def release_provider(provider):
+        """Release every held payout of one verified provider; returns the number of rows released"""
+        released = 0
+        with transaction.atomic():
+            for phase, model, provider_field, count_field in SETTLEMENT_PHASES:
+                ids = list(
+                    model.objects.select_for_update(of=('self',))
+                    .filter(status='on_hold', **{provider_field: provider})
+                    .order_by('id')
+                    .values_list('id', flat=True)
+                )
+                if ids:
+                    released += SettlementBatchService.release(
+                        model, provider_field, count_field, ids, {'source': phase, 'released_by': 'provider_release'}
+                    )[0]
+        return released
+
+    @staticmethod
+    @transaction.atomic
+    def process_chunk(run, phase, model, provider_field, count_field):
+        """Release one chunk and checkpoint it; returns the updated run or None when the phase is drained"""
+        started = time.perf_counter()
+        run = SettlementRun.objects.select_for_update().get(pk=run.pk)
+        cursor = run.cursors.get(phase)
+
+        releasable = SettlementBatchService.releasable_payouts(model, provider_field)
+        ids = SettlementBatchService._lock_chunk(releasable.filter(id__gt=cursor) if cursor else releasable, run)
+        rescan = not ids and bool(cursor)
+        if rescan:
+            # Rows skipped while another worker held them sit behind the cursor
+            ids = SettlementBatchService._lock_chunk(releasable, run)
+        if not ids:
+            return None
+
+        released, schedules = SettlementBatchService.release(
+            model, provider_field, count_field, ids, {'settlement_run': str(run.id), 'source': phase}
+        )
+
+        elapsed = time.perf_counter() - started
+        chunk_amount = sum((Decimal(schedule.total_net_amount) for schedule in schedules), Decimal('0')).quantize(CENT)
+        stats = {
+            'chunk': run.chunks_completed + 1,
+            'phase': phase,
+            'payouts': released,
+            'providers': len(schedules),
+            'amount': str(chunk_amount),
+            'rescan': rescan,
+            'seconds': round(elapsed, 4),
+            'payouts_per_second': round(released / elapsed, 1) if elapsed else None,
+        }
+        logger.info(f"Settlement run {run.id} chunk {stats['chunk']}: {stats}")
+
+        if not rescan:
+            run.cursors = {**run.cursors, phase: str(ids[-1])}
+        run.chunks_completed += 1
+        run.payouts_released += released
+        run.schedules_created += len(schedules)
+        run.total_amount += chunk_amount
+        run.chunk_stats = (run.chunk_stats + [stats])[-MAX_CHUNK_STATS:]
+        run.save()
+        return run
@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from core.models import Transaction as CoreTransaction
+from .models import FedaPayTransaction, PaymentReceipt, ServiceTransaction
+from .receipt_render_service import ReceiptRenderService
+
+
+@receiver(post_save, sender=PaymentReceipt)
+def render_issued_receipt(sender, instance, **kwargs):
+    """Pre-render the PDF as soon as a receipt is issued for a settled transaction"""
+    if instance.transaction_id:
+        kind, object_id = 'transaction', instance.transaction_id
+        target = instance.transaction
+    elif instance.service_transaction_id:
+        kind, object_id = 'service', instance.service_transaction_id
+        target = instance.service_transaction
+    else:
+        return
+
+    if ReceiptRenderService.is_cacheable(kind, target):
+        receipt_number = instance.receipt_number
+        transaction.on_commit(lambda: ReceiptRenderService.enqueue(kind, object_id, receipt_number))
+
+
+@receiver(post_init, sender=CoreTransaction)
+@receiver(post_init, sender=ServiceTransaction)
+@receiver(post_init, sender=FedaPayTransaction)
+def remember_transaction_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.__dict__.get('status')
+
+
+def _became(instance, status):
+    """Whether this save moved the instance to status (and remember the saved status)"""
+    previous, instance._loaded_status = instance._loaded_status, instance.status
+    return instance.status == status and previous != status
+
+
+@receiver(post_save, sender=CoreTransaction)
+def render_completed_transaction_receipt(sender, instance, **kwargs):
+    """Pre-render the receipt once, when a transaction becomes completed"""
+    if not _became(instance, 'completed'):
+        return
+    receipt_number = PaymentReceipt.objects.filter(
+        transaction_id=instance.pk
+    ).values_list('receipt_number', flat=True).first()
+    if receipt_number:
+        transaction.on_commit(lambda: ReceiptRenderService.enqueue('transaction', instance.id, receipt_number))
+
+
+@receiver(post_save, sender=ServiceTransaction)
+def render_completed_service_receipt(sender, instance, **kwargs):
+    if _became(instance, 'completed'):
+        transaction.on_commit(lambda: ReceiptRenderService.enqueue('service', instance.id))
+
+
+@receiver(post_save, sender=FedaPayTransaction)
+def render_approved_fedapay_receipt(sender, instance, **kwargs):
+    if _became(instance, 'approved'):
+        transaction.on_commit(lambda: ReceiptRenderService.enqueue('fedapay', instance.id))
@@ -0,0 +1,44 @@
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def process_fedapay_webhook_events(ordering_key=None):
+    """
+    Worker side of the FedaPay webhook queue.
+
+    Called with an ordering_key right after an event is acknowledged, and
+    periodically without one to pick up retries and events whose enqueue
+    was lost.
+    """
+    from .fedapay_webhook_handler import FedaPayWebhookHandler
+
+    stats = FedaPayWebhookHandler.process_pending_events(ordering_key=ordering_key)
+    if stats['failed'] or stats['dead_letter']:
+        logger.warning(f"FedaPay webhook processing: {stats}")
+    return stats
+
+
+@shared_task
+def render_receipt_pdf(kind, object_id, receipt_number=None):
+    """Render a settled transaction's receipt once so downloads only stream the stored file"""
+    from .receipt_render_service import ReceiptRenderService
+
+    return ReceiptRenderService.render_by_id(kind, object_id, receipt_number)
+
+
+@shared_task
+def run_settlement_batch(chunk_size=500):
+    """End-of-day release of held payouts (resumes an interrupted run)"""
+    from .settlement_service import SettlementBatchService
+
+    run = SettlementBatchService.run(chunk_size=chunk_size, resume=True)
+    return {
+        'run': str(run.id),
+        'status': run.status,
+        'chunks': run.chunks_completed,
+        'payouts_released': run.payouts_released,
+        'schedules_created': run.schedules_created,
+    }
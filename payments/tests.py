@@ -4,6 +4,7 @@ from rest_framework import status
 from core.models import Participant, Wallet, Transaction
 from .models import FeeLedger, HealthTransaction, ProviderPayout
 from datetime import date, timedelta
+from decimal import Decimal
 
 
 class FeeLedgerModelTest(TestCase):  # FeeLedgerModelTest class implementation
@@ -85,3 +86,343 @@ class ProviderPayoutModelTest(TestCase):  # ProviderPayoutModelTest class implem
         self.assertEqual(payout.status, "pending")
         self.assertEqual(payout.amount, 50000)
         self.assertEqual(payout.transaction_count, 10)
+
+
+class FedaPayWebhookQueueTest(TestCase):  # Ack-fast ingestion and ordered worker processing
+    def _event(self, event_id, event_type="transaction.pending", entity_id=42):
+        return {"id": event_id, "type": event_type, "entity": {"id": entity_id}}
+
+    def test_ingest_is_idempotent(self):  # Duplicate deliveries store a single event
+        from .fedapay_webhook_handler import FedaPayWebhookHandler
+        from .models import FedaPayWebhookEvent
+
+        first, created = FedaPayWebhookHandler.ingest_webhook(self._event(1))
+        again, created_again = FedaPayWebhookHandler.ingest_webhook(self._event(1))
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(first.pk, again.pk)
+        self.assertEqual(first.status, "received")
+        self.assertEqual(first.ordering_key, "transaction:42")
+        self.assertEqual(FedaPayWebhookEvent.objects.filter(event_id=1).count(), 1)
+
+    def test_failed_head_blocks_key_until_dead_letter(self):  # Per-key ordering with retries
+        from unittest import mock
+        from .fedapay_webhook_handler import FedaPayWebhookHandler, WEBHOOK_MAX_ATTEMPTS
+        from .models import FedaPayWebhookEvent
+
+        FedaPayWebhookHandler.ingest_webhook(self._event(10))
+        FedaPayWebhookHandler.ingest_webhook(self._event(11))
+
+        with mock.patch.object(FedaPayWebhookHandler, "_dispatch", side_effect=RuntimeError("boom")):
+            stats = FedaPayWebhookHandler.process_pending_events()
+        self.assertEqual(stats["failed"], 1)
+        head = FedaPayWebhookEvent.objects.get(event_id=10)
+        self.assertEqual(head.status, "retrying")
+        self.assertEqual(FedaPayWebhookEvent.objects.get(event_id=11).status, "received")
+
+        # Retry window not reached yet: nothing behind the head is processed
+        stats = FedaPayWebhookHandler.process_pending_events()
+        self.assertEqual(stats["processed"], 0)
+
+        FedaPayWebhookEvent.objects.filter(event_id=10).update(attempts=WEBHOOK_MAX_ATTEMPTS - 1, next_attempt_at=None)
+        with mock.patch.object(FedaPayWebhookHandler, "_dispatch", side_effect=[RuntimeError("boom"), None]):
+            stats = FedaPayWebhookHandler.process_pending_events()
+        self.assertEqual(stats["dead_letter"], 1)
+        self.assertEqual(stats["processed"], 1)
+        self.assertEqual(FedaPayWebhookEvent.objects.get(event_id=10).status, "dead_letter")
+        self.assertTrue(FedaPayWebhookEvent.objects.get(event_id=11).processed)
+
+
+    def test_keys_are_distinct_and_oldest_first(self):  # One entry per key, by oldest pending event
+        from datetime import timedelta
+        from django.utils import timezone
+        from unittest import mock
+        from .fedapay_webhook_handler import FedaPayWebhookHandler
+        from .models import FedaPayWebhookEvent
+
+        for event_id, entity_id in ((20, 2), (21, 1), (22, 2), (23, 1)):
+            FedaPayWebhookHandler.ingest_webhook(self._event(event_id, entity_id=entity_id))
+        now = timezone.now()
+        for offset, event_id in enumerate((21, 20, 23, 22)):
+            FedaPayWebhookEvent.objects.filter(event_id=event_id).update(created_at=now + timedelta(seconds=offset))
+
+        seen = []
+        with mock.patch.object(
+            FedaPayWebhookHandler, "_process_ordering_key",
+            side_effect=lambda key, limit: seen.append(key) or {"processed": 0, "failed": 0, "dead_letter": 0},
+        ):
+            stats = FedaPayWebhookHandler.process_pending_events()
+        self.assertEqual(seen, ["transaction:1", "transaction:2"])
+        self.assertEqual(stats["keys"], 2)
+
+    def test_processed_on_commit_without_a_worker_broker(self):  # memory:// broker: no worker would ever run the task
+        from .fedapay_webhook_handler import FedaPayWebhookHandler
+        from .models import FedaPayWebhookEvent
+
+        with self.captureOnCommitCallbacks(execute=True):
+            FedaPayWebhookHandler.ingest_webhook(self._event(30))
+        self.assertTrue(FedaPayWebhookEvent.objects.get(event_id=30).processed)
+
+    def test_queued_for_workers_with_a_real_broker(self):  # Processing leaves the request path
+        from unittest import mock
+        from django.test import override_settings
+        from .fedapay_webhook_handler import FedaPayWebhookHandler
+        from .models import FedaPayWebhookEvent
+
+        with override_settings(CELERY_BROKER_URL="redis://localhost:6379/0"), \
+                mock.patch("payments.tasks.process_fedapay_webhook_events.delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            FedaPayWebhookHandler.ingest_webhook(self._event(31))
+        delay.assert_called_once_with(ordering_key="transaction:42")
+        self.assertFalse(FedaPayWebhookEvent.objects.get(event_id=31).processed)
+
+
+class StoredReceiptResponseTest(TestCase):  # ETag and Range handling for pre-rendered receipts
+    def setUp(self):  # Setup
+        import tempfile
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from django.test import override_settings
+
+        self.media = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media.name)
+        self.settings_override.enable()
+        self.name = default_storage.save("receipts/rendered/test.pdf", ContentFile(b"%PDF-0123456789"))
+
+    def tearDown(self):  # Teardown
+        self.settings_override.disable()
+        self.media.cleanup()
+
+    def _response(self, **headers):
+        from django.test import RequestFactory
+        from .receipt_render_service import ReceiptRenderService
+
+        request = RequestFactory().get("/", **headers)
+        return ReceiptRenderService.stored_file_response(request, self.name, "abc", "receipt.pdf")
+
+    def test_full_download(self):  # Whole file with validators
+        response = self._response()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], '"abc"')
+        self.assertEqual(b"".join(response.streaming_content), b"%PDF-0123456789")
+
+    def test_range_and_conditional_requests(self):  # 206, 304 and 416
+        response = self._response(HTTP_RANGE="bytes=5-8")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 5-8/15")
+        self.assertEqual(b"".join(response.streaming_content), b"0123")
+
+        self.assertEqual(self._response(HTTP_IF_NONE_MATCH='"abc"').status_code, 304)
+        self.assertEqual(self._response(HTTP_RANGE="bytes=40-").status_code, 416)
+
+
+class FeeBatchEquivalenceTest(TestCase):  # Batch fee engine must match the scalar path row by row
+    def setUp(self):  # Setup
+        import random
+        from decimal import Decimal
+
+        rng = random.Random(2026)
+        types = ["service_payment", "payment", "deposit", "withdrawal"]
+        self.amounts = [Decimal(rng.randint(0, 5_000_000)) / 100 for _ in range(500)]
+        self.amounts += [0, 1, "0.005", 12345.675, "999999999.99", Decimal("0.49")]
+        self.types = [rng.choice(types) for _ in self.amounts]
+
+    def _assert_matches_scalar(self, include_tax, fee_config):
+        from decimal import Decimal
+        from .fee_service import FeeCalculationService
+
+        batch = FeeCalculationService.calculate_fees_batch(
+            self.amounts, self.types, include_tax=include_tax, fee_config=fee_config
+        )
+        expected_totals = {"amount": Decimal("0"), "total_fee": Decimal("0"), "net_amount": Decimal("0")}
+        for index, (amount, transaction_type) in enumerate(zip(self.amounts, self.types)):
+            scalar = FeeCalculationService.calculate_fees(
+                amount, transaction_type, include_tax=include_tax, fee_config=fee_config
+            )
+            for column in ("amount", "platform_fee", "tax", "total_fee", "net_amount"):
+                self.assertEqual(batch[column][index], scalar[column], (column, amount, transaction_type))
+            for key in expected_totals:
+                expected_totals[key] += scalar[key]
+
+        self.assertEqual(batch["totals"]["count"], len(self.amounts))
+        for key, value in expected_totals.items():
+            self.assertEqual(batch["totals"][key], value)
+        self.assertEqual(sum(t["count"] for t in batch["by_type"].values()), len(self.amounts))
+
+    def test_matches_scalar_with_default_rates(self):  # Both paths read the same configuration when none is given
+        self._assert_matches_scalar(True, None)
+        self._assert_matches_scalar(False, None)
+
+    def test_matches_scalar_with_system_configuration(self):  # Rates snapshotted from SystemConfiguration
+        from decimal import Decimal
+        from core.system_config import SystemConfiguration
+        from .fee_service import FeeCalculationService
+
+        SystemConfiguration.objects.create(platform_fee_percentage=Decimal("2.50"), tax_percentage=Decimal("19.25"))
+        fee_config = FeeCalculationService.get_fee_config()
+        self.assertEqual(fee_config["platform_fee_rate"], Decimal("0.025"))
+        self.assertEqual(fee_config["tax_rate"], Decimal("0.1925"))
+        self._assert_matches_scalar(True, fee_config)
+        self._assert_matches_scalar(True, None)
+
+    def test_payout_deductions_use_configured_rates(self):  # Payout summary shares the snapshot
+        from decimal import Decimal
+        from core.system_config import SystemConfiguration
+        from .fee_service import FeeCalculationService
+
+        SystemConfiguration.objects.create(platform_fee_percentage=Decimal("2.00"), tax_percentage=Decimal("10.00"))
+        summary = FeeCalculationService.calculate_payout_deductions(
+            Decimal("15000"), 2, 1, Decimal("10000"), Decimal("5000")
+        )
+        self.assertEqual(summary["wallet_payments"]["total_fee"], Decimal("220.00"))
+        self.assertEqual(summary["onsite_payments"]["total_fee"], Decimal("110.00"))
+        self.assertEqual(summary["net_payout_amount"], Decimal("14670.00"))
+        self.assertEqual(summary["fee_summary"]["tax_rate"], "10.00%")
+
+    def test_single_type_and_length_check(self):  # Broadcast type, reject mismatched columns
+        from .fee_service import FeeCalculationService
+
+        batch = FeeCalculationService.calculate_fees_batch(
+            [100, 200], "service_payment", fee_config=FeeCalculationService.get_fee_config()
+        )
+        self.assertEqual(list(batch["by_type"]), ["service_payment"])
+        with self.assertRaises(ValueError):
+            FeeCalculationService.calculate_fees_batch([100, 200], ["payment"])
+
+
+class SettlementBatchServiceTest(TestCase):  # Chunked, resumable release of held payouts
+    def setUp(self):  # Setup
+        self.verified = Participant.objects.create_participant(
+            email="verified@test.com", password="test123", role="doctor", has_blue_checkmark=True
+        )
+        self.unverified = Participant.objects.create_participant(
+            email="unverified@test.com", password="test123", role="hospital"
+        )
+        for provider in (self.verified, self.unverified):
+            for amount in (1000, 2000, 3000):
+                ProviderPayout.objects.create(
+                    provider=provider, amount=amount, status="on_hold",
+                    period_start=date.today(), period_end=date.today(),
+                    transaction_count=1, total_fees_deducted=10,
+                )
+
+    def test_run_resumes_from_checkpoint(self):  # Interrupted run continues after its last chunk
+        from .models import PayoutSchedule, SettlementRun
+        from .settlement_service import SettlementBatchService
+
+        run = SettlementBatchService.run(chunk_size=2, max_chunks=1)
+        self.assertEqual(run.status, "running")
+        self.assertEqual(run.payouts_released, 2)
+
+        resumed = SettlementBatchService.run(chunk_size=2)
+        self.assertEqual(resumed.pk, run.pk)
+        self.assertEqual(resumed.status, "completed")
+        self.assertEqual(resumed.payouts_released, 3)
+        self.assertEqual(resumed.total_amount, Decimal("6000.00"))
+        self.assertEqual(len(resumed.chunk_stats), 2)
+        self.assertEqual(SettlementRun.objects.count(), 1)
+
+        schedules = PayoutSchedule.objects.filter(participant=self.verified)
+        self.assertEqual(sum(s.total_net_amount for s in schedules), 6000)
+        self.assertEqual(sum(s.total_fees_deducted for s in schedules), 30)
+        self.assertFalse(ProviderPayout.objects.filter(provider=self.verified, status="on_hold").exists())
+        self.assertEqual(ProviderPayout.objects.filter(provider=self.unverified, status="on_hold").count(), 3)
+        # The schedules carry the released amount: nothing is left pending on the payout rows
+        self.assertFalse(ProviderPayout.objects.filter(provider=self.verified, status="pending").exists())
+
+    def test_rows_skipped_behind_the_cursor_are_released(self):  # Re-scan before a phase completes
+        from .models import SettlementRun
+        from .settlement_service import SettlementBatchService
+
+        last_id = ProviderPayout.objects.order_by("-id").values_list("id", flat=True).first()
+        SettlementRun.objects.create(chunk_size=2, cursors={"provider_payouts": str(last_id)})
+
+        run = SettlementBatchService.run(chunk_size=2)
+        self.assertEqual(run.status, "completed")
+        self.assertEqual(run.payouts_released, 3)
+        self.assertTrue(all(stats["rescan"] for stats in run.chunk_stats))
+        self.assertEqual(run.cursors["provider_payouts"], str(last_id))
+        self.assertFalse(ProviderPayout.objects.filter(provider=self.verified, status="on_hold").exists())
+
+    def test_provider_release_uses_the_settlement_transition(self):  # Admin release posts a schedule like the batch
+        from sync.models import SyncEvent
+        from .models import PayoutSchedule
+        from .payment_hold_service import release_held_payments
+
+        self.assertEqual(release_held_payments(self.unverified), 0)
+        self.assertEqual(release_held_payments(self.verified), 3)
+
+        payouts = ProviderPayout.objects.filter(provider=self.verified)
+        self.assertEqual(set(payouts.values_list("status", "version")), {("processing", 2)})
+        schedule = PayoutSchedule.objects.get(participant=self.verified)
+        self.assertEqual(schedule.total_net_amount, 6000)
+        self.assertEqual(
+            SyncEvent.objects.filter(model_name="payments.providerpayout", object_id__in=payouts.values("id"),
+                                     event_type="update").count(),
+            3,
+        )
+        self.assertTrue(SyncEvent.objects.filter(model_name="payments.payoutschedule", object_id=schedule.id).exists())
+
+    def test_payment_summary_aggregates_in_sql(self):  # Summary for held payouts
+        from .payment_hold_service import get_provider_payment_summary
+
+        summary = get_provider_payment_summary(self.unverified)
+        self.assertEqual(summary["total_on_hold"], 6000)
+        self.assertEqual(summary["on_hold_count"], 3)
+
+
+class TransactionReceiptSignalTest(TestCase):  # Receipt pre-rendering on the completed transition only
+    def setUp(self):  # Setup
+        self.patient = Participant.objects.create(email="receipt-patient@test.com", role="patient")
+        self.transaction = Transaction.objects.create(
+            transaction_ref="TX-RECEIPT-1", transaction_type="payment", amount=5000, status="pending",
+            payment_method="cash", description="Consultation", balance_before=0, balance_after=0,
+        )
+
+    def test_receipt_lookup_only_when_completed(self):  # No query for other saves, one enqueue on completion
+        from unittest import mock
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import PaymentReceipt
+        from .receipt_render_service import ReceiptRenderService
+
+        PaymentReceipt.objects.create(
+            receipt_number="RCPT-SIGNAL-1", transaction=self.transaction,
+            issued_to=self.patient, issued_by=self.patient, amount=5000,
+        )
+        with mock.patch.object(ReceiptRenderService, "enqueue") as enqueue:
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                self.transaction.status = "processing"
+                self.transaction.save()
+            self.assertFalse([q for q in queries.captured_queries if "payment_receipts" in q["sql"]])
+            enqueue.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.transaction.status = "completed"
+                self.transaction.save()
+            enqueue.assert_called_once_with("transaction", self.transaction.id, "RCPT-SIGNAL-1")
+
+            with self.captureOnCommitCallbacks(execute=True):
+                reloaded = Transaction.objects.get(pk=self.transaction.pk)
+                reloaded.description = "edited"
+                reloaded.save()
+            enqueue.assert_called_once()
+
+    def test_fedapay_receipt_only_on_approval(self):  # Webhook re-deliveries re-save approved rows
+        from unittest import mock
+        from .models import FedaPayTransaction
+        from .receipt_render_service import ReceiptRenderService
+
+        fedapay = FedaPayTransaction.objects.create(
+            participant=self.patient, transaction_type="service_payment", amount=5000, description="Consultation",
+        )
+        with mock.patch.object(ReceiptRenderService, "enqueue") as enqueue:
+            for _ in range(2):
+                with self.captureOnCommitCallbacks(execute=True):
+                    fedapay.status = "approved"
+                    fedapay.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                reloaded = FedaPayTransaction.objects.get(pk=fedapay.pk)
+                reloaded.last_error_message = "late webhook"
+                reloaded.save()
+        enqueue.assert_called_once_with("fedapay", fedapay.id)
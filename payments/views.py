@@ -15,7 +15,7 @@ from .models import *
 from .serializers import *
 from .fedapay_webhook_handler import FedaPayWebhookHandler, FedaPayWalletService
 from .fedapay_service import fedapay_service
-from .receipt_service import ReceiptPDFService
+from .receipt_render_service import ReceiptRenderService, fedapay_receipt_number
 from .service_payment_service import ServicePaymentService
 from core.models import Transaction as CoreTransaction, Participant
 from core.view_mixins import SafeQuerysetMixin
@@ -223,20 +223,13 @@ class FedaPayTransactionViewSet(SafeQuerysetMixin, viewsets.ReadOnlyModelViewSet
         fedapay_txn = self.get_object()
         
         try:
-            # Generate receipt number if not exists
-            receipt_number = f"RCP-{fedapay_txn.id}"
+            receipt_number = fedapay_receipt_number(fedapay_txn)
             
-            # Generate PDF
-            pdf_buffer = ReceiptPDFService.generate_transaction_receipt(
-                fedapay_txn,
-                receipt_number
+            # Stream the pre-rendered PDF (rendered live while the payment is still pending)
+            return ReceiptRenderService.receipt_response(
+                request, 'fedapay', fedapay_txn, receipt_number
             )
             
-            # Return PDF as response
-            response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="receipt_{receipt_number}.pdf"'
-            return response
-            
         except Exception as e:
             return Response(
                 {"error": str(e)},
@@ -318,7 +311,8 @@ def fedapay_webhook(request):
                         'timestamp': str(timezone.now())
                     },
                     processed=True,
-                    processed_at=timezone.now()
+                    processed_at=timezone.now(),
+                    status='processed'
                 )
                 logger.info(f"✅ Redirect callback logged for transaction {transaction_id}")
             except Exception as e:
@@ -376,15 +370,12 @@ def fedapay_webhook(request):
             logger.error(f"Webhook rejected: Missing required fields in payload")
             return JsonResponse({"error": "Invalid payload structure"}, status=400)
         
-        # Handle webhook with transaction safety
-        success = FedaPayWebhookHandler.handle_webhook(event_data)
+        # Ack-fast: store the event idempotently, workers process it in order per transaction
+        webhook_event, created = FedaPayWebhookHandler.ingest_webhook(event_data)
         
-        if success:
+        if webhook_event.processed:
             return JsonResponse({"status": "success"}, status=200)
-        else:
-            # Return 200 even on processing errors to prevent webhook disabling
-            logger.warning(f"Webhook processing warning for event {event_data.get('event')}")
-            return JsonResponse({"status": "acknowledged"}, status=200)
+        return JsonResponse({"status": "acknowledged"}, status=200)
             
     except json.JSONDecodeError as e:
         logger.error(f"Webhook rejected: Invalid JSON - {str(e)}")
@@ -453,17 +444,11 @@ def download_transaction_receipt(request, transaction_id):
             
             QRCodeService.generate_invoice_qr_code(receipt)
         
-        # Generate PDF
-        pdf_buffer = ReceiptPDFService.generate_transaction_receipt(
-            transaction,
-            receipt_number
+        # Stream the pre-rendered PDF (rendered live while the transaction is still pending)
+        return ReceiptRenderService.receipt_response(
+            request, 'transaction', transaction, receipt_number
         )
         
-        # Return PDF as response
-        response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="receipt_{receipt_number}.pdf"'
-        return response
-        
     except CoreTransaction.DoesNotExist:
         return JsonResponse(
             {"error": "Transaction not found"},
@@ -37,7 +37,7 @@ from .services.phone_verification_service import PhoneVerificationService
 from .services.fedapay_gateway_service import FedaPayGatewayService
 from .services.service_transaction_service import ServiceTransactionService
 from .fee_service import FeeCalculationService
-from .receipt_service import ReceiptPDFService
+from .receipt_render_service import ReceiptRenderService, service_receipt_number
 from .enhanced_receipt_service import EnhancedReceiptService
 from core.models import Participant
 
@@ -375,17 +375,12 @@ class ServiceTransactionViewSet(viewsets.ReadOnlyModelViewSet):  # Service class
             )
 
         try:
-            receipt_number = f"RCP-{timezone.now().strftime('%Y%m%d')}-{service_txn.id}"
+            receipt_number = service_receipt_number(service_txn)
 
-            pdf_buffer = ReceiptPDFService.generate_service_transaction_receipt(
-                service_txn,
-                receipt_number
+            return ReceiptRenderService.receipt_response(
+                request, 'service', service_txn, receipt_number
             )
 
-            response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="receipt_{receipt_number}.pdf"'
-            return response
-
         except Exception as e:
             return Response(
                 {'error': str(e)},
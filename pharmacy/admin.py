@@ -1,10 +1,11 @@
 from django.contrib import admin
 from .models import (
     PharmacyInventory, PharmacyOrder, PharmacyOrderItem,
-    PharmacySupplier, PharmacyPurchase, PharmacyPurchaseItem,
+    PharmacySupplier, PharmacyPurchase, PharmacyPurchaseItem, PharmacyPurchaseReceipt,
     PharmacySale, PharmacySaleItem, PharmacyStaff,
     DoctorPharmacyReferral, PharmacyBonusConfig,
-    PharmacyCounter, OrderQueue, DeliveryTracking, PickupVerification
+    PharmacyCounter, OrderQueue, DeliveryTracking, PickupVerification,
+    InventoryImportJob
 )
 
 @admin.register(PharmacyInventory)
@@ -13,6 +14,12 @@ class PharmacyInventoryAdmin(admin.ModelAdmin):  # Admin configuration for Pharm
     list_filter = ['pharmacy', 'expiry_date']
     search_fields = ['medication__name', 'batch_number']
 
+@admin.register(InventoryImportJob)
+class InventoryImportJobAdmin(admin.ModelAdmin):  # Admin configuration for InventoryImportJob model
+    list_display = ['original_name', 'pharmacy', 'status', 'imported_count', 'error_count', 'total_rows', 'created_at']
+    list_filter = ['status', 'created_at']
+    readonly_fields = ['started_at', 'finished_at', 'created_at']
+
 @admin.register(PharmacyOrder)
 class PharmacyOrderAdmin(admin.ModelAdmin):  # Admin configuration for PharmacyOrder model
     list_display = ['order_number', 'pharmacy', 'patient', 'status', 'total_amount', 'order_date']
@@ -31,6 +38,12 @@ class PharmacyPurchaseAdmin(admin.ModelAdmin):  # Admin configuration for Pharma
     list_filter = ['status', 'pharmacy', 'order_date']
     search_fields = ['purchase_number']
 
+@admin.register(PharmacyPurchaseReceipt)
+class PharmacyPurchaseReceiptAdmin(admin.ModelAdmin):  # Admin configuration for PharmacyPurchaseReceipt model
+    list_display = ['delivery_reference', 'purchase', 'quantity_received', 'created_batches', 'merged_batches', 'received_at']
+    search_fields = ['delivery_reference', 'purchase__purchase_number']
+    readonly_fields = ['received_at']
+
 @admin.register(PharmacySale)
 class PharmacySaleAdmin(admin.ModelAdmin):  # Admin configuration for PharmacySale model
     list_display = ['sale_number', 'pharmacy', 'patient', 'final_amount', 'payment_method', 'sale_date']
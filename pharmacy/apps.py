@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PharmacyConfig(AppConfig):  # PharmacyConfig class implementation
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pharmacy'
+
+    def ready(self):
+        import pharmacy.signals  # Import signals to register them
@@ -0,0 +1,148 @@
+"""
+Monthly referral bonus calculation behind PharmacyBonusConfigViewSet.calculate_bonuses.
+
+Each active PharmacyBonusConfig of a pharmacy is applied with one conditional
+UPDATE over its eligible referrals (fulfilled within the month, of the
+config's doctor or of any doctor, bonus not yet set):
+
+    percentage    bonus_earned = total_amount * bonus_percentage / 100
+    fixed_amount  bonus_earned = fixed_bonus_amount
+    tiered        bonus_earned = bonus_amount_for_tier, when the month's
+                  eligible referral count is within [min, max]
+
+preceded by one aggregate (count and bonus total) over the same rows. The
+updated referrals' sync events are logged in bulk afterwards (the UPDATE sends
+no post_save), so a month costs a handful of queries per config whatever the
+number of referrals. Configs
+are applied doctor-specific first, then oldest first; a referral that received
+a bonus is not eligible for later configs.
+
+A dry run executes the same updates inside a transaction that is rolled back,
+so the preview matches exactly what a real run would write. Month-end runs
+are scheduled in backend/celery.py (pharmacy.tasks.calculate_referral_bonuses).
+"""
+import logging
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Q, Sum, Value
+from django.utils import timezone
+
+from sync.signals import log_bulk_sync_events
+
+from .models import DoctorPharmacyReferral, PharmacyBonusConfig
+
+logger = logging.getLogger(__name__)
+
+
+class BonusEngine:
+    """Set-based referral bonus calculation"""
+
+    @staticmethod
+    def month_bounds(year, month):
+        """Aware [start, end) datetimes of a calendar month"""
+        start = timezone.make_aware(datetime(year, month, 1))
+        end = timezone.make_aware(datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1))
+        return start, end
+
+    @staticmethod
+    def previous_month(today=None):
+        today = today or timezone.now().date()
+        return (today.year - 1, 12) if today.month == 1 else (today.year, today.month - 1)
+
+    @staticmethod
+    def active_configs(pharmacy_id, start, end):
+        """Configs covering the month, in application order (doctor-specific first, then oldest first)"""
+        configs = PharmacyBonusConfig.objects.filter(
+            pharmacy_id=pharmacy_id,
+            is_active=True,
+            valid_from__lte=start.date(),
+        ).filter(
+            Q(valid_until__isnull=True) | Q(valid_until__gte=end.date())
+        )
+        return sorted(configs, key=lambda config: (config.doctor_id is None, config.created_at))
+
+    @staticmethod
+    def bonus_expression(config):
+        """SQL expression of a referral's bonus under config, or None when it pays nothing"""
+        if config.bonus_type == 'percentage' and config.bonus_percentage:
+            return F('total_amount') * Value(config.bonus_percentage) / Value(100)
+        if config.bonus_type == 'fixed_amount' and config.fixed_bonus_amount:
+            return Value(config.fixed_bonus_amount, output_field=IntegerField())
+        if config.bonus_type == 'tiered' and config.bonus_amount_for_tier:
+            return Value(config.bonus_amount_for_tier, output_field=IntegerField())
+        return None
+
+    @staticmethod
+    def apply_config(config, start, end, now=None):
+        """Set the bonus of config's eligible referrals; returns (referrals updated, bonus total)"""
+        referrals = DoctorPharmacyReferral.objects.filter(
+            pharmacy_id=config.pharmacy_id,
+            referral_date__gte=start,
+            referral_date__lt=end,
+            was_fulfilled=True,
+            bonus_earned=0,
+        )
+        if config.doctor_id:
+            referrals = referrals.filter(doctor_id=config.doctor_id)
+
+        bonus = BonusEngine.bonus_expression(config)
+        if bonus is None:
+            return 0, 0
+        stats = referrals.aggregate(count=Count('id'), total=Sum(bonus))
+        if not stats['count']:
+            return 0, 0
+        if config.bonus_type == 'tiered' and not (
+            config.min_prescriptions_per_month <= stats['count'] <= config.max_prescriptions_per_month
+        ):
+            return 0, 0
+
+        ids = list(referrals.values_list('id', flat=True))
+        updated = referrals.filter(id__in=ids).update(
+            bonus_earned=bonus,
+            version=F('version') + 1,
+            updated_at=now or timezone.now(),
+        )
+        log_bulk_sync_events(DoctorPharmacyReferral.objects.filter(id__in=ids))
+        return updated, stats['total'] or 0
+
+    @staticmethod
+    def calculate(pharmacy_id, year, month, dry_run=False):
+        """
+        Apply the pharmacy's active bonus configs to a month's referrals
+
+        Returns:
+            dict: month, year, dry_run, configs_applied, referrals_updated,
+            total_bonus and a per-config breakdown
+        """
+        start, end = BonusEngine.month_bounds(int(year), int(month))
+        now = timezone.now()
+        breakdown = []
+        with transaction.atomic():
+            configs = BonusEngine.active_configs(pharmacy_id, start, end)
+            for config in configs:
+                updated, total = BonusEngine.apply_config(config, start, end, now)
+                breakdown.append({
+                    'config_id': str(config.pk),
+                    'bonus_type': config.bonus_type,
+                    'doctor_id': str(config.doctor_id) if config.doctor_id else None,
+                    'referrals_updated': updated,
+                    'total_bonus': total,
+                })
+            if dry_run:
+                transaction.set_rollback(True)
+
+        summary = {
+            'month': int(month),
+            'year': int(year),
+            'dry_run': dry_run,
+            'configs_applied': len(configs),
+            'referrals_updated': sum(row['referrals_updated'] for row in breakdown),
+            'total_bonus': sum(row['total_bonus'] for row in breakdown),
+            'configs': breakdown,
+        }
+        logger.info(
+            f"Referral bonuses {'previewed' if dry_run else 'calculated'} for {pharmacy_id} {month}/{year}: "
+            f"{summary['referrals_updated']} referrals, {summary['total_bonus']}"
+        )
+        return summary
@@ -0,0 +1,452 @@
+"""
+Public medication catalog search.
+
+MedicationCatalogEntry holds one denormalized row per publicly available
+inventory item (medication names, pharmacy name and location, stock, price).
+Queries are resolved in two steps:
+
+1. The query words are matched against an in-memory term dictionary built from
+   the Medication names (name, generic name, brand name) and the pharmacy
+   cities: exact words, prefixes ("amoxi"), French phonetic keys ("amoxiciline",
+   "paracétamole") and trigram similarity for typos. Words that only match a
+   city become a location filter. The dictionary is small (one entry per
+   distinct word, not per inventory row) and is rebuilt per process when its
+   cache version changes.
+2. One indexed query on MedicationCatalogEntry filtered by the matched
+   medication ids (and city, pharmacy, category), ranked by match score then
+   price, returns the requested page; pharmacy and category facets are two
+   grouped queries on the same filter.
+
+Entries are refreshed after commit from inventory, medication and pharmacy
+signals (see pharmacy/signals.py) and by InventoryImporter after each chunk.
+"""
+import logging
+import re
+import time
+import unicodedata
+import uuid
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, FloatField, Value, When
+from django.utils import timezone
+
+from core.price_index import normalize_region
+from prescriptions.models import Medication
+
+from .models import MedicationCatalogEntry, PharmacyInventory
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VOCABULARY_VERSION_KEY = 'pharmacy:catalog:vocabulary'
+CATALOG_VOCABULARY_TTL = 600  # seconds a process keeps its term dictionary without a version change
+MAX_MEDICATION_MATCHES = 300  # best-scoring medications a query is narrowed to
+MAX_PREFIX_MATCHES = 200
+TYPO_MIN_LENGTH = 4
+TYPO_MIN_SIMILARITY = 0.6  # trigram Dice coefficient of the phonetic keys
+CITY_MIN_SCORE = 0.5  # 'coto' or 'cotonuo' still name Cotonou
+FACET_LIMIT = 20
+
+FIELD_WEIGHTS = (('name', 1.0), ('generic_name', 0.9), ('brand_name', 0.8))
+PHONETIC_RULES = (('ph', 'f'), ('th', 't'), ('qu', 'k'), ('ck', 'k'), ('y', 'i'), ('ae', 'e'), ('oe', 'e'), ('z', 's'))
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+_term_index = {'version': None, 'built_at': 0.0, 'index': None}
+
+
+def normalize_text(value):
+    """Lowercase, accent-free text"""
+    decomposed = unicodedata.normalize('NFKD', (value or '').lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(value):
+    return [word for word in _WORD_RE.findall(normalize_text(value)) if len(word) > 1 or word.isdigit()]
+
+
+def phonetic_key(word):
+    """
+    Spelling-insensitive key for French drug names
+
+    'amoxicilline', 'amoxicillin' and 'amoxiciline' all give 'amoxisilin';
+    'paracétamole' and 'paracetamol' give 'parasetamol'.
+    """
+    for source, target in PHONETIC_RULES:
+        word = word.replace(source, target)
+    word = re.sub(r'c(?=[eiy])', 's', word)
+    word = word.replace('c', 'k')
+    word = re.sub(r'(.)\1+', r'\1', word)
+    if len(word) > 4:
+        word = re.sub(r'[es]+$', '', word)
+    return word
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CatalogTermIndex:
+    """Term dictionary of medication names and pharmacy cities with prefix, phonetic and trigram lookups"""
+
+    def __init__(self, medications, city_keys):
+        self.terms = []
+        self.term_ids = {}
+        self.medications = []  # term id -> {medication_id: field weight}
+        self.cities = []  # term id -> {city_key}
+        phonetic_terms = defaultdict(list)
+
+        for medication_id, *names in medications:
+            for (_, weight), value in zip(FIELD_WEIGHTS, names):
+                for word in tokenize(value):
+                    term_medications = self.medications[self._term(word)]
+                    term_medications[medication_id] = max(term_medications.get(medication_id, 0), weight)
+        for city_key in city_keys:
+            for word in tokenize(city_key):
+                self.cities[self._term(word)].add(city_key)
+
+        for term_id, term in enumerate(self.terms):
+            phonetic_terms[phonetic_key(term)].append(term_id)
+        self.phonetic_terms = dict(phonetic_terms)
+        self.sorted_terms = sorted(self.term_ids)
+        self.sorted_phonetic = sorted(self.phonetic_terms)
+        self.phonetic_trigrams = {key: len(trigrams(key)) for key in self.phonetic_terms}
+        self.trigram_postings = defaultdict(list)
+        for key in self.phonetic_terms:
+            for gram in trigrams(key):
+                self.trigram_postings[gram].append(key)
+
+    def _term(self, word):
+        term_id = self.term_ids.get(word)
+        if term_id is None:
+            term_id = self.term_ids[word] = len(self.terms)
+            self.terms.append(word)
+            self.medications.append({})
+            self.cities.append(set())
+        return term_id
+
+    @staticmethod
+    def _prefixed(sorted_values, prefix):
+        start = bisect_left(sorted_values, prefix)
+        for value in sorted_values[start:start + MAX_PREFIX_MATCHES]:
+            if not value.startswith(prefix):
+                break
+            yield value
+
+    def match(self, word):
+        """{term id: score in (0, 1]} of dictionary terms matching one query word"""
+        scores = {}
+
+        def hit(term_ids, score):
+            for term_id in term_ids:
+                if score > scores.get(term_id, 0):
+                    scores[term_id] = score
+
+        if word in self.term_ids:
+            hit([self.term_ids[word]], 1.0)
+        for term in self._prefixed(self.sorted_terms, word):
+            hit([self.term_ids[term]], 0.6 + 0.3 * len(word) / len(term))
+
+        key = phonetic_key(word)
+        if len(key) >= 3:
+            for phonetic in self._prefixed(self.sorted_phonetic, key):
+                hit(self.phonetic_terms[phonetic], 0.5 + 0.35 * len(key) / len(phonetic))
+
+        if len(word) >= TYPO_MIN_LENGTH:
+            grams = trigrams(key)
+            shared = Counter()
+            for gram in grams:
+                shared.update(self.trigram_postings.get(gram, ()))
+            for phonetic, count in shared.items():
+                similarity = 2 * count / (len(grams) + self.phonetic_trigrams[phonetic])
+                if similarity >= TYPO_MIN_SIMILARITY:
+                    hit(self.phonetic_terms[phonetic], 0.8 * similarity)
+        return scores
+
+
+class CatalogSearchService:
+    """Maintain and query the public medication catalog index"""
+
+    # Index maintenance
+
+    @staticmethod
+    def _pharmacy_location(row, prefix=''):
+        return {
+            'pharmacy_name': row[f'{prefix}provider_data__provider_name'] or row[f'{prefix}full_name'] or '',
+            'pharmacy_phone': (row[f'{prefix}provider_data__phone_number'] or row[f'{prefix}phone_number'] or '')[:20],
+            'address': row[f'{prefix}provider_data__address'] or row[f'{prefix}address'] or '',
+            'city': (row[f'{prefix}city'] or row[f'{prefix}provider_data__city'] or '').strip(),
+        }
+
+    @staticmethod
+    def _location_fields(prefix=''):
+        return [
+            f'{prefix}{field}' for field in (
+                'full_name', 'phone_number', 'address', 'city', 'provider_data__provider_name',
+                'provider_data__phone_number', 'provider_data__address', 'provider_data__city',
+            )
+        ]
+
+    @staticmethod
+    @transaction.atomic
+    def refresh_items(inventory_ids):
+        """Replace the catalog entries of some inventory items (3 queries whatever the count)"""
+        inventory_ids = list(inventory_ids)
+        if not inventory_ids:
+            return 0
+        rows = PharmacyInventory.objects.filter(pk__in=inventory_ids, is_publicly_available=True).values(
+            'id', 'pharmacy_id', 'medication_id', 'manufacturer', 'quantity_in_stock', 'selling_price',
+            'expiry_date', 'requires_refrigeration', 'medication__name', 'medication__generic_name',
+            'medication__brand_name', 'medication__category', 'medication__requires_prescription',
+            *CatalogSearchService._location_fields('pharmacy__'),
+        )
+        entries = []
+        for row in rows:
+            location = CatalogSearchService._pharmacy_location(row, 'pharmacy__')
+            entries.append(MedicationCatalogEntry(
+                inventory_id=row['id'],
+                pharmacy_id=row['pharmacy_id'],
+                medication_id=row['medication_id'],
+                medication_name=row['medication__name'],
+                generic_name=row['medication__generic_name'],
+                brand_name=row['medication__brand_name'],
+                category=row['medication__category'],
+                requires_prescription=row['medication__requires_prescription'],
+                city_key=normalize_region(location['city']),
+                manufacturer=row['manufacturer'],
+                quantity_in_stock=row['quantity_in_stock'],
+                selling_price=row['selling_price'],
+                expiry_date=row['expiry_date'],
+                requires_refrigeration=row['requires_refrigeration'],
+                **location,
+            ))
+        MedicationCatalogEntry.objects.filter(inventory_id__in=inventory_ids).delete()
+        MedicationCatalogEntry.objects.bulk_create(entries, batch_size=1000)
+        return len(entries)
+
+    @staticmethod
+    def refresh_medication(medication_id):
+        """Copy renamed/recategorized medication fields into its entries"""
+        medication = Medication.objects.filter(pk=medication_id).values(
+            'name', 'generic_name', 'brand_name', 'category', 'requires_prescription'
+        ).first()
+        if medication is not None:
+            MedicationCatalogEntry.objects.filter(medication_id=medication_id).update(
+                medication_name=medication['name'], **{key: value for key, value in medication.items() if key != 'name'}
+            )
+        CatalogSearchService.invalidate_vocabulary()
+
+    @staticmethod
+    def refresh_pharmacy(pharmacy_id):
+        """Copy a pharmacy's name, phone and location into its entries"""
+        from core.models import Participant
+
+        row = Participant.objects.filter(pk=pharmacy_id).values(*CatalogSearchService._location_fields()).first()
+        if row is None:
+            return
+        location = CatalogSearchService._pharmacy_location(row)
+        updated = MedicationCatalogEntry.objects.filter(pharmacy_id=pharmacy_id).update(
+            city_key=normalize_region(location['city']), **location
+        )
+        if updated:
+            CatalogSearchService.invalidate_vocabulary()
+
+    @staticmethod
+    def rebuild(chunk_size=2000):
+        """Re-index every publicly available item chunk by chunk (searches stay served meanwhile)"""
+        total = 0
+        last_id = None
+        items = PharmacyInventory.objects.filter(is_publicly_available=True).order_by('id')
+        while True:
+            chunk = items.filter(id__gt=last_id) if last_id else items
+            ids = list(chunk.values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            total += CatalogSearchService.refresh_items(ids)
+            last_id = ids[-1]
+        MedicationCatalogEntry.objects.filter(inventory__is_publicly_available=False).delete()
+        CatalogSearchService.invalidate_vocabulary()
+        logger.info(f"Medication catalog index rebuilt: {total} entries")
+        return total
+
+    # Term dictionary
+
+    @staticmethod
+    def invalidate_vocabulary():
+        """Bump the dictionary version so every process rebuilds its term index on next search"""
+        try:
+            cache.incr(CATALOG_VOCABULARY_VERSION_KEY)
+        except ValueError:
+            cache.set(CATALOG_VOCABULARY_VERSION_KEY, time.time_ns(), None)
+
+    @staticmethod
+    def term_index():
+        version = cache.get(CATALOG_VOCABULARY_VERSION_KEY)
+        if version is None:  # evicted or cleared: start a version no process has built yet
+            cache.add(CATALOG_VOCABULARY_VERSION_KEY, time.time_ns(), None)
+            version = cache.get(CATALOG_VOCABULARY_VERSION_KEY)
+        if (
+            _term_index['index'] is None
+            or _term_index['version'] != version
+            or time.monotonic() - _term_index['built_at'] > CATALOG_VOCABULARY_TTL
+        ):
+            medications = Medication.objects.values_list('id', 'name', 'generic_name', 'brand_name')
+            city_keys = (
+                MedicationCatalogEntry.objects.exclude(city_key='')
+                .order_by('city_key').values_list('city_key', flat=True).distinct()
+            )
+            _term_index.update(
+                version=version,
+                built_at=time.monotonic(),
+                index=CatalogTermIndex(medications.iterator(chunk_size=5000), list(city_keys)),
+            )
+        return _term_index['index']
+
+    @staticmethod
+    def resolve(query):
+        """
+        Match a free-text query against the term dictionary
+
+        Returns:
+            tuple: ({medication_id: score} or None when the query names no
+            medication, {city_key} or None when it names no city); empty
+            medication scores mean nothing matches
+        """
+        index = CatalogSearchService.term_index()
+        medication_scores = None
+        city_keys = None
+        for word in tokenize(query):
+            matches = index.match(word)
+            word_medications = {}
+            word_cities = set()
+            exact_medication = exact_city = False
+            for term_id, score in matches.items():
+                for medication_id, weight in index.medications[term_id].items():
+                    if score * weight > word_medications.get(medication_id, 0):
+                        word_medications[medication_id] = score * weight
+                if score >= CITY_MIN_SCORE:
+                    word_cities |= index.cities[term_id]
+                if score == 1.0:
+                    exact_medication = exact_medication or bool(index.medications[term_id])
+                    exact_city = exact_city or bool(index.cities[term_id])
+
+            if word_cities and not exact_medication and (exact_city or not word_medications):
+                city_keys = word_cities if city_keys is None else city_keys & word_cities
+                if not city_keys:
+                    return {}, city_keys
+            elif word_medications:
+                if medication_scores is None:
+                    medication_scores = word_medications
+                else:
+                    medication_scores = {
+                        medication_id: medication_scores[medication_id] + score
+                        for medication_id, score in word_medications.items()
+                        if medication_id in medication_scores
+                    }
+            else:
+                return {}, city_keys
+
+        if medication_scores and len(medication_scores) > MAX_MEDICATION_MATCHES:
+            best = sorted(medication_scores.items(), key=lambda item: item[1], reverse=True)[:MAX_MEDICATION_MATCHES]
+            medication_scores = dict(best)
+        return medication_scores, city_keys
+
+    # Search
+
+    @staticmethod
+    def search(query='', city='', pharmacy_id=None, category='', medication_id=None, min_quantity=1,
+               page=1, page_size=20, facets=True):
+        """
+        One ranked page of available catalog entries
+
+        Returns:
+            dict: {'total', 'results': [MedicationCatalogEntry], 'facets':
+            {'pharmacies': [...], 'categories': [...]}}
+        """
+        empty = {'total': 0, 'results': [], 'facets': {'pharmacies': [], 'categories': []}}
+        try:
+            pharmacy_id = uuid.UUID(str(pharmacy_id)) if pharmacy_id else None
+            medication_id = uuid.UUID(str(medication_id)) if medication_id else None
+        except ValueError:
+            return empty
+        entries = MedicationCatalogEntry.objects.filter(
+            quantity_in_stock__gte=max(min_quantity, 1),
+            expiry_date__gt=timezone.now().date(),
+        )
+        if medication_id:
+            entries = entries.filter(medication_id=medication_id)
+        if city:
+            entries = entries.filter(city_key=normalize_region(city))
+
+        rank = None
+        if query.strip():
+            medication_scores, city_keys = CatalogSearchService.resolve(query)
+            if medication_scores is not None and not medication_scores:
+                return empty
+            if city_keys is not None:
+                entries = entries.filter(city_key__in=city_keys)
+            if medication_scores:
+                entries = entries.filter(medication_id__in=list(medication_scores))
+                by_score = defaultdict(list)
+                for matched_id, score in medication_scores.items():
+                    by_score[round(score, 3)].append(matched_id)
+                rank = Case(
+                    *[When(medication_id__in=ids, then=Value(score)) for score, ids in by_score.items()],
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                )
+
+        filtered = entries
+        if pharmacy_id:
+            filtered = filtered.filter(pharmacy_id=pharmacy_id)
+        if category:
+            filtered = filtered.filter(category=category)
+
+        if rank is not None:
+            ordered = filtered.annotate(rank=rank).order_by('-rank', 'selling_price', 'id')
+        else:
+            ordered = filtered.order_by('medication_name', 'selling_price', 'id')
+        offset = (page - 1) * page_size
+        results = list(ordered[offset:offset + page_size])
+        total = len(results) if page == 1 and len(results) < page_size else filtered.count()
+
+        response = {'total': total, 'results': results, 'facets': {'pharmacies': [], 'categories': []}}
+        if facets:
+            pharmacy_facet = entries.filter(category=category) if category else entries
+            category_facet = entries.filter(pharmacy_id=pharmacy_id) if pharmacy_id else entries
+            response['facets'] = {
+                'pharmacies': list(
+                    pharmacy_facet.values('pharmacy_id', 'pharmacy_name')
+                    .annotate(count=Count('id')).order_by('-count', 'pharmacy_name')[:FACET_LIMIT]
+                ),
+                'categories': list(
+                    category_facet.exclude(category='').values('category')
+                    .annotate(count=Count('id')).order_by('-count', 'category')[:FACET_LIMIT]
+                ),
+            }
+        return response
+
+    @staticmethod
+    def serialize(entry):
+        return {
+            'id': str(entry.inventory_id),
+            'medication_id': str(entry.medication_id),
+            'medication_name': entry.medication_name,
+            'generic_name': entry.generic_name,
+            'brand_name': entry.brand_name,
+            'category': entry.category,
+            'requires_prescription': entry.requires_prescription,
+            'pharmacy_id': str(entry.pharmacy_id),
+            'pharmacy_name': entry.pharmacy_name,
+            'pharmacy_address': entry.address,
+            'pharmacy_phone': entry.pharmacy_phone,
+            'city': entry.city,
+            'manufacturer': entry.manufacturer,
+            'quantity_in_stock': entry.quantity_in_stock,
+            'selling_price': entry.selling_price,
+            'expiry_date': entry.expiry_date.strftime('%Y-%m-%d'),
+            'requires_refrigeration': entry.requires_refrigeration,
+            'score': round(getattr(entry, 'rank', 0.0) or 0.0, 3),
+        }
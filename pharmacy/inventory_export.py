@@ -0,0 +1,252 @@
+"""
+Streaming inventory export behind PharmacyInventoryViewSet.export_inventory.
+
+Rows are read with values_list(...).iterator(chunk_size=EXPORT_CHUNK_SIZE), so
+neither model instances nor the whole result set are held in memory. The XLSX
+writer uses an openpyxl write-only workbook (rows are flushed to a temporary
+file as they are appended, and only the header, status and days-remaining
+cells carry a style); the CSV variant is yielded line by line into a
+StreamingHttpResponse.
+
+Inventories above INLINE_EXPORT_MAX_ROWS are exported by a Celery task (or in
+the request when no worker consumes the broker, backend.celery.run_inline) to
+default_storage under a name derived from the inventory fingerprint (row
+count, latest updated_at and today's date, since "Jours Restants" moves daily).
+That file is served until the inventory changes; until it exists the view
+answers 202 and the client retries.
+"""
+import csv
+import hashlib
+import logging
+import tempfile
+
+import openpyxl
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max
+from django.utils import timezone
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+from .models import PharmacyInventory
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 2000
+INLINE_EXPORT_MAX_ROWS = 5000  # larger inventories are exported in the background
+EXPORT_PENDING_TIMEOUT = 15 * 60  # a lost task is retried after this
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+HEADERS = [
+    'Médicament',
+    'Nom Générique',
+    'Numéro de Lot',
+    'Quantité',
+    'Prix Unitaire',
+    'Prix de Vente',
+    'Valeur Totale',
+    'Fabricant',
+    'Date Fabrication',
+    'Date Expiration',
+    'Jours Restants',
+    'Niveau Réapprovisionnement',
+    'Emplacement',
+    'Réfrigération',
+    'Statut',
+]
+DAYS_COLUMN = 10  # 0-based positions in a row
+STATUS_COLUMN = 14
+
+EXPORT_FIELDS = (
+    'medication__name', 'medication__generic_name', 'batch_number', 'quantity_in_stock', 'unit_price',
+    'selling_price', 'manufacturer', 'manufacturing_date', 'expiry_date', 'reorder_level',
+    'storage_location', 'requires_refrigeration',
+)
+
+RED = PatternFill(start_color="fee2e2", end_color="fee2e2", fill_type="solid")
+AMBER = PatternFill(start_color="fef3c7", end_color="fef3c7", fill_type="solid")
+GREEN = PatternFill(start_color="d1fae5", end_color="d1fae5", fill_type="solid")
+STATUS_FILLS = {'Rupture': RED, 'Stock Faible': AMBER, 'En Stock': GREEN}
+
+
+def stock_status(quantity, reorder_level):
+    if quantity == 0:
+        return 'Rupture'
+    if quantity <= reorder_level:
+        return 'Stock Faible'
+    return 'En Stock'
+
+
+def inventory_rows(pharmacy_id, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield one list of HEADERS values per inventory item, streamed from the database"""
+    today = timezone.now().date()
+    items = (
+        PharmacyInventory.objects.filter(pharmacy_id=pharmacy_id)
+        .order_by('medication__name', 'batch_number')
+        .values_list(*EXPORT_FIELDS)
+    )
+    for (name, generic_name, batch, quantity, unit_price, selling_price, manufacturer,
+         manufacturing_date, expiry_date, reorder_level, location, refrigerated) in items.iterator(chunk_size=chunk_size):
+        yield [
+            name,
+            generic_name,
+            batch,
+            quantity,
+            unit_price,
+            selling_price,
+            quantity * unit_price,
+            manufacturer,
+            manufacturing_date.strftime('%Y-%m-%d') if manufacturing_date else '',
+            expiry_date.strftime('%Y-%m-%d'),
+            (expiry_date - today).days,
+            reorder_level,
+            location,
+            'OUI' if refrigerated else 'NON',
+            stock_status(quantity, reorder_level),
+        ]
+
+
+def write_inventory_xlsx(pharmacy_id, output, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write the inventory workbook to a path or binary file object with a write-only workbook"""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Inventaire")
+    for col in range(1, len(HEADERS) + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 18
+
+    header_fill = PatternFill(start_color="10b981", end_color="10b981", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF", size=12)
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    header = []
+    for title in HEADERS:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cell.border = border
+        header.append(cell)
+    ws.append(header)
+
+    for row in inventory_rows(pharmacy_id, chunk_size):
+        status_cell = WriteOnlyCell(ws, value=row[STATUS_COLUMN])
+        status_cell.fill = STATUS_FILLS[row[STATUS_COLUMN]]
+        row[STATUS_COLUMN] = status_cell
+
+        days = row[DAYS_COLUMN]
+        if days < 90:
+            days_cell = WriteOnlyCell(ws, value=days)
+            days_cell.fill = RED if days < 30 else AMBER
+            row[DAYS_COLUMN] = days_cell
+        ws.append(row)
+
+    wb.save(output)
+    return output
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def iter_inventory_csv(pharmacy_id, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the inventory as UTF-8 CSV lines (with a BOM so Excel keeps the accents)"""
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(HEADERS)
+    for row in inventory_rows(pharmacy_id, chunk_size):
+        yield writer.writerow(row)
+
+
+class InventoryExporter:
+    """Cached background exports of large inventories"""
+
+    @staticmethod
+    def fingerprint(pharmacy_id):
+        """(row count, fingerprint) of an inventory; changes with any saved item, deletion or new day"""
+        state = PharmacyInventory.objects.filter(pharmacy_id=pharmacy_id).aggregate(
+            count=Count('id'), latest=Max('updated_at')
+        )
+        latest = state['latest'].isoformat() if state['latest'] else ''
+        raw = f"{state['count']}:{latest}:{timezone.now().date().isoformat()}"
+        return state['count'], hashlib.sha1(raw.encode()).hexdigest()[:20]
+
+    @staticmethod
+    def export_dir(pharmacy_id):
+        return f"inventory_exports/{pharmacy_id}"
+
+    @staticmethod
+    def export_name(pharmacy_id, fingerprint):
+        return f"{InventoryExporter.export_dir(pharmacy_id)}/{fingerprint}.xlsx"
+
+    @staticmethod
+    def _pending_key(pharmacy_id, fingerprint):
+        return f"pharmacy:inventory_export:{pharmacy_id}:{fingerprint}"
+
+    @staticmethod
+    def prepare(pharmacy_id):
+        """
+        Decide how the current inventory is served
+
+        Returns:
+            dict: {'status': 'ready', 'file': storage name} when the cached export
+            is current, {'status': 'inline'} for small inventories, otherwise
+            {'status': 'pending'} with the background export queued (once)
+        """
+        count, fingerprint = InventoryExporter.fingerprint(pharmacy_id)
+        name = InventoryExporter.export_name(pharmacy_id, fingerprint)
+        if default_storage.exists(name):
+            return {'status': 'ready', 'file': name, 'rows': count}
+        if count <= INLINE_EXPORT_MAX_ROWS:
+            return {'status': 'inline', 'rows': count}
+
+        if cache.add(InventoryExporter._pending_key(pharmacy_id, fingerprint), True, EXPORT_PENDING_TIMEOUT):
+            InventoryExporter.enqueue(pharmacy_id)
+            if default_storage.exists(name):  # built in the request (backend.celery.run_inline)
+                return {'status': 'ready', 'file': name, 'rows': count}
+        return {'status': 'pending', 'rows': count}
+
+    @staticmethod
+    def enqueue(pharmacy_id):
+        """Export on a worker, or within the request when no worker consumes the broker"""
+        from backend.celery import run_inline
+
+        if run_inline():
+            InventoryExporter.build(pharmacy_id)
+            return
+        from .tasks import export_inventory_file
+        export_inventory_file.delay(str(pharmacy_id))
+
+    @staticmethod
+    def build(pharmacy_id):
+        """Write the current inventory export to default_storage and drop older ones; returns the storage name"""
+        _, fingerprint = InventoryExporter.fingerprint(pharmacy_id)
+        name = InventoryExporter.export_name(pharmacy_id, fingerprint)
+        try:
+            if not default_storage.exists(name):
+                with tempfile.TemporaryFile() as tmp:
+                    write_inventory_xlsx(pharmacy_id, tmp)
+                    tmp.seek(0)
+                    saved = default_storage.save(name, File(tmp))
+                if saved != name:  # a concurrent build stored it first
+                    default_storage.delete(saved)
+                logger.info(f"Exported inventory of {pharmacy_id} to {name}")
+            InventoryExporter.prune(pharmacy_id, keep=name)
+        finally:
+            cache.delete(InventoryExporter._pending_key(pharmacy_id, fingerprint))
+        return name
+
+    @staticmethod
+    def prune(pharmacy_id, keep):
+        """Delete the pharmacy's outdated export files"""
+        directory = InventoryExporter.export_dir(pharmacy_id)
+        try:
+            _, files = default_storage.listdir(directory)
+        except (FileNotFoundError, NotImplementedError):
+            return
+        for file_name in files:
+            path = f"{directory}/{file_name}"
+            if path != keep:
+                default_storage.delete(path)
@@ -0,0 +1,435 @@
+"""
+Bulk inventory import behind PharmacyInventoryViewSet.import_inventory.
+
+The workbook is streamed with openpyxl in read-only mode and applied in chunks
+of IMPORT_CHUNK_SIZE rows. Per chunk, medication names are resolved with one
+case-insensitive query (unknown names are bulk-created), the existing
+(medication, batch) inventory items with one more query, and rows are written
+with bulk_update / bulk_create. Bulk writes send no post_save, so the
+SyncEvents of the chunk's medications and inventory items are written with it
+(sync.signals.log_bulk_sync_events). Invalid rows (missing values, text
+longer than its column, numbers outside the integer columns) are reported
+("Ligne N: ...") without stopping the import; when a chunk still hits a
+database error it is replayed one savepoint per row, so only the offending
+rows are reported.
+
+Large uploads run as an InventoryImportJob in Celery (within the request when
+no worker consumes the broker, backend.celery.run_inline); each chunk and the
+job checkpoint commit together, so an interrupted job resumes after last_row.
+"""
+import logging
+import uuid
+from datetime import datetime
+
+import openpyxl
+from django.core.files.storage import default_storage
+from django.db import DataError, IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from prescriptions.models import Medication
+from sync.signals import log_bulk_sync_events
+
+from .catalog_search import CatalogSearchService
+from .models import InventoryImportJob, PharmacyInventory
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 1000
+INLINE_IMPORT_MAX_BYTES = 512 * 1024  # larger uploads are imported in the background
+MAX_REPORTED_ROWS = 1000  # row errors/warnings kept in a job report (counts stay exact)
+TEMPLATE_COLUMNS = 13
+
+INT_MAX = 2147483647  # IntegerField columns
+TRUE_VALUES = ['OUI', 'YES', 'TRUE', '1']
+UPDATE_FIELDS = [
+    'quantity_in_stock', 'unit_price', 'selling_price', 'manufacturer', 'manufacturing_date', 'expiry_date',
+    'reorder_level', 'storage_location', 'requires_refrigeration', 'is_publicly_available',
+]
+
+
+def _empty_results():
+    return {
+        'success': 0,
+        'created': 0,
+        'updated': 0,
+        'errors': [],
+        'warnings': [],
+        'created_medications': [],
+    }
+
+
+def _merge_results(results, chunk_results):
+    for key in ('success', 'created', 'updated'):
+        results[key] += chunk_results[key]
+    for key in ('errors', 'warnings', 'created_medications'):
+        results[key].extend(chunk_results[key])
+
+
+def _text(value):
+    return str(value).strip() if value is not None else ''
+
+
+def _text_limits():
+    """(values key, label, max_length) of the text columns"""
+    medication, inventory = Medication._meta, PharmacyInventory._meta
+    return [
+        ('medication_name', 'Nom du médicament', medication.get_field('name').max_length),
+        ('generic_name', 'Nom générique', medication.get_field('generic_name').max_length),
+        ('batch_number', 'Numéro de lot', inventory.get_field('batch_number').max_length),
+        ('manufacturer', 'Fabricant', min(
+            medication.get_field('manufacturer').max_length, inventory.get_field('manufacturer').max_length
+        )),
+        ('storage_location', 'Emplacement', inventory.get_field('storage_location').max_length),
+    ]
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    return value
+
+
+class InventoryImporter:
+    """Streaming, chunked import of the inventory template"""
+
+    @staticmethod
+    def read_rows(file, start_row=2):
+        """Yield (row_number, values) of non-empty rows, padded to the template width"""
+        wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            ws = wb.active
+            for row_num, row in enumerate(ws.iter_rows(min_row=start_row, values_only=True), start=start_row):
+                if not any(row):  # Skip empty rows
+                    continue
+                row = tuple(row)
+                yield row_num, row + (None,) * (TEMPLATE_COLUMNS - len(row))
+        finally:
+            wb.close()
+
+    @staticmethod
+    def count_rows(file):
+        """Data rows according to the sheet dimension (no full read; 0 when the file has no dimension record)"""
+        wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            return max((wb.active.max_row or 1) - 1, 0)
+        finally:
+            wb.close()
+
+    @staticmethod
+    def parse_row(row_num, row):
+        """
+        Validate and convert one template row
+
+        Returns:
+            tuple: (values dict or None, error message or None, warning messages)
+        """
+        med_name = _text(row[0])
+        batch_number = _text(row[2])
+        quantity = row[3]
+        unit_price = row[4]
+        selling_price = row[5]
+        expiry_date = row[8]
+
+        # Validate required fields
+        if not med_name:
+            return None, f"Ligne {row_num}: Nom du médicament manquant", []
+        if not batch_number:
+            return None, f"Ligne {row_num}: Numéro de lot manquant", []
+        if not quantity:
+            return None, f"Ligne {row_num}: Quantité manquante", []
+        if not unit_price:
+            return None, f"Ligne {row_num}: Prix unitaire manquant", []
+        if not selling_price:
+            return None, f"Ligne {row_num}: Prix de vente manquant", []
+        if not expiry_date:
+            return None, f"Ligne {row_num}: Date d'expiration manquante", []
+
+        try:
+            quantity = int(float(quantity))
+            # Prices are in USD, convert to minor units (USD cents)
+            unit_price = int(float(unit_price) * 100)
+            selling_price = int(float(selling_price) * 100)
+            reorder_level = int(float(row[9] or 10))
+        except (TypeError, ValueError, OverflowError):
+            return None, f"Ligne {row_num}: Format numérique invalide", []
+        if any(abs(value) > INT_MAX for value in (quantity, unit_price, selling_price, reorder_level)):
+            return None, f"Ligne {row_num}: Valeur numérique hors limites", []
+
+        try:
+            expiry_date = _parse_date(expiry_date)
+        except ValueError:
+            return None, f"Ligne {row_num}: Format de date d'expiration invalide (utilisez AAAA-MM-JJ)", []
+
+        warnings = []
+        manufacturing_date = row[7]
+        if manufacturing_date:
+            try:
+                manufacturing_date = _parse_date(manufacturing_date)
+            except ValueError:
+                warnings.append(f"Ligne {row_num}: Format de date de fabrication invalide, ignoré")
+                manufacturing_date = None
+
+        values = {
+            'medication_name': med_name,
+            'generic_name': _text(row[1]),
+            'batch_number': batch_number,
+            'quantity_in_stock': quantity,
+            'unit_price': unit_price,
+            'selling_price': selling_price,
+            'manufacturer': _text(row[6]),
+            'manufacturing_date': manufacturing_date or None,
+            'expiry_date': expiry_date,
+            'reorder_level': reorder_level,
+            'storage_location': _text(row[10]),
+            'requires_refrigeration': str(row[11]).upper() in TRUE_VALUES if row[11] else False,
+            'is_publicly_available': str(row[12]).upper() in TRUE_VALUES if row[12] is not None else True,
+        }
+        for key, label, max_length in _text_limits():
+            if len(values[key]) > max_length:
+                return None, f"Ligne {row_num}: {label} trop long ({max_length} caractères max)", []
+        return values, None, warnings
+
+    @staticmethod
+    def resolve_medications(parsed):
+        """
+        {lowercase name: medication id} for the names of a chunk, one query; unknown names are bulk-created
+
+        Returns:
+            tuple: (mapping, names of created medications)
+        """
+        first_rows = {}
+        for _, values in parsed:
+            first_rows.setdefault(values['medication_name'].lower(), values)
+
+        medications = {}
+        rows = (
+            Medication.objects.annotate(lower_name=Lower('name'))
+            .filter(lower_name__in=list(first_rows))
+            .order_by('created_at')
+            .values_list('lower_name', 'id')
+        )
+        for lower_name, medication_id in rows:
+            medications.setdefault(lower_name, medication_id)
+
+        missing = [name for name in first_rows if name not in medications]
+        created = Medication.objects.bulk_create([
+            Medication(
+                name=first_rows[name]['medication_name'],
+                generic_name=first_rows[name]['generic_name'],
+                manufacturer=first_rows[name]['manufacturer'],
+                category='Imported',
+                requires_prescription=True
+            )
+            for name in missing
+        ], batch_size=500)
+        for name, medication in zip(missing, created):
+            medications[name] = medication.id
+        log_bulk_sync_events(created, 'create')
+        return medications, [medication.name for medication in created]
+
+    @staticmethod
+    @transaction.atomic
+    def apply_chunk(pharmacy, parsed, results):
+        """Write one chunk of parsed rows; later rows for the same (medication, batch) win, as before"""
+        medications, created_names = InventoryImporter.resolve_medications(parsed)
+        results['created_medications'].extend(created_names)
+
+        keys = {
+            (medications[values['medication_name'].lower()], values['batch_number'])
+            for _, values in parsed
+        }
+        existing = {}
+        for item in PharmacyInventory.objects.filter(
+            pharmacy=pharmacy,
+            medication_id__in={medication_id for medication_id, _ in keys},
+            batch_number__in={batch_number for _, batch_number in keys},
+        ).order_by('created_at'):
+            existing.setdefault((item.medication_id, item.batch_number), item)
+
+        to_create = {}
+        to_update = {}
+        now = timezone.now()
+        for row_num, values in parsed:
+            key = (medications[values['medication_name'].lower()], values['batch_number'])
+            fields = {field: values[field] for field in UPDATE_FIELDS}
+            item = existing.get(key)
+            if item is not None:
+                for field, value in fields.items():
+                    setattr(item, field, value)
+                if key not in to_update:
+                    item.version += 1
+                    item.updated_at = now
+                to_update[key] = item
+                results['updated'] += 1
+                results['warnings'].append(
+                    f"Ligne {row_num}: Article existant mis à jour - {values['medication_name']} (Lot: {values['batch_number']})"
+                )
+            elif key in to_create:
+                for field, value in fields.items():
+                    setattr(to_create[key], field, value)
+                results['updated'] += 1
+            else:
+                to_create[key] = PharmacyInventory(
+                    pharmacy=pharmacy,
+                    medication_id=key[0],
+                    batch_number=values['batch_number'],
+                    **fields
+                )
+                results['created'] += 1
+            results['success'] += 1
+
+        PharmacyInventory.objects.bulk_update(list(to_update.values()), UPDATE_FIELDS + ['version', 'updated_at'], batch_size=500)
+        PharmacyInventory.objects.bulk_create(list(to_create.values()), batch_size=500)
+        # bulk writes send no signals, so the sync events and catalog search entries are written here
+        log_bulk_sync_events(to_update.values(), 'update')
+        log_bulk_sync_events(to_create.values(), 'create')
+        CatalogSearchService.refresh_items([item.pk for item in [*to_update.values(), *to_create.values()]])
+
+    @staticmethod
+    def apply_rows(pharmacy, parsed, results):
+        """
+        apply_chunk, replayed one savepoint per row when the chunk hits a
+        database error, so a bad row is reported instead of failing the import
+        """
+        chunk_results = _empty_results()
+        try:
+            InventoryImporter.apply_chunk(pharmacy, parsed, chunk_results)
+        except (IntegrityError, DataError) as e:
+            logger.warning(f"Inventory import chunk of {pharmacy.pk} failed, retrying row by row: {e}")
+            for row_num, values in parsed:
+                row_results = _empty_results()
+                try:
+                    InventoryImporter.apply_chunk(pharmacy, [(row_num, values)], row_results)
+                except (IntegrityError, DataError) as e:
+                    results['errors'].append(f"Ligne {row_num}: Erreur - {str(e)}")
+                else:
+                    _merge_results(results, row_results)
+        else:
+            _merge_results(results, chunk_results)
+
+    @staticmethod
+    def import_file(file, pharmacy, chunk_size=IMPORT_CHUNK_SIZE, start_row=2, on_chunk=None):
+        """
+        Import a template workbook
+
+        Args:
+            file: Uploaded or stored workbook (file-like)
+            pharmacy: Participant owning the inventory
+            chunk_size: Rows per batch/transaction
+            start_row: First sheet row to read (resume point)
+            on_chunk: Called as on_chunk(last_row, chunk_results, rows_read) inside each chunk's transaction
+
+        Returns:
+            dict: success/created/updated counts, errors, warnings, created_medications
+        """
+        results = _empty_results()
+
+        def flush(parsed, last_row, rows_read, chunk_results):
+            with transaction.atomic():
+                if parsed:
+                    InventoryImporter.apply_rows(pharmacy, parsed, chunk_results)
+                if on_chunk:
+                    on_chunk(last_row, chunk_results, rows_read)
+            _merge_results(results, chunk_results)
+
+        parsed = []
+        chunk_results = _empty_results()
+        rows_read = 0
+        last_row = start_row - 1
+        for row_num, row in InventoryImporter.read_rows(file, start_row=start_row):
+            rows_read += 1
+            last_row = row_num
+            try:
+                values, error, warnings = InventoryImporter.parse_row(row_num, row)
+            except Exception as e:
+                values, error, warnings = None, f"Ligne {row_num}: Erreur - {str(e)}", []
+            chunk_results['warnings'].extend(warnings)
+            if error:
+                chunk_results['errors'].append(error)
+            else:
+                parsed.append((row_num, values))
+
+            if rows_read % chunk_size == 0:
+                flush(parsed, last_row, rows_read, chunk_results)
+                parsed = []
+                chunk_results = _empty_results()
+
+        if rows_read % chunk_size:
+            flush(parsed, last_row, rows_read, chunk_results)
+        return results
+
+    @staticmethod
+    def queue(file, pharmacy):
+        """Store an upload and queue its import as an InventoryImportJob"""
+        name = default_storage.save(f"inventory_imports/{pharmacy.pk}/{uuid.uuid4().hex}.xlsx", file)
+        with default_storage.open(name, 'rb') as stored:
+            total_rows = InventoryImporter.count_rows(stored)
+        job = InventoryImportJob.objects.create(
+            pharmacy=pharmacy,
+            file_name=name,
+            original_name=getattr(file, 'name', '')[:255],
+            total_rows=total_rows,
+        )
+        transaction.on_commit(lambda: InventoryImporter.enqueue(job.pk))
+        logger.info(f"Queued inventory import {job.id} for {pharmacy.pk} ({total_rows} rows)")
+        return job
+
+    @staticmethod
+    def enqueue(job_id):
+        """Import a job on a worker, or within the request when no worker consumes the broker"""
+        from backend.celery import run_inline
+
+        if run_inline():
+            InventoryImporter.run(job_id)
+            return
+        from .tasks import import_inventory_job
+        import_inventory_job.delay(str(job_id))
+
+    @staticmethod
+    def run(job_id, chunk_size=IMPORT_CHUNK_SIZE):
+        """Import (or resume) a queued job's workbook and delete it once done"""
+        job = InventoryImportJob.objects.select_related('pharmacy').get(pk=job_id)
+        if job.status in ('completed', 'failed'):
+            return job
+        job.status = 'running'
+        job.started_at = job.started_at or timezone.now()
+        job.save(update_fields=['status', 'started_at'])
+
+        def checkpoint(last_row, chunk_results, rows_read):
+            job.last_row = last_row
+            job.rows_processed += len(chunk_results['errors']) + chunk_results['success']
+            job.imported_count += chunk_results['success']
+            job.created_count += chunk_results['created']
+            job.updated_count += chunk_results['updated']
+            job.error_count += len(chunk_results['errors'])
+            job.errors = (job.errors + chunk_results['errors'])[:MAX_REPORTED_ROWS]
+            job.warnings = (job.warnings + chunk_results['warnings'])[:MAX_REPORTED_ROWS]
+            job.created_medications = (job.created_medications + chunk_results['created_medications'])[:MAX_REPORTED_ROWS]
+            job.save()
+
+        try:
+            with default_storage.open(job.file_name, 'rb') as file:
+                InventoryImporter.import_file(
+                    file, job.pharmacy, chunk_size=chunk_size, start_row=job.last_row + 1 if job.last_row else 2,
+                    on_chunk=checkpoint,
+                )
+        except Exception as e:
+            logger.error(f"Inventory import {job.id} failed: {e}", exc_info=True)
+            job.status = 'failed'
+            job.error = f"Erreur de lecture du fichier: {str(e)}"
+            job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'error', 'finished_at'])
+            return job
+
+        job.status = 'completed'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'finished_at'])
+        default_storage.delete(job.file_name)
+        logger.info(
+            f"Inventory import {job.id} completed: {job.imported_count} rows "
+            f"({job.created_count} created, {job.updated_count} updated), {job.error_count} errors"
+        )
+        return job
@@ -0,0 +1,101 @@
+"""
+Benchmark the month-end referral bonus calculation.
+
+Creates one pharmacy, --doctors doctors and --referrals fulfilled referrals
+within last month, a global percentage config plus fixed-amount and tiered
+configs for a few doctors, then times BonusEngine.calculate as a dry run and
+as a real run. Everything runs inside a rolled-back transaction.
+
+Usage:
+    python manage.py benchmark_bonus_engine
+    python manage.py benchmark_bonus_engine --referrals 100000 --doctors 500
+"""
+import random
+import time
+import uuid
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from pharmacy.bonus_engine import BonusEngine
+
+
+class Command(BaseCommand):
+    help = 'Time the referral bonus calculation on synthetic referrals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--referrals', type=int, default=100000)
+        parser.add_argument('--doctors', type=int, default=200)
+
+    def handle(self, *args, **options):
+        year, month = BonusEngine.previous_month()
+        with transaction.atomic():
+            started = time.perf_counter()
+            pharmacy = self._populate(options['referrals'], options['doctors'], year, month)
+            self.stdout.write(f"created {options['referrals']} referrals in {time.perf_counter() - started:.1f}s")
+
+            for dry_run in (True, False):
+                started = time.perf_counter()
+                summary = BonusEngine.calculate(pharmacy.pk, year, month, dry_run=dry_run)
+                self.stdout.write(
+                    f"dry_run={dry_run!s:5} {summary['referrals_updated']:>7} referrals  "
+                    f"total {summary['total_bonus']:>12}  {(time.perf_counter() - started) * 1000:8.1f}ms"
+                )
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (changes rolled back)'))
+
+    @staticmethod
+    def _populate(referral_count, doctor_count, year, month):
+        from core.models import Participant
+        from pharmacy.models import DoctorPharmacyReferral, PharmacyBonusConfig
+        from prescriptions.models import Prescription
+
+        rng = random.Random(42)
+        suffix = uuid.uuid4().hex[:8]
+        pharmacy = Participant.objects.create(email=f'bonus-benchmark-{suffix}@example.com', role='pharmacy')
+        patient = Participant.objects.create(email=f'bonus-benchmark-patient-{suffix}@example.com', role='patient')
+        doctors = Participant.objects.bulk_create([
+            Participant(email=f'bonus-benchmark-doctor-{suffix}-{i}@example.com', role='doctor')
+            for i in range(doctor_count)
+        ], batch_size=1000)
+        prescription = Prescription.objects.create(
+            patient=patient, doctor=doctors[0], issue_date=date.today(), valid_until=date.today() + timedelta(days=30)
+        )
+
+        start, end = BonusEngine.month_bounds(year, month)
+        seconds = int((end - start).total_seconds()) - 1
+        for offset in range(0, referral_count, 10000):
+            DoctorPharmacyReferral.objects.bulk_create([
+                DoctorPharmacyReferral(
+                    doctor=rng.choice(doctors),
+                    pharmacy=pharmacy,
+                    prescription=prescription,
+                    patient=patient,
+                    referral_date=start + timedelta(seconds=rng.randint(0, seconds)),
+                    was_fulfilled=rng.random() < 0.9,
+                    total_amount=rng.randint(500, 50000),
+                )
+                for _ in range(min(10000, referral_count - offset))
+            ])
+
+        valid_from = start.date() - timedelta(days=365)
+        PharmacyBonusConfig.objects.bulk_create(
+            [PharmacyBonusConfig(pharmacy=pharmacy, bonus_type='percentage', bonus_percentage=5, valid_from=valid_from)]
+            + [
+                PharmacyBonusConfig(
+                    pharmacy=pharmacy, doctor=doctor, bonus_type='fixed_amount', fixed_bonus_amount=1000,
+                    valid_from=valid_from,
+                )
+                for doctor in doctors[:10]
+            ]
+            + [
+                PharmacyBonusConfig(
+                    pharmacy=pharmacy, doctor=doctor, bonus_type='tiered', min_prescriptions_per_month=1,
+                    max_prescriptions_per_month=100000, bonus_amount_for_tier=2500,
+                    valid_from=valid_from,
+                )
+                for doctor in doctors[10:20]
+            ]
+        )
+        return pharmacy
@@ -0,0 +1,128 @@
+"""
+Benchmark the medication catalog search on a synthetic catalog.
+
+Creates --pharmacies pharmacies spread over a dozen cities, ~1,000 medications
+(real drug stems x strengths x forms) and --rows public inventory items with
+their catalog entries, then times CatalogSearchService.search for prefix,
+misspelled and city-qualified queries. Everything runs inside a rolled-back
+transaction.
+
+Usage:
+    python manage.py benchmark_catalog_search
+    python manage.py benchmark_catalog_search --rows 100000 --repeat 50
+"""
+import random
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.price_index import normalize_region
+from pharmacy.catalog_search import CatalogSearchService
+
+STEMS = [
+    'Amoxicilline', 'Paracétamol', 'Ibuprofène', 'Métronidazole', 'Ciprofloxacine', 'Artéméther', 'Luméfantrine',
+    'Quinine', 'Oméprazole', 'Metformine', 'Amlodipine', 'Cotrimoxazole', 'Doxycycline', 'Azithromycine',
+    'Ceftriaxone', 'Diclofénac', 'Salbutamol', 'Prednisolone', 'Loratadine', 'Cétirizine', 'Fluconazole',
+    'Albendazole', 'Mébendazole', 'Furosémide', 'Captopril', 'Glibenclamide', 'Insuline', 'Acide folique',
+    'Fer sulfate', 'Vitamine C', 'Tramadol', 'Codéine', 'Dexaméthasone', 'Hydrochlorothiazide', 'Losartan',
+    'Atorvastatine', 'Clarithromycine', 'Érythromycine', 'Gentamicine', 'Phloroglucinol',
+]
+STRENGTHS = ['100mg', '250mg', '500mg', '1g', '5mg']
+FORMS = ['comprimé', 'gélule', 'sirop', 'injectable', 'suspension']
+CITIES = [
+    'Cotonou', 'Porto-Novo', 'Parakou', 'Abomey-Calavi', 'Djougou', 'Bohicon', 'Natitingou', 'Lokossa',
+    'Ouidah', 'Abomey', 'Kandi', 'Savalou',
+]
+QUERIES = ['amoxi', 'amoxicilline 500', 'paracetamole', 'ibuprofene cotonou', 'metronidazol', 'cipro parakou', 'vitamine']
+
+
+class Command(BaseCommand):
+    help = 'Time catalog searches on a synthetic catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Public inventory items to index')
+        parser.add_argument('--pharmacies', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            started = time.perf_counter()
+            self._populate(options['rows'], options['pharmacies'])
+            self.stdout.write(f"indexed {options['rows']} items in {time.perf_counter() - started:.1f}s")
+
+            CatalogSearchService.invalidate_vocabulary()
+            started = time.perf_counter()
+            CatalogSearchService.term_index()
+            self.stdout.write(f'term dictionary built in {(time.perf_counter() - started) * 1000:.1f}ms')
+
+            for query in QUERIES:
+                for facets in (False, True):
+                    timings = []
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        result = CatalogSearchService.search(query=query, facets=facets)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    timings.sort()
+                    self.stdout.write(
+                        f"{query!r:24} facets={facets!s:5} {result['total']:>7} hits  "
+                        f"median {statistics.median(timings):6.1f}ms  p95 {timings[int(len(timings) * 0.95) - 1]:6.1f}ms"
+                    )
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Benchmark complete (changes rolled back)'))
+
+    @staticmethod
+    def _populate(rows, pharmacy_count):
+        from core.models import Participant
+        from prescriptions.models import Medication
+        from pharmacy.models import MedicationCatalogEntry, PharmacyInventory
+
+        rng = random.Random(42)
+        pharmacies = Participant.objects.bulk_create([
+            Participant(
+                email=f'catalog-benchmark-{uuid.uuid4().hex[:12]}@example.com',
+                role='pharmacy',
+                full_name=f'Pharmacie {i}',
+                city=CITIES[i % len(CITIES)],
+            )
+            for i in range(pharmacy_count)
+        ], batch_size=1000)
+        medications = Medication.objects.bulk_create([
+            Medication(name=f'{stem} {strength} {form}', generic_name=stem, category='Benchmark')
+            for stem in STEMS for strength in STRENGTHS for form in FORMS
+        ], batch_size=1000)
+
+        expiry = date.today() + timedelta(days=365)
+        for start in range(0, rows, 10000):
+            items = [
+                PharmacyInventory(
+                    pharmacy=rng.choice(pharmacies),
+                    medication=rng.choice(medications),
+                    batch_number=f'B{start + i}',
+                    quantity_in_stock=rng.randint(1, 500),
+                    selling_price=rng.randint(500, 20000),
+                    expiry_date=expiry,
+                )
+                for i in range(min(10000, rows - start))
+            ]
+            PharmacyInventory.objects.bulk_create(items)
+            MedicationCatalogEntry.objects.bulk_create([
+                MedicationCatalogEntry(
+                    inventory=item,
+                    pharmacy=item.pharmacy,
+                    medication=item.medication,
+                    medication_name=item.medication.name,
+                    generic_name=item.medication.generic_name,
+                    category=item.medication.category,
+                    pharmacy_name=item.pharmacy.full_name,
+                    city=item.pharmacy.city,
+                    city_key=normalize_region(item.pharmacy.city),
+                    quantity_in_stock=item.quantity_in_stock,
+                    selling_price=item.selling_price,
+                    expiry_date=expiry,
+                )
+                for item in items
+            ])
@@ -0,0 +1,25 @@
+"""
+Rebuild the medication catalog search index (MedicationCatalogEntry).
+
+Entries follow inventory, medication and pharmacy changes through signals;
+run this once after migrating, or after writes that bypass signals
+(queryset.update, raw SQL).
+
+Usage:
+    python manage.py rebuild_catalog_index
+    python manage.py rebuild_catalog_index --chunk-size 5000
+"""
+from django.core.management.base import BaseCommand
+
+from pharmacy.catalog_search import CatalogSearchService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the medication catalog search index used by the public catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Inventory items per transaction')
+
+    def handle(self, *args, **options):
+        total = CatalogSearchService.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Catalog index rebuilt: {total} entries'))
@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-18 21:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0022_inventory_import_job'),
+        ('prescriptions', '0008_prescription_health_record'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicationCatalogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('medication_name', models.CharField(max_length=255)),
+                ('generic_name', models.CharField(blank=True, max_length=255)),
+                ('brand_name', models.CharField(blank=True, max_length=255)),
+                ('category', models.CharField(blank=True, max_length=100)),
+                ('requires_prescription', models.BooleanField(default=True)),
+                ('pharmacy_name', models.CharField(blank=True, max_length=255)),
+                ('pharmacy_phone', models.CharField(blank=True, max_length=20)),
+                ('address', models.TextField(blank=True)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('city_key', models.CharField(blank=True, max_length=100)),
+                ('manufacturer', models.CharField(blank=True, max_length=255)),
+                ('quantity_in_stock', models.IntegerField(default=0)),
+                ('selling_price', models.IntegerField(default=0)),
+                ('expiry_date', models.DateField()),
+                ('requires_refrigeration', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('inventory', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='catalog_entry', to='pharmacy.pharmacyinventory')),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='catalog_entries', to='prescriptions.medication')),
+                ('pharmacy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='catalog_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'pharmacy_catalog_entries',
+                'indexes': [models.Index(fields=['medication', 'city_key', 'selling_price'], name='pharmacy_ca_medicat_6306e5_idx'), models.Index(fields=['city_key', 'medication_name'], name='pharmacy_ca_city_ke_af1710_idx'), models.Index(fields=['pharmacy', 'medication_name'], name='pharmacy_ca_pharmac_d5be4d_idx'), models.Index(fields=['medication_name', 'selling_price'], name='pharmacy_ca_medicat_479ce4_idx')],
+            },
+        ),
+    ]
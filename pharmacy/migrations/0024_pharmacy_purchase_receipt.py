@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-18 21:49
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy', '0023_medication_catalog_entry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PharmacyPurchaseReceipt',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Global unique identifier', primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='When this record was created')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='When this record was last modified')),
+                ('version', models.IntegerField(default=1, help_text='Version number for conflict detection')),
+                ('last_synced_at', models.DateTimeField(blank=True, help_text='When this record was last synced with cloud', null=True)),
+                ('created_by_instance', models.UUIDField(blank=True, default=uuid.uuid4, help_text='UUID of instance that created this record')),
+                ('modified_by_instance', models.UUIDField(blank=True, default=uuid.uuid4, help_text='UUID of instance that last modified this record')),
+                ('is_deleted', models.BooleanField(db_index=True, default=False, help_text='Soft delete flag for sync purposes')),
+                ('deleted_at', models.DateTimeField(blank=True, help_text='When this record was marked as deleted', null=True)),
+                ('delivery_reference', models.CharField(max_length=100)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('items_received', models.IntegerField(default=0)),
+                ('quantity_received', models.IntegerField(default=0)),
+                ('created_batches', models.IntegerField(default=0)),
+                ('merged_batches', models.IntegerField(default=0)),
+                ('purchase', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='pharmacy.pharmacypurchase')),
+                ('received_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='purchase_receipts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'pharmacy_purchase_receipts',
+                'ordering': ['-received_at'],
+                'unique_together': {('purchase', 'delivery_reference')},
+            },
+        ),
+    ]
@@ -97,6 +97,100 @@ class PharmacyInventory(SyncMixin):  # Manages pharmacy medication stock and inv
             models.Index(fields=['is_publicly_available']),
         ]
 
+class InventoryImportJob(models.Model):  # Background bulk import of an inventory workbook
+    """
+    Progress and row-level report of an inventory import (see pharmacy/inventory_import.py).
+
+    Not a SyncMixin model: it only matters to the instance running the import.
+    The uploaded workbook is kept in default storage until the job finishes;
+    a job interrupted mid-file resumes after last_row.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    pharmacy = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name='inventory_import_jobs')
+    file_name = models.CharField(max_length=255)  # storage path of the uploaded workbook
+    original_name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', db_index=True)
+    total_rows = models.PositiveIntegerField(default=0)  # sheet dimension, may include blank rows
+    last_row = models.PositiveIntegerField(default=0)  # last sheet row committed
+    rows_processed = models.PositiveIntegerField(default=0)
+    imported_count = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)  # first MAX_REPORTED_ROWS row messages
+    warnings = models.JSONField(default=list, blank=True)
+    created_medications = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)  # fatal error (unreadable file, ...)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:  # Meta class implementation
+        db_table = 'pharmacy_inventory_import_jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['pharmacy', 'status']),
+        ]
+
+    def __str__(self):  # Return string representation
+        return f"Import {self.original_name or self.file_name} - {self.status}"
+
+    @property
+    def progress_percent(self):
+        if self.status == 'completed':
+            return 100.0
+        if not self.total_rows:
+            return 0.0
+        return round(min(self.last_row - 1, self.total_rows) * 100 / self.total_rows, 1) if self.last_row else 0.0
+
+class MedicationCatalogEntry(models.Model):  # Search index row of a publicly available inventory item
+    """
+    Denormalized medication catalog row behind the public catalog search (see pharmacy/catalog_search.py).
+
+    One row per publicly available PharmacyInventory item with the medication
+    names and pharmacy location copied in, so a search is one indexed query on
+    this table. Rows are derived data, refreshed from inventory, medication and
+    pharmacy signals, so the model does not use SyncMixin. Stock and expiry are
+    filtered at query time.
+    """
+    inventory = models.OneToOneField(PharmacyInventory, on_delete=models.CASCADE, related_name='catalog_entry')
+    pharmacy = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name='catalog_entries')
+    medication = models.ForeignKey(Medication, on_delete=models.CASCADE, related_name='catalog_entries')
+    medication_name = models.CharField(max_length=255)
+    generic_name = models.CharField(max_length=255, blank=True)
+    brand_name = models.CharField(max_length=255, blank=True)
+    category = models.CharField(max_length=100, blank=True)
+    requires_prescription = models.BooleanField(default=True)
+    pharmacy_name = models.CharField(max_length=255, blank=True)
+    pharmacy_phone = models.CharField(max_length=20, blank=True)
+    address = models.TextField(blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    city_key = models.CharField(max_length=100, blank=True)  # Normalized city (lowercase, no accents)
+    manufacturer = models.CharField(max_length=255, blank=True)
+    quantity_in_stock = models.IntegerField(default=0)
+    selling_price = models.IntegerField(default=0)
+    expiry_date = models.DateField()
+    requires_refrigeration = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:  # Meta class implementation
+        db_table = 'pharmacy_catalog_entries'
+        indexes = [
+            models.Index(fields=['medication', 'city_key', 'selling_price']),
+            models.Index(fields=['city_key', 'medication_name']),
+            models.Index(fields=['pharmacy', 'medication_name']),
+            models.Index(fields=['medication_name', 'selling_price']),
+        ]
+
+    def __str__(self):  # Return string representation
+        return f"{self.medication_name} @ {self.pharmacy_name}"
+
 class PharmacyOrder(SyncMixin):  # Tracks customer medication orders and fulfillment status
     STATUS_CHOICES = [
         ('cart', 'Shopping Cart'),
@@ -231,6 +325,21 @@ class PharmacyPurchaseItem(SyncMixin):  # Represents individual medications in s
     class Meta:  # Meta class implementation
         db_table = 'pharmacy_purchase_items'
 
+class PharmacyPurchaseReceipt(SyncMixin):  # One received supplier delivery of a purchase (see pharmacy/purchase_receiving.py)
+    purchase = models.ForeignKey(PharmacyPurchase, on_delete=models.CASCADE, related_name='receipts')
+    delivery_reference = models.CharField(max_length=100)  # retries with the same reference are not applied twice
+    received_by = models.ForeignKey(Participant, on_delete=models.SET_NULL, null=True, blank=True, related_name='purchase_receipts')
+    received_at = models.DateTimeField(default=timezone.now)
+    items_received = models.IntegerField(default=0)
+    quantity_received = models.IntegerField(default=0)
+    created_batches = models.IntegerField(default=0)
+    merged_batches = models.IntegerField(default=0)
+
+    class Meta:  # Meta class implementation
+        db_table = 'pharmacy_purchase_receipts'
+        unique_together = ['purchase', 'delivery_reference']
+        ordering = ['-received_at']
+
 class PharmacySale(SyncMixin):  # Records completed pharmacy sales transactions
     PAYMENT_METHOD_CHOICES = [
         ('fedapay_mobile', 'FedaPay Mobile Money'),
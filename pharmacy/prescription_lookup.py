@@ -0,0 +1,126 @@
+"""
+Counter-side prescription lookup behind search_prescription.
+
+The cost of a lookup does not depend on the number of prescription items:
+the prescription (with its patient), the items (with their medications) and
+the staff member's pharmacy are read once, stock for every prescribed
+medication comes from one query over the pharmacy's unexpired batches, and
+prices are converted with a single exchange rate looked up per request.
+
+Per medication the best batch is the earliest-expiring batch that covers the
+prescribed quantity on its own (the one a first-expiry-first-out sale would
+start with), else the earliest-expiring batch; the other batches are listed
+as alternatives.
+"""
+import json
+import uuid
+from collections import defaultdict
+
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import Participant
+from currency_converter.services import CurrencyConverterService
+from prescriptions.models import Prescription
+
+from .models import PharmacyInventory, PharmacyStaff
+
+
+class PrescriptionLookup:
+    """Prescription items with the counter pharmacy's stock and local prices"""
+
+    @staticmethod
+    def find_prescription(code):
+        """
+        Prescription named by a manual code (id or uid) or a scanned QR payload
+
+        Raises:
+            Prescription.DoesNotExist: when nothing matches
+        """
+        code = str(code).strip()
+        if code.startswith('{'):
+            try:
+                code = str(json.loads(code).get('prescription_id') or '')
+            except (ValueError, AttributeError):
+                raise Prescription.DoesNotExist()
+        try:
+            value = uuid.UUID(code)
+        except ValueError:
+            raise Prescription.DoesNotExist()
+        return Prescription.objects.select_related('patient').get(Q(id=value) | Q(uid=value))
+
+    @staticmethod
+    def counter_pharmacy_id(participant):
+        """
+        Pharmacy a counter user works for
+
+        The owner account is its own pharmacy. Staff accounts (role 'pharmacy'
+        with a staff_role, or 'pharmacy_staff') resolve through their
+        PharmacyStaff record, then through affiliated_provider_id.
+        """
+        if participant.role == 'pharmacy' and not participant.staff_role:
+            return participant.pk
+        pharmacy_id = PharmacyStaff.objects.filter(
+            staff_participant=participant, is_active=True
+        ).values_list('pharmacy_id', flat=True).first()
+        if pharmacy_id is None and participant.affiliated_provider_id:
+            pharmacy_id = Participant.objects.filter(
+                pk=participant.affiliated_provider_id, role='pharmacy'
+            ).values_list('pk', flat=True).first()
+        return pharmacy_id
+
+    @staticmethod
+    def batches_by_medication(pharmacy_id, medication_ids):
+        """{medication_id: [batch dicts, earliest expiry first]} in one query"""
+        batches = defaultdict(list)
+        rows = PharmacyInventory.objects.filter(
+            pharmacy_id=pharmacy_id,
+            medication_id__in=medication_ids,
+            quantity_in_stock__gt=0,
+            expiry_date__gt=timezone.now().date(),
+        ).order_by('medication_id', 'expiry_date', 'created_at').values(
+            'id', 'medication_id', 'batch_number', 'quantity_in_stock', 'selling_price', 'expiry_date'
+        )
+        for row in rows:
+            batches[row['medication_id']].append(row)
+        return batches
+
+    @staticmethod
+    def resolve(prescription, pharmacy_id, currency, rate):
+        """Medication lines of a prescription; prices are converted with rate (XOF -> currency)"""
+        items = list(prescription.items.select_related('medication'))
+        batches = PrescriptionLookup.batches_by_medication(
+            pharmacy_id, {item.medication_id for item in items if item.medication_id}
+        ) if pharmacy_id else {}
+
+        def local_price(amount):
+            return CurrencyConverterService.apply_rate(amount, rate, currency)
+
+        medications = []
+        for item in items:
+            candidates = batches.get(item.medication_id, [])
+            in_stock = sum(batch['quantity_in_stock'] for batch in candidates)
+            best = next((batch for batch in candidates if batch['quantity_in_stock'] >= item.quantity), None)
+            best = best or (candidates[0] if candidates else None)
+            medications.append({
+                'medication_id': str(item.medication_id) if item.medication_id else None,
+                'medicine_name': item.medication.name if item.medication else item.medication_name,
+                'quantity': item.quantity,
+                'unit_price': local_price(best['selling_price']) if best else 0,
+                'currency': currency,
+                'available': in_stock >= item.quantity,
+                'in_stock': in_stock,
+                'batch_number': best['batch_number'] if best else None,
+                'expiry_date': best['expiry_date'].isoformat() if best else None,
+                'alternatives': [
+                    {
+                        'inventory_item_id': str(batch['id']),
+                        'batch_number': batch['batch_number'],
+                        'quantity_in_stock': batch['quantity_in_stock'],
+                        'unit_price': local_price(batch['selling_price']),
+                        'expiry_date': batch['expiry_date'].isoformat(),
+                    }
+                    for batch in candidates if batch is not best
+                ],
+            })
+        return medications
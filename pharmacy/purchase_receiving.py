@@ -0,0 +1,222 @@
+"""
+Supplier delivery receipt behind PharmacyPurchaseViewSet.receive_purchase.
+
+A delivery is applied in one transaction with a fixed number of queries: the
+purchase row is locked (so deliveries of one purchase are serialized), its
+items are read with one query, the existing (medication, batch_number)
+inventory rows with one more, and received quantities are merged into those
+batches or create new ones with bulk_update / bulk_create. One 'in' /
+'purchase' PharmacyStockMovement per received line is bulk-created. Bulk
+writes send no post_save, so their SyncEvents (batches, movements, purchase
+items) are written in bulk in the same transaction.
+
+Each delivery is recorded as a PharmacyPurchaseReceipt keyed by its delivery
+reference (the Idempotency-Key header or delivery_reference field); a retry
+with a reference already received returns that receipt instead of adding the
+stock again.
+"""
+import logging
+import uuid
+from datetime import date, datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from sync.signals import log_bulk_sync_events
+
+from .models import (
+    PharmacyInventory, PharmacyPurchase, PharmacyPurchaseItem, PharmacyPurchaseReceipt, PharmacyStockMovement,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MARGIN = 1.3  # selling price of a new batch, as a factor of the purchase unit price
+
+
+def _parse_date(value):
+    if isinstance(value, (date, datetime)) or value is None:
+        return value.date() if isinstance(value, datetime) else value
+    try:
+        return datetime.strptime(str(value), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"Format de date d'expiration invalide: {value} (utilisez AAAA-MM-JJ)")
+
+
+class PurchaseReceiver:
+    """Atomic, set-based receipt of supplier deliveries"""
+
+    @staticmethod
+    def receipt_summary(receipt, replayed=False):
+        return {
+            'delivery_reference': receipt.delivery_reference,
+            'purchase_status': receipt.purchase.status,
+            'items_received': receipt.items_received,
+            'quantity_received': receipt.quantity_received,
+            'created_batches': receipt.created_batches,
+            'merged_batches': receipt.merged_batches,
+            'replayed': replayed,
+        }
+
+    @staticmethod
+    def parse_lines(items, lines):
+        """
+        Validate delivery lines against the purchase items ({str(id): item})
+
+        Lines naming the same purchase item are added up; a missing batch
+        number or expiry date falls back to the one already on the item.
+
+        Returns:
+            list: (purchase_item, quantity, batch_number, expiry_date)
+
+        Raises:
+            ValueError: on unknown items, invalid quantities or dates
+        """
+        if not lines:
+            raise ValueError('Aucun article reçu')
+
+        received = {}
+        for line in lines:
+            item = items.get(str(line.get('id')))
+            if item is None:
+                raise ValueError(f"Article d'achat introuvable: {line.get('id')}")
+            try:
+                quantity = int(line.get('quantity_received', 0))
+            except (TypeError, ValueError):
+                quantity = -1
+            if quantity < 0:
+                raise ValueError('La quantité reçue doit être positive')
+            batch_number = str(line.get('batch_number') or item.batch_number or '').strip()
+            expiry_date = _parse_date(line.get('expiry_date') or item.expiry_date)
+            if quantity and (not batch_number or expiry_date is None):
+                raise ValueError(f"Numéro de lot et date d'expiration requis pour l'article {item.pk}")
+
+            previous = received.get(item.pk)
+            received[item.pk] = (item, quantity + (previous[1] if previous else 0), batch_number, expiry_date)
+        return list(received.values())
+
+    @staticmethod
+    def receive(purchase_id, lines, delivery_reference=None, performed_by=None):
+        """
+        Apply one supplier delivery to a purchase and the pharmacy inventory
+
+        Args:
+            purchase_id: PharmacyPurchase primary key
+            lines: [{'id': purchase item id, 'quantity_received', 'batch_number', 'expiry_date'}]
+            delivery_reference: Idempotency key of the delivery (generated when omitted)
+            performed_by: Participant recorded on the receipt and stock movements
+
+        Returns:
+            dict: receipt summary; 'replayed' is True for an already received reference
+
+        Raises:
+            ValueError: on invalid lines or a purchase that cannot be received
+        """
+        delivery_reference = str(delivery_reference or f"DEL-{uuid.uuid4().hex[:12].upper()}")[:100]
+        with transaction.atomic():
+            purchase = PharmacyPurchase.objects.select_for_update().get(pk=purchase_id)
+            receipt = PharmacyPurchaseReceipt.objects.filter(
+                purchase=purchase, delivery_reference=delivery_reference
+            ).select_related('purchase').first()
+            if receipt is not None:
+                logger.info(f"Delivery {delivery_reference} of purchase {purchase.purchase_number} already received")
+                return PurchaseReceiver.receipt_summary(receipt, replayed=True)
+            if purchase.status in ('received', 'cancelled'):
+                raise ValueError(f"L'achat {purchase.purchase_number} est déjà {purchase.get_status_display().lower()}")
+
+            items = {str(item.pk): item for item in purchase.items.all()}
+            received = [line for line in PurchaseReceiver.parse_lines(items, lines) if line[1] > 0]
+
+            existing = {}
+            if received:
+                batches = PharmacyInventory.objects.select_for_update().filter(
+                    pharmacy_id=purchase.pharmacy_id,
+                    medication_id__in={item.medication_id for item, _, _, _ in received},
+                    batch_number__in={batch_number for _, _, batch_number, _ in received},
+                ).order_by('id')  # same lock order as StockAllocator
+                for batch in sorted(batches, key=lambda b: b.created_at):
+                    existing.setdefault((batch.medication_id, batch.batch_number), batch)
+
+            now = timezone.now()
+            to_update = {}
+            to_create = {}
+            movements = []
+            for item, quantity, batch_number, expiry_date in received:
+                key = (item.medication_id, batch_number)
+                batch = existing.get(key) or to_create.get(key)
+                if batch is None:
+                    batch = PharmacyInventory(
+                        pharmacy_id=purchase.pharmacy_id,
+                        medication_id=item.medication_id,
+                        batch_number=batch_number,
+                        quantity_in_stock=0,
+                        unit_price=item.unit_price,
+                        selling_price=int(item.unit_price * DEFAULT_MARGIN),
+                        expiry_date=expiry_date,
+                    )
+                    to_create[key] = batch
+                elif key in existing and key not in to_update:
+                    batch.unit_price = item.unit_price
+                    batch.version += 1
+                    batch.updated_at = now
+                    to_update[key] = batch
+
+                movements.append(PharmacyStockMovement(
+                    pharmacy_id=purchase.pharmacy_id,
+                    inventory_item_id=batch.pk,
+                    movement_type='in',
+                    quantity=quantity,
+                    reason='purchase',
+                    reference_number=delivery_reference,
+                    notes=f"Réception {purchase.purchase_number}",
+                    previous_quantity=batch.quantity_in_stock,
+                    new_quantity=batch.quantity_in_stock + quantity,
+                    performed_by=performed_by,
+                    movement_date=now,
+                ))
+                batch.quantity_in_stock += quantity
+
+                item.quantity_received += quantity
+                item.batch_number = batch_number
+                item.expiry_date = expiry_date
+                item.version += 1
+                item.updated_at = now
+
+            PharmacyInventory.objects.bulk_update(
+                list(to_update.values()), ['quantity_in_stock', 'unit_price', 'version', 'updated_at'], batch_size=500
+            )
+            PharmacyInventory.objects.bulk_create(list(to_create.values()), batch_size=500)
+            PharmacyStockMovement.objects.bulk_create(movements, batch_size=500)
+            PharmacyPurchaseItem.objects.bulk_update(
+                [item for item, _, _, _ in received],
+                ['quantity_received', 'batch_number', 'expiry_date', 'version', 'updated_at'],
+                batch_size=500,
+            )
+            log_bulk_sync_events(to_update.values(), 'update')
+            log_bulk_sync_events(to_create.values(), 'create')
+            log_bulk_sync_events(movements, 'create')
+            log_bulk_sync_events([item for item, _, _, _ in received], 'update')
+
+            fully_received = all(item.quantity_received >= item.quantity_ordered for item in items.values())
+            purchase.status = 'received' if fully_received else 'partially_received'
+            purchase.received_date = now.date()
+            purchase.save()
+
+            receipt = PharmacyPurchaseReceipt.objects.create(
+                purchase=purchase,
+                delivery_reference=delivery_reference,
+                received_by=performed_by,
+                received_at=now,
+                items_received=len(received),
+                quantity_received=sum(quantity for _, quantity, _, _ in received),
+                created_batches=len(to_create),
+                merged_batches=len(to_update),
+            )
+
+            batch_ids = [batch.pk for batch in [*to_update.values(), *to_create.values()]]
+
+            def refresh_catalog():
+                from .catalog_search import CatalogSearchService
+                CatalogSearchService.refresh_items(batch_ids)
+
+            transaction.on_commit(refresh_catalog)  # bulk writes send no post_save
+        return PurchaseReceiver.receipt_summary(receipt)
@@ -4,7 +4,8 @@ from .models import (
     PharmacySupplier, PharmacyPurchase, PharmacyPurchaseItem,
     PharmacySale, PharmacySaleItem, PharmacyStaff,
     DoctorPharmacyReferral, PharmacyBonusConfig,
-    PharmacyCounter, OrderQueue, DeliveryTracking, PickupVerification
+    PharmacyCounter, OrderQueue, DeliveryTracking, PickupVerification,
+    InventoryImportJob
 )
 from prescriptions.serializers import MedicationSerializer
 
@@ -19,6 +20,18 @@ class PharmacyInventorySerializer(serializers.ModelSerializer):  # Serializer fo
         fields = '__all__'
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+class InventoryImportJobSerializer(serializers.ModelSerializer):  # Serializer for InventoryImportJob progress
+    progress_percent = serializers.FloatField(read_only=True)
+
+    class Meta:  # Meta class implementation
+        model = InventoryImportJob
+        fields = [
+            'id', 'original_name', 'status', 'progress_percent', 'total_rows', 'rows_processed',
+            'imported_count', 'created_count', 'updated_count', 'error_count', 'errors', 'warnings',
+            'created_medications', 'error', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
 class PharmacyOrderItemSerializer(serializers.ModelSerializer):  # Serializer for PharmacyOrderItem data
     medication_details = MedicationSerializer(source='medication', read_only=True)
 
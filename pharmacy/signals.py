@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Participant
+from pharmacy.models import PharmacyInventory
+
+CATALOG_PHARMACY_FIELDS = {'full_name', 'phone_number', 'address', 'city'}
+
+
+@receiver(post_save, sender=PharmacyInventory)
+def refresh_catalog_entry(sender, instance, **kwargs):
+    """Keep the item's MedicationCatalogEntry in sync (deletions cascade)"""
+    from pharmacy.catalog_search import CatalogSearchService
+    inventory_id = instance.pk
+    transaction.on_commit(lambda: CatalogSearchService.refresh_items([inventory_id]))
+
+
+@receiver([post_save, post_delete], sender='prescriptions.Medication')
+def refresh_catalog_medication(sender, instance, **kwargs):
+    """Copy medication renames into the catalog and rebuild the search dictionary"""
+    from pharmacy.catalog_search import CatalogSearchService
+    medication_id = instance.pk
+    transaction.on_commit(lambda: CatalogSearchService.refresh_medication(medication_id))
+
+
+@receiver(post_save, sender=Participant)
+def refresh_catalog_pharmacy(sender, instance, created, update_fields=None, **kwargs):
+    if created or instance.role != 'pharmacy':
+        return
+    if update_fields is not None and not CATALOG_PHARMACY_FIELDS.intersection(update_fields):
+        return  # e.g. last_login updates
+    from pharmacy.catalog_search import CatalogSearchService
+    pharmacy_id = instance.pk
+    transaction.on_commit(lambda: CatalogSearchService.refresh_pharmacy(pharmacy_id))
+
+
+@receiver(post_save, sender='core.ProviderData')
+def refresh_catalog_provider_data(sender, instance, **kwargs):
+    if instance.provider_type != 'pharmacy':
+        return
+    from pharmacy.catalog_search import CatalogSearchService
+    pharmacy_id = instance.participant_id
+    transaction.on_commit(lambda: CatalogSearchService.refresh_pharmacy(pharmacy_id))
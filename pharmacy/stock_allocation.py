@@ -0,0 +1,254 @@
+"""
+First-expiry-first-out stock allocation behind PharmacySaleViewSet.create.
+
+A sale names medications and quantities; the batches are picked server-side.
+All candidate batches of the sale's medications (in stock, not expired) are
+locked with one SELECT ... FOR UPDATE ordered by id, so concurrent sales lock
+rows in the same order and cannot deadlock. Each line is split across batches
+by expiry date, earliest first. Every touched batch is decremented by one
+conditional UPDATE (a CASE per batch, guarded by quantity_in_stock >= taken),
+and sale items and stock movements are bulk-created. Neither sends post_save,
+so the SyncEvents of the decremented batches (read back once), items and
+movements are written in bulk within the same transaction.
+
+On databases without row locks the guard still prevents overselling: when a
+concurrent sale changed a batch, the UPDATE matches fewer rows and the
+allocation is retried from fresh stock.
+"""
+import logging
+import uuid
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from sync.signals import log_bulk_sync_events
+
+from .models import PharmacyInventory, PharmacySale, PharmacySaleItem, PharmacyStockMovement
+
+logger = logging.getLogger(__name__)
+
+MAX_ALLOCATION_ATTEMPTS = 3
+
+
+class InsufficientStock(ValueError):
+    """Raised when unexpired stock cannot cover a sale; shortages lists each short medication"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__('Stock insuffisant pour ' + ', '.join(
+            f"{shortage['medication_id']} (demandé: {shortage['requested']}, disponible: {shortage['available']})"
+            for shortage in shortages
+        ))
+
+
+def _parse_uuid(value):
+    """UUID of a sale line id; ValueError (not a database ValidationError) when malformed"""
+    try:
+        return uuid.UUID(str(value))
+    except (TypeError, ValueError, AttributeError):
+        raise ValueError(f'Identifiant invalide: {value}')
+
+
+class _StockChanged(Exception):
+    """A locked-in plan no longer matches the stock (only without row locks)"""
+
+
+class StockAllocator:
+    """Allocate sale quantities to batches, first expiry first out"""
+
+    @staticmethod
+    def requested_quantities(pharmacy, lines):
+        """
+        {medication_id: quantity} of sale lines, duplicate medications merged
+
+        Lines carry medication_id and quantity; lines from older clients that
+        only name an inventory_item_id are mapped to that batch's medication.
+
+        Raises:
+            ValueError: on missing or malformed ids and non-positive quantities
+        """
+        if not lines:
+            raise ValueError('Aucun article dans la vente')
+
+        if not all(isinstance(line, dict) for line in lines):
+            raise ValueError('Format des articles invalide')
+
+        legacy_ids = [
+            _parse_uuid(line['inventory_item_id']) for line in lines
+            if not line.get('medication_id') and line.get('inventory_item_id')
+        ]
+        legacy_medications = dict(
+            PharmacyInventory.objects.filter(pharmacy=pharmacy, pk__in=legacy_ids).values_list('id', 'medication_id')
+        ) if legacy_ids else {}
+
+        requested = {}
+        for line in lines:
+            medication_id = line.get('medication_id')
+            if not medication_id and line.get('inventory_item_id'):
+                medication_id = legacy_medications.get(_parse_uuid(line['inventory_item_id']))
+            if not medication_id:
+                raise ValueError('Chaque article doit indiquer medication_id')
+            try:
+                quantity = int(line.get('quantity', 0))
+            except (TypeError, ValueError):
+                quantity = 0
+            if quantity <= 0:
+                raise ValueError('La quantité doit être supérieure à 0')
+            medication_id = _parse_uuid(medication_id)
+            requested[medication_id] = requested.get(medication_id, 0) + quantity
+        return requested
+
+    @staticmethod
+    def plan(batches, requested):
+        """
+        Split requested quantities across batches, earliest expiry first (no queries)
+
+        Returns:
+            list: (batch, medication_id, quantity) allocations
+
+        Raises:
+            InsufficientStock: when the batches cannot cover a medication
+        """
+        by_medication = defaultdict(list)
+        for batch in batches:
+            by_medication[batch.medication_id].append(batch)
+
+        allocations = []
+        shortages = []
+        for medication_id, quantity in requested.items():
+            remaining = quantity
+            for batch in sorted(by_medication[medication_id], key=lambda b: (b.expiry_date, b.created_at, b.pk)):
+                take = min(remaining, batch.quantity_in_stock)
+                allocations.append((batch, medication_id, take))
+                remaining -= take
+                if not remaining:
+                    break
+            if remaining:
+                shortages.append({
+                    'medication_id': str(medication_id),
+                    'requested': quantity,
+                    'available': quantity - remaining,
+                })
+        if shortages:
+            raise InsufficientStock(shortages)
+        return allocations
+
+    @staticmethod
+    def allocate(pharmacy, requested):
+        """Lock candidate batches, plan and apply the decrement; returns the allocations"""
+        batches = list(
+            PharmacyInventory.objects.select_for_update()
+            .filter(
+                pharmacy=pharmacy,
+                medication_id__in=list(requested),
+                quantity_in_stock__gt=0,
+                expiry_date__gt=timezone.now().date(),
+            )
+            .order_by('id')
+            .only('id', 'medication_id', 'quantity_in_stock', 'expiry_date', 'created_at', 'selling_price')
+        )
+        allocations = StockAllocator.plan(batches, requested)
+
+        taken = {batch.pk: quantity for batch, _, quantity in allocations}
+        guard = Q()
+        for batch_id, quantity in taken.items():
+            guard |= Q(pk=batch_id, quantity_in_stock__gte=quantity)
+        updated = PharmacyInventory.objects.filter(guard).update(
+            quantity_in_stock=F('quantity_in_stock') - Case(
+                *[When(pk=batch_id, then=Value(quantity)) for batch_id, quantity in taken.items()],
+                output_field=IntegerField(),
+            ),
+            version=F('version') + 1,
+            updated_at=timezone.now(),
+        )
+        if updated != len(taken):
+            raise _StockChanged()
+        return allocations
+
+    @staticmethod
+    def create_sale(pharmacy, lines, cashier=None, **sale_fields):
+        """
+        Record a counter sale with server-side batch allocation
+
+        Unit prices come from each batch's selling_price; discount_amount,
+        tax_amount, amount_paid, payment_method and the other PharmacySale
+        fields are taken from sale_fields.
+
+        Raises:
+            InsufficientStock: when unexpired stock is short (nothing is written)
+            ValueError: on invalid lines
+        """
+        requested = StockAllocator.requested_quantities(pharmacy, lines)
+        for attempt in range(1, MAX_ALLOCATION_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    allocations = StockAllocator.allocate(pharmacy, requested)
+                    sale = StockAllocator._record(pharmacy, allocations, cashier, sale_fields)
+                break
+            except _StockChanged:
+                if attempt == MAX_ALLOCATION_ATTEMPTS:
+                    raise ValueError('Stock modifié pendant la vente, veuillez réessayer')
+                logger.info(f"Stock changed during sale allocation for {pharmacy.pk}, retrying ({attempt})")
+
+        batch_ids = [batch.pk for batch, _, _ in allocations]
+
+        def refresh_catalog():
+            from .catalog_search import CatalogSearchService
+            CatalogSearchService.refresh_items(batch_ids)
+
+        transaction.on_commit(refresh_catalog)  # the UPDATE sends no post_save
+        return sale
+
+    @staticmethod
+    def _record(pharmacy, allocations, cashier, sale_fields):
+        total_amount = sum(batch.selling_price * quantity for batch, _, quantity in allocations)
+        discount_amount = int(sale_fields.pop('discount_amount', 0) or 0)
+        tax_amount = int(sale_fields.pop('tax_amount', 0) or 0)
+        final_amount = total_amount - discount_amount + tax_amount
+        amount_paid = sale_fields.pop('amount_paid', None)
+        sale = PharmacySale.objects.create(
+            sale_number=f"SALE-{uuid.uuid4().hex[:10].upper()}",
+            pharmacy=pharmacy,
+            cashier=cashier,
+            total_amount=total_amount,
+            discount_amount=discount_amount,
+            tax_amount=tax_amount,
+            final_amount=final_amount,
+            amount_paid=final_amount if amount_paid in (None, '') else int(amount_paid),
+            payment_method=sale_fields.pop('payment_method', None) or 'onsite_cash',
+            **sale_fields,
+        )
+
+        now = timezone.now()
+        items = PharmacySaleItem.objects.bulk_create([
+            PharmacySaleItem(
+                sale=sale,
+                medication_id=medication_id,
+                inventory_item_id=batch.pk,
+                quantity=quantity,
+                unit_price=batch.selling_price,
+                total_price=batch.selling_price * quantity,
+            )
+            for batch, medication_id, quantity in allocations
+        ])
+        movements = PharmacyStockMovement.objects.bulk_create([
+            PharmacyStockMovement(
+                pharmacy=pharmacy,
+                inventory_item_id=batch.pk,
+                movement_type='out',
+                quantity=quantity,
+                reason='sale',
+                reference_number=sale.sale_number,
+                previous_quantity=batch.quantity_in_stock,
+                new_quantity=batch.quantity_in_stock - quantity,
+                performed_by=cashier,
+                movement_date=now,
+            )
+            for batch, _, quantity in allocations
+        ])
+        log_bulk_sync_events(PharmacyInventory.objects.filter(pk__in={batch.pk for batch, _, _ in allocations}))
+        log_bulk_sync_events(items, 'create')
+        log_bulk_sync_events(movements, 'create')
+        return sale
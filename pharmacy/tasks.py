@@ -0,0 +1,54 @@
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def import_inventory_job(job_id):
+    """Import a large inventory workbook in chunks (queued by PharmacyInventoryViewSet.import_inventory)"""
+    from .inventory_import import InventoryImporter
+
+    job = InventoryImporter.run(job_id)
+    return {
+        'job': str(job.id),
+        'status': job.status,
+        'imported': job.imported_count,
+        'errors': job.error_count,
+    }
+
+
+@shared_task
+def export_inventory_file(pharmacy_id):
+    """Write a large inventory export to storage (queued by PharmacyInventoryViewSet.export_inventory)"""
+    from .inventory_export import InventoryExporter
+
+    return {'pharmacy': pharmacy_id, 'file': InventoryExporter.build(pharmacy_id)}
+
+
+@shared_task
+def calculate_referral_bonuses(pharmacy_id=None, year=None, month=None, dry_run=False):
+    """
+    Month-end referral bonus run (scheduled in backend/celery.py)
+
+    Without arguments every pharmacy with an active bonus config is processed
+    for the previous month, each in its own transaction.
+    """
+    from .bonus_engine import BonusEngine
+    from .models import PharmacyBonusConfig
+
+    if year is None or month is None:
+        year, month = BonusEngine.previous_month()
+    if pharmacy_id:
+        pharmacy_ids = [pharmacy_id]
+    else:
+        pharmacy_ids = PharmacyBonusConfig.objects.filter(is_active=True).values_list('pharmacy_id', flat=True).distinct()
+
+    results = []
+    for current_id in pharmacy_ids:
+        try:
+            results.append({'pharmacy': str(current_id), **BonusEngine.calculate(current_id, year, month, dry_run=dry_run)})
+        except Exception as e:
+            logger.error(f"Referral bonus calculation failed for {current_id} {month}/{year}: {e}")
+            results.append({'pharmacy': str(current_id), 'error': str(e)})
+    return results
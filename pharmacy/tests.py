@@ -1,3 +1,750 @@
-from django.test import TestCase
+import tempfile
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import OperationalError, close_old_connections, connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core.models import Participant
+from prescriptions.models import Medication, Prescription, PrescriptionItem
+from rest_framework.test import APIClient
+from sync.models import SyncEvent
+
+from .bonus_engine import BonusEngine
+from .catalog_search import CatalogSearchService, phonetic_key
+from .inventory_export import InventoryExporter, iter_inventory_csv, write_inventory_xlsx
+from .inventory_import import InventoryImporter
+from .models import (
+    DoctorPharmacyReferral, InventoryImportJob, MedicationCatalogEntry, PharmacyBonusConfig, PharmacyInventory,
+    PharmacyPurchase, PharmacyPurchaseItem, PharmacySaleItem, PharmacyStaff, PharmacyStockMovement, PharmacySupplier,
+)
+from .purchase_receiving import PurchaseReceiver
+from .stock_allocation import InsufficientStock, StockAllocator
+
+
+def _workbook(rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(['Nom du Médicament*'] + [''] * 12)
+    for row in rows:
+        ws.append(row)
+    output = BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
+def _row(name, batch, quantity=10, expiry='2030-01-01'):
+    return [name, '', batch, quantity, 1.5, 2.0, 'Lab', None, expiry, None, 'A-1', 'NON', 'OUI']
+
+
+class InventoryImportTests(TestCase):
+    def setUp(self):
+        self.pharmacy = Participant.objects.create_participant(
+            email='import-pharmacy@example.com', password='x', role='pharmacy'
+        )
+        self.medication = Medication.objects.create(name='Paracetamol 500mg', category='Analgesic')
+        self.existing = PharmacyInventory.objects.create(
+            pharmacy=self.pharmacy, medication=self.medication, batch_number='LOT1',
+            quantity_in_stock=1, expiry_date=date(2029, 1, 1)
+        )
+
+    def test_import_creates_updates_and_reports_rows(self):
+        workbook = _workbook([
+            _row('paracetamol 500MG', 'LOT1', quantity=40),
+            _row('Ibuprofen 400mg', 'LOT9'),
+            _row('Ibuprofen 400mg', 'LOT9', quantity=25),
+            _row('Amoxicillin', None),
+            _row('Amoxicillin', 'LOT3', expiry='31/12/2030'),
+        ])
+
+        results = InventoryImporter.import_file(workbook, self.pharmacy, chunk_size=2)
+
+        self.assertEqual(results['success'], 3)
+        self.assertEqual(results['created_medications'], ['Ibuprofen 400mg'])
+        self.assertEqual(results['errors'], [
+            'Ligne 5: Numéro de lot manquant',
+            "Ligne 6: Format de date d'expiration invalide (utilisez AAAA-MM-JJ)",
+        ])
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.quantity_in_stock, 40)
+        self.assertEqual(self.existing.unit_price, 150)
+        self.assertEqual(self.existing.version, 2)
+        ibuprofen = PharmacyInventory.objects.get(medication__name='Ibuprofen 400mg')
+        self.assertEqual(ibuprofen.quantity_in_stock, 25)
+        self.assertEqual(PharmacyInventory.objects.filter(pharmacy=self.pharmacy).count(), 2)
+
+    def test_rows_exceeding_columns_are_reported(self):  # Caught before they reach the database
+        long_batch = _row('Med A', 'L' * 101)
+        huge_quantity = _row('Med B', 'B2', quantity=10 ** 12)
+        blank_name = _row('   ', 'B3')
+        results = InventoryImporter.import_file(
+            _workbook([long_batch, huge_quantity, blank_name, _row('Med C', 'B4')]), self.pharmacy
+        )
+        self.assertEqual(results['success'], 1)
+        self.assertEqual(results['errors'], [
+            'Ligne 2: Numéro de lot trop long (100 caractères max)',
+            'Ligne 3: Valeur numérique hors limites',
+            'Ligne 4: Nom du médicament manquant',
+        ])
+
+    def test_database_error_is_reported_for_its_row_only(self):  # Chunk replayed one savepoint per row
+        from django.db import IntegrityError
+
+        def refresh_items(pks):
+            if PharmacyInventory.objects.filter(pk__in=pks, batch_number='BAD').exists():
+                raise IntegrityError('duplicate key')
+
+        with mock.patch('pharmacy.inventory_import.CatalogSearchService.refresh_items', side_effect=refresh_items):
+            results = InventoryImporter.import_file(
+                _workbook([_row('Med A', 'B1'), _row('Med B', 'BAD'), _row('Med C', 'B3')]), self.pharmacy
+            )
+        self.assertEqual((results['success'], results['created']), (2, 2))
+        self.assertEqual(results['errors'], ['Ligne 3: Erreur - duplicate key'])
+        self.assertEqual(results['created_medications'], ['Med A', 'Med C'])
+        self.assertEqual(
+            sorted(PharmacyInventory.objects.filter(pharmacy=self.pharmacy).values_list('batch_number', flat=True)),
+            ['B1', 'B3', 'LOT1'],
+        )
+
+    def test_query_count_does_not_grow_with_rows(self):
+        rows = [_row(f'Med {i % 7}', f'B{i}') for i in range(300)]
+        with self.assertNumQueries(15):  # savepoints + medications, new medications, items, insert, sync events, catalog refresh
+            InventoryImporter.import_file(_workbook(rows), self.pharmacy, chunk_size=1000)
+        self.assertEqual(PharmacyInventory.objects.filter(pharmacy=self.pharmacy).count(), 301)
+
+    def test_background_job_reports_progress(self):
+        upload = SimpleUploadedFile('stock.xlsx', _workbook([_row('Med A', 'B1'), _row('', 'B2')]).getvalue())
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            with mock.patch('pharmacy.inventory_import.InventoryImporter.enqueue') as enqueue:
+                with self.captureOnCommitCallbacks(execute=True):
+                    job = InventoryImporter.queue(upload, self.pharmacy)
+            enqueue.assert_called_once_with(job.pk)
+            self.assertEqual(job.total_rows, 2)
+
+            job = InventoryImporter.run(job.pk, chunk_size=1)
+            self.assertEqual(job.status, 'completed')
+            self.assertEqual(job.progress_percent, 100.0)
+            self.assertEqual((job.imported_count, job.error_count), (1, 1))
+            self.assertEqual(job.errors, ['Ligne 3: Nom du médicament manquant'])
+            self.assertEqual(InventoryImportJob.objects.get(pk=job.pk).last_row, 3)
+            self.assertFalse(default_storage.exists(job.file_name))
+
+    def test_queued_upload_is_imported_without_a_worker_broker(self):  # memory:// broker: nothing would run the task
+        upload = SimpleUploadedFile('stock.xlsx', _workbook([_row('Med A', 'B1'), _row('Med B', 'B2')]).getvalue())
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            with self.captureOnCommitCallbacks(execute=True):
+                job = InventoryImporter.queue(upload, self.pharmacy)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.imported_count), ('completed', 2))
+
+    def test_bulk_writes_log_sync_events(self):
+        from sync.models import SyncEvent
+
+        InventoryImporter.import_file(_workbook([
+            _row('paracetamol 500MG', 'LOT1', quantity=40),
+            _row('Ibuprofen 400mg', 'LOT9'),
+        ]), self.pharmacy)
+
+        events = SyncEvent.objects.filter(model_name='pharmacy.pharmacyinventory')
+        self.assertEqual(
+            sorted(events.values_list('event_type', 'data_snapshot__fields__quantity_in_stock')),
+            [('create', 1), ('create', 10), ('update', 40)],  # setUp item, then the imported rows
+        )
+        self.assertTrue(SyncEvent.objects.filter(model_name='prescriptions.medication', event_type='create').exists())
+
+
+class InventoryExportTests(TestCase):
+    def setUp(self):
+        self.pharmacy = Participant.objects.create_participant(
+            email='export-pharmacy@example.com', password='x', role='pharmacy'
+        )
+        self.medication = Medication.objects.create(name='Paracetamol 500mg', category='Analgesic')
+        cache.clear()
+
+    def _stock(self, count, quantity=50):
+        today = timezone.now().date()
+        PharmacyInventory.objects.bulk_create([
+            PharmacyInventory(
+                pharmacy=self.pharmacy, medication=self.medication, batch_number=f'LOT{i:06d}',
+                quantity_in_stock=quantity, unit_price=100, expiry_date=today + timedelta(days=365),
+            )
+            for i in range(count)
+        ], batch_size=5000)
+
+    def _peak(self, export):
+        export()  # warm-up, the first run also compiles the query
+        tracemalloc.start()
+        export()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+    def _xlsx_peak(self):
+        def export():
+            with tempfile.TemporaryFile() as output:
+                write_inventory_xlsx(self.pharmacy.pk, output, chunk_size=500)
+        return self._peak(export)
+
+    def _csv_peak(self):
+        return self._peak(lambda: sum(len(line) for line in iter_inventory_csv(self.pharmacy.pk, chunk_size=500)))
+
+    def test_xlsx_and_csv_rows(self):
+        self._stock(1)
+        PharmacyInventory.objects.create(
+            pharmacy=self.pharmacy, medication=self.medication, batch_number='EMPTY',
+            quantity_in_stock=0, expiry_date=timezone.now().date() + timedelta(days=10),
+        )
+        output = BytesIO()
+        write_inventory_xlsx(self.pharmacy.pk, output)
+        ws = openpyxl.load_workbook(output).active
+        rows = list(ws.values)
+        self.assertEqual(rows[0][0], 'Médicament')
+        self.assertEqual([row[2] for row in rows[1:]], ['EMPTY', 'LOT000000'])
+        self.assertEqual(rows[1][14], 'Rupture')
+        self.assertEqual(ws['O2'].fill.start_color.rgb, '00fee2e2')
+        self.assertEqual(ws['K2'].fill.start_color.rgb, '00fee2e2')
+        self.assertEqual(rows[2][6], 5000)
+
+        lines = list(iter_inventory_csv(self.pharmacy.pk))
+        self.assertTrue(lines[0].startswith('\ufeffMédicament,'))
+        self.assertEqual(len(lines), 3)
+        self.assertIn('LOT000000', lines[2])
+
+    def test_peak_memory_is_flat(self):
+        # Both writers share the streamed row source; XLSX is traced up to 10k rows only,
+        # openpyxl under tracemalloc being too slow for 100k in the suite
+        self._stock(1000)
+        small = {'xlsx': self._xlsx_peak(), 'csv': self._csv_peak()}
+        self._stock(9000)
+        large = {'xlsx': self._xlsx_peak()}
+        self._stock(90000)
+        large['csv'] = self._csv_peak()
+        for export, peak in large.items():
+            self.assertLess(peak, small[export] * 1.25 + 64 * 1024, f'{export}: {small[export]} B -> {peak} B')
+
+    def test_large_export_is_built_in_background_and_cached(self):
+        self._stock(3)
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media), \
+                mock.patch('pharmacy.inventory_export.INLINE_EXPORT_MAX_ROWS', 2), \
+                mock.patch('pharmacy.inventory_export.InventoryExporter.enqueue') as enqueue:
+            self.assertEqual(InventoryExporter.prepare(self.pharmacy.pk)['status'], 'pending')
+            self.assertEqual(InventoryExporter.prepare(self.pharmacy.pk)['status'], 'pending')
+            enqueue.assert_called_once_with(self.pharmacy.pk)
+
+            name = InventoryExporter.build(self.pharmacy.pk)
+            self.assertEqual(InventoryExporter.prepare(self.pharmacy.pk), {'status': 'ready', 'file': name, 'rows': 3})
+
+            item = PharmacyInventory.objects.filter(pharmacy=self.pharmacy).first()
+            item.quantity_in_stock = 1
+            item.save()
+            self.assertEqual(InventoryExporter.prepare(self.pharmacy.pk)['status'], 'pending')
+            self.assertEqual(enqueue.call_count, 2)
+            self.assertNotEqual(InventoryExporter.build(self.pharmacy.pk), name)
+            self.assertEqual(len(default_storage.listdir(f'inventory_exports/{self.pharmacy.pk}')[1]), 1)
+
+    def test_large_export_is_built_without_a_worker_broker(self):  # memory:// broker: nothing would run the task
+        self._stock(3)
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media), \
+                mock.patch('pharmacy.inventory_export.INLINE_EXPORT_MAX_ROWS', 2):
+            export = InventoryExporter.prepare(self.pharmacy.pk)
+            self.assertEqual((export['status'], export['rows']), ('ready', 3))
+            self.assertTrue(default_storage.exists(export['file']))
+
+
+class CatalogSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cotonou = Participant.objects.create_participant(
+            email='cotonou-pharmacy@example.com', password='x', role='pharmacy', full_name='Pharmacie du Port', city='Cotonou'
+        )
+        self.parakou = Participant.objects.create_participant(
+            email='parakou-pharmacy@example.com', password='x', role='pharmacy', full_name='Pharmacie Centrale', city='Parakou'
+        )
+        self.amoxicillin = Medication.objects.create(name='Amoxicilline 500mg', generic_name='Amoxicilline', category='Antibiotique')
+        self.paracetamol = Medication.objects.create(name='Paracétamol 1g', generic_name='Paracétamol', category='Analgésique')
+        expiry = timezone.now().date() + timedelta(days=200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.items = [
+                PharmacyInventory.objects.create(
+                    pharmacy=pharmacy, medication=medication, batch_number=f'L{i}',
+                    quantity_in_stock=20, selling_price=price, expiry_date=expiry,
+                )
+                for i, (pharmacy, medication, price) in enumerate([
+                    (self.cotonou, self.amoxicillin, 1500),
+                    (self.parakou, self.amoxicillin, 1200),
+                    (self.cotonou, self.paracetamol, 500),
+                ])
+            ]
+
+    def _names(self, query, **filters):
+        return [
+            (entry.medication_name, entry.city)
+            for entry in CatalogSearchService.search(query=query, **filters)['results']
+        ]
+
+    def test_phonetic_key_folds_french_spellings(self):
+        self.assertEqual(phonetic_key('amoxicilline'), phonetic_key('amoxicillin'))
+        self.assertEqual(phonetic_key('paracetamole'), phonetic_key('paracetamol'))
+
+    def test_prefix_typo_and_city_queries(self):
+        amoxicillin = [('Amoxicilline 500mg', 'Parakou'), ('Amoxicilline 500mg', 'Cotonou')]  # cheapest first
+        self.assertEqual(self._names('amoxi'), amoxicillin)
+        self.assertEqual(self._names('amoxiciline'), amoxicillin)
+        self.assertEqual(self._names('Paracétamole'), [('Paracétamol 1g', 'Cotonou')])
+        self.assertEqual(self._names('amoxi parakou'), [('Amoxicilline 500mg', 'Parakou')])
+        self.assertEqual(self._names('', city='cotonou'), [('Amoxicilline 500mg', 'Cotonou'), ('Paracétamol 1g', 'Cotonou')])
+        self.assertEqual(self._names('insuline'), [])
+
+    def test_pagination_and_facets(self):
+        result = CatalogSearchService.search(query='amoxicilline', page=2, page_size=1)
+        self.assertEqual(result['total'], 2)
+        self.assertEqual([entry.city for entry in result['results']], ['Cotonou'])
+        self.assertEqual(
+            [(row['pharmacy_name'], row['count']) for row in result['facets']['pharmacies']],
+            [('Pharmacie Centrale', 1), ('Pharmacie du Port', 1)],
+        )
+
+        CatalogSearchService.term_index()
+        with self.assertNumQueries(2):  # vocabulary is cached: page + count
+            CatalogSearchService.search(query='amoxi', page=2, page_size=1, facets=False)
+
+    def test_availability_endpoint_is_paged(self):  # count/page like public_catalog instead of a silent cap
+        client = APIClient()
+        url = '/api/v1/pharmacy/inventory/check_availability/'
+        response = client.get(url, {'medication_id': str(self.amoxicillin.pk), 'page': 2, 'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['count'], response.data['page'], response.data['page_size']), (2, 2, 1))
+        self.assertEqual([row['city'] for row in response.data['results']], ['Cotonou'])
+
+        legacy = client.get(url, {'q': 'amoxi', 'limit': 1})
+        self.assertEqual((legacy.data['count'], len(legacy.data['results'])), (2, 1))
+        self.assertEqual(client.get(url).status_code, 400)
+
+    def test_signals_keep_entries_in_sync(self):
+        item = self.items[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            item.quantity_in_stock = 0
+            item.save()
+        self.assertEqual(self._names('amoxi'), [('Amoxicilline 500mg', 'Parakou')])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item.is_publicly_available = False
+            item.save()
+            self.amoxicillin.name = 'Clamoxyl 500mg'
+            self.amoxicillin.save()
+        self.assertFalse(MedicationCatalogEntry.objects.filter(inventory=item).exists())
+        self.assertEqual(self._names('clamoxyl'), [('Clamoxyl 500mg', 'Parakou')])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.parakou.city = 'Natitingou'
+            self.parakou.save()
+        self.assertEqual(self._names('clamoxyl natitingou'), [('Clamoxyl 500mg', 'Natitingou')])
+
+
+class StockAllocationTests(TestCase):
+    def setUp(self):
+        self.pharmacy = Participant.objects.create_participant(
+            email='sale-pharmacy@example.com', password='x', role='pharmacy'
+        )
+        self.medication = Medication.objects.create(name='Paracetamol 500mg', category='Analgesic')
+        today = timezone.now().date()
+        self.expired = self._batch('OLD', 50, today - timedelta(days=1))
+        self.later = self._batch('LATE', 10, today + timedelta(days=300))
+        self.sooner = self._batch('SOON', 3, today + timedelta(days=20))
+
+    def _batch(self, batch_number, quantity, expiry_date, medication=None):
+        return PharmacyInventory.objects.create(
+            pharmacy=self.pharmacy, medication=medication or self.medication, batch_number=batch_number,
+            quantity_in_stock=quantity, selling_price=200, expiry_date=expiry_date,
+        )
+
+    def _stock(self):
+        return dict(PharmacyInventory.objects.filter(pharmacy=self.pharmacy).values_list('batch_number', 'quantity_in_stock'))
+
+    def test_lines_are_split_first_expiry_first_out(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sale = StockAllocator.create_sale(
+                self.pharmacy, [{'medication_id': str(self.medication.pk), 'quantity': 5}], cashier=self.pharmacy
+            )
+
+        self.assertEqual(self._stock(), {'OLD': 50, 'LATE': 8, 'SOON': 0})
+        self.assertEqual(
+            sorted(sale.items.values_list('inventory_item__batch_number', 'quantity', 'total_price')),
+            [('LATE', 2, 400), ('SOON', 3, 600)],
+        )
+        self.assertEqual((sale.total_amount, sale.final_amount, sale.amount_paid), (1000, 1000, 1000))
+        self.assertEqual(
+            sorted(PharmacyStockMovement.objects.filter(reference_number=sale.sale_number)
+                   .values_list('previous_quantity', 'new_quantity')),
+            [(3, 0), (10, 8)],
+        )
+        self.assertEqual(MedicationCatalogEntry.objects.get(inventory=self.later).quantity_in_stock, 8)
+        self.later.refresh_from_db()
+        self.assertEqual(self.later.version, 2)
+
+        from sync.models import SyncEvent
+        event = SyncEvent.objects.get(object_id=self.later.pk, event_type='update')
+        self.assertEqual((event.data_snapshot['fields']['quantity_in_stock'], event.data_snapshot['fields']['version']), (8, 2))
+        self.assertEqual(SyncEvent.objects.filter(model_name='pharmacy.pharmacysaleitem').count(), 2)
+        self.assertEqual(SyncEvent.objects.filter(model_name='pharmacy.pharmacystockmovement').count(), 2)
+
+    def test_insufficient_stock_changes_nothing(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            StockAllocator.create_sale(self.pharmacy, [
+                {'medication_id': self.medication.pk, 'quantity': 10},
+                {'inventory_item_id': str(self.sooner.pk), 'quantity': 4},  # legacy line, same medication
+            ])
+        self.assertEqual(raised.exception.shortages, [
+            {'medication_id': str(self.medication.pk), 'requested': 14, 'available': 13},
+        ])
+        self.assertEqual(self._stock(), {'OLD': 50, 'LATE': 10, 'SOON': 3})
+        self.assertFalse(PharmacySaleItem.objects.exists())
+
+    def test_malformed_ids_raise_value_error(self):  # Reported as 400 by PharmacySaleViewSet.create, not a 500
+        for line in (
+            {'medication_id': 'not-a-uuid', 'quantity': 1},
+            {'inventory_item_id': '12', 'quantity': 1},
+            'not-a-line',
+        ):
+            with self.assertRaises(ValueError):
+                StockAllocator.requested_quantities(self.pharmacy, [line])
+
+    def test_query_count_does_not_grow_with_lines(self):
+        medications = [Medication.objects.create(name=f'Med {i}', category='Other') for i in range(10)]
+        expiry = timezone.now().date() + timedelta(days=90)
+        for medication in medications:
+            self._batch('A', 5, expiry, medication)
+            self._batch('B', 5, expiry + timedelta(days=1), medication)
+        lines = [{'medication_id': medication.pk, 'quantity': 7} for medication in medications]
+
+        # savepoint, lock, update, sale + sync event, items, movements, batches reload + 3 sync event inserts, release
+        with self.assertNumQueries(12):
+            StockAllocator.create_sale(self.pharmacy, lines)
+        self.assertEqual(PharmacySaleItem.objects.count(), 20)
+
+
+class StockAllocationConcurrencyTests(TransactionTestCase):
+    def test_parallel_sales_never_oversell(self):
+        pharmacy = Participant.objects.create_participant(
+            email='rush-pharmacy@example.com', password='x', role='pharmacy'
+        )
+        medication = Medication.objects.create(name='Amoxicilline 500mg', category='Antibiotic')
+        expiry = timezone.now().date() + timedelta(days=60)
+        for i, quantity in enumerate((12, 20, 18)):
+            PharmacyInventory.objects.create(
+                pharmacy=pharmacy, medication=medication, batch_number=f'B{i}',
+                quantity_in_stock=quantity, selling_price=100, expiry_date=expiry + timedelta(days=i),
+            )
+        initial = 50
+
+        def sell(_):
+            try:
+                StockAllocator.create_sale(pharmacy, [{'medication_id': medication.pk, 'quantity': 4}])
+                return 'sold'
+            except InsufficientStock:
+                return 'short'
+            except (OperationalError, ValueError):  # sqlite table locks / retries exhausted
+                return 'failed'
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            outcomes = list(pool.map(sell, range(30)))
+
+        remaining = PharmacyInventory.objects.filter(medication=medication).aggregate(total=Sum('quantity_in_stock'))['total']
+        sold = PharmacySaleItem.objects.aggregate(total=Sum('quantity'))['total'] or 0
+        self.assertEqual(sold, 4 * outcomes.count('sold'))
+        self.assertEqual(remaining, initial - sold)
+        self.assertGreaterEqual(remaining, 0)
+        self.assertFalse(PharmacyInventory.objects.filter(quantity_in_stock__lt=0).exists())
+        if connection.vendor == 'postgresql':
+            self.assertEqual(outcomes.count('sold'), initial // 4)
+
+
+class PurchaseReceivingTests(TestCase):
+    def setUp(self):
+        self.pharmacy = Participant.objects.create_participant(
+            email='purchase-pharmacy@example.com', password='x', role='pharmacy'
+        )
+        supplier = PharmacySupplier.objects.create(
+            pharmacy=self.pharmacy, name='Grossiste', email='grossiste@example.com', phone_number='0100',
+            address='Zone industrielle', city='Cotonou', country='Bénin',
+        )
+        self.purchase = PharmacyPurchase.objects.create(
+            purchase_number='PUR-TEST', pharmacy=self.pharmacy, supplier=supplier, status='ordered'
+        )
+        self.paracetamol = Medication.objects.create(name='Paracetamol 500mg', category='Analgesic')
+        self.ibuprofen = Medication.objects.create(name='Ibuprofen 400mg', category='Analgesic')
+        self.existing = PharmacyInventory.objects.create(
+            pharmacy=self.pharmacy, medication=self.paracetamol, batch_number='LOT1',
+            quantity_in_stock=5, unit_price=100, selling_price=150, expiry_date=date(2030, 1, 1),
+        )
+        self.items = [
+            PharmacyPurchaseItem.objects.create(
+                purchase=self.purchase, medication=medication, quantity_ordered=20, unit_price=110, total_price=2200
+            )
+            for medication in (self.paracetamol, self.ibuprofen)
+        ]
+
+    def _lines(self, paracetamol=20, ibuprofen=8):
+        return [
+            {'id': str(self.items[0].pk), 'quantity_received': paracetamol, 'batch_number': 'LOT1', 'expiry_date': '2030-01-01'},
+            {'id': str(self.items[1].pk), 'quantity_received': ibuprofen, 'batch_number': 'IB7', 'expiry_date': '2029-06-30'},
+        ]
+
+    def test_delivery_merges_batches_and_records_movements(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            receipt = PurchaseReceiver.receive(self.purchase.pk, self._lines(), 'BL-001', performed_by=self.pharmacy)
+
+        self.assertEqual(
+            (receipt['purchase_status'], receipt['quantity_received'], receipt['merged_batches'], receipt['created_batches']),
+            ('partially_received', 28, 1, 1),
+        )
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.quantity_in_stock, self.existing.unit_price, self.existing.selling_price), (25, 110, 150))
+        ibuprofen = PharmacyInventory.objects.get(medication=self.ibuprofen)
+        self.assertEqual((ibuprofen.batch_number, ibuprofen.quantity_in_stock, ibuprofen.selling_price), ('IB7', 8, 143))
+        self.assertEqual(
+            sorted(PharmacyStockMovement.objects.filter(reference_number='BL-001')
+                   .values_list('movement_type', 'reason', 'previous_quantity', 'new_quantity')),
+            [('in', 'purchase', 0, 8), ('in', 'purchase', 5, 25)],
+        )
+        self.assertEqual(MedicationCatalogEntry.objects.get(inventory=self.existing).quantity_in_stock, 25)
+
+        from sync.models import SyncEvent
+        merged = SyncEvent.objects.get(object_id=self.existing.pk, event_type='update')
+        self.assertEqual(merged.data_snapshot['fields']['quantity_in_stock'], 25)
+        self.assertTrue(SyncEvent.objects.filter(object_id=ibuprofen.pk, event_type='create').exists())
+        self.assertEqual(SyncEvent.objects.filter(model_name='pharmacy.pharmacystockmovement').count(), 2)
+        self.assertEqual(SyncEvent.objects.filter(model_name='pharmacy.pharmacypurchaseitem', event_type='update').count(), 2)
+
+        receipt = PurchaseReceiver.receive(self.purchase.pk, self._lines(paracetamol=0, ibuprofen=12), 'BL-002')
+        self.assertEqual(receipt['purchase_status'], 'received')
+        self.assertEqual(PharmacyInventory.objects.get(medication=self.ibuprofen).quantity_in_stock, 20)
+
+    def test_retried_delivery_is_applied_once(self):
+        first = PurchaseReceiver.receive(self.purchase.pk, self._lines(), 'BL-001')
+        with self.assertNumQueries(4):  # savepoint, purchase lock, receipt lookup, release
+            retry = PurchaseReceiver.receive(self.purchase.pk, self._lines(), 'BL-001')
+
+        self.assertTrue(retry['replayed'])
+        self.assertEqual({**retry, 'replayed': False}, first)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.quantity_in_stock, 25)
+        self.assertEqual(PharmacyStockMovement.objects.count(), 2)
+
+    def test_invalid_line_applies_nothing(self):
+        lines = self._lines()
+        lines[1]['expiry_date'] = '30/06/2029'
+        with self.assertRaises(ValueError):
+            PurchaseReceiver.receive(self.purchase.pk, lines, 'BL-001')
+
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.quantity_in_stock, 5)
+        self.assertFalse(self.purchase.receipts.exists())
+        self.assertFalse(PharmacyStockMovement.objects.exists())
+
+    def test_query_count_does_not_grow_with_lines(self):
+        medications = [Medication.objects.create(name=f'Med {i}', category='Other') for i in range(30)]
+        lines = [
+            {
+                'id': str(PharmacyPurchaseItem.objects.create(
+                    purchase=self.purchase, medication=medication, quantity_ordered=5, unit_price=10, total_price=50
+                ).pk),
+                'quantity_received': 5, 'batch_number': f'B{i}', 'expiry_date': '2031-01-01',
+            }
+            for i, medication in enumerate(medications)
+        ]
+        with self.assertNumQueries(16):  # lookups, 2 bulk inserts, items update, their 3 sync event inserts, purchase + receipt
+            PurchaseReceiver.receive(self.purchase.pk, lines, 'BL-BIG')
+        self.assertEqual(PharmacyInventory.objects.filter(batch_number__startswith='B').count(), 30)
+
+
+class BonusEngineTests(TestCase):
+    def setUp(self):
+        self.pharmacy = Participant.objects.create_participant(
+            email='bonus-pharmacy@example.com', password='x', role='pharmacy'
+        )
+        self.doctor_a = Participant.objects.create_participant(email='bonus-a@example.com', password='x', role='doctor')
+        self.doctor_b = Participant.objects.create_participant(email='bonus-b@example.com', password='x', role='doctor')
+        self.patient = Participant.objects.create_participant(email='bonus-patient@example.com', password='x', role='patient')
+        self.prescription = Prescription.objects.create(
+            patient=self.patient, doctor=self.doctor_a, issue_date=date(2026, 9, 1), valid_until=date(2026, 10, 1)
+        )
+        september = timezone.make_aware(timezone.datetime(2026, 9, 15))
+        self.a1 = self._referral(self.doctor_a, 1000, september)
+        self.a2 = self._referral(self.doctor_a, 3333, september)
+        self.b1 = self._referral(self.doctor_b, 2010, september)
+        self.unfulfilled = self._referral(self.doctor_b, 5000, september, was_fulfilled=False)
+        self.october = self._referral(self.doctor_b, 5000, september + timedelta(days=30))
+
+    def _referral(self, doctor, amount, when, was_fulfilled=True):
+        return DoctorPharmacyReferral.objects.create(
+            doctor=doctor, pharmacy=self.pharmacy, prescription=self.prescription, patient=self.patient,
+            referral_date=when, was_fulfilled=was_fulfilled, total_amount=amount,
+        )
+
+    def _config(self, **fields):
+        return PharmacyBonusConfig.objects.create(pharmacy=self.pharmacy, valid_from=date(2026, 1, 1), **fields)
+
+    def _bonuses(self):
+        return {
+            referral: DoctorPharmacyReferral.objects.get(pk=referral.pk).bonus_earned
+            for referral in (self.a1, self.a2, self.b1, self.unfulfilled, self.october)
+        }
+
+    def test_doctor_configs_take_precedence_over_global_percentage(self):
+        self._config(bonus_type='percentage', bonus_percentage=5)
+        self._config(doctor=self.doctor_a, bonus_type='fixed_amount', fixed_bonus_amount=700)
+
+        # savepoint, configs, (aggregate, ids, update, sync snapshot, sync insert) per config, release
+        with self.assertNumQueries(13):
+            summary = BonusEngine.calculate(self.pharmacy.pk, 2026, 9)
+
+        self.assertEqual((summary['configs_applied'], summary['referrals_updated'], summary['total_bonus']), (2, 3, 1500))
+        self.assertEqual(list(self._bonuses().values()), [700, 700, 100, 0, 0])
+        self.assertEqual(DoctorPharmacyReferral.objects.get(pk=self.a1.pk).version, 2)
+        self.assertEqual(SyncEvent.objects.filter(
+            model_name='pharmacy.doctorpharmacyreferral', event_type='update',
+            object_id__in=[self.a1.pk, self.a2.pk, self.b1.pk],
+        ).count(), 3)
+
+        again = BonusEngine.calculate(self.pharmacy.pk, 2026, 9)
+        self.assertEqual(again['referrals_updated'], 0)
+
+    def test_tiered_bonus_only_within_range(self):
+        self._config(doctor=self.doctor_a, bonus_type='tiered', min_prescriptions_per_month=3,
+                     max_prescriptions_per_month=10, bonus_amount_for_tier=900)
+        self._config(doctor=self.doctor_b, bonus_type='tiered', min_prescriptions_per_month=1,
+                     max_prescriptions_per_month=1, bonus_amount_for_tier=400)
+
+        summary = BonusEngine.calculate(self.pharmacy.pk, 2026, 9)
+
+        self.assertEqual([row['referrals_updated'] for row in summary['configs']], [0, 1])
+        self.assertEqual(list(self._bonuses().values()), [0, 0, 400, 0, 0])
+
+    def test_dry_run_previews_without_writing(self):
+        self._config(bonus_type='percentage', bonus_percentage=10)
+
+        preview = BonusEngine.calculate(self.pharmacy.pk, 2026, 9, dry_run=True)
+        self.assertEqual(list(self._bonuses().values()), [0, 0, 0, 0, 0])
+
+        applied = BonusEngine.calculate(self.pharmacy.pk, 2026, 9)
+        self.assertEqual({**preview, 'dry_run': False}, applied)
+        self.assertEqual(applied['total_bonus'], 100 + 333 + 201)
+
+    def test_endpoint_calculates_without_a_worker_broker(self):  # memory:// broker: nothing would run the task
+        self._config(bonus_type='percentage', bonus_percentage=10)
+        client = APIClient()
+        client.force_authenticate(self.pharmacy)
+
+        response = client.post('/api/v1/pharmacy/bonus-configs/calculate_bonuses/', {'year': 2026, 'month': 9})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['total_bonus'], 634)
+        self.assertEqual(list(self._bonuses().values()), [100, 333, 201, 0, 0])
+
+
+class PrescriptionLookupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pharmacy = Participant.objects.create_participant(
+            email='counter-pharmacy@example.com', password='x', role='pharmacy'
+        )
+        self.cashier = Participant.objects.create_participant(
+            email='counter-cashier@example.com', password='x', role='pharmacy_staff'
+        )
+        PharmacyStaff.objects.create(
+            pharmacy=self.pharmacy, staff_participant=self.cashier, full_name='Caissier',
+            email=self.cashier.email, phone_number='0100', role='cashier',
+        )
+        doctor = Participant.objects.create_participant(email='counter-doctor@example.com', password='x', role='doctor')
+        patient = Participant.objects.create_participant(
+            email='counter-patient@example.com', password='x', role='patient', phone_number='+33612345678'
+        )
+        self.prescription = Prescription.objects.create(
+            patient=patient, doctor=doctor, issue_date=date.today(), valid_until=date.today() + timedelta(days=30)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.cashier)
+
+    def _prescribe(self, medication, quantity):
+        PrescriptionItem.objects.create(
+            prescription=self.prescription, medication=medication, medication_name=medication.name,
+            dosage='1', dosage_form='comprimé', strength='500mg', quantity=quantity, frequency='once_daily',
+            duration_days=5,
+        )
+
+    def _stock(self, medication, batch_number, quantity, days, price=1000):
+        PharmacyInventory.objects.create(
+            pharmacy=self.pharmacy, medication=medication, batch_number=batch_number, quantity_in_stock=quantity,
+            selling_price=price, expiry_date=date.today() + timedelta(days=days),
+        )
+
+    def _search(self):
+        response = self.client.get('/api/v1/pharmacy/prescription/search/', {'code': str(self.prescription.uid)})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['prescription']
+
+    def test_best_batch_and_alternatives(self):
+        paracetamol = Medication.objects.create(name='Paracetamol 500mg', category='Analgesic')
+        ibuprofen = Medication.objects.create(name='Ibuprofen 400mg', category='Analgesic')
+        self._prescribe(paracetamol, 10)
+        self._prescribe(ibuprofen, 30)
+        self._stock(paracetamol, 'EXPIRED', 50, -1)
+        self._stock(paracetamol, 'SMALL', 4, 20)
+        self._stock(paracetamol, 'BIG', 40, 200, price=2000)
+        self._stock(ibuprofen, 'I1', 12, 30)
+
+        result = self._search()
+
+        self.assertEqual(result['currency'], 'EUR')
+        first, second = result['medications']
+        self.assertEqual((first['batch_number'], first['in_stock'], first['available']), ('BIG', 44, True))
+        self.assertEqual(first['unit_price'], 3.0)  # 2000 XOF at the static EUR rate (0.0015)
+        self.assertEqual([batch['batch_number'] for batch in first['alternatives']], ['SMALL'])
+        self.assertEqual((second['batch_number'], second['in_stock'], second['available']), ('I1', 12, False))
+
+    def test_staff_account_uses_its_employer_stock(self):  # role 'pharmacy' + staff_role, as the staff views create it
+        from .prescription_lookup import PrescriptionLookup
+
+        paracetamol = Medication.objects.create(name='Paracetamol 500mg', category='Analgesic')
+        self._prescribe(paracetamol, 10)
+        self._stock(paracetamol, 'P1', 15, 30)
+        pharmacist = Participant.objects.create(
+            email='counter-pharmacist@example.com', role='pharmacy', staff_role='pharmacist',
+            affiliated_provider_id=self.pharmacy.uid, is_active=True,
+        )
+        self.client.force_authenticate(pharmacist)
+        self.assertEqual(self._search()['medications'][0]['in_stock'], 15)  # no PharmacyStaff row: affiliation
+
+        other = Participant.objects.create_participant(email='other-pharmacy@example.com', password='x', role='pharmacy')
+        PharmacyStaff.objects.create(
+            pharmacy=other, staff_participant=pharmacist, full_name='Pharmacien', email=pharmacist.email,
+            phone_number='0101', role='pharmacist',
+        )
+        self.assertEqual(PrescriptionLookup.counter_pharmacy_id(pharmacist), other.pk)
+        self.assertEqual(PrescriptionLookup.counter_pharmacy_id(self.pharmacy), self.pharmacy.pk)
+
+    def test_query_count_does_not_grow_with_items(self):
+        for size in (1, 10, 50):
+            PrescriptionItem.objects.filter(prescription=self.prescription).delete()
+            for i in range(size):
+                medication = Medication.objects.create(name=f'Med {size}-{i}', category='Other')
+                self._prescribe(medication, 2)
+                self._stock(medication, 'A', 1, 10)
+                self._stock(medication, 'B', 5, 60)
+            cache.clear()
+            with self.subTest(items=size), self.assertNumQueries(5):  # prescription, rate, staff, items, batches
+                medications = self._search()['medications']
+            self.assertEqual(len(medications), size)
+            self.assertTrue(all(medication['batch_number'] == 'B' for medication in medications))
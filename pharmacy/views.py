@@ -9,6 +9,7 @@ from django.db import transaction
 from django.db import models
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.decorators import login_required
+import logging
 import uuid
 import secrets
 import string
@@ -30,6 +31,8 @@ from prescriptions.models import Prescription
 from prescriptions.serializers import PrescriptionSerializer
 from currency_converter.services import CurrencyConverterService
 
+logger = logging.getLogger(__name__)
+
 class PharmacyInventoryViewSet(viewsets.ModelViewSet):  # View for PharmacyInventorySet operations
     serializer_class = PharmacyInventorySerializer
     permission_classes = [IsAuthenticated]
@@ -173,25 +176,43 @@ class PharmacyInventoryViewSet(viewsets.ModelViewSet):  # View for PharmacyInven
     
     @action(detail=False, methods=['get'])
     def export_inventory(self, request):
-        """Export current inventory to Excel"""
-        from django.http import HttpResponse
-        from .excel_utils import export_inventory_to_excel
+        """Export current inventory to Excel, or CSV with ?output=csv (large inventories are exported in the background)"""
+        import tempfile
+        from django.core.files.storage import default_storage
+        from django.http import FileResponse, StreamingHttpResponse
+        from .inventory_export import InventoryExporter, XLSX_CONTENT_TYPE, iter_inventory_csv, write_inventory_xlsx
         from datetime import datetime
         
-        output = export_inventory_to_excel(request.user)
+        basename = f"Inventaire_{request.user.full_name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
-        filename = f"Inventaire_{request.user.full_name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response = HttpResponse(
-            output.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
+        if request.query_params.get('output') == 'csv':
+            response = StreamingHttpResponse(iter_inventory_csv(request.user.pk), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = f'attachment; filename="{basename}.csv"'
+            return response
+        
+        export = InventoryExporter.prepare(request.user.pk)
+        if export['status'] == 'pending':
+            return Response({
+                'status': 'pending',
+                'rows': export['rows'],
+                'message': 'Export en cours de préparation, réessayez dans quelques secondes',
+                'retry_after': 5,
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        if export['status'] == 'ready':
+            output = default_storage.open(export['file'], 'rb')
+        else:
+            output = tempfile.TemporaryFile()
+            write_inventory_xlsx(request.user.pk, output)
+            output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=f"{basename}.xlsx", content_type=XLSX_CONTENT_TYPE)
     
     @action(detail=False, methods=['post'])
     def import_inventory(self, request):
-        """Import inventory from Excel file"""
+        """Import inventory from Excel file (large files are imported in the background)"""
         from .excel_utils import import_inventory_from_excel
+        from .inventory_import import INLINE_IMPORT_MAX_BYTES, InventoryImporter
+        from .serializers import InventoryImportJobSerializer
         
         if 'file' not in request.FILES:
             return Response(
@@ -207,6 +228,19 @@ class PharmacyInventoryViewSet(viewsets.ModelViewSet):  # View for PharmacyInven
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if file.size > INLINE_IMPORT_MAX_BYTES:
+            job = InventoryImporter.queue(file, request.user)
+            job.refresh_from_db()  # already imported when no worker consumes the broker
+            if job.status == 'completed':
+                return Response({
+                    'message': f'{job.imported_count} articles importés avec succès',
+                    'job': InventoryImportJobSerializer(job).data
+                }, status=status.HTTP_200_OK)
+            return Response({
+                'message': 'Importation en cours',
+                'job': InventoryImportJobSerializer(job).data
+            }, status=status.HTTP_202_ACCEPTED)
+        
         results = import_inventory_from_excel(file, request.user)
         
         if results['success'] > 0:
@@ -223,48 +257,98 @@ class PharmacyInventoryViewSet(viewsets.ModelViewSet):  # View for PharmacyInven
                 'errors': results['errors']
             }, status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=False, methods=['get'], permission_classes=[])
-    def public_catalog(self, request):  # Public catalog
-        pharmacy_id = request.query_params.get('pharmacy_id')
-        medication_id = request.query_params.get('medication_id')
-
-        queryset = PharmacyInventory.objects.filter(
-            is_publicly_available=True,
-            quantity_in_stock__gt=0,
-            expiry_date__gt=timezone.now().date()
-        ).select_related('medication', 'pharmacy__provider_data')
-
-        if pharmacy_id:
-            queryset = queryset.filter(pharmacy_id=pharmacy_id)
-        if medication_id:
-            queryset = queryset.filter(medication_id=medication_id)
+    @action(detail=False, methods=['get'])
+    def import_status(self, request):
+        """Progress and row report of a background inventory import (?job=<id>)"""
+        from django.core.exceptions import ValidationError
+        from .models import InventoryImportJob
+        from .serializers import InventoryImportJobSerializer
+        
+        try:
+            job = InventoryImportJob.objects.filter(
+                pk=request.query_params.get('job'),
+                pharmacy=request.user
+            ).first()
+        except ValidationError:
+            job = None
+        if job is None:
+            return Response({'error': 'Importation introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(InventoryImportJobSerializer(job).data)
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+    @action(detail=False, methods=['get'], permission_classes=[])
+    def public_catalog(self, request):  # Public catalog (ranked search over the catalog index)
+        from .catalog_search import CatalogSearchService
+        
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get('page_size', 20)), 1), 100)
+        except ValueError:
+            return Response({'error': 'page and page_size must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        search = CatalogSearchService.search(
+            query=request.query_params.get('q', request.query_params.get('search', '')),
+            city=request.query_params.get('city', '').strip(),
+            pharmacy_id=request.query_params.get('pharmacy_id') or None,
+            category=request.query_params.get('category', '').strip(),
+            medication_id=request.query_params.get('medication_id') or None,
+            page=page,
+            page_size=page_size,
+        )
+        return Response({
+            'count': search['total'],
+            'page': page,
+            'page_size': page_size,
+            'results': [CatalogSearchService.serialize(entry) for entry in search['results']],
+            'facets': search['facets'],
+        })
 
     @action(detail=False, methods=['get'], permission_classes=[])
-    def check_availability(self, request):  # Check availability
+    def check_availability(self, request):  # Check availability (by medication_id or free-text q), paged like public_catalog
+        from .catalog_search import CatalogSearchService
+        
         medication_id = request.query_params.get('medication_id')
-        quantity = int(request.query_params.get('quantity', 1))
+        query = request.query_params.get('q', '').strip()
+        try:
+            quantity = int(request.query_params.get('quantity', 1))
+            page = max(int(request.query_params.get('page', 1)), 1)
+            # 'limit' is the page size of older clients
+            page_size = min(max(int(request.query_params.get('page_size', request.query_params.get('limit', 50))), 1), 100)
+        except ValueError:
+            return Response(
+                {'error': 'quantity, page and page_size must be integers'}, status=status.HTTP_400_BAD_REQUEST
+            )
 
-        if not medication_id:
-            return Response({'error': 'medication_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not medication_id and not query:
+            return Response({'error': 'medication_id or q is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        pharmacies = PharmacyInventory.objects.filter(
+        search = CatalogSearchService.search(
+            query=query,
+            city=request.query_params.get('city', '').strip(),
             medication_id=medication_id,
-            is_publicly_available=True,
-            quantity_in_stock__gte=quantity,
-            expiry_date__gt=timezone.now().date()
-        ).select_related('pharmacy__provider_data').values(
-            'pharmacy_id',
-            'pharmacy__provider_data__provider_name',
-            'pharmacy__provider_data__address',
-            'pharmacy__provider_data__phone_number',
-            'quantity_in_stock',
-            'selling_price'
+            min_quantity=quantity,
+            page=page,
+            page_size=page_size,
+            facets=False,
         )
-
-        return Response(list(pharmacies))
+        return Response({
+            'count': search['total'],
+            'page': page,
+            'page_size': page_size,
+            'results': [
+                {
+                    'pharmacy_id': entry.pharmacy_id,
+                    'pharmacy__provider_data__provider_name': entry.pharmacy_name,
+                    'pharmacy__provider_data__address': entry.address,
+                    'pharmacy__provider_data__phone_number': entry.pharmacy_phone,
+                    'medication_id': entry.medication_id,
+                    'medication_name': entry.medication_name,
+                    'city': entry.city,
+                    'quantity_in_stock': entry.quantity_in_stock,
+                    'selling_price': entry.selling_price,
+                }
+                for entry in search['results']
+            ],
+        })
 
 class PharmacyOrderViewSet(viewsets.ModelViewSet):  # View for PharmacyOrderSet operations
     serializer_class = PharmacyOrderSerializer
@@ -376,38 +460,20 @@ class PharmacyPurchaseViewSet(viewsets.ModelViewSet):  # View for PharmacyPurcha
         serializer.save(pharmacy=self.request.user, purchase_number=purchase_number)
 
     @action(detail=True, methods=['post'])
-    @transaction.atomic
-    def receive_purchase(self, request, pk=None):  # Receive purchase
+    def receive_purchase(self, request, pk=None):  # Receive purchase (retries with the same delivery reference are ignored)
+        from .purchase_receiving import PurchaseReceiver
         purchase = self.get_object()
-        received_items = request.data.get('items', [])
-
-        for item_data in received_items:
-            item_id = item_data.get('id')
-            quantity_received = item_data.get('quantity_received')
-            batch_number = item_data.get('batch_number')
-            expiry_date = item_data.get('expiry_date')
-
-            purchase_item = purchase.items.get(id=item_id)
-            purchase_item.quantity_received = quantity_received
-            purchase_item.batch_number = batch_number
-            purchase_item.expiry_date = expiry_date
-            purchase_item.save()
-
-            PharmacyInventory.objects.create(
-                pharmacy=request.user,
-                medication=purchase_item.medication,
-                batch_number=batch_number,
-                quantity_in_stock=quantity_received,
-                unit_price=purchase_item.unit_price,
-                selling_price=int(purchase_item.unit_price * 1.3),
-                expiry_date=expiry_date
+        try:
+            receipt = PurchaseReceiver.receive(
+                purchase.pk,
+                request.data.get('items', []),
+                delivery_reference=request.META.get('HTTP_IDEMPOTENCY_KEY') or request.data.get('delivery_reference'),
+                performed_by=request.user,
             )
+        except ValueError as e:
+            return Response({'status': 'error', 'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        purchase.status = 'received'
-        purchase.received_date = timezone.now().date()
-        purchase.save()
-
-        return Response({'status': 'success', 'message': 'Purchase received and inventory updated'})
+        return Response({'status': 'success', 'message': 'Purchase received and inventory updated', **receipt})
 
 class PharmacySaleViewSet(viewsets.ModelViewSet):  # View for PharmacySaleSet operations
     serializer_class = PharmacySaleSerializer
@@ -420,54 +486,29 @@ class PharmacySaleViewSet(viewsets.ModelViewSet):  # View for PharmacySaleSet op
             return PharmacySale.objects.filter(pharmacy=self.request.user).select_related('patient')
         return PharmacySale.objects.none()
 
-    @transaction.atomic
-    def create(self, request, *args, **kwargs):  # Create
+    def create(self, request, *args, **kwargs):  # Create (batches are allocated server-side, first expiry first out)
+        from .stock_allocation import InsufficientStock, StockAllocator
         try:
-            sale_number = f"SALE-{uuid.uuid4().hex[:10].upper()}"
-            items_data = request.data.get('items', [])
-
-            total_amount = sum(item['total_price'] for item in items_data)
-            discount_amount = request.data.get('discount_amount', 0)
-            tax_amount = request.data.get('tax_amount', 0)
-            final_amount = total_amount - discount_amount + tax_amount
-
-            sale = PharmacySale.objects.create(
-                sale_number=sale_number,
-                pharmacy=request.user,
+            sale = StockAllocator.create_sale(
+                request.user,
+                request.data.get('items', []),
+                cashier=request.user,
                 patient_id=request.data.get('patient_id'),
                 order_id=request.data.get('order_id'),
-                total_amount=total_amount,
-                discount_amount=discount_amount,
-                tax_amount=tax_amount,
-                final_amount=final_amount,
+                discount_amount=request.data.get('discount_amount', 0),
+                tax_amount=request.data.get('tax_amount', 0),
                 amount_paid=request.data.get('amount_paid'),
                 change_given=request.data.get('change_given', 0),
                 payment_method=request.data.get('payment_method'),
                 transaction_ref=request.data.get('transaction_ref', ''),
-                cashier=request.user
             )
+        except InsufficientStock as e:
+            return Response({'error': str(e), 'shortages': e.shortages}, status=status.HTTP_409_CONFLICT)
+        except (ValueError, TypeError, KeyError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            for item_data in items_data:
-                # Use select_for_update to prevent race conditions on inventory
-                inventory = PharmacyInventory.objects.select_for_update().get(id=item_data['inventory_item_id'])
-
-                PharmacySaleItem.objects.create(
-                    sale=sale,
-                    medication_id=item_data['medication_id'],
-                    inventory_item=inventory,
-                    quantity=item_data['quantity'],
-                    unit_price=item_data['unit_price'],
-                    total_price=item_data['total_price']
-                )
-
-                inventory.quantity_in_stock -= item_data['quantity']
-                inventory.save()
-
-            serializer = self.get_serializer(sale)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        serializer = self.get_serializer(sale)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['get'])
     def daily_sales(self, request):  # Daily sales
@@ -711,62 +752,37 @@ class PharmacyBonusConfigViewSet(viewsets.ModelViewSet):  # View for PharmacyBon
         serializer.save(pharmacy=self.request.user)
 
     @action(detail=False, methods=['post'])
-    @transaction.atomic
-    def calculate_bonuses(self, request):  # Calculate bonuses
+    def calculate_bonuses(self, request):  # Calculate bonuses (queued; dry_run returns a preview)
+        from .bonus_engine import BonusEngine
         if request.user.role != 'pharmacy':
             return Response({'error': 'Only pharmacies can calculate bonuses'}, status=status.HTTP_403_FORBIDDEN)
 
-        month = request.data.get('month', timezone.now().month)
-        year = request.data.get('year', timezone.now().year)
-
-        start_date = timezone.datetime(year, month, 1)
-        if month == 12:
-            end_date = timezone.datetime(year + 1, 1, 1)
-        else:
-            end_date = timezone.datetime(year, month + 1, 1)
-
-        configs = PharmacyBonusConfig.objects.filter(
-            pharmacy=request.user,
-            is_active=True,
-            valid_from__lte=start_date.date()
-        ).filter(
-            models.Q(valid_until__isnull=True) | models.Q(valid_until__gte=end_date.date())
-        )
-
-        for config in configs:
-            referrals = DoctorPharmacyReferral.objects.filter(
-                pharmacy=request.user,
-                doctor=config.doctor if config.doctor else models.F('doctor'),
-                referral_date__gte=start_date,
-                referral_date__lt=end_date,
-                was_fulfilled=True,
-                bonus_earned=0
-            )
-
-            count = referrals.count()
-
-            if config.bonus_type == 'percentage':
-                for referral in referrals:
-                    bonus = int(referral.total_amount * float(config.bonus_percentage) / 100)
-                    referral.bonus_earned = bonus
-                    referral.save()
-
-            elif config.bonus_type == 'fixed_amount':
-                for referral in referrals:
-                    referral.bonus_earned = config.fixed_bonus_amount
-                    referral.save()
-
-            elif config.bonus_type == 'tiered':
-                if config.min_prescriptions_per_month <= count <= config.max_prescriptions_per_month:
-                    for referral in referrals:
-                        referral.bonus_earned = config.bonus_amount_for_tier
-                        referral.save()
+        try:
+            month = int(request.data.get('month', timezone.now().month))
+            year = int(request.data.get('year', timezone.now().year))
+            BonusEngine.month_bounds(year, month)
+        except (TypeError, ValueError):
+            return Response({'error': 'Invalid month or year'}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+
+        if dry_run:
+            return Response({'success': True, **BonusEngine.calculate(request.user.pk, year, month, dry_run=True)})
+
+        from backend.celery import run_inline
+        if run_inline():  # no worker consumes the broker; the calculation is set-based
+            return Response({
+                'success': True,
+                'message': f'Bonuses calculated for {month}/{year}',
+                **BonusEngine.calculate(request.user.pk, year, month),
+            })
 
+        from .tasks import calculate_referral_bonuses
+        calculate_referral_bonuses.delay(str(request.user.pk), year, month)
         return Response({
             'success': True,
-            'message': f'Bonuses calculated for {month}/{year}',
-            'configs_applied': configs.count()
-        })
+            'queued': True,
+            'message': f'Bonus calculation for {month}/{year} queued',
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 # Staff Management Views
@@ -858,7 +874,8 @@ def counter_dashboard(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def search_prescription(request):
-    """Search prescription by QR code or manual code"""
+    """Search prescription by QR code or manual code, with the counter pharmacy's stock and local prices"""
+    from .prescription_lookup import PrescriptionLookup
     code = request.GET.get('code')
     
     if not code:
@@ -868,65 +885,35 @@ def search_prescription(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        prescription = Prescription.objects.get(
-            models.Q(prescription_number=code) | models.Q(qr_code=code)
-        )
-        
-        currency_service = CurrencyConverterService()
-        local_currency = currency_service.get_participant_currency(prescription.patient)
-        
-        medications = []
-        for item in prescription.items.all():
-            staff = PharmacyStaff.objects.filter(staff_participant=request.user).first()
-            if not staff:
-                continue
-                
-            inventory = PharmacyInventory.objects.filter(
-                pharmacy=staff.pharmacy,
-                medication=item.medication,
-                quantity_in_stock__gte=item.quantity
-            ).first()
-            
-            if inventory:
-                local_price = currency_service.convert_to_local(
-                    inventory.selling_price,
-                    prescription.patient
-                )
-                medications.append({
-                    'medicine_name': item.medication.name,
-                    'quantity': item.quantity,
-                    'unit_price': local_price,
-                    'currency': local_currency,
-                    'available': True
-                })
-            else:
-                medications.append({
-                    'medicine_name': item.medication.name,
-                    'quantity': item.quantity,
-                    'unit_price': 0,
-                    'currency': local_currency,
-                    'available': False
-                })
-        
-        return Response({
-            'success': True,
-            'prescription': {
-                'id': str(prescription.id),
-                'prescription_number': prescription.prescription_number,
-                'patient_name': prescription.patient.full_name,
-                'patient_phone': prescription.patient.phone_number,
-                'status': prescription.status,
-                'currency': local_currency,
-                'medications': medications
-            }
-        })
-        
+        prescription = PrescriptionLookup.find_prescription(code)
     except Prescription.DoesNotExist:
         return Response({
             'success': False,
             'message': 'Prescription not found'
         }, status=status.HTTP_404_NOT_FOUND)
 
+    local_currency = CurrencyConverterService.get_participant_currency(prescription.patient)
+    rate = CurrencyConverterService.get_rate(CurrencyConverterService.BASE_CURRENCY, local_currency)
+    medications = PrescriptionLookup.resolve(
+        prescription,
+        PrescriptionLookup.counter_pharmacy_id(request.user),
+        local_currency,
+        rate,
+    )
+
+    return Response({
+        'success': True,
+        'prescription': {
+            'id': str(prescription.id),
+            'prescription_number': str(prescription.uid),
+            'patient_name': prescription.patient.full_name,
+            'patient_phone': prescription.patient.phone_number,
+            'status': prescription.status,
+            'currency': local_currency,
+            'medications': medications
+        }
+    })
+
 
 @extend_schema(
     tags=["Pharmacy Prescriptions"],
@@ -238,7 +238,7 @@ function searchProviders() {
     })
     .then(response => response.json())
     .then(data => {
-        displayResults(data.providers);
+        displayResults(data.providers, data.count);
         document.getElementById('map-loading').classList.add('hidden');
     })
     .catch(error => {
@@ -251,13 +251,13 @@ function searchProviders() {
 /**
  * Display search results on map and list
  */
-function displayResults(providers) {
+function displayResults(providers, total) {
     // Clear existing markers
     markers.forEach(marker => map.removeLayer(marker));
     markers = [];
     
-    // Update count
-    document.querySelector('.result-count').textContent = providers.length;
+    // Update count (total matches; the API returns one page of the nearest)
+    document.querySelector('.result-count').textContent = total ?? providers.length;
     
     // Clear results list
     const resultsList = document.getElementById('results-list');
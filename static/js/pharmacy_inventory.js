@@ -364,9 +364,32 @@ window.submitRestock = async function(event, productId) {
     }
 };
 
-// Excel export function
-window.exportInventoryExcel = function() {
-    window.location.href = '/api/v1/pharmacy/inventory/export_inventory/';
+// Excel export function (large inventories are prepared in the background: 202 until ready)
+window.exportInventoryExcel = async function() {
+    const url = '/api/v1/pharmacy/inventory/export_inventory/';
+    try {
+        let response = await fetch(url);
+        while (response.status === 202) {
+            const pending = await response.json();
+            await new Promise(resolve => setTimeout(resolve, (pending.retry_after || 5) * 1000));
+            response = await fetch(url);
+        }
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        const disposition = response.headers.get('Content-Disposition') || '';
+        const match = disposition.match(/filename="?([^"]+)"?/);
+        const link = document.createElement('a');
+        link.href = URL.createObjectURL(await response.blob());
+        link.download = match ? match[1] : 'Inventaire.xlsx';
+        document.body.appendChild(link);
+        link.click();
+        link.remove();
+        URL.revokeObjectURL(link.href);
+    } catch (error) {
+        console.error('Error exporting inventory:', error);
+        alert("Erreur lors de l'export de l'inventaire");
+    }
 };
 
 // Tab switching functionality
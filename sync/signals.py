@@ -6,6 +6,7 @@ is created, updated, or deleted. This enables event sourcing for
 offline-first synchronization.
 """
 
+import hashlib
 import json
 from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
@@ -82,6 +83,45 @@ def log_sync_event_on_save(sender, instance, created, **kwargs):
         logger.error(f"Failed to create SyncEvent for {sender.__name__}: {str(e)}")
 
 
+def log_bulk_sync_events(instances, event_type='update'):
+    """
+    Create the SyncEvents of rows written by bulk_create, bulk_update or
+    queryset.update(), which send no post_save
+
+    Pass the created objects, or a queryset of the updated rows so the
+    snapshots hold the stored values. One serialization and one bulk insert;
+    data_hash is computed here since bulk_create skips SyncEvent.save().
+    """
+    instances = [
+        instance for instance in instances
+        if isinstance(instance, SyncMixin) and not getattr(instance, '_skip_sync_logging', False)
+    ]
+    if not instances:
+        return 0
+
+    instance_id = get_current_instance_id()
+    try:
+        snapshots = json.loads(serialize('json', instances))
+        return len(SyncEvent.objects.bulk_create([
+            SyncEvent(
+                model_name=f"{instance._meta.app_label}.{instance._meta.model_name}",
+                object_id=instance.id,
+                event_type=event_type,
+                instance_id=instance_id,
+                data_snapshot=data_snapshot,
+                data_hash=hashlib.sha256(json.dumps(data_snapshot, sort_keys=True).encode()).hexdigest(),
+                synced_to_cloud=False,
+            )
+            for instance, data_snapshot in zip(instances, snapshots)
+        ], batch_size=500))
+
+    except Exception as e:
+        import logging
+        logger = logging.getLogger(__name__)
+        logger.error(f"Failed to create bulk SyncEvents for {instances[0].__class__.__name__}: {str(e)}")
+        return 0
+
+
 # Store objects about to be deleted (needed for post_delete)
 _objects_to_delete = {}
 
@@ -0,0 +1,247 @@
+"""
+Nearest-first hospital dispatch for new TransportRequests.
+
+Ambulance requests, and the other transport types hospitals provide (medical
+taxi, wheelchair, stretcher, regular taxi; DISPATCHED_TRANSPORT_TYPES), are
+not announced to every hospital of the region while the request is being
+saved: the first wave is sent once the request is committed, and later waves
+go through Celery (transport.tasks.dispatch_ambulance_request). Hospitals are
+notified in waves:
+
+- candidates are ranked by distance from the pickup point through the
+  provider map index (core/provider_map_index.py), within
+  DISPATCH_RADIUS_KM; active hospitals of the request's region that are not
+  on the map (no coordinates, not verified) come after them, and are the
+  only candidates when the pickup point is unknown;
+- each wave notifies the next WAVE_SIZE hospitals not yet notified, with one
+  bulk insert of HospitalTransportNotification rows and one of Notification
+  rows (bulk writes send no post_save: their sync events are logged with
+  log_bulk_sync_events);
+- while the request stays pending the next wave follows after
+  ESCALATION_SECONDS (by urgency), or at once when every hospital of the
+  latest wave declined. The countdown task is backed by the
+  escalate_ambulance_dispatches sweep scheduled in backend/celery.py; both
+  need a worker broker, so without one (backend.celery.run_inline) only the
+  all-declined escalation runs, within the response request.
+
+Waves are numbered and dispatch_wave is idempotent per wave, so a retried
+task, the countdown and the sweep never notify twice.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Max, Min, Subquery
+from django.utils import timezone
+
+from communication.models import Notification
+from core.models import Participant
+from sync.signals import log_bulk_sync_events
+
+from .models import HospitalTransportNotification, TransportRequest
+
+logger = logging.getLogger(__name__)
+
+WAVE_SIZE = 3
+MAX_WAVES = 10
+DISPATCH_RADIUS_KM = 100
+ESCALATION_SECONDS = {'emergency': 60, 'urgent': 120}
+DEFAULT_ESCALATION_SECONDS = 300
+DISPATCH_WINDOW = timedelta(hours=1)  # pending requests older than this are no longer escalated
+DISPATCHED_TRANSPORT_TYPES = tuple(value for value, _ in TransportRequest.TRANSPORT_TYPE_CHOICES)
+
+
+class AmbulanceDispatcher:
+    """Notify the nearest hospitals of an ambulance request, in timed waves"""
+
+    @staticmethod
+    def escalation_delay(transport_request):
+        return ESCALATION_SECONDS.get(transport_request.urgency, DEFAULT_ESCALATION_SECONDS)
+
+    @staticmethod
+    def next_hospitals(transport_request, exclude, limit=WAVE_SIZE):
+        """[(hospital id, distance km or None)] of the next hospitals to notify, nearest first"""
+        ranked = []
+        if transport_request.pickup_latitude is not None and transport_request.pickup_longitude is not None:
+            from core.provider_map_index import ProviderMapIndex
+            ranked = ProviderMapIndex.nearby(
+                transport_request.pickup_latitude, transport_request.pickup_longitude,
+                DISPATCH_RADIUS_KM, role='hospital',
+            )
+        selected = [(hospital_id, distance) for hospital_id, distance in ranked if hospital_id not in exclude][:limit]
+        if len(selected) < limit:
+            skip = set(exclude) | {hospital_id for hospital_id, _ in ranked}
+            regional = Participant.objects.filter(
+                role='hospital', is_active=True, region_code=transport_request.region_code
+            ).exclude(pk__in=skip).order_by('pk').values_list('pk', flat=True)[:limit - len(selected)]
+            selected.extend((hospital_id, None) for hospital_id in regional)
+        return selected
+
+    @staticmethod
+    def notify(transport_request, hospitals, wave):
+        """Bulk-create the hospital and in-app notifications of one wave"""
+        dispatched = HospitalTransportNotification.objects.bulk_create([
+            HospitalTransportNotification(
+                transport_request=transport_request,
+                hospital_id=hospital_id,
+                status='pending',
+                dispatch_wave=wave,
+                distance_km=round(distance, 2) if distance is not None else None,
+                region_code=transport_request.region_code,
+            )
+            for hospital_id, distance in hospitals
+        ])
+        if transport_request.transport_type == 'ambulance':
+            title = 'Nouvelle demande de transport ambulance'
+            summary = f"Demande d'ambulance urgente ({transport_request.get_urgency_display()})"
+        else:
+            title = f"Nouvelle demande de transport: {transport_request.get_transport_type_display()}"
+            summary = (
+                f"Demande de transport {transport_request.get_transport_type_display()} "
+                f"({transport_request.get_urgency_display()})"
+            )
+        message = (
+            f"{summary}\n"
+            f"Lieu de prise en charge: {transport_request.pickup_address}\n"
+            f"Destination: {transport_request.dropoff_address}\n"
+            f"Heure prévue: {transport_request.scheduled_pickup_time.strftime('%d/%m/%Y %H:%M')}"
+        )
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                recipient_id=hospital_id,
+                notification_type='system',
+                title=title,
+                message=message + (f"\nDistance: {distance:.1f} km" if distance is not None else ''),
+                action_url='/hospital/transport/dashboard/',
+                metadata={
+                    'transport_request_id': str(transport_request.id),
+                    'urgency': transport_request.urgency,
+                    'transport_type': transport_request.transport_type,
+                    'dispatch_wave': wave,
+                    'distance_km': round(distance, 2) if distance is not None else None,
+                },
+                region_code=transport_request.region_code,
+            )
+            for hospital_id, distance in hospitals
+        ])
+        log_bulk_sync_events(dispatched, 'create')
+        log_bulk_sync_events(notifications, 'create')
+
+    @staticmethod
+    def dispatch_wave(request_id, wave=1):
+        """
+        Notify the next wave of hospitals while the request is pending
+
+        Returns:
+            dict: request, wave, notified (hospital count) and, when nothing
+            was sent, the reason ('not_pending', 'already_dispatched', 'exhausted')
+        """
+        with transaction.atomic():
+            transport_request = TransportRequest.objects.select_for_update().get(pk=request_id)
+            if transport_request.status != 'pending':
+                return {'request': str(request_id), 'wave': wave, 'notified': 0, 'reason': 'not_pending'}
+
+            notified = dict(HospitalTransportNotification.objects.filter(
+                transport_request=transport_request
+            ).values_list('hospital_id', 'dispatch_wave'))
+            last_wave = max(notified.values(), default=0)
+            if wave <= last_wave or last_wave >= MAX_WAVES:
+                return {'request': str(request_id), 'wave': wave, 'notified': 0, 'reason': 'already_dispatched'}
+            wave = last_wave + 1
+
+            hospitals = AmbulanceDispatcher.next_hospitals(transport_request, exclude=set(notified))
+            if not hospitals:
+                logger.info(f"No hospital left to notify for transport request {transport_request.request_number}")
+                return {'request': str(request_id), 'wave': wave, 'notified': 0, 'reason': 'exhausted'}
+            AmbulanceDispatcher.notify(transport_request, hospitals, wave)
+
+            if len(hospitals) == WAVE_SIZE and wave < MAX_WAVES:
+                delay = AmbulanceDispatcher.escalation_delay(transport_request)
+                transaction.on_commit(lambda: AmbulanceDispatcher.schedule(request_id, wave + 1, delay))
+
+        if wave == 1:
+            latency = timezone.now() - transport_request.created_at
+            logger.info(
+                f"Transport request {transport_request.request_number}: first wave of {len(hospitals)} hospitals "
+                f"notified {latency.total_seconds():.2f}s after the request"
+            )
+        return {'request': str(request_id), 'wave': wave, 'notified': len(hospitals)}
+
+    @staticmethod
+    def start(request_id):
+        """Send the first wave of a committed request (bounded: WAVE_SIZE hospitals, two bulk inserts)"""
+        try:
+            AmbulanceDispatcher.dispatch_wave(request_id, 1)
+        except Exception as e:
+            logger.error(f"Could not dispatch transport request {request_id}: {e}")
+
+    @staticmethod
+    def schedule(request_id, wave, delay):
+        """Queue a later wave; without a broker the escalation sweep picks it up"""
+        from backend.celery import run_inline
+
+        if run_inline():
+            if not delay:
+                AmbulanceDispatcher.dispatch_wave(request_id, wave)
+            return
+        try:
+            from .tasks import dispatch_ambulance_request
+            dispatch_ambulance_request.apply_async((str(request_id), wave), countdown=delay)
+        except Exception as e:
+            logger.warning(f"Could not schedule dispatch wave {wave} for {request_id}: {e}")
+
+    @staticmethod
+    def record_response(transport_request, hospital, accepted, notes=''):
+        """
+        Store a hospital's answer on its latest notification; when every
+        hospital of the latest wave declined, the next wave is sent without
+        waiting for the timer
+        """
+        now = timezone.now()
+        latest = HospitalTransportNotification.objects.filter(
+            transport_request=transport_request, hospital=hospital
+        ).order_by('-dispatch_wave', '-created_at').values('pk')[:1]
+        answered = HospitalTransportNotification.objects.filter(pk=Subquery(latest))
+        updated = answered.update(
+            status='accepted' if accepted else 'rejected',
+            responded_at=now,
+            response_notes=notes,
+            can_provide_transport=accepted,
+            version=F('version') + 1,
+            updated_at=now,
+        )
+        log_bulk_sync_events(answered)
+        if accepted or not updated:
+            return
+        waves = HospitalTransportNotification.objects.filter(transport_request=transport_request)
+        last_wave = waves.aggregate(last=Max('dispatch_wave'))['last']
+        if not waves.filter(dispatch_wave=last_wave).exclude(status='rejected').exists():
+            transaction.on_commit(lambda: AmbulanceDispatcher.schedule(transport_request.pk, last_wave + 1, 0))
+
+    @staticmethod
+    def escalate_due(now=None):
+        """Send the next wave of pending requests whose latest wave timed out; returns the number escalated"""
+        now = now or timezone.now()
+        pending = TransportRequest.objects.filter(
+            transport_type__in=DISPATCHED_TRANSPORT_TYPES, status='pending', created_at__gte=now - DISPATCH_WINDOW,
+        ).annotate(
+            last_wave=Max('hospital_notifications__dispatch_wave'),
+            last_sent=Max('hospital_notifications__created_at'),
+        ).values_list('id', 'urgency', 'last_wave', 'last_sent')
+
+        escalated = 0
+        for request_id, urgency, last_wave, last_sent in pending:
+            delay = timedelta(seconds=ESCALATION_SECONDS.get(urgency, DEFAULT_ESCALATION_SECONDS))
+            if last_wave is not None and (last_wave >= MAX_WAVES or last_sent + delay > now):
+                continue
+            result = AmbulanceDispatcher.dispatch_wave(request_id, (last_wave or 0) + 1)
+            escalated += bool(result['notified'])
+        return escalated
+
+    @staticmethod
+    def first_notification_latency(transport_request):
+        """Time from the request to its first hospital notification, or None before dispatch"""
+        first = HospitalTransportNotification.objects.filter(
+            transport_request=transport_request
+        ).aggregate(first=Min('created_at'))['first']
+        return first - transport_request.created_at if first else None
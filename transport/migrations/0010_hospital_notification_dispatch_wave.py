@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 22:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0009_transportrequest_accepted_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hospitaltransportnotification',
+            name='dispatch_wave',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Dispatch wave that notified this hospital'),
+        ),
+        migrations.AddField(
+            model_name='hospitaltransportnotification',
+            name='distance_km',
+            field=models.FloatField(blank=True, help_text='Hospital distance from the pickup point', null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-18 22:12
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport', '0010_hospital_notification_dispatch_wave'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='driverlocation',
+            name='quote',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='driver_locations', to='transport.ridesharequote'),
+        ),
+        migrations.CreateModel(
+            name='TransportTrack',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Global unique identifier', primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='When this record was created')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='When this record was last modified')),
+                ('version', models.IntegerField(default=1, help_text='Version number for conflict detection')),
+                ('last_synced_at', models.DateTimeField(blank=True, help_text='When this record was last synced with cloud', null=True)),
+                ('created_by_instance', models.UUIDField(blank=True, default=uuid.uuid4, help_text='UUID of instance that created this record')),
+                ('modified_by_instance', models.UUIDField(blank=True, default=uuid.uuid4, help_text='UUID of instance that last modified this record')),
+                ('is_deleted', models.BooleanField(db_index=True, default=False, help_text='Soft delete flag for sync purposes')),
+                ('deleted_at', models.DateTimeField(blank=True, help_text='When this record was marked as deleted', null=True)),
+                ('region_code', models.CharField(db_index=True, default='global', max_length=50)),
+                ('polyline', models.TextField(blank=True, help_text='Google encoded polyline of the kept positions')),
+                ('time_offsets', models.JSONField(blank=True, default=list, help_text='Seconds since started_at, one per point')),
+                ('point_count', models.IntegerField(default=0)),
+                ('distance_km', models.FloatField(default=0.0)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('ended_at', models.DateTimeField(blank=True, null=True)),
+                ('transport_request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='track', to='transport.transportrequest')),
+            ],
+            options={
+                'db_table': 'transport_tracks',
+            },
+        ),
+    ]
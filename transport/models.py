@@ -273,7 +273,7 @@ class TransportChat(SyncMixin):  # Real-time chat between patient and driver
 class DriverLocation(SyncMixin):  # Real-time tracking of driver location
     region_code = models.CharField(max_length=50, default="global", db_index=True)
     transport_request = models.ForeignKey(TransportRequest, on_delete=models.CASCADE, related_name='driver_locations')
-    quote = models.ForeignKey(RideShareQuote, on_delete=models.CASCADE, related_name='driver_locations')
+    quote = models.ForeignKey(RideShareQuote, on_delete=models.CASCADE, null=True, blank=True, related_name='driver_locations')
     latitude = models.FloatField()
     longitude = models.FloatField()
     heading = models.FloatField(null=True, blank=True)
@@ -296,6 +296,23 @@ class DriverLocation(SyncMixin):  # Real-time tracking of driver location
         return f"Location at {self.timestamp}"
 
 
+class TransportTrack(SyncMixin):  # Compacted route of a finished trip (see transport/tracking.py)
+    region_code = models.CharField(max_length=50, default="global", db_index=True)
+    transport_request = models.OneToOneField(TransportRequest, on_delete=models.CASCADE, related_name='track')
+    polyline = models.TextField(blank=True, help_text="Google encoded polyline of the kept positions")
+    time_offsets = models.JSONField(default=list, blank=True, help_text="Seconds since started_at, one per point")
+    point_count = models.IntegerField(default=0)
+    distance_km = models.FloatField(default=0.0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    ended_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:  # Meta class implementation
+        db_table = 'transport_tracks'
+
+    def __str__(self):  # Return string representation
+        return f"Track of {self.transport_request_id} ({self.point_count} points)"
+
+
 class HospitalTransportNotification(SyncMixin):  # Notifications to hospitals about transport requests
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -313,6 +330,8 @@ class HospitalTransportNotification(SyncMixin):  # Notifications to hospitals ab
     can_provide_transport = models.BooleanField(default=False)
     estimated_arrival_time = models.DateTimeField(null=True, blank=True)
     proposed_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    dispatch_wave = models.PositiveSmallIntegerField(default=1, help_text="Dispatch wave that notified this hospital")
+    distance_km = models.FloatField(null=True, blank=True, help_text="Hospital distance from the pickup point")
 
     class Meta:  # Meta class implementation
         db_table = 'hospital_transport_notifications'
@@ -0,0 +1,33 @@
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def dispatch_ambulance_request(request_id, wave=1):
+    """Notify the next wave of hospitals of an ambulance request (queued by transport.signals)"""
+    from .dispatch import AmbulanceDispatcher
+
+    return AmbulanceDispatcher.dispatch_wave(request_id, wave)
+
+
+@shared_task
+def escalate_ambulance_dispatches():
+    """Send the next wave of pending ambulance requests whose latest wave timed out (scheduled in backend/celery.py)"""
+    from .dispatch import AmbulanceDispatcher
+
+    escalated = AmbulanceDispatcher.escalate_due()
+    if escalated:
+        logger.info(f"Escalated {escalated} ambulance requests")
+    return {'escalated': escalated}
+
+
+@shared_task
+def compact_transport_track(request_id):
+    """Compact a finished trip's positions into its TransportTrack (queued by transport.signals)"""
+    from .tracking import LocationTracker
+
+    track = LocationTracker.compact(request_id)
+    return {'request': str(request_id), 'points': track.point_count if track else 0}
+
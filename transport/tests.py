@@ -1,3 +1,252 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from communication.models import Notification
+from core.models import Participant
+from core.provider_map_index import ProviderMapIndex
+from sync.models import SyncEvent
+
+from .dispatch import AmbulanceDispatcher
+from .models import DriverLocation, HospitalTransportNotification, TransportRequest, TransportTrack
+from .tracking import LocationTracker, decode_polyline, encode_polyline
+
+PICKUP = (6.3703, 2.3912)
+
+
+class AmbulanceDispatchTests(TestCase):
+    def setUp(self):
+        self.patient = Participant.objects.create(email='patient@example.com', role='patient', full_name='Patient')
+        # ~1, 5, 10, 20 and 200 km north of the pickup point, plus one hospital without coordinates
+        self.hospitals = [
+            Participant.objects.create(
+                email=f'hospital{km}@example.com', role='hospital', full_name=f'Hôpital {km} km',
+                latitude=PICKUP[0] + km / 111.2, longitude=PICKUP[1], is_active=True, is_verified=True,
+            )
+            for km in (20, 1, 200, 10, 5)
+        ]
+        self.unmapped = Participant.objects.create(
+            email='unmapped@example.com', role='hospital', full_name='Hôpital sans GPS', is_active=True,
+        )
+        ProviderMapIndex.rebuild()
+
+    def _request(self, **fields):
+        return TransportRequest.objects.create(**{
+            'patient': self.patient,
+            'transport_type': 'ambulance',
+            'urgency': 'emergency',
+            'pickup_address': 'Cotonou',
+            'pickup_latitude': PICKUP[0],
+            'pickup_longitude': PICKUP[1],
+            'dropoff_address': 'CNHU',
+            'scheduled_pickup_time': timezone.now(),
+            **fields,
+        })
+
+    def _notified(self, transport_request, wave):
+        return list(HospitalTransportNotification.objects.filter(
+            transport_request=transport_request, dispatch_wave=wave
+        ).order_by('distance_km').values_list('hospital__full_name', flat=True))
+
+    def test_first_wave_notifies_nearest_hospitals(self):
+        transport_request = self._request()
+
+        result = AmbulanceDispatcher.dispatch_wave(transport_request.pk)
+
+        self.assertEqual(result['notified'], 3)
+        self.assertEqual(self._notified(transport_request, 1), ['Hôpital 1 km', 'Hôpital 5 km', 'Hôpital 10 km'])
+        self.assertEqual(Notification.objects.filter(metadata__transport_request_id=str(transport_request.id)).count(), 3)
+        # Bulk inserts send no post_save: their sync events are logged explicitly
+        self.assertEqual(SyncEvent.objects.filter(
+            model_name='transport.hospitaltransportnotification', event_type='create',
+            object_id__in=HospitalTransportNotification.objects.values('id'),
+        ).count(), 3)
+        # Retries of a wave already sent are no-ops
+        self.assertEqual(AmbulanceDispatcher.dispatch_wave(transport_request.pk, 1)['reason'], 'already_dispatched')
+
+    def test_request_is_dispatched_after_commit(self):  # No Celery involved in the first wave
+        with self.captureOnCommitCallbacks(execute=True):
+            transport_request = self._request()
+            self.assertFalse(HospitalTransportNotification.objects.exists())
+
+        self.assertEqual(self._notified(transport_request, 1), ['Hôpital 1 km', 'Hôpital 5 km', 'Hôpital 10 km'])
+        latency = AmbulanceDispatcher.first_notification_latency(transport_request)
+        self.assertIsNotNone(latency)
+        self.assertLess(latency, timedelta(seconds=2))
+
+    def test_timed_escalation_until_accepted(self):
+        transport_request = self._request()
+        AmbulanceDispatcher.dispatch_wave(transport_request.pk)
+        now = timezone.now()
+
+        self.assertEqual(AmbulanceDispatcher.escalate_due(now + timedelta(seconds=30)), 0)
+        self.assertEqual(AmbulanceDispatcher.escalate_due(now + timedelta(seconds=61)), 1)
+        # After the hospitals within the radius, the rest of the region
+        self.assertEqual(
+            sorted(self._notified(transport_request, 2)), ['Hôpital 20 km', 'Hôpital 200 km', 'Hôpital sans GPS']
+        )
+
+        transport_request.status = 'accepted'
+        transport_request.save()
+        self.assertEqual(AmbulanceDispatcher.escalate_due(now + timedelta(seconds=200)), 0)
+        self.assertEqual(AmbulanceDispatcher.dispatch_wave(transport_request.pk, 3)['reason'], 'not_pending')
+
+    def test_wave_declined_by_everyone_escalates_immediately(self):
+        transport_request = self._request()
+        AmbulanceDispatcher.dispatch_wave(transport_request.pk)
+        wave = HospitalTransportNotification.objects.filter(transport_request=transport_request)
+
+        with mock.patch.object(AmbulanceDispatcher, 'schedule') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                for notification in wave[:2]:
+                    AmbulanceDispatcher.record_response(transport_request, notification.hospital, accepted=False)
+            schedule.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                AmbulanceDispatcher.record_response(transport_request, wave.filter(status='pending')[0].hospital, False)
+            schedule.assert_called_once_with(transport_request.pk, 2, 0)
+
+        AmbulanceDispatcher.schedule(transport_request.pk, 2, 0)  # without a worker broker: sent inline
+        self.assertEqual(len(self._notified(transport_request, 2)), 3)
+
+
+    def test_other_transport_types_notify_hospitals_too(self):  # e.g. a medical taxi, through the same waves
+        with self.captureOnCommitCallbacks(execute=True):
+            transport_request = self._request(transport_type='medical_taxi', urgency='scheduled')
+
+        self.assertEqual(self._notified(transport_request, 1), ['Hôpital 1 km', 'Hôpital 5 km', 'Hôpital 10 km'])
+        notification = Notification.objects.filter(metadata__transport_request_id=str(transport_request.id)).first()
+        self.assertEqual(notification.title, 'Nouvelle demande de transport: Medical Taxi')
+        self.assertEqual(AmbulanceDispatcher.escalate_due(timezone.now() + timedelta(seconds=301)), 1)
+
+    def test_response_updates_only_the_latest_wave(self):  # Earlier rows of the same hospital keep their answer
+        transport_request = self._request()
+        AmbulanceDispatcher.dispatch_wave(transport_request.pk)
+        hospital = self.hospitals[1]
+        earlier = HospitalTransportNotification.objects.get(transport_request=transport_request, hospital=hospital)
+        HospitalTransportNotification.objects.filter(pk=earlier.pk).update(status='rejected', dispatch_wave=0)
+        latest = HospitalTransportNotification.objects.create(
+            transport_request=transport_request, hospital=hospital, status='pending', dispatch_wave=1,
+        )
+
+        AmbulanceDispatcher.record_response(transport_request, hospital, accepted=True)
+        self.assertEqual(
+            dict(HospitalTransportNotification.objects.filter(pk__in=[earlier.pk, latest.pk]).values_list('pk', 'status')),
+            {earlier.pk: 'rejected', latest.pk: 'accepted'},
+        )
+
+
+class LocationTrackingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.patient = Participant.objects.create(email='patient@example.com', role='patient', full_name='Patient')
+        self.hospital = Participant.objects.create(email='hospital@example.com', role='hospital', full_name='Hôpital')
+        self.transport_request = TransportRequest.objects.create(
+            patient=self.patient,
+            transport_type='medical_taxi',
+            urgency='scheduled',
+            status='en_route',
+            pickup_address='Cotonou',
+            dropoff_address='CNHU',
+            scheduled_pickup_time=timezone.now(),
+        )
+
+    def _trip(self, minutes=30, interval=3):
+        """Pings every `interval` seconds at ~40 km/h, with a two-minute stop every ten minutes"""
+        start = timezone.now()
+        lat, lng = PICKUP
+        pings = []
+        for i in range(minutes * 60 // interval):
+            elapsed = i * interval
+            if elapsed % 600 >= 120:
+                lat += 40 / 3600 * interval / 111.2
+            pings.append(LocationTracker.parse_ping({
+                'latitude': lat, 'longitude': lng, 'speed': 40, 'timestamp': start + timedelta(seconds=elapsed),
+            }))
+        return pings
+
+    def test_polyline_round_trip(self):
+        points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+        self.assertEqual(encode_polyline(points), '_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+        self.assertEqual(decode_polyline(encode_polyline(points)), points)
+
+    def test_trip_writes_an_order_of_magnitude_less_than_pings(self):
+        pings = self._trip()
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(0, len(pings), 20):  # the app posts a minute of pings at a time
+                self.transport_request.refresh_from_db()
+                LocationTracker.record(self.transport_request, pings[i:i + 20])
+        writes = [q for q in queries.captured_queries if q['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertLessEqual(len(writes) * 10, len(pings))
+        self.assertEqual(LocationTracker.latest(self.transport_request), pings[-1])
+
+        with self.captureOnCommitCallbacks(execute=True):  # compacted in-process with the memory:// broker
+            self.transport_request.status = 'completed'
+            self.transport_request.save()
+
+        track = TransportTrack.objects.get(transport_request=self.transport_request)
+        self.assertFalse(DriverLocation.objects.filter(transport_request=self.transport_request).exists())
+        self.assertLessEqual(track.point_count * 10, len(pings) * 4)
+        self.assertEqual(len(decode_polyline(track.polyline)), track.point_count)
+        self.assertEqual(len(track.time_offsets), track.point_count)
+        self.assertAlmostEqual(track.distance_km, 40 * 0.4, delta=1)
+
+    def test_compaction_is_queued_with_a_worker_broker(self):
+        with override_settings(CELERY_BROKER_URL='redis://localhost:6379/0'), \
+                mock.patch('transport.tasks.compact_transport_track.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.transport_request.status = 'cancelled'
+            self.transport_request.save()
+        delay.assert_called_once_with(str(self.transport_request.pk))
+
+    def test_location_endpoint(self):
+        client = APIClient()
+        url = f'/api/v1/transport/tracking/{self.transport_request.pk}/location/'
+        ping = {'latitude': 6.37, 'longitude': 2.39, 'heading': 90}
+
+        client.force_authenticate(self.patient)
+        self.assertEqual(client.post(url, ping, format='json').status_code, 403)
+
+        client.force_authenticate(self.hospital)
+        response = client.post(url, {'points': [ping]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['kept'], 1)
+        self.assertEqual(client.post(url, {'latitude': 100}, format='json').status_code, 400)
+
+        client.force_authenticate(self.patient)
+        response = client.get(url)
+        self.assertEqual(response.data['location']['latitude'], 6.37)
+        self.assertEqual(response.data['location']['heading'], 90)
+
+    def test_batches_are_thinned_against_the_stored_position(self):  # Any worker sees the last kept ping
+        start = timezone.now()
+        first = LocationTracker.parse_ping({'latitude': 6.37, 'longitude': 2.39, 'timestamp': start})
+        self.assertEqual(LocationTracker.record(self.transport_request, [first])['kept'], 1)
+
+        cache.clear()  # next batch served by another process
+        self.transport_request.refresh_from_db()
+        close = LocationTracker.parse_ping({'latitude': 6.37, 'longitude': 2.39, 'timestamp': start + timedelta(seconds=3)})
+        self.assertEqual(LocationTracker.record(self.transport_request, [close])['kept'], 0)
+        self.assertEqual(DriverLocation.objects.filter(transport_request=self.transport_request).count(), 1)
+
+        cache.clear()
+        self.transport_request.refresh_from_db()
+        self.assertEqual(LocationTracker.latest(self.transport_request)['timestamp'], first['timestamp'])
+
+    def test_late_batch_does_not_move_the_position_back(self):
+        start = timezone.now()
+        LocationTracker.record(self.transport_request, [
+            LocationTracker.parse_ping({'latitude': 6.40, 'longitude': 2.39, 'timestamp': start + timedelta(minutes=5)})
+        ])
+        LocationTracker.record(self.transport_request, [
+            LocationTracker.parse_ping({'latitude': 6.37, 'longitude': 2.39, 'timestamp': start})
+        ])
+        self.transport_request.refresh_from_db()
+        self.assertEqual(self.transport_request.current_latitude, 6.40)
+        self.assertEqual(DriverLocation.objects.filter(transport_request=self.transport_request).count(), 2)
@@ -0,0 +1,282 @@
+"""
+Live driver tracking for transport requests.
+
+The hospital app posts GPS pings in batches ({"points": [...]}, about a minute
+of pings per request); the tracking page polls the GET driver_location
+endpoint. Only a thinned track reaches the database:
+
+- a ping is kept when the vehicle moved at least KEEP_DISTANCE_M and
+  KEEP_MIN_SECONDS passed since the last kept ping, or when KEEP_MAX_SECONDS
+  passed (one heartbeat a minute while stopped);
+- the kept pings of a batch are written with one bulk insert of
+  DriverLocation rows and one update of TransportRequest.current_latitude/
+  current_longitude/last_location_update, so the request row always holds
+  the last kept ping: it is what the next batch is thinned against and what
+  every worker serves. The newest ping (with heading and speed) is also
+  cached for GETs served by the same process;
+- when the trip completes or is cancelled, the rows are compacted into one
+  TransportTrack (encoded polyline plus time offsets) and deleted.
+
+Bulk writes send no post_save, so tracking does not add sync events either.
+"""
+import logging
+import math
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import DriverLocation, TransportRequest, TransportTrack
+
+logger = logging.getLogger(__name__)
+
+KEEP_DISTANCE_M = 50
+KEEP_MIN_SECONDS = 10
+KEEP_MAX_SECONDS = 60
+LIVE_TTL = 60 * 60 * 6
+POLYLINE_PRECISION = 5
+TRACKED_STATUSES = ['accepted', 'driver_assigned', 'en_route', 'arrived', 'in_transit']
+
+
+def _distance_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000 * math.asin(min(1.0, math.sqrt(a)))
+
+
+def encode_polyline(points, precision=POLYLINE_PRECISION):
+    """Encode [(lat, lng)] with the Google encoded polyline algorithm"""
+    factor = 10 ** precision
+    output = []
+    previous = (0, 0)
+    for lat, lng in points:
+        current = (round(lat * factor), round(lng * factor))
+        for delta in (current[0] - previous[0], current[1] - previous[1]):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                output.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            output.append(chr(value + 63))
+        previous = current
+    return ''.join(output)
+
+
+def decode_polyline(encoded, precision=POLYLINE_PRECISION):
+    """[(lat, lng)] of an encoded polyline"""
+    factor = 10 ** precision
+    points = []
+    index = lat = lng = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat / factor, lng / factor))
+    return points
+
+
+class LocationTracker:
+    """Driver position pipeline"""
+
+    @staticmethod
+    def _live_key(request_id):
+        return f'transport:location:{request_id}'
+
+    @staticmethod
+    def parse_ping(data):
+        """
+        Normalized ping from request data
+
+        Raises:
+            ValueError: on missing or out of range coordinates
+        """
+        try:
+            latitude, longitude = float(data['latitude']), float(data['longitude'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Coordonnées invalides')
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError('Coordonnées invalides')
+
+        timestamp = data.get('timestamp')
+        if isinstance(timestamp, str):
+            timestamp = parse_datetime(timestamp)
+        if not isinstance(timestamp, datetime):
+            timestamp = timezone.now()
+        elif timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+
+        def optional(name):
+            try:
+                return float(data[name]) if data.get(name) not in (None, '') else None
+            except (TypeError, ValueError):
+                return None
+
+        return {
+            'latitude': latitude,
+            'longitude': longitude,
+            'heading': optional('heading'),
+            'speed': optional('speed'),
+            'accuracy': optional('accuracy'),
+            'timestamp': timestamp.isoformat(),
+        }
+
+    @staticmethod
+    def stored(transport_request):
+        """Last kept ping of a request, from its row, or None"""
+        if transport_request.current_latitude is None or transport_request.last_location_update is None:
+            return None
+        return {
+            'latitude': transport_request.current_latitude,
+            'longitude': transport_request.current_longitude,
+            'timestamp': transport_request.last_location_update.isoformat(),
+        }
+
+    @staticmethod
+    def latest(transport_request):
+        """Latest known position of a request: this process's cached ping when newer than the stored one"""
+        stored = LocationTracker.stored(transport_request)
+        cached = cache.get(LocationTracker._live_key(transport_request.pk))
+        if cached is None or (stored and parse_datetime(stored['timestamp']) > parse_datetime(cached['timestamp'])):
+            return stored
+        return cached
+
+    @staticmethod
+    def should_keep(previous, ping):
+        """Whether a ping is far or late enough after the last kept one to be persisted"""
+        if previous is None:
+            return True
+        elapsed = (parse_datetime(ping['timestamp']) - parse_datetime(previous['timestamp'])).total_seconds()
+        if elapsed >= KEEP_MAX_SECONDS:
+            return True
+        moved = _distance_m(previous['latitude'], previous['longitude'], ping['latitude'], ping['longitude'])
+        return moved >= KEEP_DISTANCE_M and elapsed >= KEEP_MIN_SECONDS
+
+    @staticmethod
+    def record(transport_request, pings, quote_id=None):
+        """
+        Ingest a batch of pings of an active request (transport_request freshly loaded)
+
+        Returns:
+            dict: received and kept (rows written)
+        """
+        pings = sorted(pings, key=lambda ping: parse_datetime(ping['timestamp']))
+        if not pings:
+            return {'received': 0, 'kept': 0}
+
+        previous = LocationTracker.stored(transport_request)
+        kept = []
+        for ping in pings:
+            if LocationTracker.should_keep(previous, ping):
+                kept.append(ping)
+                previous = ping
+
+        latest = pings[-1]
+        live_key = LocationTracker._live_key(transport_request.pk)
+        cached = cache.get(live_key)
+        if cached is None or parse_datetime(cached['timestamp']) <= parse_datetime(latest['timestamp']):
+            cache.set(live_key, latest, LIVE_TTL)
+
+        LocationTracker.write(transport_request, kept, quote_id=quote_id)
+        return {'received': len(pings), 'kept': len(kept)}
+
+    @staticmethod
+    def write(transport_request, points, quote_id=None):
+        """Persist kept pings: one bulk insert and one update of the request's current position"""
+        if not points:
+            return 0
+        DriverLocation.objects.bulk_create([
+            DriverLocation(
+                transport_request_id=transport_request.pk,
+                quote_id=quote_id,
+                latitude=point['latitude'],
+                longitude=point['longitude'],
+                heading=point.get('heading'),
+                speed=point.get('speed'),
+                accuracy=point.get('accuracy'),
+                timestamp=parse_datetime(point['timestamp']),
+                region_code=transport_request.region_code,
+            )
+            for point in points
+        ])
+        last = points[-1]
+        last_at = parse_datetime(last['timestamp'])
+        # A batch delivered late must not move the request back to an older position
+        TransportRequest.objects.filter(
+            Q(last_location_update__isnull=True) | Q(last_location_update__lt=last_at), pk=transport_request.pk,
+        ).update(
+            current_latitude=last['latitude'],
+            current_longitude=last['longitude'],
+            last_location_update=last_at,
+            version=F('version') + 1,
+            updated_at=timezone.now(),
+        )
+        return len(points)
+
+    @staticmethod
+    def compact(request_id):
+        """
+        Replace a finished trip's DriverLocation rows with one TransportTrack
+
+        Returns:
+            TransportTrack or None when the trip has no recorded position
+        """
+        transport_request = TransportRequest.objects.get(pk=request_id)
+        with transaction.atomic():
+            rows = list(DriverLocation.objects.filter(
+                transport_request_id=request_id
+            ).order_by('timestamp').values_list('latitude', 'longitude', 'timestamp'))
+            if not rows:
+                return TransportTrack.objects.filter(transport_request_id=request_id).first()
+
+            points = [(lat, lng) for lat, lng, _ in rows]
+            started_at = rows[0][2]
+            track = TransportTrack.objects.filter(transport_request_id=request_id).first() or TransportTrack(
+                transport_request_id=request_id, region_code=transport_request.region_code
+            )
+            if track.point_count:  # late pings after an earlier compaction: append to the existing track
+                points = decode_polyline(track.polyline) + points
+                started_at = track.started_at
+                offsets = track.time_offsets + [int((ts - started_at).total_seconds()) for _, _, ts in rows]
+            else:
+                offsets = [int((ts - started_at).total_seconds()) for _, _, ts in rows]
+            track.polyline = encode_polyline(points)
+            track.time_offsets = offsets
+            track.point_count = len(points)
+            track.distance_km = round(sum(
+                _distance_m(*points[i - 1], *points[i]) for i in range(1, len(points))
+            ) / 1000, 3)
+            track.started_at = started_at
+            track.ended_at = rows[-1][2]
+            track.save()
+            DriverLocation.objects.filter(transport_request_id=request_id).delete()
+
+        cache.delete(LocationTracker._live_key(request_id))
+        logger.info(f"Compacted {len(rows)} positions of transport request {request_id} into {track.point_count}-point track")
+        return track
+
+    @staticmethod
+    def enqueue_compaction(request_id):
+        """Compact a finished trip on a worker, or right away when no worker consumes the broker"""
+        from backend.celery import run_inline
+        from .tasks import compact_transport_track
+
+        try:
+            if run_inline():
+                LocationTracker.compact(request_id)
+            else:
+                compact_transport_track.delay(str(request_id))
+        except Exception as e:
+            logger.warning(f"Could not compact the track of transport request {request_id}: {e}")
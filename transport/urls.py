@@ -14,6 +14,7 @@ urlpatterns = [
     path('book/', views.TransportRequestView.as_view(), name='transport_request_page'),
     path('my-requests/', views.PatientTransportRequestsView.as_view(), name='patient_requests_list'),
     path('tracking/<uuid:request_id>/', views.TransportTrackingView.as_view(), name='transport_tracking'),
+    path('tracking/<uuid:request_id>/location/', views.driver_location, name='driver_location'),
     
     # Hospital transport dashboard
     path('hospital/dashboard/', views.HospitalTransportDashboardView.as_view(), name='hospital_dashboard'),
@@ -1,6 +1,7 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import TemplateView
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.utils import timezone
 from django.db.models import Q, Count
 from datetime import datetime, timedelta
@@ -10,6 +11,8 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .models import TransportRequest, TransportProvider, RideShareQuote
 from .serializers import TransportRequestSerializer, TransportProviderSerializer, RideShareQuoteSerializer
+from .dispatch import AmbulanceDispatcher
+from .tracking import TRACKED_STATUSES, LocationTracker
 from core.models import Participant
 from communication.models import Notification
 
@@ -78,34 +81,12 @@ class TransportRequestViewSet(viewsets.ModelViewSet):  # View for TransportReque
         return TransportRequest.objects.filter(patient=self.request.user)
 
     def perform_create(self, serializer):  # Perform create
-        from communication.models import Notification
-        from core.models import Participant
-        
         # Set scheduled_pickup_time to now for emergency transport
-        transport_request = serializer.save(
+        # Hospitals are notified nearest first by transport.signals (every transport type)
+        serializer.save(
             patient=self.request.user,
             scheduled_pickup_time=timezone.now()
         )
-        
-        # Notify all active hospitals about the new transport request
-        hospitals = Participant.objects.filter(
-            role='hospital',
-            is_active=True
-        )
-        
-        for hospital in hospitals:
-            Notification.objects.create(
-                recipient=hospital,
-                notification_type='system',
-                title='Nouvelle Demande de Transport',
-                message=f'Nouvelle demande de transport ambulancier de {self.request.user.first_name} {self.request.user.last_name}. Urgence: {transport_request.get_urgency_display()}',
-                action_url=f'/hospital/transport/dashboard/',
-                metadata={
-                    'transport_request_id': str(transport_request.id),
-                    'urgency': transport_request.urgency,
-                    'transport_type': transport_request.transport_type
-                }
-            )
 
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):  # Cancel
@@ -538,6 +519,7 @@ def accept_transport_request(request, request_id):
         transport_request.status = 'driver_assigned'
         transport_request.assigned_hospital = request.user
         transport_request.save()
+        AmbulanceDispatcher.record_response(transport_request, request.user, accepted=True)
         
         # Send notification to patient
         Notification.objects.create(
@@ -615,7 +597,8 @@ def decline_transport_request(request, request_id):
         reason = request.data.get('reason', 'Non disponible')
         
         # Note: We don't cancel the request, just decline it so other hospitals can accept
-        # Add a declined_by field to track which hospitals declined
+        # (the next dispatch wave goes out once the whole current wave declined)
+        AmbulanceDispatcher.record_response(transport_request, request.user, accepted=False, notes=reason)
         
         # Send notification to patient
         Notification.objects.create(
@@ -634,6 +617,46 @@ def decline_transport_request(request, request_id):
         return Response({'error': 'Demande non trouvée'}, status=status.HTTP_404_NOT_FOUND)
 
 
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def driver_location(request, request_id):
+    """
+    GET: latest driver position of a transport request (patient or hospital)
+    POST: driver GPS pings from the hospital app, one point or {"points": [...]} (see transport/tracking.py)
+    """
+    is_hospital = request.user.role in ['hospital', 'hospital_admin', 'hospital_staff']
+    try:
+        transport_request = TransportRequest.objects.get(id=request_id)
+    except TransportRequest.DoesNotExist:
+        return Response({'error': 'Demande non trouvée'}, status=status.HTTP_404_NOT_FOUND)
+    if not is_hospital and transport_request.patient_id != request.user.pk:
+        return Response({'error': 'Accès refusé'}, status=status.HTTP_403_FORBIDDEN)
+
+    if request.method == 'GET':
+        location = LocationTracker.latest(transport_request)
+        return Response({'status': transport_request.status, 'location': location})
+
+    if not is_hospital:
+        return Response({'error': 'Accès refusé'}, status=status.HTTP_403_FORBIDDEN)
+    if transport_request.status not in TRACKED_STATUSES:
+        return Response({'error': 'Le suivi n\'est pas actif pour cette demande'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        points = request.data.get('points') or [request.data]
+        pings = [LocationTracker.parse_ping(point) for point in points]
+    except (ValueError, AttributeError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    quote_id = None
+    if request.data.get('quote_id'):
+        try:
+            quote_id = RideShareQuote.objects.filter(
+                id=request.data['quote_id'], transport_request=transport_request
+            ).values_list('id', flat=True).first()
+        except (ValueError, DjangoValidationError):
+            quote_id = None
+    return Response(LocationTracker.record(transport_request, pings, quote_id=quote_id))
+
+
 
 
 # Hospital-specific ViewSet for Transport Management
@@ -687,6 +710,7 @@ class HospitalTransportViewSet(viewsets.ReadOnlyModelViewSet):
         transport_request.assigned_hospital = request.user
         transport_request.status = 'accepted'
         transport_request.save()
+        AmbulanceDispatcher.record_response(transport_request, request.user, accepted=True)
         
         # Send notification to patient
         Notification.objects.create(